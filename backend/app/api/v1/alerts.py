@@ -1,14 +1,28 @@
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, tuple_
 from datetime import datetime, timedelta
+import json
+import time
 
+from app.core.config import settings
 from app.core.db import get_db
 from app.core.dependencies import get_current_active_user, get_current_user_with_permission
-from app.models.postgres import Alert, Asset, AlertRule, User
+from app.crud.alert_counter_crud import count_alerts, count_by_status_severity, count_new_alerts, move_alert_counts
+from app.crud.event_crud import get_asset_events, get_event_near
+from app.crud.version_crud import ALERT_RULES_VERSION, bump_version
+from app.models.postgres import Alert, AlertOccurrence, Asset, AlertRule, User
+from app.core.fulltext import index_text
+from app.core.threat_category import classify_threat
+from app.services.alert_search import highlight, ranked_matches, search_condition
+from app.services.rule_engine import RuleCompileError, compile_rule
 from app.schemas.user import User as UserSchema
 from app.schemas.common import (
+    BulkOperationResponse,
+    CursorPaginatedResponse,
+    decode_cursor,
+    encode_cursor,
     MessageResponse,
     PaginatedResponse,
     IDResponse
@@ -20,8 +34,18 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 告警详情中关联事件的时间窗口和数量
+RELATED_EVENT_WINDOW = timedelta(hours=1)
+RELATED_EVENT_LIMIT = 20
+
+# 告警处理状态
+ALERT_STATUSES = ("unhandled", "handling", "resolved")
+
+# 批量更新状态时一次最多指定的告警ID数
+BULK_STATUS_MAX_IDS = 10000
+
 # 告警相关数据模式
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class AlertBase(BaseModel):
     """告警基础模式"""
@@ -39,17 +63,39 @@ class AlertUpdate(BaseModel):
     status: Optional[str] = None  # unhandled, handling, resolved
     handle_notes: Optional[str] = None
 
+class AlertFilter(BaseModel):
+    """告警过滤条件模式（与告警列表的查询参数相同）"""
+    severity: Optional[str] = None
+    status: Optional[str] = None
+    asset_id: Optional[int] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    search: Optional[str] = None
+
+class AlertBulkStatusUpdate(BaseModel):
+    """批量更新告警状态模式（ids 与 filter 二选一）"""
+    ids: Optional[List[int]] = Field(None, max_length=BULK_STATUS_MAX_IDS)
+    filter: Optional[AlertFilter] = None
+    status: str  # unhandled, handling, resolved
+    handle_notes: Optional[str] = None
+
 class AlertResponse(AlertBase):
     """告警响应模式"""
     id: int
     event_id: Optional[int]
-    asset_id: int
+    asset_id: Optional[int]  # 规则引擎产生的告警可能没有关联资产
     status: str
     created_at: datetime
     updated_at: datetime
     handled_by: Optional[int]
     handle_notes: Optional[str]
     handled_at: Optional[datetime]
+    # 聚合信息：重复命中合并到同一告警
+    rule_id: Optional[int] = None
+    occurrence_count: int = 1
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    threat_category: Optional[str] = None
 
     # 关联数据
     asset_name: Optional[str] = None
@@ -58,11 +104,26 @@ class AlertResponse(AlertBase):
     class Config:
         from_attributes = True
 
+class AlertSearchHit(AlertResponse):
+    """告警检索结果模式"""
+    score: float  # 相关度，越大越相关
+    highlight: Optional[str] = None  # 描述（或名称）中命中关键词附近的摘要，关键词用 <mark> 标记
+
 class AlertDetail(AlertResponse):
     """告警详情模式"""
     raw_data: Optional[dict] = None
     related_events: List[dict] = []
 
+class AlertOccurrenceResponse(BaseModel):
+    """告警发生记录模式"""
+    id: int
+    event_id: Optional[int]
+    occurred_at: datetime
+    description: Optional[str]
+
+    class Config:
+        from_attributes = True
+
 class AlertRuleBase(BaseModel):
     """告警规则基础模式"""
     name: str
@@ -105,6 +166,80 @@ class AlertStatistics(BaseModel):
     today_new: int
     this_week_new: int
 
+def _alert_response(alert: Alert, asset_name: Optional[str], handler_name: Optional[str]) -> AlertResponse:
+    """告警列表项"""
+    return AlertResponse(
+        id=alert.id,
+        alert_name=alert.alert_name,
+        severity=alert.severity,
+        description=alert.description,
+        event_id=alert.event_id,
+        asset_id=alert.asset_id,
+        status=alert.status,
+        created_at=alert.created_at,
+        updated_at=alert.updated_at,
+        handled_by=alert.handled_by,
+        handle_notes=alert.handle_notes,
+        handled_at=alert.handled_at,
+        rule_id=alert.rule_id,
+        occurrence_count=alert.occurrence_count or 1,
+        first_seen=alert.first_seen,
+        last_seen=alert.last_seen,
+        threat_category=alert.threat_category,
+        asset_name=asset_name,
+        handler_name=handler_name
+    )
+
+# 精确总数的缓存: 过滤条件 → (过期时间, 总数)
+_total_cache: Dict[str, Tuple[float, int]] = {}
+_TOTAL_CACHE_MAX_KEYS = 1024
+
+def _cached_total(query, key: str) -> int:
+    """
+    精确总数，按过滤条件缓存 ALERT_TOTAL_CACHE_TTL 秒
+
+    同一过滤条件在缓存期内只执行一次全量 COUNT
+    """
+    now = time.monotonic()
+    cached = _total_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    total = query.order_by(None).count()
+    if len(_total_cache) >= _TOTAL_CACHE_MAX_KEYS:
+        _total_cache.clear()
+    _total_cache[key] = (now + settings.ALERT_TOTAL_CACHE_TTL, total)
+    return total
+
+def _apply_alert_filters(
+    query,
+    severity: Optional[str] = None,
+    status: Optional[str] = None,
+    asset_id: Optional[int] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    search: Optional[str] = None
+):
+    """按告警列表的过滤条件过滤查询"""
+    if severity:
+        query = query.filter(Alert.severity == severity)
+
+    if status:
+        query = query.filter(Alert.status == status)
+
+    if asset_id:
+        query = query.filter(Alert.asset_id == asset_id)
+
+    if start_time:
+        query = query.filter(Alert.created_at >= start_time)
+
+    if end_time:
+        query = query.filter(Alert.created_at <= end_time)
+
+    if search:
+        # 全文索引匹配（见 app/services/alert_search.py）
+        query = query.filter(search_condition(query.session, search))
+    return query
+
 @router.get("/", response_model=PaginatedResponse[AlertResponse], summary="获取告警列表")
 def get_alerts(
     page: int = Query(1, ge=1, description="页码"),
@@ -132,36 +267,15 @@ def get_alerts(
     try:
         skip = (page - 1) * size
 
-        # 构建查询
-        query = db.query(Alert, Asset.name.label('asset_name'), User.full_name.label('handler_name')).join(
+        # 构建查询（规则引擎产生的告警可能没有资产）
+        query = db.query(Alert, Asset.name.label('asset_name'), User.full_name.label('handler_name')).outerjoin(
             Asset, Alert.asset_id == Asset.id
         ).outerjoin(
             User, Alert.handled_by == User.id
         )
 
         # 应用过滤条件
-        if severity:
-            query = query.filter(Alert.severity == severity)
-
-        if status:
-            query = query.filter(Alert.status == status)
-
-        if asset_id:
-            query = query.filter(Alert.asset_id == asset_id)
-
-        if start_time:
-            query = query.filter(Alert.created_at >= start_time)
-
-        if end_time:
-            query = query.filter(Alert.created_at <= end_time)
-
-        if search:
-            query = query.filter(
-                or_(
-                    Alert.alert_name.ilike(f"%{search}%"),
-                    Alert.description.ilike(f"%{search}%")
-                )
-            )
+        query = _apply_alert_filters(query, severity, status, asset_id, start_time, end_time, search)
 
         # 获取总数
         total = query.count()
@@ -170,25 +284,7 @@ def get_alerts(
         results = query.order_by(desc(Alert.created_at)).offset(skip).limit(size).all()
 
         # 构建响应数据
-        alerts = []
-        for alert, asset_name, handler_name in results:
-            alert_data = AlertResponse(
-                id=alert.id,
-                alert_name=alert.alert_name,
-                severity=alert.severity,
-                description=alert.description,
-                event_id=alert.event_id,
-                asset_id=alert.asset_id,
-                status=alert.status,
-                created_at=alert.created_at,
-                updated_at=alert.updated_at,
-                handled_by=alert.handled_by,
-                handle_notes=alert.handle_notes,
-                handled_at=alert.handled_at,
-                asset_name=asset_name,
-                handler_name=handler_name
-            )
-            alerts.append(alert_data)
+        alerts = [_alert_response(*row) for row in results]
 
         return PaginatedResponse.create(
             items=alerts,
@@ -204,6 +300,221 @@ def get_alerts(
             detail="获取告警列表失败"
         )
 
+@router.get("/cursor", response_model=CursorPaginatedResponse[AlertResponse], summary="游标分页获取告警列表")
+def get_alerts_by_cursor(
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，首页不传"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    exact_total: bool = Query(False, description="返回精确总数（按过滤条件缓存，可能有短暂延迟）"),
+    severity: Optional[str] = Query(None, description="告警级别过滤"),
+    status_filter: Optional[str] = Query(None, alias="status", description="处理状态过滤"),
+    asset_id: Optional[int] = Query(None, description="资产ID过滤"),
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("alert:read"))
+) -> Any:
+    """
+    游标分页获取告警列表（按创建时间倒序）
+
+    按 (created_at, id) 做 keyset 分页，任意页深的代价相同；过滤条件与告警列表相同。
+    默认只数到 ALERT_LIST_TOTAL_CAP 条（超出时 total_display 为 "10,000+"），
+    exact_total=true 时返回按过滤条件缓存的精确总数
+    """
+    try:
+        filters = dict(
+            severity=severity, status=status_filter, asset_id=asset_id,
+            start_time=start_time, end_time=end_time, search=search
+        )
+        base = _apply_alert_filters(db.query(Alert.id), **filters)
+
+        query = db.query(Alert, Asset.name.label('asset_name'), User.full_name.label('handler_name')).outerjoin(
+            Asset, Alert.asset_id == Asset.id
+        ).outerjoin(
+            User, Alert.handled_by == User.id
+        )
+        query = _apply_alert_filters(query, **filters)
+        if cursor:
+            try:
+                created_at, last_id = decode_cursor(cursor)
+                created_at = datetime.fromisoformat(created_at)
+                last_id = int(last_id)
+            except (ValueError, TypeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="无效的游标"
+                )
+            query = query.filter(tuple_(Alert.created_at, Alert.id) < tuple_(created_at, last_id))
+
+        # 多取一条判断是否有下一页
+        results = query.order_by(desc(Alert.created_at), desc(Alert.id)).limit(size + 1).all()
+        next_cursor = None
+        if len(results) > size:
+            results = results[:size]
+            tail = results[-1][0]
+            next_cursor = encode_cursor(tail.created_at, tail.id)
+
+        if exact_total and not (asset_id or start_time or end_time or search):
+            # 只按状态、级别过滤时由告警计数表直接得到精确总数
+            total = count_alerts(db, status=status_filter or None, severity=severity or None)
+        elif exact_total:
+            total = _cached_total(base, json.dumps(filters, default=str, sort_keys=True))
+        else:
+            # 只数到上限，代价有界
+            cap = settings.ALERT_LIST_TOTAL_CAP
+            total = min(base.limit(cap + 1).count(), cap + 1)
+            exact_total = total <= cap
+            total = min(total, cap)
+
+        return CursorPaginatedResponse.create(
+            items=[_alert_response(*row) for row in results],
+            size=size,
+            next_cursor=next_cursor,
+            total=total,
+            total_exact=exact_total
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取告警列表失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取告警列表失败"
+        )
+
+@router.get("/search", response_model=PaginatedResponse[AlertSearchHit], summary="全文检索告警")
+def search_alerts(
+    q: str = Query(..., min_length=1, max_length=200, description="关键词，多个关键词以空格分隔"),
+    page: int = Query(1, ge=1, description="页码"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    severity: Optional[str] = Query(None, description="告警级别过滤"),
+    status_filter: Optional[str] = Query(None, alias="status", description="处理状态过滤"),
+    asset_id: Optional[int] = Query(None, description="资产ID过滤"),
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("alert:read"))
+) -> Any:
+    """
+    全文检索告警名称和描述
+
+    使用全文索引匹配，结果按相关度排序（相同时较新的在前），并返回关键词高亮摘要。
+    多个关键词同时命中才返回；中文按二元组切分，连续的关键词按短语匹配，最后一个字按前缀匹配
+    """
+    try:
+        matches = ranked_matches(db, q)
+        if matches is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="搜索关键词不包含可检索的字符"
+            )
+
+        query = db.query(
+            Alert, Asset.name.label('asset_name'), User.full_name.label('handler_name'), matches.c.score
+        ).join(
+            matches, matches.c.id == Alert.id
+        ).outerjoin(
+            Asset, Alert.asset_id == Asset.id
+        ).outerjoin(
+            User, Alert.handled_by == User.id
+        )
+        query = _apply_alert_filters(
+            query, severity, status_filter, asset_id, start_time, end_time
+        )
+
+        total = query.count()
+        results = query.order_by(
+            desc(matches.c.score), desc(Alert.created_at)
+        ).offset((page - 1) * size).limit(size).all()
+
+        items = []
+        for alert, asset_name, handler_name, score in results:
+            hit = _alert_response(alert, asset_name, handler_name).model_dump()
+            items.append(AlertSearchHit(
+                **hit,
+                score=score or 0.0,
+                highlight=highlight(alert.description, q) or highlight(alert.alert_name, q)
+            ))
+
+        return PaginatedResponse.create(
+            items=items,
+            total=total,
+            page=page,
+            size=size
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"检索告警失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="检索告警失败"
+        )
+
+@router.get("/statistics", response_model=AlertStatistics, summary="获取告警统计")
+def get_alert_statistics(
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("alert:read"))
+) -> Any:
+    """
+    获取告警统计数据
+
+    包含总数、各状态数量、各级别数量、时间段统计等
+    """
+    try:
+        # 从告警计数表汇总，不扫描告警表
+        counts = count_by_status_severity(db)
+
+        def subtotal(index: int, value: str) -> int:
+            return sum(count for key, count in counts.items() if key[index] == value)
+
+        # 时间段统计（告警创建时间为UTC）
+        today = datetime.utcnow().date()
+        today_new = count_alerts(db, since=today)
+        this_week_new = count_alerts(db, since=today - timedelta(days=7))
+
+        total = sum(counts.values())
+        unhandled = subtotal(0, 'unhandled')
+        handling = subtotal(0, 'handling')
+        resolved = subtotal(0, 'resolved')
+        critical = subtotal(1, 'critical')
+        high = subtotal(1, 'high')
+        medium = subtotal(1, 'medium')
+        low = subtotal(1, 'low')
+
+        return AlertStatistics(
+            total=total,
+            unhandled=unhandled,
+            handling=handling,
+            resolved=resolved,
+            critical=critical,
+            high=high,
+            medium=medium,
+            low=low,
+            today_new=today_new,
+            this_week_new=this_week_new
+        )
+
+    except Exception as e:
+        logger.error(f"获取告警统计失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取告警统计失败"
+        )
+
+def _event_summary(event) -> dict:
+    """关联事件的摘要信息"""
+    return {
+        "id": event.id,
+        "event_type": event.event_type,
+        "event_time": event.event_time.isoformat(),
+        "source_ip": event.source_ip,
+        "destination_ip": event.destination_ip,
+        "description": event.description,
+    }
+
 @router.get("/{alert_id}", response_model=AlertDetail, summary="获取告警详情")
 def get_alert_detail(
     alert_id: int,
@@ -216,8 +527,8 @@ def get_alert_detail(
     包含告警基本信息、关联事件、处理记录等
     """
     try:
-        # 查询告警详情
-        result = db.query(Alert, Asset.name.label('asset_name'), User.full_name.label('handler_name')).join(
+        # 查询告警详情（规则引擎产生的告警可能没有资产）
+        result = db.query(Alert, Asset.name.label('asset_name'), User.full_name.label('handler_name')).outerjoin(
             Asset, Alert.asset_id == Asset.id
         ).outerjoin(
             User, Alert.handled_by == User.id
@@ -231,34 +542,28 @@ def get_alert_detail(
 
         alert, asset_name, handler_name = result
 
-        # 获取关联事件（模拟数据）
+        # 获取关联事件：触发事件及同一资产在告警前后窗口内的事件
+        # 查询都带 event_time 范围，分区表上只会扫描相关分区
         related_events = []
+        raw_data = None
         if alert.event_id:
-            related_events = [
-                {
-                    "id": alert.event_id,
-                    "event_type": "process_creation",
-                    "event_time": alert.created_at.isoformat(),
-                    "description": "可疑进程创建事件"
-                }
-            ]
-
+            event = get_event_near(db, alert.event_id, alert.created_at)
+            if event:
+                raw_data = event.raw_data
+                related_events.append(_event_summary(event))
+
+        # 没有资产的告警不查同资产事件（asset_id 为空会匹配所有无资产的事件）
+        if alert.asset_id is not None:
+            window_start = alert.created_at - RELATED_EVENT_WINDOW
+            window_end = alert.created_at + RELATED_EVENT_WINDOW
+            for event in get_asset_events(db, alert.asset_id, window_start, window_end, RELATED_EVENT_LIMIT):
+                if event.id != alert.event_id:
+                    related_events.append(_event_summary(event))
+
+        # 基本字段与列表项相同，新增字段不需要在详情中重复赋值
         alert_detail = AlertDetail(
-            id=alert.id,
-            alert_name=alert.alert_name,
-            severity=alert.severity,
-            description=alert.description,
-            event_id=alert.event_id,
-            asset_id=alert.asset_id,
-            status=alert.status,
-            created_at=alert.created_at,
-            updated_at=alert.updated_at,
-            handled_by=alert.handled_by,
-            handle_notes=alert.handle_notes,
-            handled_at=alert.handled_at,
-            asset_name=asset_name,
-            handler_name=handler_name,
-            raw_data={"source": "honeypot", "confidence": 0.85},
+            **_alert_response(alert, asset_name, handler_name).model_dump(),
+            raw_data=raw_data,
             related_events=related_events
         )
 
@@ -273,6 +578,132 @@ def get_alert_detail(
             detail="获取告警详情失败"
         )
 
+@router.get(
+    "/{alert_id}/occurrences",
+    response_model=PaginatedResponse[AlertOccurrenceResponse],
+    summary="获取告警发生记录"
+)
+def get_alert_occurrences(
+    alert_id: int,
+    page: int = Query(1, ge=1, description="页码"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("alert:read"))
+) -> Any:
+    """
+    获取聚合告警下的每次命中（按时间倒序）
+
+    每条告警最多保留 ALERT_MAX_OCCURRENCES 条明细，occurrence_count 为全部命中次数
+    """
+    try:
+        if db.query(Alert.id).filter(Alert.id == alert_id).first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="告警不存在"
+            )
+
+        query = db.query(AlertOccurrence).filter(AlertOccurrence.alert_id == alert_id)
+        total = query.count()
+        occurrences = query.order_by(
+            desc(AlertOccurrence.occurred_at), desc(AlertOccurrence.id)
+        ).offset((page - 1) * size).limit(size).all()
+
+        return PaginatedResponse.create(
+            items=[AlertOccurrenceResponse.model_validate(item) for item in occurrences],
+            total=total,
+            page=page,
+            size=size
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取告警发生记录失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取告警发生记录失败"
+        )
+
+@router.post("/bulk-status", response_model=BulkOperationResponse, summary="批量更新告警状态")
+def bulk_update_alert_status(
+    bulk_update: AlertBulkStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("alert:handle"))
+) -> Any:
+    """
+    批量更新告警处理状态，一条 UPDATE 语句完成
+
+    - **ids**: 告警ID列表（最多 10000 个），不存在的ID计入失败
+    - **filter**: 或按告警列表的过滤条件选择告警（至少一个条件）
+    - **status**: 新状态 (unhandled, handling, resolved)
+    - **handle_notes**: 处理备注
+    """
+    try:
+        if bulk_update.status not in ALERT_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的告警状态: {bulk_update.status}"
+            )
+        if (bulk_update.ids is None) == (bulk_update.filter is None):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ids 和 filter 必须且只能指定一个"
+            )
+
+        query = db.query(Alert)
+        failed_items = []
+        if bulk_update.ids is not None:
+            ids = sorted(set(bulk_update.ids))
+            total_count = len(ids)
+            query = query.filter(Alert.id.in_(ids))
+            existing = {alert_id for (alert_id,) in db.query(Alert.id).filter(Alert.id.in_(ids))}
+            failed_items = [alert_id for alert_id in ids if alert_id not in existing]
+        else:
+            conditions = bulk_update.filter.model_dump(exclude_none=True)
+            if not conditions:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="过滤条件不能为空"
+                )
+            query = _apply_alert_filters(query, **conditions)
+            total_count = None
+
+        now = datetime.utcnow()
+        values = {
+            Alert.status: bulk_update.status,
+            Alert.handled_by: current_user.id,
+            Alert.handled_at: now,
+            Alert.updated_at: now,
+        }
+        if bulk_update.handle_notes:
+            values[Alert.handle_notes] = bulk_update.handle_notes
+        move_alert_counts(db, query, bulk_update.status)
+        success_count = query.update(values, synchronize_session=False)
+        db.commit()
+
+        if total_count is None:
+            total_count = success_count
+        logger.info(f"用户 {current_user.username} 批量将 {success_count} 条告警的状态更新为 {bulk_update.status}")
+
+        return BulkOperationResponse(
+            success_count=success_count,
+            failed_count=len(failed_items),
+            total_count=total_count,
+            success=not failed_items,
+            message=f"已更新 {success_count} 条告警" + (f"，{len(failed_items)} 条不存在" if failed_items else ""),
+            failed_items=failed_items or None
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量更新告警状态失败: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="批量更新告警状态失败"
+        )
+
 @router.put("/{alert_id}/status", response_model=MessageResponse, summary="更新告警状态")
 def update_alert_status(
     alert_id: int,
@@ -295,8 +726,10 @@ def update_alert_status(
                 detail="告警不存在"
             )
 
-        # 更新状态
+        # 更新状态（计数表中的计数同时从旧状态移到新状态）
         if alert_update.status:
+            if alert_update.status != alert.status:
+                move_alert_counts(db, db.query(Alert).filter(Alert.id == alert_id), alert_update.status)
             alert.status = alert_update.status
             alert.handled_by = current_user.id
             alert.handled_at = datetime.utcnow()
@@ -349,6 +782,12 @@ def create_alert(
                 detail="指定的资产不存在"
             )
 
+        # 关联事件的类型参与威胁分类
+        event_type = None
+        if alert_data.event_id is not None:
+            event = get_event_near(db, alert_data.event_id, datetime.utcnow())
+            event_type = event.event_type if event else None
+
         # 创建告警
         alert = Alert(
             alert_name=alert_data.alert_name,
@@ -356,10 +795,14 @@ def create_alert(
             description=alert_data.description,
             event_id=alert_data.event_id,
             asset_id=alert_data.asset_id,
-            status='unhandled'
+            status='unhandled',
+            search_text=index_text(alert_data.alert_name, alert_data.description),
+            threat_category=classify_threat(alert_data.alert_name, event_type, alert_data.description)
         )
 
         db.add(alert)
+        db.flush()
+        count_new_alerts(db, [alert])
         db.commit()
         db.refresh(alert)
 
@@ -380,59 +823,6 @@ def create_alert(
             detail="创建告警失败"
         )
 
-@router.get("/statistics", response_model=AlertStatistics, summary="获取告警统计")
-def get_alert_statistics(
-    db: Session = Depends(get_db),
-    current_user: UserSchema = Depends(get_current_user_with_permission("alert:read"))
-) -> Any:
-    """
-    获取告警统计数据
-
-    包含总数、各状态数量、各级别数量、时间段统计等
-    """
-    try:
-        # 总告警数
-        total = db.query(Alert).count()
-
-        # 按状态统计
-        unhandled = db.query(Alert).filter(Alert.status == 'unhandled').count()
-        handling = db.query(Alert).filter(Alert.status == 'handling').count()
-        resolved = db.query(Alert).filter(Alert.status == 'resolved').count()
-
-        # 按级别统计
-        critical = db.query(Alert).filter(Alert.severity == 'critical').count()
-        high = db.query(Alert).filter(Alert.severity == 'high').count()
-        medium = db.query(Alert).filter(Alert.severity == 'medium').count()
-        low = db.query(Alert).filter(Alert.severity == 'low').count()
-
-        # 时间段统计
-        today = datetime.now().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        week_start = today_start - timedelta(days=7)
-
-        today_new = db.query(Alert).filter(Alert.created_at >= today_start).count()
-        this_week_new = db.query(Alert).filter(Alert.created_at >= week_start).count()
-
-        return AlertStatistics(
-            total=total,
-            unhandled=unhandled,
-            handling=handling,
-            resolved=resolved,
-            critical=critical,
-            high=high,
-            medium=medium,
-            low=low,
-            today_new=today_new,
-            this_week_new=this_week_new
-        )
-
-    except Exception as e:
-        logger.error(f"获取告警统计失败: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="获取告警统计失败"
-        )
-
 @router.get("/rules", response_model=PaginatedResponse[AlertRuleResponse], summary="获取告警规则列表")
 def get_alert_rules(
     page: int = Query(1, ge=1, description="页码"),
@@ -482,7 +872,11 @@ def create_alert_rule(
 
     - **name**: 规则名称
     - **description**: 规则描述
-    - **condition**: 触发条件（JSON格式）
+    - **condition**: 触发条件（JSON格式），如
+      {"all": [{"field": "event_type", "value": "authentication_failure"},
+      {"field": "destination_port", "op": "in", "value": [22, 23]}]}，
+      加 "threshold": {"count": 10, "window": "5m", "group_by": ["src_ip"]} 为阈值规则，
+      格式见 app.services.rule_engine
     - **severity**: 告警级别
     - **enabled**: 是否启用
     """
@@ -504,6 +898,17 @@ def create_alert_rule(
             enabled=rule_data.enabled
         )
 
+        # 校验条件能否编译
+        try:
+            compile_rule(rule)
+        except RuleCompileError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"规则条件无效: {e}"
+            )
+
+        # 递增规则集版本号，规则引擎轮询到后增量加载
+        rule.revision = bump_version(db, ALERT_RULES_VERSION)
         db.add(rule)
         db.commit()
         db.refresh(rule)
@@ -548,7 +953,18 @@ def update_alert_rule(
         for field, value in update_data.items():
             setattr(rule, field, value)
 
+        # 校验条件能否编译
+        try:
+            compile_rule(rule)
+        except RuleCompileError as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"规则条件无效: {e}"
+            )
+
         rule.updated_at = datetime.utcnow()
+        rule.revision = bump_version(db, ALERT_RULES_VERSION)
 
         db.commit()
 
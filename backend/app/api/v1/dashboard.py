@@ -1,12 +1,16 @@
-from typing import Any, List, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Any, List, Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from datetime import datetime, timedelta
 
 from app.core.db import get_db
-from app.core.dependencies import get_current_active_user
-from app.models.postgres import Alert, Asset, Event, User
+from app.core.config import settings
+from app.core.dependencies import get_current_active_user, get_current_active_user_cached
+from app.core.snapshot import SnapshotRefresher, etag_matches
+from app.core.threat_category import OTHER_LABEL, THREAT_CATEGORIES
+from app.crud.alert_counter_crud import estimate_affected_assets, hourly_trend
+from app.models.postgres import Alert, AlertCounter, Asset, Event, HuntingTask, User
 from app.schemas.user import User as UserSchema
 from app.schemas.common import StatisticsResponse
 import logging
@@ -34,6 +38,7 @@ class AlertTrendData(BaseModel):
     critical_counts: List[int]
     high_counts: List[int]
     medium_counts: List[int]
+    low_counts: List[int] = []
 
 class ThreatDistribution(BaseModel):
     """威胁类型分布"""
@@ -57,7 +62,7 @@ class RecentAlert(BaseModel):
     id: int
     alert_name: str
     severity: str
-    asset_name: str
+    asset_name: Optional[str] = None
     created_at: datetime
 
 class BigScreenData(BaseModel):
@@ -70,54 +75,48 @@ class BigScreenData(BaseModel):
 
 @router.get("/metrics", response_model=SecurityMetrics, summary="获取安全态势关键指标")
 def get_security_metrics(
+    days: Optional[int] = Query(None, ge=1, le=3650, description="受影响资产只统计最近天数（默认全部告警）"),
     db: Session = Depends(get_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ) -> Any:
     """
     获取安全态势关键指标
     
-    返回今日新增告警、未处理告警、受影响资产等关键数据
+    返回今日新增告警、未处理告警、受影响资产等关键数据（日期均为UTC）：
+    计数类指标在一条语句中汇总（告警计数表上的条件聚合，狩猎任务和今日处理的告警为标量子查询），
+    受影响资产合并每日 HyperLogLog 草图估计（误差约 3%）
     """
     try:
-        # 获取今天的日期范围
-        today = datetime.now().date()
+        today = datetime.utcnow().date()
         today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
-        
-        # 今日新增告警
-        today_alerts = db.query(Alert).filter(
-            and_(
-                Alert.created_at >= today_start,
-                Alert.created_at <= today_end
-            )
-        ).count()
-        
-        # 未处理告警
-        unhandled_alerts = db.query(Alert).filter(
-            Alert.status == 'unhandled'
-        ).count()
-        
-        # 受影响资产（有告警的资产）
-        affected_assets = db.query(Alert.asset_id).distinct().count()
-        
-        # 活跃威胁狩猎任务（这里暂时返回模拟数据）
-        active_hunting_tasks = 8
-        
+
+        # 活跃威胁狩猎任务（等待中和执行中）
+        active_hunting_tasks = db.query(func.count(HuntingTask.id)).filter(
+            HuntingTask.status.in_(("pending", "running"))
+        ).scalar_subquery()
         # 已处理安全事件（今日）
-        handled_events = db.query(Alert).filter(
-            and_(
-                Alert.status == 'resolved',
-                Alert.handled_at >= today_start,
-                Alert.handled_at <= today_end
-            )
-        ).count()
+        handled_events = db.query(func.count(Alert.id)).filter(
+            Alert.status == 'resolved',
+            Alert.handled_at >= today_start
+        ).scalar_subquery()
+
+        row = db.query(
+            func.coalesce(func.sum(AlertCounter.count).filter(AlertCounter.day >= today), 0),
+            func.coalesce(func.sum(AlertCounter.count).filter(AlertCounter.status == 'unhandled'), 0),
+            active_hunting_tasks,
+            handled_events
+        ).one()
+
+        # 受影响资产（有告警的资产）
+        since = today - timedelta(days=days - 1) if days else None
+        affected_assets = estimate_affected_assets(db, since=since)
         
         return SecurityMetrics(
-            today_alerts=today_alerts,
-            unhandled_alerts=unhandled_alerts,
+            today_alerts=row[0],
+            unhandled_alerts=row[1],
             affected_assets=affected_assets,
-            active_hunting_tasks=active_hunting_tasks,
-            handled_events=handled_events
+            active_hunting_tasks=row[2],
+            handled_events=row[3]
         )
         
     except Exception as e:
@@ -129,81 +128,58 @@ def get_security_metrics(
 
 @router.get("/alert-trend", response_model=AlertTrendData, summary="获取告警趋势数据")
 def get_alert_trend(
-    days: int = Query(7, ge=1, le=30, description="天数"),
+    days: int = Query(7, ge=1, le=365, description="天数"),
+    asset_id: Optional[int] = Query(None, description="资产ID过滤"),
     db: Session = Depends(get_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ) -> Any:
     """
     获取告警趋势数据
-    
-    - **days**: 查询天数，默认7天，最大30天
+
+    读取告警小时汇总表，一次查询得到每天各级别的新建告警数（日期按UTC）
+
+    - **days**: 查询天数，默认7天，最大365天
+    - **asset_id**: 只统计指定资产的告警
     """
     try:
         # 计算日期范围
-        end_date = datetime.now().date()
+        end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=days-1)
-        
+
+        counts_by_day = hourly_trend(db, datetime.combine(start_date, datetime.min.time()), asset_id)
+        totals: Dict[Any, int] = {}
+        for (day, _), count in counts_by_day.items():
+            totals[day] = totals.get(day, 0) + count
+
         dates = []
         counts = []
         critical_counts = []
         high_counts = []
         medium_counts = []
-        
-        # 按天统计告警数据
+        low_counts = []
+
         for i in range(days):
             current_date = start_date + timedelta(days=i)
-            date_start = datetime.combine(current_date, datetime.min.time())
-            date_end = datetime.combine(current_date, datetime.max.time())
-            
-            # 总告警数
-            total_count = db.query(Alert).filter(
-                and_(
-                    Alert.created_at >= date_start,
-                    Alert.created_at <= date_end
-                )
-            ).count()
-            
-            # 紧急告警数
-            critical_count = db.query(Alert).filter(
-                and_(
-                    Alert.created_at >= date_start,
-                    Alert.created_at <= date_end,
-                    Alert.severity == 'critical'
-                )
-            ).count()
-            
-            # 高危告警数
-            high_count = db.query(Alert).filter(
-                and_(
-                    Alert.created_at >= date_start,
-                    Alert.created_at <= date_end,
-                    Alert.severity == 'high'
-                )
-            ).count()
-            
-            # 中危告警数
-            medium_count = db.query(Alert).filter(
-                and_(
-                    Alert.created_at >= date_start,
-                    Alert.created_at <= date_end,
-                    Alert.severity == 'medium'
-                )
-            ).count()
-            
+            severity_counts = {
+                severity: counts_by_day.get((current_date, severity), 0)
+                for severity in ('critical', 'high', 'medium', 'low')
+            }
             dates.append(current_date.strftime("%m/%d"))
-            counts.append(total_count)
-            critical_counts.append(critical_count)
-            high_counts.append(high_count)
-            medium_counts.append(medium_count)
-        
+            counts.append(totals.get(current_date, 0))
+            critical_counts.append(severity_counts['critical'])
+            high_counts.append(severity_counts['high'])
+            medium_counts.append(severity_counts['medium'])
+            low_counts.append(severity_counts['low'])
+
         return AlertTrendData(
             dates=dates,
             counts=counts,
             critical_counts=critical_counts,
             high_counts=high_counts,
-            medium_counts=medium_counts
+            medium_counts=medium_counts,
+            low_counts=low_counts
         )
-        
+
     except Exception as e:
         logger.error(f"获取告警趋势数据失败: {e}")
         raise HTTPException(
@@ -213,38 +189,28 @@ def get_alert_trend(
 
 @router.get("/threat-distribution", response_model=ThreatDistribution, summary="获取威胁类型分布")
 def get_threat_distribution(
+    days: Optional[int] = Query(None, ge=1, le=365, description="只统计最近天数（默认全部告警）"),
     db: Session = Depends(get_db),
     current_user: UserSchema = Depends(get_current_active_user)
 ) -> Any:
     """
     获取威胁类型分布数据
+
+    按告警写入时分类的 threat_category 汇总（一次 GROUP BY），
+    无法归入六类威胁的告警计入"其他"（没有时不返回），尚未回填类别的告警不计入
     """
     try:
-        # 这里使用模拟数据，实际应该从数据库统计
-        # 可以根据告警名称或事件类型进行分类统计
-        threat_types = [
-            "恶意软件", "可疑脚本", "横向移动", 
-            "持久化", "数据渗出", "暴力破解"
-        ]
-        
-        threat_counts = []
-        for threat_type in threat_types:
-            # 这里应该根据实际的威胁分类逻辑进行统计
-            # 暂时使用模拟数据
-            if threat_type == "恶意软件":
-                count = 42
-            elif threat_type == "可疑脚本":
-                count = 38
-            elif threat_type == "横向移动":
-                count = 15
-            elif threat_type == "持久化":
-                count = 24
-            elif threat_type == "数据渗出":
-                count = 8
-            else:  # 暴力破解
-                count = 22
-            
-            threat_counts.append(count)
+        query = db.query(Alert.threat_category, func.count(Alert.id)).filter(Alert.threat_category.isnot(None))
+        if days is not None:
+            query = query.filter(Alert.created_at >= datetime.utcnow() - timedelta(days=days))
+        counts = dict(query.group_by(Alert.threat_category).all())
+
+        threat_types = list(THREAT_CATEGORIES.values())
+        threat_counts = [counts.get(category, 0) for category in THREAT_CATEGORIES]
+        other_count = sum(count for category, count in counts.items() if category not in THREAT_CATEGORIES)
+        if other_count:
+            threat_types.append(OTHER_LABEL)
+            threat_counts.append(other_count)
         
         return ThreatDistribution(
             types=threat_types,
@@ -272,14 +238,8 @@ def get_asset_status_distribution(
         warning_count = db.query(Asset).filter(Asset.status == 'warning').count()
         danger_count = db.query(Asset).filter(Asset.status == 'danger').count()
         
-        # 离线资产（假设超过24小时没有心跳的为离线）
-        offline_threshold = datetime.now() - timedelta(hours=24)
-        offline_count = db.query(Asset).filter(
-            or_(
-                Asset.last_checkin < offline_threshold,
-                Asset.last_checkin.is_(None)
-            )
-        ).count()
+        # 离线资产（资产表没有心跳时间列，按状态统计）
+        offline_count = db.query(Asset).filter(Asset.status == 'offline').count()
         
         total_count = normal_count + warning_count + danger_count + offline_count
         
@@ -323,8 +283,8 @@ def get_recent_alerts(
     - **limit**: 返回数量，默认10条，最大50条
     """
     try:
-        # 查询最近的高优先级告警
-        alerts = db.query(Alert, Asset.name.label('asset_name')).join(
+        # 查询最近的高优先级告警（规则引擎产生的告警可能没有资产）
+        alerts = db.query(Alert, Asset.name.label('asset_name')).outerjoin(
             Asset, Alert.asset_id == Asset.id
         ).filter(
             Alert.severity.in_(['critical', 'high'])
@@ -351,31 +311,41 @@ def get_recent_alerts(
             detail="获取最近告警失败"
         )
 
+def _compute_big_screen_data(db: Session) -> Dict[str, Any]:
+    """计算大屏视图数据（由快照刷新任务调用）"""
+    return BigScreenData(
+        metrics=get_security_metrics(days=None, db=db, current_user=None),
+        alert_trend=get_alert_trend(days=7, asset_id=None, db=db, current_user=None),
+        threat_distribution=get_threat_distribution(days=None, db=db, current_user=None),
+        asset_status=get_asset_status_distribution(db, None),
+        recent_alerts=get_recent_alerts(5, db, None)
+    ).model_dump(mode="json")
+
+# 大屏数据快照：后台每 BIG_SCREEN_REFRESH_INTERVAL 秒计算一次，多个工作进程共享
+big_screen_snapshot = SnapshotRefresher(
+    "big_screen",
+    _compute_big_screen_data,
+    path=lambda: settings.BIG_SCREEN_SNAPSHOT_FILE,
+    interval=lambda: settings.BIG_SCREEN_REFRESH_INTERVAL
+)
+
 @router.get("/big-screen", response_model=BigScreenData, summary="获取大屏视图数据")
 def get_big_screen_data(
-    db: Session = Depends(get_db),
-    current_user: UserSchema = Depends(get_current_active_user)
+    if_none_match: Optional[str] = Header(None),
+    current_user: UserSchema = Depends(get_current_active_user_cached)
 ) -> Any:
     """
     获取大屏视图所需的综合数据
     
-    包含所有安全态势相关的数据，用于大屏展示
+    包含所有安全态势相关的数据，用于大屏展示。数据来自后台定期刷新的快照（最多延迟一个刷新周期），
+    响应带 ETag；请求带 If-None-Match 且数据未变化时返回 304，不访问数据库
     """
     try:
-        # 获取各个模块的数据
-        metrics = get_security_metrics(db, current_user)
-        alert_trend = get_alert_trend(7, db, current_user)
-        threat_distribution = get_threat_distribution(db, current_user)
-        asset_status = get_asset_status_distribution(db, current_user)
-        recent_alerts = get_recent_alerts(5, db, current_user)
-        
-        return BigScreenData(
-            metrics=metrics,
-            alert_trend=alert_trend,
-            threat_distribution=threat_distribution,
-            asset_status=asset_status,
-            recent_alerts=recent_alerts
-        )
+        snapshot = big_screen_snapshot.get()
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, snapshot.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
         
     except Exception as e:
         logger.error(f"获取大屏数据失败: {e}")
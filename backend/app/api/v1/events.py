@@ -0,0 +1,270 @@
+from typing import Any, AsyncIterator, List, Dict, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import get_db
+from app.core.admission import IngestTicket, admit_ingest
+from app.core.batch_writer import event_writer
+from app.core.event_aggregator import aggregate_rows, event_aggregator
+from app.core.dependencies import get_current_user_with_permission
+from app.crud.event_crud import bulk_insert_events
+from app.services.cold_storage import get_event_detail, search_events
+from app.schemas.user import User as UserSchema
+from app.schemas.event import (
+    EventIngest,
+    EventBatchResult,
+    EventBatchError,
+    EventBatchResponse,
+    EventRecord
+)
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 响应中最多返回的错误行数
+MAX_REPORTED_ERRORS = 50
+
+async def _iter_ndjson_lines(request: Request, max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """
+    逐行读取NDJSON请求体，不在内存中缓存整个请求
+
+    超过长度限制的行以None表示，由调用方计为拒绝
+    """
+    pending = bytearray()
+    oversized = False
+
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if oversized or len(pending) + (end - start) > max_line_bytes:
+                yield None
+            else:
+                pending += chunk[start:end]
+                yield bytes(pending)
+            pending.clear()
+            oversized = False
+            start = end + 1
+
+        if not oversized:
+            pending += chunk[start:]
+            if len(pending) > max_line_bytes:
+                # 丢弃超长行的剩余部分，直到下一个换行符
+                oversized = True
+                pending.clear()
+
+    if oversized:
+        yield None
+    elif pending.strip():
+        yield bytes(pending)
+
+def _format_validation_error(error: ValidationError) -> str:
+    """提取校验错误中的第一条信息"""
+    first = error.errors()[0]
+    location = ".".join(str(item) for item in first.get("loc", ()))
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+def _write_batch(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """写入一个批次并提交，失败时回滚"""
+    try:
+        count = bulk_insert_events(db, rows)
+        db.commit()
+        return count
+    except Exception:
+        db.rollback()
+        raise
+
+@router.post("/events:batch", response_model=EventBatchResponse, summary="批量写入事件")
+async def ingest_events_batch(
+    request: Request,
+    buffered: bool = Query(False, description="是否交给缓冲写入器异步写入"),
+    aggregate: Optional[bool] = Query(None, description="是否聚合重复事件（默认取系统配置）"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("event:create")),
+    ticket: IngestTicket = Depends(admit_ingest)
+) -> Any:
+    """
+    以NDJSON格式批量写入事件
+
+    请求体每行一个JSON对象，按行流式解析和校验，
+    每累计 EVENT_INGEST_BATCH_SIZE 行写入一次数据库并单独提交。
+    返回每个批次的接收/拒绝数量，以及前若干条拒绝原因。
+
+    - **buffered**: 为true时校验通过的行交给进程内缓冲写入器，
+      由其按批合并提交，响应中的接收数表示已入队
+    - **aggregate**: 为true时键（事件类型、源IP、目标端口、资产）相同且在
+      聚合窗口内的事件合并为一行并累计 count；非缓冲模式在每个批次内聚合，
+      缓冲模式经过常驻聚合阶段跨请求聚合。接收数始终按原始事件行计
+
+    写入经过准入控制：来源速率超限、写入队列过深或写入并发已满时返回429，
+    并在 Retry-After 头中给出建议的重试秒数
+    """
+    if aggregate is None:
+        aggregate = settings.EVENT_AGGREGATION_ENABLED
+    batch_size = settings.EVENT_INGEST_BATCH_SIZE
+    batches: List[EventBatchResult] = []
+    errors: List[EventBatchError] = []
+    total_lines = 0
+    accepted = 0
+    rejected = 0
+
+    rows: List[Dict[str, Any]] = []
+    batch_rejected = 0
+    batch_first_line = 1
+
+    def record_error(line_no: int, message: str, end_line: Optional[int] = None) -> None:
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(EventBatchError(line=line_no, error=message, end_line=end_line))
+
+    async def flush() -> None:
+        nonlocal rows, batch_rejected, batch_first_line, accepted, rejected
+        batch_accepted = 0
+        ticket.charge(len(rows) + batch_rejected)
+        if rows and buffered:
+            sink = event_aggregator if aggregate else event_writer
+            for row in rows:
+                await sink.enqueue(row)
+            batch_accepted = len(rows)
+        elif rows:
+            try:
+                await run_in_threadpool(_write_batch, db, aggregate_rows(rows) if aggregate else rows)
+                batch_accepted = len(rows)
+            except Exception as e:
+                logger.error(f"事件批次 {len(batches) + 1} 写入失败: {e}")
+                record_error(batch_first_line, f"批次 {len(batches) + 1} 写入数据库失败", end_line=total_lines)
+                batch_rejected += len(rows)
+
+        batches.append(EventBatchResult(
+            batch=len(batches) + 1,
+            accepted=batch_accepted,
+            rejected=batch_rejected
+        ))
+        accepted += batch_accepted
+        rejected += batch_rejected
+        rows = []
+        batch_rejected = 0
+        batch_first_line = total_lines + 1
+
+    if buffered and not event_writer.running:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="缓冲写入器未启动"
+        )
+    if buffered and aggregate and not event_aggregator.running:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="事件聚合阶段未启动"
+        )
+
+    try:
+        async for line in _iter_ndjson_lines(request, settings.EVENT_INGEST_MAX_LINE_BYTES):
+            if line is not None and not line.strip():
+                continue
+
+            total_lines += 1
+            if line is None:
+                batch_rejected += 1
+                record_error(total_lines, "行长度超过限制")
+            else:
+                try:
+                    rows.append(EventIngest.model_validate_json(line).model_dump())
+                except ValidationError as e:
+                    batch_rejected += 1
+                    record_error(total_lines, _format_validation_error(e))
+
+            if len(rows) + batch_rejected >= batch_size:
+                await flush()
+
+        if rows or batch_rejected:
+            await flush()
+
+        logger.info(
+            f"用户 {current_user.username} 批量写入事件: "
+            f"共 {total_lines} 行，接收 {accepted}，拒绝 {rejected}"
+        )
+
+        return EventBatchResponse(
+            total_lines=total_lines,
+            accepted=accepted,
+            rejected=rejected,
+            batches=batches,
+            errors=errors
+        )
+
+    except Exception as e:
+        logger.error(f"批量写入事件失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="批量写入事件失败"
+        )
+
+@router.get("/events", response_model=List[EventRecord], summary="查询事件")
+def query_events(
+    start_time: datetime = Query(..., description="开始时间"),
+    end_time: datetime = Query(..., description="结束时间"),
+    asset_id: Optional[int] = Query(None, description="资产ID"),
+    limit: int = Query(100, ge=1, le=1000, description="最大返回数量"),
+    include_cold: bool = Query(True, description="是否包含冷存储中的归档事件"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("event:read"))
+) -> Any:
+    """
+    按时间范围和资产查询事件（按时间倒序）
+
+    同时查询events表和冷存储段文件，供调查与狩猎使用；
+    结果中的 storage 字段标明事件来自热数据还是冷归档。
+    列表不返回 raw_data，需要时通过事件详情接口获取
+    """
+    if start_time > end_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="开始时间不能晚于结束时间"
+        )
+
+    try:
+        return search_events(db, start_time, end_time, asset_id, limit, include_cold)
+    except Exception as e:
+        logger.error(f"查询事件失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="查询事件失败"
+        )
+
+@router.get("/events/{event_id}", response_model=EventRecord, summary="获取事件详情")
+def get_event(
+    event_id: int,
+    event_time: Optional[datetime] = Query(None, description="事件时间（可选，用于缩小查找范围）"),
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_current_user_with_permission("event:read"))
+) -> Any:
+    """
+    获取事件详情，包含解压后的原始数据 raw_data
+
+    先查events表，找不到时查冷存储
+    """
+    try:
+        event = get_event_detail(db, event_id, event_time)
+        if event is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="事件不存在"
+            )
+        return event
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取事件详情失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取事件详情失败"
+        )
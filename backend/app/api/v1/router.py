@@ -5,10 +5,12 @@ from app.api.v1 import (
     dashboard,
     assets,
     alerts,
+    events,
     hunting,
     intelligence,
     investigation,
     reports,
+    stream,
     system
 )
 
@@ -26,10 +28,12 @@ api_router.include_router(dashboard.router, prefix="/dashboard", tags=["安全
 # 核心业务路由
 api_router.include_router(assets.router, prefix="/assets", tags=["资产管理"])
 api_router.include_router(alerts.router, prefix="/alerts", tags=["告警中心"])
+api_router.include_router(events.router, tags=["事件采集"])
 api_router.include_router(hunting.router, prefix="/hunting", tags=["威胁狩猎"])
 api_router.include_router(intelligence.router, prefix="/intelligence", tags=["威胁情报"])
 api_router.include_router(investigation.router, prefix="/investigation", tags=["调查与响应"])
 api_router.include_router(reports.router, prefix="/reports", tags=["报告中心"])
+api_router.include_router(stream.router, prefix="/stream", tags=["实时推送"])
 
 # 系统管理路由
 api_router.include_router(system.router, prefix="/system", tags=["系统管理"])
\ No newline at end of file
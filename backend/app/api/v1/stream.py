@@ -0,0 +1,130 @@
+from typing import Any, AsyncIterator
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.dependencies import authenticate_token
+from app.core.stream import StreamSubscriber, stream_hub
+from app.models.postgres import User
+import asyncio
+import json
+import logging
+import time
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# WebSocket 和 EventSource 都无法设置请求头，令牌通过查询参数传递
+TOKEN_QUERY = Query(..., description="JWT令牌")
+
+def _authorize(token: str) -> User:
+    """校验令牌并检查告警查看权限"""
+    user = authenticate_token(token)
+    permissions = {perm.name for role in user.roles for perm in role.permissions}
+    if "alert:read" not in permissions:
+        logger.warning(f"用户 {user.username} 缺少权限: alert:read")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="权限不足，需要权限: alert:read"
+        )
+    return user
+
+@router.websocket("")
+async def stream_websocket(websocket: WebSocket, token: str = TOKEN_QUERY):
+    """
+    实时推送（WebSocket）
+
+    每条消息是一个JSON对象 {"type": ..., "data": ...}（类型见 app/core/stream.py），
+    没有消息时每 STREAM_HEARTBEAT_INTERVAL 秒发送 {"type": "ping"}；
+    每 USER_CACHE_TTL 秒重新校验令牌和权限，用户被禁用或失去权限时以 1008 关闭
+    """
+    try:
+        await run_in_threadpool(_authorize, token)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+
+    subscriber = stream_hub.subscribe()
+    if subscriber is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="连接数已达上限")
+        return
+    await websocket.accept()
+
+    # 客户端不发送消息，读取只为及时发现断开
+    receiver = asyncio.create_task(_wait_disconnect(websocket))
+    authorized_at = time.monotonic()
+    try:
+        while not receiver.done():
+            if time.monotonic() - authorized_at >= settings.USER_CACHE_TTL:
+                try:
+                    await run_in_threadpool(_authorize, token)
+                except HTTPException as e:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+                    break
+                authorized_at = time.monotonic()
+            getter = asyncio.create_task(subscriber.get(settings.STREAM_HEARTBEAT_INTERVAL))
+            await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            messages = getter.result() or [{"type": "ping"}]
+            for message in messages:
+                await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"实时推送连接异常: {e}")
+    finally:
+        receiver.cancel()
+        stream_hub.unsubscribe(subscriber)
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@router.get("", summary="实时推送（SSE）")
+async def stream_events(request: Request, token: str = TOKEN_QUERY) -> Any:
+    """
+    实时推送的 Server-Sent Events 版本（不支持 WebSocket 时使用）
+
+    事件名为消息类型，data 为消息的 data 字段；没有消息时发送注释行作为心跳；
+    每 USER_CACHE_TTL 秒重新校验令牌和权限，失败时结束响应
+    """
+    await run_in_threadpool(_authorize, token)
+    subscriber = stream_hub.subscribe()
+    if subscriber is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="连接数已达上限"
+        )
+    return StreamingResponse(
+        _sse_events(request, subscriber, token),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _sse_events(request: Request, subscriber: StreamSubscriber, token: str) -> AsyncIterator[str]:
+    authorized_at = time.monotonic()
+    try:
+        while not await request.is_disconnected():
+            if time.monotonic() - authorized_at >= settings.USER_CACHE_TTL:
+                try:
+                    await run_in_threadpool(_authorize, token)
+                except HTTPException as e:
+                    logger.info(f"实时推送连接校验失败，已断开: {e.detail}")
+                    break
+                authorized_at = time.monotonic()
+            messages = await subscriber.get(settings.STREAM_HEARTBEAT_INTERVAL)
+            if not messages:
+                yield ": ping\n\n"
+                continue
+            for message in messages:
+                data = json.dumps(message.get("data", {}), ensure_ascii=False)
+                yield f"event: {message['type']}\ndata: {data}\n\n"
+    finally:
+        stream_hub.unsubscribe(subscriber)
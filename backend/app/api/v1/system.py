@@ -9,6 +9,13 @@ import os
 from app.core.db import get_db
 from app.core.dependencies import get_current_active_user, get_admin_user
 from app.core.config import settings
+from app.core.batch_writer import event_writer
+from app.core.event_aggregator import event_aggregator
+from app.core.admission import ingest_admission
+from app.crud.sync_crud import get_sync_lag
+from app.services.rule_engine import RuleRegistry
+from app.services.rule_worker import EVENTS_RULE_ENGINE
+from app.services.syslog_collector import read_stats_file
 from app.schemas.user import User as UserSchema
 from app.schemas.common import (
     MessageResponse,
@@ -21,6 +28,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 本进程的编译规则集（按版本号增量刷新，状态接口不必每次重新编译全部规则）
+_rule_registry = RuleRegistry()
+
 # 系统管理相关数据模式
 from pydantic import BaseModel
 
@@ -70,6 +80,96 @@ class BackupInfo(BaseModel):
     created_at: datetime
     status: str       # success, failed, in_progress
 
+class WriterStats(BaseModel):
+    """批量写入器状态模式"""
+    name: str
+    running: bool
+    queue_depth: int
+    queue_capacity: int
+    batch_size: int
+    max_latency: float
+    enqueued: int
+    rejected: int
+    flushed_rows: int
+    failed_rows: int
+    flush_count: int
+    last_flush_duration: float  # 秒
+    max_flush_duration: float   # 秒
+    avg_flush_duration: float   # 秒
+    last_flush_at: Optional[datetime] = None
+
+class AggregatorStats(BaseModel):
+    """事件聚合阶段状态模式"""
+    running: bool
+    keys: int
+    max_keys: int
+    window_seconds: float
+    events_in: int
+    rows_out: int
+    evicted: int            # 因LRU淘汰提前输出的键数
+    reduction_ratio: float  # 输入事件数 / 输出行数
+
+class CollectorStats(BaseModel):
+    """syslog采集器状态模式（来自采集器进程定期写出的指标文件）"""
+    running: bool
+    queue_depth: int
+    queue_capacity: int
+    overload_policy: str
+    received: Dict[str, int]
+    received_total: int
+    dropped: Dict[str, int]  # 按原因统计的丢弃数
+    dropped_total: int
+    sampled_out: int         # 过载采样跳过的消息数
+    parse_errors: int
+    rejected: int            # 清洗器拒绝的记录数
+    forwarded: int
+    tcp_connections: int
+    assets: int
+    started_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class AdmissionSource(BaseModel):
+    """准入控制中的来源状态"""
+    source: str     # 用户名@客户端地址
+    tokens: float   # 当前令牌数（负数表示透支）
+    rejected: int
+
+class AdmissionStats(BaseModel):
+    """写入准入控制状态模式"""
+    enabled: bool
+    in_flight: int          # 正在处理的写入请求数
+    max_concurrency: int
+    queue_depth: int
+    max_queue_depth: int
+    source_rate: float
+    source_burst: float
+    tracked_sources: int
+    admitted: int
+    rejected: Dict[str, int]  # 按原因（rate_limit/queue_depth/concurrency）统计
+    rejected_total: int
+    sources: List[AdmissionSource]  # 令牌最少的来源
+
+class SyncStatus(BaseModel):
+    """增量同步状态模式"""
+    name: str
+    last_id: int
+    last_event_time: Optional[datetime] = None
+    synced_rows: int
+    updated_at: Optional[datetime] = None
+    pending_rows: int   # 待同步行数
+    lag_seconds: float  # 最早未同步事件的等待时间（秒）
+
+class RuleEngineStatus(SyncStatus):
+    """规则引擎状态模式"""
+    rules: int                      # 编译成功的启用规则数
+    indexed_event_types: int
+    wildcard_rules: int             # 未按事件类型索引、对所有事件生效的规则数
+    threshold_rules: int
+    sequence_rules: int
+    compile_errors: Dict[int, str]  # 规则ID → 编译错误
+    rule_set_version: int           # 规则集版本号（规则每次修改递增）
+    state: Optional[Dict[str, Any]] = None  # 工作进程上报的有状态规则规模（分组数、部分匹配数等）
+
 class SystemLog(BaseModel):
     """系统日志模式"""
     timestamp: datetime
@@ -201,4 +301,137 @@ def get_system_status(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="获取系统状态失败"
-        )
\ No newline at end of file
+        )
+
+@router.get("/ingest/writers", response_model=List[WriterStats], summary="获取批量写入器状态")
+def get_writer_stats(
+    current_user: UserSchema = Depends(get_admin_user)
+) -> Any:
+    """
+    获取事件批量写入器的队列深度和刷新耗时
+
+    需要管理员权限
+    """
+    try:
+        return [WriterStats(**event_writer.stats())]
+
+    except Exception as e:
+        logger.error(f"获取批量写入器状态失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取批量写入器状态失败"
+        )
+
+@router.get("/ingest/aggregator", response_model=AggregatorStats, summary="获取事件聚合状态")
+def get_aggregator_stats(
+    current_user: UserSchema = Depends(get_admin_user)
+) -> Any:
+    """
+    获取写入前事件聚合的键数、输入输出行数和压缩比
+
+    需要管理员权限
+    """
+    try:
+        return AggregatorStats(**event_aggregator.stats())
+
+    except Exception as e:
+        logger.error(f"获取事件聚合状态失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取事件聚合状态失败"
+        )
+
+@router.get("/ingest/admission", response_model=AdmissionStats, summary="获取写入准入控制状态")
+def get_admission_stats(
+    top: int = Query(10, ge=1, le=100, description="返回的来源数"),
+    current_user: UserSchema = Depends(get_admin_user)
+) -> Any:
+    """
+    获取当前worker的写入准入控制状态：写入并发、队列深度、拒绝计数和最接近限流的来源
+
+    需要管理员权限
+    """
+    try:
+        return AdmissionStats(**ingest_admission.stats(top=top))
+
+    except Exception as e:
+        logger.error(f"获取写入准入控制状态失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取写入准入控制状态失败"
+        )
+
+@router.get("/ingest/collector", response_model=CollectorStats, summary="获取syslog采集器状态")
+def get_collector_stats(
+    current_user: UserSchema = Depends(get_admin_user)
+) -> Any:
+    """
+    获取syslog采集器的接收、丢弃、采样计数
+
+    采集器运行在独立进程中，这里读取其定期写出的指标文件。需要管理员权限
+    """
+    try:
+        stats = read_stats_file(settings.COLLECTOR_STATS_FILE)
+        if stats is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="采集器未运行"
+            )
+        return CollectorStats(**stats)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取采集器状态失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取采集器状态失败"
+        )
+
+@router.get("/rule-engine/status", response_model=RuleEngineStatus, summary="获取规则引擎状态")
+def get_rule_engine_status(
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_admin_user)
+) -> Any:
+    """
+    获取规则引擎的匹配高水位、积压事件数、规则编译情况，
+    以及工作进程最近上报的阈值/序列规则状态规模
+
+    需要管理员权限
+    """
+    try:
+        _rule_registry.refresh(db)
+        return RuleEngineStatus(
+            **get_sync_lag(db, EVENTS_RULE_ENGINE),
+            **{key: value for key, value in _rule_registry.rule_set.stats().items() if key != "uses_raw_data"},
+            compile_errors=_rule_registry.errors,
+            rule_set_version=_rule_registry.version,
+            state=read_stats_file(settings.RULE_ENGINE_STATS_FILE)
+        )
+
+    except Exception as e:
+        logger.error(f"获取规则引擎状态失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取规则引擎状态失败"
+        )
+
+@router.get("/sync/status", response_model=SyncStatus, summary="获取事件同步状态")
+def get_sync_status(
+    db: Session = Depends(get_db),
+    current_user: UserSchema = Depends(get_admin_user)
+) -> Any:
+    """
+    获取事件到Manticore增量同步的高水位和延迟
+
+    需要管理员权限
+    """
+    try:
+        return SyncStatus(**get_sync_lag(db))
+
+    except Exception as e:
+        logger.error(f"获取事件同步状态失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取事件同步状态失败"
+        )
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from app.core.db import get_db
-from app.core.dependencies import get_current_active_user, get_admin_user
+from app.core.dependencies import get_current_active_user, get_admin_user, invalidate_user_cache
 from app.crud.user_crud import user
 from app.schemas.user import (
     User,
@@ -244,6 +244,7 @@ def update_user(
         # 更新用户信息
         update_data = user_data.dict(exclude_unset=True)
         updated_user = user.update(db, db_obj=target_user, obj_in=update_data)
+        invalidate_user_cache()
         
         logger.info(f"用户信息更新成功: {updated_user.username}")
         
@@ -347,6 +348,7 @@ def delete_user(
         
         # 删除用户
         user.remove(db, id=user_id)
+        invalidate_user_cache()
         
         logger.info(f"管理员 {current_user.username} 删除了用户 {target_user.username}")
         
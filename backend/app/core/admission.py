@@ -0,0 +1,230 @@
+"""
+写入准入控制
+蠕虫爆发时单个蜜罐的日志量可能暴涨上百倍，API只有少量worker，
+写入请求占满线程池后分析员的告警处理和大屏查询也会失去响应。
+
+准入控制只作用于写入通道（ingest），读取和告警处理（interactive）不受限制:
+- 每个来源（用户@客户端地址）一个令牌桶，按事件数扣减，允许短时透支，
+  透支未还清前该来源的新请求返回429
+- 全局队列深度上限：缓冲写入器排队行数超过上限时所有写入请求返回429
+- 写入通道并发上限：每个进程同时处理的写入请求数有上限，
+  保证写入最多占用线程池中的这么多线程，其余留给交互通道
+
+拒绝时返回429和按恢复速度估算的 Retry-After
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from collections import Counter, OrderedDict
+import math
+import time
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.batch_writer import BatchWriter, event_writer
+from app.core.config import settings
+from app.core.dependencies import get_current_active_user
+
+# Retry-After 上限（秒）
+MAX_RETRY_AFTER = 60
+
+class TokenBucket:
+    """
+    令牌桶
+
+    tokens 可以为负（透支），请求按实际写入的事件数事后扣减，
+    透支期间 retry_after 返回还清透支所需的时间
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic() if now is None else now
+
+    def refill(self, now: Optional[float] = None) -> float:
+        """按经过的时间补充令牌，返回当前令牌数"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return self.tokens
+
+    def retry_after(self, now: Optional[float] = None) -> float:
+        """令牌数恢复到1所需的秒数，0表示可以放行"""
+        tokens = self.refill(now)
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate if self.rate > 0 else float(MAX_RETRY_AFTER)
+
+    def consume(self, amount: float, now: Optional[float] = None) -> None:
+        """扣减令牌（允许透支）"""
+        self.refill(now)
+        self.tokens -= amount
+
+class AdmissionController:
+    """
+    写入通道准入控制器
+
+    admit/release 成对调用；charge 在请求处理过程中按写入的事件数扣减来源令牌
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        source_rate: float = 5000.0,
+        source_burst: float = 20000.0,
+        max_sources: int = 10000,
+        max_queue_depth: int = 16000,
+        max_concurrency: int = 4,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.writer = writer
+        self.source_rate = source_rate
+        self.source_burst = source_burst
+        self.max_sources = max_sources
+        self.max_queue_depth = max_queue_depth
+        self.max_concurrency = max_concurrency
+        self.enabled = enabled
+        self._clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+        # 运行指标
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+        self.rejected_by_source: Counter = Counter()
+
+    def _bucket(self, source: str) -> TokenBucket:
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            bucket = TokenBucket(self.source_rate, self.source_burst, self._clock())
+            self._buckets[source] = bucket
+            # 超过来源上限时淘汰最久未访问的来源（满桶的来源淘汰后重建没有区别）
+            while len(self._buckets) > self.max_sources:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(source)
+        return bucket
+
+    def _queue_retry_after(self, depth: int) -> float:
+        """按写入器的实际吞吐估算队列降到上限一半所需的时间"""
+        stats = self.writer
+        if stats.total_flush_duration > 0 and stats.flushed_rows:
+            throughput = stats.flushed_rows / stats.total_flush_duration
+        else:
+            throughput = stats.batch_size / max(stats.max_latency, 0.001)
+        return (depth - self.max_queue_depth / 2) / max(throughput, 1.0)
+
+    def _reject(self, reason: str, source: str, retry_after: float, detail: str) -> HTTPException:
+        self.rejected[reason] += 1
+        self.rejected_by_source[source] += 1
+        seconds = min(MAX_RETRY_AFTER, max(1, math.ceil(retry_after)))
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(seconds)}
+        )
+
+    def admit(self, source: str) -> None:
+        """
+        检查写入请求能否进入写入通道
+
+        Raises:
+            HTTPException: 429，带 Retry-After 头
+        """
+        if not self.enabled:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        depth = self.writer.queue_depth
+        if depth >= self.max_queue_depth:
+            raise self._reject("queue_depth", source, self._queue_retry_after(depth), "写入队列已满，请稍后重试")
+
+        if self.in_flight >= self.max_concurrency:
+            raise self._reject("concurrency", source, 1, "写入请求过多，请稍后重试")
+
+        retry_after = self._bucket(source).retry_after(self._clock())
+        if retry_after > 0:
+            raise self._reject("rate_limit", source, retry_after, "该来源写入速率超过限制，请稍后重试")
+
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        """写入请求结束"""
+        self.in_flight -= 1
+
+    def charge(self, source: str, events: int) -> None:
+        """按写入的事件数扣减来源令牌"""
+        if self.enabled and events:
+            self._bucket(source).consume(events, self._clock())
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """获取控制器状态，sources 为令牌最少（最接近限流）的来源"""
+        now = self._clock()
+        sources: List[Dict[str, Any]] = []
+        for source, bucket in self._buckets.items():
+            sources.append({
+                "source": source,
+                "tokens": round(bucket.refill(now), 1),
+                "rejected": self.rejected_by_source.get(source, 0),
+            })
+        sources.sort(key=lambda item: item["tokens"])
+
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.writer.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "source_rate": self.source_rate,
+            "source_burst": self.source_burst,
+            "tracked_sources": len(self._buckets),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "rejected_total": sum(self.rejected.values()),
+            "sources": sources[:top],
+        }
+
+class IngestTicket:
+    """一次已准入的写入请求，charge 按事件数扣减来源令牌"""
+
+    __slots__ = ("controller", "source")
+
+    def __init__(self, controller: AdmissionController, source: str):
+        self.controller = controller
+        self.source = source
+
+    def charge(self, events: int) -> None:
+        self.controller.charge(self.source, events)
+
+# 写入准入控制器单例（每个worker进程一个）
+ingest_admission = AdmissionController(
+    event_writer,
+    source_rate=settings.ADMISSION_SOURCE_RATE,
+    source_burst=settings.ADMISSION_SOURCE_BURST,
+    max_sources=settings.ADMISSION_MAX_SOURCES,
+    max_queue_depth=settings.ADMISSION_MAX_QUEUE_DEPTH,
+    max_concurrency=settings.ADMISSION_INGEST_CONCURRENCY,
+    enabled=settings.ADMISSION_ENABLED
+)
+
+async def admit_ingest(
+    request: Request,
+    current_user: Any = Depends(get_current_active_user)
+):
+    """
+    写入通道准入依赖项
+
+    来源为 用户名@客户端地址；请求结束（包括异常）后释放并发名额
+    """
+    client = request.client.host if request.client else "unknown"
+    source = f"{current_user.username}@{client}"
+    ingest_admission.admit(source)
+    try:
+        yield IngestTicket(ingest_admission, source)
+    finally:
+        ingest_admission.release()
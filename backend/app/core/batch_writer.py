@@ -0,0 +1,232 @@
+"""
+批量写入器
+将逐条产生的数据行在进程内缓冲，按批大小或最大延迟合并写入数据库，
+避免每条记录单独提交（SQLite下每次提交都要fsync）
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.crud.event_crud import bulk_insert_events
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 停止信号
+_STOP = object()
+
+class BatchWriter:
+    """
+    基于asyncio的缓冲批量写入器
+
+    - enqueue/enqueue_nowait 入队单行数据，队列满时前者等待、后者返回False
+    - 后台任务在攒满 batch_size 行或首行等待超过 max_latency 秒时刷新
+    - flush_func 为同步函数，在线程池中执行，接收行列表并负责提交事务
+    - stop 会写完队列中剩余数据后退出
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: int = 500,
+        max_latency: float = 1.0,
+        max_queue: int = 10000
+    ):
+        self.name = name
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self._flush_func = flush_func
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 运行指标
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.flush_count = 0
+        self.last_flush_duration = 0.0
+        self.max_flush_duration = 0.0
+        self.total_flush_duration = 0.0
+        self.last_flush_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        """后台刷新任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队的行数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """启动后台刷新任务"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name=f"batch-writer-{self.name}")
+        logger.info(f"批量写入器 {self.name} 已启动")
+
+    async def stop(self, timeout: Optional[float] = 30.0) -> None:
+        """停止写入器，写完队列中的剩余数据"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"批量写入器 {self.name} 停止超时，剩余 {self.queue_depth} 行未写入")
+            self._task.cancel()
+        self._task = None
+        logger.info(f"批量写入器 {self.name} 已停止")
+
+    async def enqueue(self, row: Dict[str, Any]) -> None:
+        """入队一行数据，队列满时等待"""
+        if not self.running:
+            raise RuntimeError(f"批量写入器 {self.name} 未启动")
+        await self._queue.put(row)
+        self.enqueued += 1
+
+    def enqueue_nowait(self, row: Dict[str, Any]) -> bool:
+        """入队一行数据，队列满或未启动时返回False"""
+        if not self.running:
+            self.rejected += 1
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """获取运行指标"""
+        return {
+            "name": self.name,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.max_queue,
+            "batch_size": self.batch_size,
+            "max_latency": self.max_latency,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "flush_count": self.flush_count,
+            "last_flush_duration": round(self.last_flush_duration, 6),
+            "max_flush_duration": round(self.max_flush_duration, 6),
+            "avg_flush_duration": round(self.total_flush_duration / self.flush_count, 6) if self.flush_count else 0.0,
+            "last_flush_at": self.last_flush_at,
+        }
+
+    async def _run(self) -> None:
+        """后台刷新循环"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    item = await self._get_with_timeout(remaining)
+                    if item is None:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # 停止时写完剩余数据
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def _get_with_timeout(self, timeout: float) -> Any:
+        """
+        带超时的出队，超时返回None
+
+        不使用wait_for，避免超时与出队同时发生时丢失数据
+        """
+        getter = asyncio.ensure_future(self._queue.get())
+        done, _ = await asyncio.wait({getter}, timeout=timeout)
+        if not done:
+            getter.cancel()
+            try:
+                return await getter
+            except asyncio.CancelledError:
+                return None
+        return getter.result()
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        """在线程池中执行一次写入，失败时重试一次"""
+        started = time.perf_counter()
+        for attempt in (1, 2):
+            try:
+                await asyncio.to_thread(self._flush_func, batch)
+                self.flushed_rows += len(batch)
+                break
+            except Exception as e:
+                if attempt == 1:
+                    logger.warning(f"批量写入器 {self.name} 写入 {len(batch)} 行失败，重试: {e}")
+                    await asyncio.sleep(0.5)
+                else:
+                    logger.error(f"批量写入器 {self.name} 写入 {len(batch)} 行失败，丢弃: {e}")
+                    self.failed_rows += len(batch)
+
+        duration = time.perf_counter() - started
+        self.flush_count += 1
+        self.last_flush_duration = duration
+        self.max_flush_duration = max(self.max_flush_duration, duration)
+        self.total_flush_duration += duration
+        self.last_flush_at = datetime.utcnow()
+
+def write_events(rows: List[Dict[str, Any]]) -> int:
+    """在独立会话中批量写入事件并提交"""
+    db = SessionLocal()
+    try:
+        count = bulk_insert_events(db, rows)
+        db.commit()
+        return count
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+# 事件写入器单例，供API处理函数和采集器使用
+event_writer = BatchWriter(
+    "events",
+    write_events,
+    batch_size=settings.EVENT_WRITER_BATCH_SIZE,
+    max_latency=settings.EVENT_WRITER_MAX_LATENCY,
+    max_queue=settings.EVENT_WRITER_QUEUE_SIZE
+)
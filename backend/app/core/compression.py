@@ -0,0 +1,124 @@
+"""
+原始事件数据压缩
+Event.raw_data 以 zlib + 预置字典的格式存储。蜜罐日志单条很短，
+但字段名和取值高度重复，用预置字典（zdict）能显著提高小文本的压缩率
+
+存储格式:
+    0xF1 <字典版本 u8> <zlib数据>   使用预置字典压缩
+    0xF0 <zlib数据>                 不使用字典压缩
+    其他                            未压缩的JSON文本（旧数据或压缩无收益的短文本）
+
+JSON文本不可能以 0xF0/0xF1 开头，因此三种格式可以直接区分。
+字典一旦发布就不能修改，新字典以新版本号加入 ZDICTS。
+"""
+
+from typing import Any, Dict, Optional
+import json
+import zlib
+
+_MARK_ZDICT = 0xF1
+_MARK_PLAIN = 0xF0
+
+# 压缩级别（预置字典下6与9的压缩率相差不到1%，编码速度更快）
+COMPRESSION_LEVEL = 6
+
+# 预置字典 v1：常见蜜罐日志（Cowrie/Dionaea/OpenCanary/Sysmon/通用采集）的字段和取值片段。
+# zlib对字典末尾的内容引用距离最短，因此越常见的片段越靠后
+_ZDICT_V1 = (
+    '{"logtype": 5001, "node_id": "opencanary-1", "utc_time": "", "local_time_adjusted": "", '
+    '"logdata": {"USERNAME": "admin", "PASSWORD": "admin", "HOSTNAME": "", "PATH": "/index.html", '
+    '"USERAGENT": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36", "SKIN": "basicLogin"}}'
+    '{"EventID": 1, "UtcTime": "2024-01-01 00:00:00.000", "ProcessGuid": "{", "ProcessId": '
+    '"Image": "C:\\\\Windows\\\\System32\\\\cmd.exe", "CommandLine": "cmd.exe /c ", '
+    '"Image": "C:\\\\Windows\\\\System32\\\\WindowsPowerShell\\\\v1.0\\\\powershell.exe", '
+    '"CommandLine": "powershell.exe -nop -w hidden -enc ", "ParentImage": "C:\\\\Windows\\\\explorer.exe", '
+    '"User": "NT AUTHORITY\\\\SYSTEM", "Hashes": "SHA256=", "TargetFilename": "C:\\\\Users\\\\Public\\\\", '
+    '"TargetObject": "HKLM\\\\SOFTWARE\\\\Microsoft\\\\Windows\\\\CurrentVersion\\\\Run\\\\", '
+    '"Protocol": "tcp", "Initiated": "true", "SourceIp": "", "SourcePort": , "DestinationIp": "", '
+    '"DestinationPort": 445, "DestinationPort": 3389, '
+    '{"connection": {"type": "accept", "protocol": "smbd", "transport": "tcp", "local_ip": "", '
+    '"local_port": 445, "remote_ip": "", "remote_port": , "remote_hostname": ""}, '
+    '"connection.protocol": "httpd", "connection.type": "connect", "dionaea", "url": "http://", '
+    '"md5hash": "", "sha512hash": "", '
+    '{"eventid": "cowrie.session.closed", "duration": , "eventid": "cowrie.client.version", '
+    '"version": "SSH-2.0-Go", "eventid": "cowrie.client.kex", "hassh": "", '
+    '"eventid": "cowrie.session.file_download", "shasum": "", "outfile": "var/lib/cowrie/downloads/", '
+    '"eventid": "cowrie.command.input", "input": "cat /proc/cpuinfo | grep name | wc -l", '
+    '"input": "uname -a", "input": "wget http://", "input": "curl -O http://", "chmod +x ", "/tmp/", '
+    '"eventid": "cowrie.login.success", "eventid": "cowrie.session.connect", '
+    '"protocol": "ssh", "protocol": "telnet", "sensor": "", "session": "", '
+    '"message": "login attempt [root/123456] failed", "message": "login attempt [root/root] succeeded", '
+    '"username": "root", "password": "123456", "password": "admin", '
+    '"eventid": "cowrie.login.failed", "timestamp": "2024-01-01T00:00:00.000000Z", '
+    '"src_ip": "", "src_port": , "dst_ip": "", "dst_port": 22, "dst_port": 23, '
+    '"src_host": "", "src_port": , "dst_host": "", "dst_port": 80, '
+    '"event_type": "port_scan", "event_type": "authentication_failure", '
+    '"event_time": "", "source_ip": "", "destination_ip": "", "source_port": , '
+    '"destination_port": , "protocol": "TCP", "process_name": "", "description": ""}'
+).encode("utf-8")
+
+# 字典版本 → 字典内容
+ZDICTS: Dict[int, bytes] = {
+    1: _ZDICT_V1,
+}
+
+# 新数据使用的字典版本
+CURRENT_ZDICT = 1
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(", ", ": "), default=str).encode("utf-8")
+
+def compress_json(value: Any, zdict_version: Optional[int] = None) -> Optional[bytes]:
+    """
+    序列化并压缩JSON值
+
+    压缩后不比原文短时直接存原文
+
+    Args:
+        value: 可JSON序列化的值
+        zdict_version: 字典版本，默认 CURRENT_ZDICT，0 表示不用字典
+
+    Returns:
+        Optional[bytes]: 存储格式的字节串（None保持为None）
+    """
+    if value is None:
+        return None
+    version = CURRENT_ZDICT if zdict_version is None else zdict_version
+    text = _dumps(value)
+
+    if version:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=ZDICTS[version])
+        payload = bytes((_MARK_ZDICT, version)) + compressor.compress(text) + compressor.flush()
+    else:
+        payload = bytes((_MARK_PLAIN,)) + zlib.compress(text, COMPRESSION_LEVEL)
+
+    return payload if len(payload) < len(text) else text
+
+def decompress_json(payload: Optional[bytes]) -> Any:
+    """
+    解码存储格式的字节串
+
+    Args:
+        payload: compress_json 的输出或未压缩的JSON文本
+
+    Returns:
+        Any: JSON值
+    """
+    if payload is None:
+        return None
+    if isinstance(payload, str):
+        return json.loads(payload)
+    payload = bytes(payload)
+    if not payload:
+        return None
+
+    marker = payload[0]
+    if marker == _MARK_ZDICT:
+        decompressor = zlib.decompressobj(zdict=ZDICTS[payload[1]])
+        text = decompressor.decompress(payload[2:]) + decompressor.flush()
+    elif marker == _MARK_PLAIN:
+        text = zlib.decompress(payload[1:])
+    else:
+        text = payload
+    return json.loads(text)
@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "H-System蜜罐EDR平台"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 120  # JWT有效期2小时
+    USER_CACHE_TTL: int = 10  # 轮询接口认证用户的缓存时间（秒），其他进程中用户禁用最多延迟该时间生效；实时推送连接按该间隔重新校验
 
     # 开发配置
     DEBUG: bool = False
@@ -26,10 +27,86 @@ class Settings(BaseSettings):
     MANTICORE_PORT: int = 9306
     MANTICORE_USER: str = ""
     MANTICORE_PASSWORD: str = ""
+    MANTICORE_SYNC_INTERVAL: int = 10  # 事件同步周期（秒）
+    MANTICORE_SYNC_CHUNK_SIZE: int = 2000  # 每次拉取/推送的行数
+    MANTICORE_SYNC_SETTLE_SECONDS: int = 5  # 只同步写入超过该秒数的事件，避免跳过未提交的较小ID
 
     # Redis（Celery用）
     REDIS_URL: str = "redis://redis:6379/0"
 
+    # 事件采集配置
+    EVENT_INGEST_BATCH_SIZE: int = 1000  # 每批写入的事件行数
+    EVENT_INGEST_MAX_LINE_BYTES: int = 64 * 1024  # NDJSON单行最大字节数
+    EVENT_WRITER_BATCH_SIZE: int = 500  # 缓冲写入器每次刷新的最大行数
+    EVENT_WRITER_MAX_LATENCY: float = 1.0  # 缓冲写入器最大等待时间（秒）
+    EVENT_WRITER_QUEUE_SIZE: int = 20000  # 缓冲写入器队列容量
+    EVENT_AGGREGATION_ENABLED: bool = False  # 是否默认在写入前聚合重复事件
+    EVENT_AGGREGATION_WINDOW: float = 60.0  # 聚合窗口（秒）
+    EVENT_AGGREGATION_MAX_KEYS: int = 50000  # 聚合表最大键数，超出按LRU输出
+
+    # 写入准入控制配置（只限制写入通道，读取和告警处理不受影响）
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_SOURCE_RATE: float = 5000.0  # 每个来源的持续写入速率（事件/秒）
+    ADMISSION_SOURCE_BURST: float = 20000.0  # 每个来源的突发容量（事件数）
+    ADMISSION_MAX_SOURCES: int = 10000  # 跟踪的来源数上限
+    ADMISSION_MAX_QUEUE_DEPTH: int = 16000  # 写入器排队行数超过该值时拒绝写入
+    ADMISSION_INGEST_CONCURRENCY: int = 4  # 每个worker同时处理的写入请求数
+
+    # 事件分区与保留期（仅PostgreSQL分区表使用分区，其余退化为按行删除）
+    EVENT_PARTITION_DAYS: int = 1  # 每个分区覆盖的天数
+    EVENT_PARTITION_PRECREATE_DAYS: int = 7  # 预建未来分区的天数
+    EVENT_RETENTION_DAYS: int = 90  # 事件保留天数
+    EVENT_RETENTION_MODE: str = "drop"  # 过期分区处理方式: drop / detach
+
+    # 事件冷存储（列式压缩段文件）
+    COLD_STORAGE_DIR: str = "./data/cold_events"  # 段文件目录
+    COLD_ARCHIVE_AFTER_DAYS: int = 7  # 超过该天数的事件归档到冷存储
+    COLD_SEGMENT_ROWS: int = 100000  # 每个段文件的最大行数
+    COLD_ROW_GROUP_ROWS: int = 8192  # 段内行组大小（扫描跳过的最小单位）
+    COLD_COMPRESSION_LEVEL: int = 6  # zlib压缩级别
+
+    # 告警规则引擎配置
+    RULE_ENGINE_CHUNK_SIZE: int = 5000  # 每块读取的事件数
+    RULE_ENGINE_SETTLE_SECONDS: int = 2  # 只匹配写入超过该秒数的事件，避免跳过未提交的较小ID
+    RULE_ENGINE_POLL_INTERVAL: float = 1.0  # 没有新事件时的轮询间隔（秒）
+    RULE_ENGINE_RELOAD_INTERVAL: float = 2.0  # 规则集版本号轮询间隔（秒），版本变化时增量重新编译
+    RULE_ENGINE_START_AT: str = "latest"  # 首次运行的起点: latest（只匹配新事件） / earliest
+    RULE_WINDOW_SLOTS: int = 12  # 阈值规则每个窗口的分桶数（窗口边缘的精度为 窗口/分桶数）
+    RULE_WINDOW_MAX_KEYS: int = 100000  # 每条阈值/序列规则最多保留的分组数，超出时淘汰最久未更新的分组
+    RULE_WINDOW_SNAPSHOT_FILE: str = "./data/rule_windows.json"  # 有状态规则（阈值、序列）的状态快照文件
+    RULE_WINDOW_SNAPSHOT_INTERVAL: float = 10.0  # 状态快照间隔（秒）
+    ALERT_SUPPRESS_WINDOW: int = 3600  # 告警聚合（抑制）窗口（秒），窗口内的重复命中合并到未处理完的告警
+    ALERT_LIST_TOTAL_CAP: int = 10000  # 游标分页告警列表默认只数到该条数（超出显示为 "10,000+"）
+    ALERT_TOTAL_CACHE_TTL: int = 60  # 告警列表精确总数的缓存时间（秒）
+    ALERT_MAX_OCCURRENCES: int = 1000  # 每条聚合告警最多记录的发生明细条数，超出后只累加次数
+    ALERT_COUNTER_RECONCILE_INTERVAL: int = 3600  # 告警计数表与告警表核对的间隔（秒）
+    BIG_SCREEN_SNAPSHOT_FILE: str = "./data/big_screen.json"  # 大屏数据快照文件（各工作进程共享）
+    BIG_SCREEN_REFRESH_INTERVAL: float = 5.0  # 大屏数据快照刷新周期（秒）
+    RULE_ENGINE_STATS_FILE: str = "./data/rule_engine_stats.json"  # 有状态规则的状态指标文件（随快照更新）
+
+    # syslog采集器配置
+    COLLECTOR_HOST: str = "0.0.0.0"
+    COLLECTOR_UDP_PORT: int = 5514  # 0 表示不监听
+    COLLECTOR_TCP_PORT: int = 5514  # 0 表示不监听
+    COLLECTOR_QUEUE_SIZE: int = 50000  # 接收队列容量（条）
+    COLLECTOR_BATCH_SIZE: int = 1000  # 每批解析清洗的消息数
+    COLLECTOR_MAX_LATENCY: float = 0.5  # 攒批最大等待时间（秒）
+    COLLECTOR_OVERLOAD_POLICY: str = "sample"  # 过载策略: drop（队列满丢弃） / sample（超水位线采样）
+    COLLECTOR_SAMPLE_WATERMARK: float = 0.8  # 开始采样的队列占用比例
+    COLLECTOR_SAMPLE_RATE: int = 10  # 采样时每N条保留1条
+    COLLECTOR_MAX_MESSAGE_BYTES: int = 64 * 1024  # 单条消息最大字节数
+    COLLECTOR_STATS_FILE: str = "./data/collector_stats.json"  # 指标文件（API进程读取）
+    COLLECTOR_STATS_INTERVAL: float = 10.0  # 指标文件刷新周期（秒）
+    COLLECTOR_ASSET_REFRESH: float = 300.0  # 资产IP映射刷新周期（秒）
+
+    # 实时推送配置（/api/v1/stream）
+    STREAM_POLL_INTERVAL: float = 1.0  # 每个工作进程检查变化的间隔（秒），与连接数无关
+    STREAM_BUFFER_SIZE: int = 200  # 每个连接待发送的消息数上限，超出时清空并要求客户端重新拉取
+    STREAM_ALERT_BATCH: int = 100  # 每次检查最多推送的新告警数
+    STREAM_SETTLE_SECONDS: float = 5.0  # 告警ID高水位和资产更新时间的回看时间（秒），覆盖分配ID/时间后稍晚提交的事务
+    STREAM_HEARTBEAT_INTERVAL: float = 15.0  # 没有消息时的心跳间隔（秒）
+    STREAM_MAX_CONNECTIONS: int = 1000  # 每个工作进程的最大连接数
+
     @property
     def database_url(self) -> str:
         """获取数据库连接URL"""
@@ -1,12 +1,15 @@
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.core.db import get_db
+from app.core.config import settings
+from app.core.db import SessionLocal, get_db
 from app.core.security import verify_token
 from app.models.postgres import User
 from app.crud.user_crud import get_user_by_username
 import logging
+import threading
+import time
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -84,6 +87,65 @@ def get_current_active_user(
         )
     return current_user
 
+# 令牌 → (过期时间, 用户)
+_user_cache: Dict[str, Tuple[float, User]] = {}
+_user_cache_lock = threading.Lock()
+
+def invalidate_user_cache() -> None:
+    """清空本进程的认证用户缓存（用户被修改、禁用或删除后调用，其他进程的缓存按 USER_CACHE_TTL 过期）"""
+    with _user_cache_lock:
+        _user_cache.clear()
+
+def authenticate_token(token: str) -> User:
+    """
+    校验令牌并返回活跃用户（带缓存），用于高频轮询和长连接的接口
+
+    令牌每次都校验；用户信息（含角色和权限）按令牌缓存 USER_CACHE_TTL 秒，缓存命中时不访问数据库
+
+    Args:
+        token: JWT令牌
+
+    Returns:
+        User: 活跃用户对象（脱离会话，只可读取已加载的属性）
+
+    Raises:
+        HTTPException: 认证失败时抛出401错误，用户被禁用时抛出403错误
+    """
+    now = time.monotonic()
+    if verify_token(token) is not None:
+        cached = _user_cache.get(token)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+    db = SessionLocal()
+    try:
+        user = get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+        # 会话关闭前加载角色和权限，供权限检查使用
+        for role in user.roles:
+            role.permissions
+    finally:
+        db.close()
+
+    with _user_cache_lock:
+        if len(_user_cache) > 10000:
+            _user_cache.clear()
+        _user_cache[token] = (now + settings.USER_CACHE_TTL, user)
+    return user
+
+def get_current_active_user_cached(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> User:
+    """
+    获取当前活跃用户（带缓存）的依赖项，缓存命中时不访问数据库
+
+    Args:
+        credentials: HTTP Bearer 认证凭据
+
+    Returns:
+        User: 活跃用户对象
+    """
+    return authenticate_token(credentials.credentials)
+
 def get_current_user_with_permission(permission: str):
     """
     创建需要特定权限的用户依赖项
@@ -0,0 +1,220 @@
+"""
+事件聚合
+扫描器会对蜜罐发出大量完全相同的探测（同一源IP、目标端口、事件类型），
+在写入前把时间窗口内键相同的事件合并为一行，用 count/first_seen/last_seen 记录次数和时间范围
+
+- EventAggregator: 有界的聚合表（LRU淘汰），同步调用，既可在单个请求内使用，
+  也可作为缓冲写入器前的常驻阶段
+- AggregatingWriter: 常驻阶段，定期把窗口到期的聚合行交给 BatchWriter
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
+
+from app.core.batch_writer import BatchWriter, event_writer
+from app.core.config import settings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 默认聚合键
+AGGREGATION_KEY_FIELDS = ("event_type", "source_ip", "destination_port", "asset_id")
+
+class _Bucket:
+    """一个键在当前窗口内的聚合状态"""
+
+    __slots__ = ("row", "count", "first_seen", "last_seen", "window_start", "window_end", "opened_at")
+
+    def __init__(self, row: Dict[str, Any], event_time: datetime, window: timedelta, opened_at: float):
+        self.row = row
+        self.count = row.get("count") or 1
+        self.first_seen = row.get("first_seen") or event_time
+        self.last_seen = row.get("last_seen") or event_time
+        # 以首条事件为中心，允许窗口长度内的乱序事件
+        self.window_start = self.first_seen - window
+        self.window_end = self.first_seen + window
+        self.opened_at = opened_at
+
+    def to_row(self) -> Dict[str, Any]:
+        row = dict(self.row)
+        row["event_time"] = self.first_seen
+        row["count"] = self.count
+        row["first_seen"] = self.first_seen
+        row["last_seen"] = self.last_seen
+        return row
+
+class EventAggregator:
+    """
+    有界事件聚合表
+
+    - add: 事件时间落在该键当前窗口内则计数，否则输出旧窗口并开启新窗口
+    - 键数超过 max_keys 时按LRU淘汰（输出）最久未命中的键
+    - expire: 输出开启时间超过窗口长度（墙钟）的键，保证写入延迟有上限
+    - drain: 输出全部键
+
+    输出的行保留窗口内第一条事件的其他字段，计数不丢失，只是可能被拆成多行
+    """
+
+    def __init__(
+        self,
+        window_seconds: Optional[float] = None,
+        max_keys: Optional[int] = None,
+        key_fields: Sequence[str] = AGGREGATION_KEY_FIELDS
+    ):
+        self.window_seconds = window_seconds or settings.EVENT_AGGREGATION_WINDOW
+        self.window = timedelta(seconds=self.window_seconds)
+        self.max_keys = max_keys or settings.EVENT_AGGREGATION_MAX_KEYS
+        self.key_fields = tuple(key_fields)
+        self._buckets: "OrderedDict[Tuple[Hashable, ...], _Bucket]" = OrderedDict()
+
+        # 运行指标
+        self.events_in = 0
+        self.rows_out = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _key(self, row: Dict[str, Any]) -> Tuple[Hashable, ...]:
+        return tuple(row.get(field) for field in self.key_fields)
+
+    def _emit(self, bucket: _Bucket) -> Dict[str, Any]:
+        self.rows_out += 1
+        return bucket.to_row()
+
+    def add(self, row: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        加入一条事件
+
+        Args:
+            row: 事件字典（需要 event_time）
+            now: 单调时钟时间，默认 time.monotonic()
+
+        Returns:
+            List[Dict[str, Any]]: 因窗口结束或LRU淘汰而需要写入的聚合行
+        """
+        now = time.monotonic() if now is None else now
+        self.events_in += 1
+        emitted = []
+        key = self._key(row)
+        event_time = row["event_time"]
+
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            if bucket.window_start < event_time < bucket.window_end:
+                bucket.count += row.get("count") or 1
+                bucket.first_seen = min(bucket.first_seen, row.get("first_seen") or event_time)
+                bucket.last_seen = max(bucket.last_seen, row.get("last_seen") or event_time)
+                self._buckets.move_to_end(key)
+                return emitted
+            emitted.append(self._emit(self._buckets.pop(key)))
+
+        self._buckets[key] = _Bucket(row, event_time, self.window, now)
+        while len(self._buckets) > self.max_keys:
+            _, evicted = self._buckets.popitem(last=False)
+            self.evicted += 1
+            emitted.append(self._emit(evicted))
+        return emitted
+
+    def expire(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """输出开启时间超过窗口长度的键"""
+        now = time.monotonic() if now is None else now
+        deadline = now - self.window_seconds
+        expired = [key for key, bucket in self._buckets.items() if bucket.opened_at <= deadline]
+        return [self._emit(self._buckets.pop(key)) for key in expired]
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """输出全部键"""
+        rows = [self._emit(bucket) for bucket in self._buckets.values()]
+        self._buckets.clear()
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        """获取运行指标"""
+        return {
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "window_seconds": self.window_seconds,
+            "events_in": self.events_in,
+            "rows_out": self.rows_out,
+            "evicted": self.evicted,
+            "reduction_ratio": round(self.events_in / self.rows_out, 2) if self.rows_out else 0.0,
+        }
+
+def aggregate_rows(rows: Sequence[Dict[str, Any]], window_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    对一批事件做一次性聚合
+
+    Args:
+        rows: 事件字典序列
+        window_seconds: 聚合窗口秒数
+
+    Returns:
+        List[Dict[str, Any]]: 聚合后的行
+    """
+    aggregator = EventAggregator(window_seconds=window_seconds, max_keys=max(len(rows), 1))
+    output = []
+    for row in rows:
+        output.extend(aggregator.add(row))
+    output.extend(aggregator.drain())
+    return output
+
+class AggregatingWriter:
+    """
+    缓冲写入器前的常驻聚合阶段
+
+    enqueue 的事件先进入聚合表，被输出的聚合行再交给下游 BatchWriter；
+    后台任务每隔 1/4 窗口输出到期的键，停止时输出全部键
+    """
+
+    def __init__(self, writer: BatchWriter, aggregator: EventAggregator):
+        self.writer = writer
+        self.aggregator = aggregator
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """启动到期检查任务"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="event-aggregator")
+        logger.info("事件聚合阶段已启动")
+
+    async def stop(self) -> None:
+        """停止并把剩余聚合行交给下游（需在下游写入器停止前调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for row in self.aggregator.drain():
+            await self.writer.enqueue(row)
+        logger.info("事件聚合阶段已停止")
+
+    async def enqueue(self, row: Dict[str, Any]) -> None:
+        """加入一条事件"""
+        for output in self.aggregator.add(row):
+            await self.writer.enqueue(output)
+
+    async def _run(self) -> None:
+        interval = max(self.aggregator.window_seconds / 4, 0.05)
+        while True:
+            await asyncio.sleep(interval)
+            for row in self.aggregator.expire():
+                await self.writer.enqueue(row)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取运行指标"""
+        return dict(self.aggregator.stats(), running=self.running)
+
+# 事件聚合阶段单例（始终随应用启动：即使 EVENT_AGGREGATION_ENABLED 关闭，请求仍可用 aggregate=true 启用聚合）
+event_aggregator = AggregatingWriter(event_writer, EventAggregator())
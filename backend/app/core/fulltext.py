@@ -0,0 +1,100 @@
+"""
+告警全文检索的分词和索引DDL
+中文没有空格分词，按字符二元组（bigram）切分：连续的中日韩字符 "暴力破解" 索引为
+"暴力 力破 破解"，其余连续的字母数字按词索引（小写）。切分后的文本存入 alerts.search_text，
+两种数据库都只需按空格分词：
+
+    PostgreSQL  to_tsvector('simple', search_text) 上的 GIN 表达式索引，ts_rank 排序
+    SQLite      FTS5 外部内容表 alerts_fts（unicode61 分词），由 alerts 上的触发器同步，bm25 排序
+
+查询词用同样的方式切分，每个关键词的词元组成短语（相邻匹配），多个关键词之间为 AND，
+关键词的最后一个词元按前缀匹配（"ssh" 命中 "sshd"，单个汉字命中以它开头的二元组）
+"""
+
+from typing import List
+import re
+
+# 中日韩字符（假名、汉字、谚文）
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_RUN_RE = re.compile(f"([{_CJK}]+)|[^\\W_{_CJK}]+")
+
+# FTS5 影子表（外部内容表，不重复存储文本）和同步触发器；只在 search_text 变化时更新索引，
+# 告警状态等其他列的更新不触及全文索引
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS alerts_fts USING fts5("
+    "search_text, content='alerts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS alerts_fts_ai AFTER INSERT ON alerts BEGIN "
+    "INSERT INTO alerts_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS alerts_fts_ad AFTER DELETE ON alerts BEGIN "
+    "INSERT INTO alerts_fts(alerts_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS alerts_fts_au AFTER UPDATE OF search_text ON alerts BEGIN "
+    "INSERT INTO alerts_fts(alerts_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO alerts_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+)
+
+SQLITE_FTS_DROP = (
+    "DROP TRIGGER IF EXISTS alerts_fts_au",
+    "DROP TRIGGER IF EXISTS alerts_fts_ad",
+    "DROP TRIGGER IF EXISTS alerts_fts_ai",
+    "DROP TABLE IF EXISTS alerts_fts",
+)
+
+# 查询条件必须使用与索引完全相同的表达式
+POSTGRES_TSVECTOR = "to_tsvector('simple'::regconfig, coalesce(search_text, ''))"
+
+POSTGRES_FTS_DDL = (
+    f"CREATE INDEX IF NOT EXISTS ix_alerts_search_text ON alerts USING gin ({POSTGRES_TSVECTOR})",
+)
+
+POSTGRES_FTS_DROP = (
+    "DROP INDEX IF EXISTS ix_alerts_search_text",
+)
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for match in _RUN_RE.finditer(text.lower()):
+        run = match.group(0)
+        if match.group(1) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+def index_text(*parts: str) -> str:
+    """
+    生成告警的 search_text（告警名称、描述等切分后以空格连接）
+
+    Args:
+        parts: 需要检索的文本
+
+    Returns:
+        str: 切分后的索引文本
+    """
+    return " ".join(" ".join(_tokens(part)) for part in parts if part)
+
+def query_terms(query: str) -> List[List[str]]:
+    """
+    按空白切分查询关键词，每个关键词切分为词元列表（没有可检索字符的关键词被忽略）
+
+    Args:
+        query: 查询字符串
+
+    Returns:
+        List[List[str]]: 各关键词的词元
+    """
+    terms = []
+    for word in query.split():
+        tokens = _tokens(word)
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+def sqlite_match(terms: List[List[str]]) -> str:
+    """FTS5 MATCH 表达式: "t1 t2"* AND "t3"*"""
+    return " AND ".join('"' + " ".join(tokens) + '"*' for tokens in terms)
+
+def postgres_tsquery(terms: List[List[str]]) -> str:
+    """to_tsquery 表达式: 't1' <-> 't2':* & 't3':*"""
+    return " & ".join(
+        "(" + " <-> ".join(f"'{token}'" for token in tokens) + ":*)" for tokens in terms
+    )
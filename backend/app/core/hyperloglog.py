@@ -0,0 +1,71 @@
+"""
+HyperLogLog 基数估计
+用于近似去重计数（如一段时间内有告警的资产数）：每个值只更新 2^PRECISION 个寄存器中的一个，
+寄存器保存哈希值前导零个数的最大值；两个草图按寄存器取最大值即可合并，
+因此每天一个草图，任意日期范围合并后估计，不需要扫描原始数据
+
+寄存器以 (寄存器号, 值) 的稀疏形式存储（数据库中每行一个寄存器），未出现的寄存器为 0；
+PRECISION = 10 时标准误差约 3.2%，基数较小时使用线性计数，结果接近精确值
+"""
+
+from typing import Dict, Iterable, Mapping, Tuple
+import hashlib
+import math
+
+# 寄存器数为 2^PRECISION
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+
+def _hash(value: object) -> int:
+    """64位哈希（跨进程稳定，不使用内置 hash）"""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+def register_of(value: object) -> Tuple[int, int]:
+    """
+    值对应的寄存器号和秩（剩余位的前导零个数加一）
+
+    Args:
+        value: 要计数的值
+
+    Returns:
+        Tuple[int, int]: (寄存器号, 秩)
+    """
+    hashed = _hash(value)
+    index = hashed >> (64 - PRECISION)
+    rest = hashed & ((1 << (64 - PRECISION)) - 1)
+    rank = (64 - PRECISION) - rest.bit_length() + 1
+    return index, rank
+
+def sketch(values: Iterable[object]) -> Dict[int, int]:
+    """
+    由一组值构造稀疏草图
+
+    Returns:
+        Dict[int, int]: 寄存器号 → 秩
+    """
+    registers: Dict[int, int] = {}
+    for value in values:
+        index, rank = register_of(value)
+        if rank > registers.get(index, 0):
+            registers[index] = rank
+    return registers
+
+def estimate(registers: Mapping[int, int]) -> int:
+    """
+    由（合并后的）稀疏草图估计基数
+
+    Args:
+        registers: 寄存器号 → 秩，未出现的寄存器为 0
+
+    Returns:
+        int: 估计的不同值个数
+    """
+    if not registers:
+        return 0
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    zeros = REGISTERS - len(registers)
+    raw = alpha * REGISTERS * REGISTERS / (zeros + sum(2.0 ** -rank for rank in registers.values()))
+    if raw <= 2.5 * REGISTERS and zeros:
+        # 小基数时线性计数更准确
+        return round(REGISTERS * math.log(REGISTERS / zeros))
+    return round(raw)
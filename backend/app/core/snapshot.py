@@ -0,0 +1,198 @@
+"""
+后台快照
+开销较大、被频繁轮询的只读数据（如大屏数据）由后台任务定期计算一次，写入快照文件，
+请求直接读取快照，不访问数据库
+
+- 每个API工作进程都启动刷新任务，但只有持有文件锁（fcntl.flock）的进程计算并写入快照，
+  同一部署的多个工作进程只计算一次；持锁进程退出后，其他进程在下一个周期接管
+- 快照文件原子替换，各进程按文件修改时间缓存解析结果，每次请求只需一次 stat
+- ETag 为数据内容的摘要，数据未变化时重新计算也得到相同的 ETag，客户端轮询可以得到 304
+- 快照不存在或超过 3 个周期未更新（持锁进程卡住）时，请求进程同步计算一次
+"""
+
+from typing import Any, Callable, Optional, Tuple
+from datetime import datetime
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 flock，每个进程各自计算
+    fcntl = None
+
+from app.core.db import SessionLocal
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class Snapshot:
+    """一份快照（ETag、JSON正文、生成时间）"""
+
+    __slots__ = ("etag", "body", "generated_at")
+
+    def __init__(self, etag: str, body: bytes, generated_at: float):
+        self.etag = etag
+        self.body = body
+        self.generated_at = generated_at
+
+class SnapshotRefresher:
+    """
+    定期计算快照的后台任务
+
+    compute 接收数据库会话，返回可JSON序列化的数据；path、interval 为每次读取的可调用对象，
+    便于跟随配置修改
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compute: Callable[[Any], Any],
+        path: Callable[[], str],
+        interval: Callable[[], float]
+    ):
+        self.name = name
+        self.compute = compute
+        self._path = path
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._lock_file = None
+        self._compute_lock = threading.Lock()
+        # (文件路径, 修改时间) → 解析后的快照
+        self._cached: Optional[Tuple[Tuple[str, int], Snapshot]] = None
+        self.session_factory = SessionLocal
+        self.refreshes = 0
+
+    @property
+    def path(self) -> str:
+        return self._path()
+
+    @property
+    def interval(self) -> float:
+        return self._interval()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """启动刷新任务"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name=f"snapshot-{self.name}")
+        logger.info(f"快照 {self.name} 刷新任务已启动")
+
+    async def stop(self) -> None:
+        """停止刷新任务并释放文件锁"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        logger.info(f"快照 {self.name} 刷新任务已停止")
+
+    def _acquire(self) -> bool:
+        """尝试成为计算快照的进程（非阻塞）"""
+        if fcntl is None:
+            return True
+        if self._lock_file is not None:
+            return True
+        lock_path = f"{self.path}.lock"
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+        lock_file = open(lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"快照 {self.name} 由本进程（{os.getpid()}）计算")
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._acquire():
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"刷新快照 {self.name} 失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    def refresh(self) -> Snapshot:
+        """计算快照并原子写入快照文件"""
+        with self._compute_lock:
+            return self._refresh()
+
+    def _refresh(self) -> Snapshot:
+        db = self.session_factory()
+        try:
+            data = self.compute(db)
+        finally:
+            db.close()
+        body = json.dumps(data, ensure_ascii=False, default=str, separators=(",", ":"), sort_keys=True)
+        etag = f'"{hashlib.sha1(body.encode()).hexdigest()[:20]}"'
+
+        path = self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"etag": etag, "generated_at": datetime.utcnow(), "data": data},
+                      f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        self.refreshes += 1
+        self._cached = None
+        return Snapshot(etag, body.encode(), time.time())
+
+    def current(self) -> Optional[Snapshot]:
+        """读取快照文件（按修改时间缓存），不存在时返回None"""
+        path = self.path
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._cached
+        if cached is not None and cached[0] == (path, mtime):
+            return cached[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取快照 {self.name} 失败: {e}")
+            return None
+        body = json.dumps(content["data"], ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+        snapshot = Snapshot(content["etag"], body.encode(), mtime / 1e9)
+        self._cached = ((path, mtime), snapshot)
+        return snapshot
+
+    def get(self) -> Snapshot:
+        """
+        当前快照；不存在或已过期（超过 3 个刷新周期）时同步计算
+
+        Returns:
+            Snapshot: 快照
+        """
+        snapshot = self.current()
+        if snapshot is not None and time.time() - snapshot.generated_at <= 3 * self.interval:
+            return snapshot
+        # 同一进程内并发的请求只计算一次
+        with self._compute_lock:
+            snapshot = self.current()
+            if snapshot is not None and time.time() - snapshot.generated_at <= 3 * self.interval:
+                return snapshot
+            return self._refresh()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否包含当前 ETag（弱比较）"""
+    if not if_none_match:
+        return False
+    candidates = [item.strip() for item in if_none_match.split(",")]
+    return "*" in candidates or etag in (item[2:] if item.startswith("W/") else item for item in candidates)
@@ -0,0 +1,242 @@
+"""
+实时推送
+告警中心和大屏通过 /api/v1/stream（WebSocket，或 SSE）接收变化，不再轮询接口
+
+- 每个工作进程一个 StreamHub：有连接时每 STREAM_POLL_INTERVAL 秒检查一次变化
+  （新的高危/严重告警、告警计数、资产状态），数据库负载与连接数无关；没有连接时不检查
+- 推送的是增量：
+    {"type": "alert", "data": {...}}                新的高危/严重告警
+    {"type": "counters", "data": {...}}             变化的计数（首条消息为完整计数）
+    {"type": "asset_status", "data": {...}}         资产状态变化（含变化前的状态 previous）
+    {"type": "resync"}                              客户端消费过慢丢弃了消息，需要重新拉取
+- 新告警按ID检查：较小的ID可能晚于较大的ID提交，高水位只推进到创建时间早于 STREAM_SETTLE_SECONDS
+  的连续告警为止，其后的告警每次重新检查，已推送的ID不再重复推送；
+  资产只读取 updated_at 晚于上次检查（减去同样的回看时间）的行
+- 每个连接一个有界的待发送缓冲：同一计数、同一资产未发出的更新合并为一条；
+  缓冲满时清空并只保留一条 resync，慢客户端不会占用无限内存
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.crud.alert_counter_crud import count_alerts, count_by_status_severity
+from app.models.postgres import Alert, Asset
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 推送的告警级别
+PUSH_SEVERITIES = ("high", "critical")
+
+Message = Dict[str, Any]
+
+class StreamSubscriber:
+    """一个连接的待发送缓冲（按合并键去重，有界）"""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, Message]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, key: str, message: Message) -> None:
+        """
+        加入待发送消息；key 相同的未发送消息合并为一条（保持原位置）
+
+        Args:
+            key: 合并键
+            message: 消息（多个连接共享，不修改）
+        """
+        existing = self._pending.get(key)
+        if existing is not None:
+            self._pending[key] = _coalesce(existing, message)
+        elif len(self._pending) >= self.max_pending:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+            self._pending["resync"] = {"type": "resync"}
+        else:
+            self._pending[key] = message
+        self._ready.set()
+
+    async def get(self, timeout: float) -> List[Message]:
+        """
+        取出所有待发送消息，没有消息时最多等待 timeout 秒
+
+        Returns:
+            List[Message]: 消息列表，超时为空列表
+        """
+        if not self._pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        messages = list(self._pending.values())
+        self._pending.clear()
+        return messages
+
+def _coalesce(existing: Message, message: Message) -> Message:
+    """合并同一键的两条消息：计数按字段覆盖；资产状态取最新状态，保留最初的 previous"""
+    data = {**existing["data"], **message["data"]}
+    if "previous" in existing["data"]:
+        data["previous"] = existing["data"]["previous"]
+    return {"type": message["type"], "data": data}
+
+class StreamHub:
+    """检查数据变化并分发给本进程的所有连接"""
+
+    def __init__(self):
+        self._subscribers: Set[StreamSubscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.session_factory = SessionLocal
+        self._reset()
+
+    def _reset(self) -> None:
+        # 没有连接时不检查，恢复检查时重新建立基线
+        self._last_alert_id: Optional[int] = None
+        # 高水位之后已推送的告警ID
+        self._pushed_alerts: Set[int] = set()
+        self._counters: Dict[str, Any] = {}
+        self._assets: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._assets_since: Optional[datetime] = None
+
+    @property
+    def connections(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Optional[StreamSubscriber]:
+        """
+        注册一个连接（须在事件循环中调用），第一个连接启动检查任务
+
+        Returns:
+            Optional[StreamSubscriber]: 连接的待发送缓冲，超过连接数上限时为 None
+        """
+        if len(self._subscribers) >= settings.STREAM_MAX_CONNECTIONS:
+            return None
+        subscriber = StreamSubscriber(settings.STREAM_BUFFER_SIZE)
+        if self._counters:
+            subscriber.push("counters", {"type": "counters", "data": dict(self._counters)})
+        self._subscribers.add(subscriber)
+
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run(), name="stream-hub")
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        """注销连接；最后一个连接断开后检查任务自行结束"""
+        self._subscribers.discard(subscriber)
+
+    def publish(self, key: str, message: Message) -> None:
+        """把消息加入所有连接的待发送缓冲"""
+        for subscriber in self._subscribers:
+            subscriber.push(key, message)
+
+    async def stop(self) -> None:
+        """停止检查任务"""
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self) -> None:
+        self._reset()
+        logger.info("实时推送检查任务已启动")
+        while self._subscribers:
+            try:
+                for key, message in await asyncio.to_thread(self.poll):
+                    self.publish(key, message)
+            except Exception as e:
+                logger.error(f"检查实时推送数据失败: {e}")
+            await asyncio.sleep(settings.STREAM_POLL_INTERVAL)
+        logger.info("实时推送没有连接，检查任务已停止")
+
+    def poll(self) -> List[Tuple[str, Message]]:
+        """
+        检查一次变化（在线程中执行），只读告警ID索引、计数表和最近更新的资产
+
+        Returns:
+            List[Tuple[str, Message]]: (合并键, 消息) 列表
+        """
+        messages: List[Tuple[str, Message]] = []
+        polled_at = datetime.utcnow()
+        settled_before = polled_at - timedelta(seconds=settings.STREAM_SETTLE_SECONDS)
+        db = self.session_factory()
+        try:
+            # 新的高危/严重告警（首次检查只记录起点）
+            if self._last_alert_id is None:
+                self._last_alert_id = db.query(func.max(Alert.id)).scalar() or 0
+                self._pushed_alerts = set()
+            else:
+                rows = db.query(
+                    Alert.id, Alert.alert_name, Alert.severity, Alert.status, Alert.asset_id, Alert.created_at
+                ).filter(
+                    Alert.id > self._last_alert_id, Alert.severity.in_(PUSH_SEVERITIES)
+                ).order_by(Alert.id).limit(settings.STREAM_ALERT_BATCH).all()
+                settled = True
+                for row in rows:
+                    # 高水位只越过已稳定的连续告警，其后可能还有较小ID的事务未提交
+                    if settled and (row.created_at is None or row.created_at <= settled_before):
+                        self._last_alert_id = row.id
+                    else:
+                        settled = False
+                    if row.id in self._pushed_alerts:
+                        continue
+                    self._pushed_alerts.add(row.id)
+                    messages.append((f"alert:{row.id}", {"type": "alert", "data": {
+                        "id": row.id,
+                        "alert_name": row.alert_name,
+                        "severity": row.severity,
+                        "status": row.status,
+                        "asset_id": row.asset_id,
+                        "created_at": row.created_at.isoformat() if row.created_at else None
+                    }}))
+                self._pushed_alerts = {alert_id for alert_id in self._pushed_alerts if alert_id > self._last_alert_id}
+
+            # 计数（只推送变化的字段）
+            by_status: Dict[str, int] = {}
+            by_severity: Dict[str, int] = {}
+            for (status, severity), count in count_by_status_severity(db).items():
+                by_status[status] = by_status.get(status, 0) + count
+                by_severity[severity] = by_severity.get(severity, 0) + count
+            counters = {
+                "today_alerts": count_alerts(db, since=datetime.utcnow().date()),
+                "unhandled_alerts": by_status.get("unhandled", 0),
+                "by_status": by_status,
+                "by_severity": by_severity
+            }
+            changed = {key: value for key, value in counters.items() if self._counters.get(key) != value}
+            if changed:
+                self._counters = counters
+                messages.append(("counters", {"type": "counters", "data": changed}))
+
+            # 资产状态变化（首次检查读取全部资产作为基线，之后只读最近更新的资产；新增和删除的资产不推送）
+            query = db.query(Asset.id, Asset.name, Asset.status)
+            if self._assets_since is not None:
+                query = query.filter(Asset.updated_at >= self._assets_since)
+            for row in query:
+                previous = self._assets.get(row.id)
+                if self._assets_since is not None and previous is not None and previous[1] != row.status:
+                    messages.append((f"asset:{row.id}", {"type": "asset_status", "data": {
+                        "id": row.id, "name": row.name, "status": row.status, "previous": previous[1]
+                    }}))
+                self._assets[row.id] = (row.name, row.status)
+            self._assets_since = settled_before
+        finally:
+            db.close()
+        return messages
+
+# 全局推送中心
+stream_hub = StreamHub()
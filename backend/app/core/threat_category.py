@@ -0,0 +1,77 @@
+"""
+威胁分类
+写入告警时按告警名称（规则名称）、触发事件的类型和描述把告警归入一个威胁类别，存入 alerts.threat_category，
+威胁类型分布只需按该列 GROUP BY（已有告警的回填见 app/services/threat_backfill.py）
+
+分类顺序：名称关键词 → 事件类型 → 描述关键词，都不匹配时为 other
+"""
+
+from typing import Dict, List, Optional
+from functools import lru_cache
+
+# 威胁类别及展示名称（按大屏展示顺序）
+THREAT_CATEGORIES: Dict[str, str] = {
+    "malware": "恶意软件",
+    "script": "可疑脚本",
+    "lateral_movement": "横向移动",
+    "persistence": "持久化",
+    "exfiltration": "数据渗出",
+    "brute_force": "暴力破解",
+}
+OTHER_CATEGORY = "other"
+OTHER_LABEL = "其他"
+
+# 关键词（小写）；按列表顺序匹配，名称同时包含多类关键词时取先出现的类别
+_KEYWORDS: List[tuple] = [
+    ("exfiltration", ("数据渗出", "渗出", "外传", "泄露", "exfil", "dns隧道", "dns tunnel")),
+    ("lateral_movement", ("横向移动", "横向", "lateral", "psexec", "wmiexec", "pass-the-hash", "远程执行")),
+    ("persistence", ("持久化", "persistence", "计划任务", "scheduled task", "crontab", "启动项", "自启动",
+                     "autorun", "注册表", "服务安装")),
+    ("malware", ("恶意软件", "malware", "病毒", "virus", "木马", "trojan", "勒索", "ransom", "挖矿", "miner",
+                 "后门", "backdoor", "下载并执行", "下载执行", "rootkit")),
+    ("script", ("可疑脚本", "脚本", "script", "powershell", "wscript", "cscript", "vbs", "macro",
+                "可疑进程", "命令执行")),
+    ("brute_force", ("暴力破解", "爆破", "brute", "密码猜测", "登录失败", "password spray")),
+]
+
+# 事件类型 → 类别（事件类型有明确含义时使用）
+_EVENT_TYPES: Dict[str, str] = {
+    "authentication_failure": "brute_force",
+    "registry_modification": "persistence",
+    "scheduled_task_creation": "persistence",
+    "service_installation": "persistence",
+    "process_creation": "script",
+    "malware_detection": "malware",
+    "file_quarantine": "malware",
+}
+
+def _match_keywords(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    text = text.lower()
+    for category, keywords in _KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return None
+
+@lru_cache(maxsize=4096)
+def _classify_name(alert_name: Optional[str], event_type: Optional[str]) -> Optional[str]:
+    return _match_keywords(alert_name) or _EVENT_TYPES.get(event_type or "")
+
+def classify_threat(
+    alert_name: Optional[str],
+    event_type: Optional[str] = None,
+    description: Optional[str] = None
+) -> str:
+    """
+    告警的威胁类别
+
+    Args:
+        alert_name: 告警名称（规则告警为规则名称）
+        event_type: 触发事件的类型
+        description: 告警描述（名称和事件类型无法分类时使用）
+
+    Returns:
+        str: THREAT_CATEGORIES 中的类别，无法分类时为 other
+    """
+    return _classify_name(alert_name, event_type) or _match_keywords(description) or OTHER_CATEGORY
@@ -0,0 +1,402 @@
+"""
+Alert Counter CRUD操作模块
+- 告警计数表按 (创建日期, 状态, 级别) 汇总告警数，统计接口只读这张小表，不再扫描告警表
+- 告警小时汇总表按 (创建小时, 级别, 资产) 汇总新建告警数，趋势图一次查询即可覆盖一年
+- 告警资产草图表每天一个 HyperLogLog 草图，合并任意日期范围即可估计有告警的资产数
+
+这些表随告警的写入在同一事务中更新（不提交，由调用方提交）:
+    新建告警                count_new_alerts
+    状态变更 / 删除告警      move_alert_counts（在 UPDATE / DELETE 之前调用）
+并发修改或绕过上述入口的写入可能使计数偏离：计数表由 reconcile_counters 定期核对，
+小时汇总表和资产草图由 rebuild_hourly_rollup / rebuild_asset_sketches 按时间段重建（manage_db.py backfill-rollups）；
+草图只增不减，删除告警不会从草图中扣除
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from datetime import date, datetime, timedelta
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core import hyperloglog
+from app.models.postgres import Alert, AlertAssetSketch, AlertCounter, AlertHourlyRollup
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+CounterKey = Tuple[date, str, str]
+RollupKey = Tuple[datetime, str, int]
+SketchKey = Tuple[date, int]
+
+# 未设置状态的告警按未处理计数
+_DEFAULT_STATUS = "unhandled"
+
+def _as_date(value: Any) -> date:
+    """SQLite 的 date() 返回文本"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+def _as_hour(value: Any) -> datetime:
+    """截断到小时；SQLite 的 strftime() 返回文本"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def _hour_bucket(db: Session):
+    """告警创建时间截断到小时的SQL表达式"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("hour", Alert.created_at)
+    return func.strftime("%Y-%m-%d %H:00:00", Alert.created_at)
+
+def _field(row: Any, name: str) -> Any:
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+def _increment(db: Session, model, keys: List[str], deltas: Dict[Tuple, int]) -> None:
+    """
+    按增量更新汇总表（INSERT ... ON CONFLICT DO UPDATE，不提交）
+
+    按键排序后写入，并发事务以相同顺序锁定汇总行，避免死锁
+    """
+    rows = [dict(zip(keys, key), count=delta) for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    stmt = _dialect(db).insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, key) for key in keys],
+        set_={"count": model.count + stmt.excluded.count}
+    )
+    db.execute(stmt)
+
+def _dialect(db: Session):
+    return postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+
+def adjust_counters(db: Session, deltas: Dict[CounterKey, int]) -> None:
+    """
+    按增量更新计数表（不提交）
+
+    Args:
+        db: 数据库会话
+        deltas: (日期, 状态, 级别) → 增量
+    """
+    _increment(db, AlertCounter, ["day", "status", "severity"], deltas)
+
+def adjust_hourly_rollup(db: Session, deltas: Dict[RollupKey, int]) -> None:
+    """
+    按增量更新小时汇总表（不提交）
+
+    Args:
+        db: 数据库会话
+        deltas: (小时, 级别, 资产ID) → 增量
+    """
+    _increment(db, AlertHourlyRollup, ["hour", "severity", "asset_id"], deltas)
+
+def merge_asset_sketches(db: Session, registers: Dict[SketchKey, int]) -> None:
+    """
+    把寄存器值合并到每日资产草图（取最大值，不提交）
+
+    只在新值更大时更新行，同一寄存器的重复写入不产生行更新
+
+    Args:
+        db: 数据库会话
+        registers: (日期, 寄存器号) → 寄存器值
+    """
+    rows = [{"day": day, "register": register, "value": value} for (day, register), value in sorted(registers.items())]
+    if not rows:
+        return
+    stmt = _dialect(db).insert(AlertAssetSketch).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AlertAssetSketch.day, AlertAssetSketch.register],
+        set_={"value": stmt.excluded.value},
+        where=AlertAssetSketch.value < stmt.excluded.value
+    )
+    db.execute(stmt)
+
+def count_new_alerts(db: Session, alerts: Iterable[Any]) -> None:
+    """
+    新建告警计入计数表、小时汇总表和资产草图（不提交）
+
+    Args:
+        db: 数据库会话
+        alerts: 已写入的告警（Alert 对象或告警行，需要 created_at/status/severity/asset_id）
+    """
+    counters: Dict[CounterKey, int] = Counter()
+    rollup: Dict[RollupKey, int] = Counter()
+    sketches: Dict[SketchKey, int] = {}
+    for alert in alerts:
+        created_at, severity, asset_id = _field(alert, "created_at"), _field(alert, "severity"), _field(alert, "asset_id")
+        day = _as_date(created_at)
+        counters[(day, _field(alert, "status") or _DEFAULT_STATUS, severity)] += 1
+        rollup[(_as_hour(created_at), severity, asset_id or 0)] += 1
+        if asset_id:
+            register, value = hyperloglog.register_of(asset_id)
+            if value > sketches.get((day, register), 0):
+                sketches[(day, register)] = value
+    adjust_counters(db, counters)
+    adjust_hourly_rollup(db, rollup)
+    merge_asset_sketches(db, sketches)
+
+def move_alert_counts(db: Session, query, status: Optional[str]) -> int:
+    """
+    查询选中的告警即将改为 status（为 None 表示即将删除）时，把它们的计数从旧状态移到新状态（不提交）
+
+    必须在执行 UPDATE / DELETE 之前、在同一事务中调用
+
+    Args:
+        db: 数据库会话
+        query: 选择告警的查询（db.query(Alert) 加过滤条件）
+        status: 新状态，None 表示删除
+
+    Returns:
+        int: 计数发生变化的告警数
+    """
+    day = func.date(Alert.created_at)
+    current = func.coalesce(Alert.status, _DEFAULT_STATUS)
+    grouped = query.with_entities(day, current, Alert.severity, func.count()).filter(Alert.created_at.isnot(None))
+    if status is not None:
+        grouped = grouped.filter(current != status)
+
+    deltas: Dict[CounterKey, int] = Counter()
+    moved = 0
+    for row_day, row_status, severity, count in grouped.group_by(day, current, Alert.severity):
+        row_day = _as_date(row_day)
+        deltas[(row_day, row_status, severity)] -= count
+        if status is not None:
+            deltas[(row_day, status, severity)] += count
+        moved += count
+    adjust_counters(db, deltas)
+
+    if status is None:
+        # 删除的告警从小时汇总中扣除（状态变更不影响小时汇总）
+        hour = _hour_bucket(db)
+        asset = func.coalesce(Alert.asset_id, 0)
+        removed = query.with_entities(hour, Alert.severity, asset, func.count()).filter(
+            Alert.created_at.isnot(None)
+        ).group_by(hour, Alert.severity, asset)
+        adjust_hourly_rollup(db, {
+            (_as_hour(row_hour), severity, asset_id): -count for row_hour, severity, asset_id, count in removed
+        })
+    return moved
+
+def count_alerts(
+    db: Session,
+    since: Optional[date] = None,
+    status: Optional[str] = None,
+    severity: Optional[str] = None
+) -> int:
+    """
+    从计数表读取告警数
+
+    Args:
+        db: 数据库会话
+        since: 只统计该日期（含）之后创建的告警
+        status: 状态过滤
+        severity: 级别过滤
+
+    Returns:
+        int: 告警数
+    """
+    query = db.query(func.coalesce(func.sum(AlertCounter.count), 0))
+    if since is not None:
+        query = query.filter(AlertCounter.day >= since)
+    if status is not None:
+        query = query.filter(AlertCounter.status == status)
+    if severity is not None:
+        query = query.filter(AlertCounter.severity == severity)
+    return int(query.scalar())
+
+def count_by_status_severity(db: Session) -> Dict[Tuple[str, str], int]:
+    """
+    按 (状态, 级别) 汇总的告警数
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        Dict[Tuple[str, str], int]: (状态, 级别) → 告警数
+    """
+    rows = db.query(
+        AlertCounter.status, AlertCounter.severity, func.sum(AlertCounter.count)
+    ).group_by(AlertCounter.status, AlertCounter.severity).all()
+    return {(status, severity): int(count) for status, severity, count in rows if count}
+
+def reconcile_counters(db: Session) -> Dict[str, int]:
+    """
+    按告警表重新核对计数表并提交，修正偏离的计数
+
+    PostgreSQL 上先锁定计数表（阻塞并发的计数更新）再汇总告警表：
+    锁定前已提交的写入都在汇总结果中，未提交的写入在解锁后再累加，核对期间不会丢失增量
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        Dict[str, int]: 核对的计数键数、修正的计数键数
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection().exec_driver_sql("LOCK TABLE alert_counters IN SHARE ROW EXCLUSIVE MODE")
+
+    day = func.date(Alert.created_at)
+    current = func.coalesce(Alert.status, _DEFAULT_STATUS)
+    actual: Dict[CounterKey, int] = {
+        (_as_date(row_day), row_status, severity): count
+        for row_day, row_status, severity, count in db.query(day, current, Alert.severity, func.count())
+        .filter(Alert.created_at.isnot(None))
+        .group_by(day, current, Alert.severity)
+    }
+    stored: Dict[CounterKey, int] = {
+        (_as_date(row.day), row.status, row.severity): row.count
+        for row in db.query(AlertCounter)
+    }
+
+    deltas = {
+        key: actual.get(key, 0) - stored.get(key, 0)
+        for key in actual.keys() | stored.keys()
+        if actual.get(key, 0) != stored.get(key, 0)
+    }
+    adjust_counters(db, deltas)
+    # 计数归零的键不再保留
+    db.query(AlertCounter).filter(AlertCounter.count == 0).delete(synchronize_session=False)
+    db.commit()
+
+    if deltas:
+        logger.warning(f"告警计数表偏离告警表，已修正 {len(deltas)} 个计数键")
+    return {"keys": len(actual), "corrected": len(deltas)}
+
+def rebuild_hourly_rollup(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk: timedelta = timedelta(days=7)
+) -> int:
+    """
+    按告警表重建时间段内的小时汇总（回填历史数据或修正偏离），每段单独提交
+
+    每段先删除该段的汇总行再按告警表重新汇总；PostgreSQL 上并发写入的告警在删除后才提交时
+    由其自身的增量计入，不会重复或遗漏
+
+    Args:
+        db: 数据库会话
+        start: 开始时间（默认最早的告警）
+        end: 结束时间（默认最新的告警）
+        chunk: 每段的时间跨度
+
+    Returns:
+        int: 重建的告警数
+    """
+    if start is None or end is None:
+        first, last = db.query(func.min(Alert.created_at), func.max(Alert.created_at)).one()
+        if first is None:
+            return 0
+        start = start or first
+        end = end or last + timedelta(hours=1)
+    start = _as_hour(start)
+
+    hour = _hour_bucket(db)
+    asset = func.coalesce(Alert.asset_id, 0)
+    total = 0
+    while start < end:
+        stop = min(start + chunk, end)
+        rows = db.query(hour, Alert.severity, asset, func.count()).filter(
+            Alert.created_at >= start, Alert.created_at < stop
+        ).group_by(hour, Alert.severity, asset).all()
+        db.query(AlertHourlyRollup).filter(
+            AlertHourlyRollup.hour >= start, AlertHourlyRollup.hour < stop
+        ).delete(synchronize_session=False)
+        adjust_hourly_rollup(db, {
+            (_as_hour(row_hour), severity, asset_id): count for row_hour, severity, asset_id, count in rows
+        })
+        db.commit()
+        total += sum(row[3] for row in rows)
+        start = stop
+    logger.info(f"告警小时汇总重建完成，共 {total} 条告警")
+    return total
+
+def hourly_trend(
+    db: Session,
+    start: datetime,
+    asset_id: Optional[int] = None
+) -> Dict[Tuple[date, str], int]:
+    """
+    按 (日期, 级别) 汇总 start 之后的新建告警数（一次查询，扫描的汇总行数与天数成正比）
+
+    Args:
+        db: 数据库会话
+        start: 开始时间（UTC）
+        asset_id: 资产过滤
+
+    Returns:
+        Dict[Tuple[date, str], int]: (日期, 级别) → 告警数
+    """
+    day = func.date(AlertHourlyRollup.hour)
+    query = db.query(day, AlertHourlyRollup.severity, func.sum(AlertHourlyRollup.count)).filter(
+        AlertHourlyRollup.hour >= start
+    )
+    if asset_id is not None:
+        query = query.filter(AlertHourlyRollup.asset_id == asset_id)
+    rows = query.group_by(day, AlertHourlyRollup.severity).all()
+    return {(_as_date(row_day), severity): int(count) for row_day, severity, count in rows}
+
+def rebuild_asset_sketches(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> int:
+    """
+    按告警表重建日期范围内的每日资产草图（回填历史数据或去掉已删除告警的资产），每天单独提交
+
+    Args:
+        db: 数据库会话
+        start: 开始日期（默认最早的告警）
+        end: 结束日期（含，默认最新的告警）
+
+    Returns:
+        int: 重建的天数
+    """
+    if start is None or end is None:
+        first, last = db.query(func.min(Alert.created_at), func.max(Alert.created_at)).one()
+        if first is None:
+            return 0
+        start = start or _as_date(first)
+        end = end or _as_date(last)
+
+    days = 0
+    current = start
+    while current <= end:
+        asset_ids = [
+            asset_id for (asset_id,) in db.query(Alert.asset_id).filter(
+                Alert.created_at >= datetime.combine(current, datetime.min.time()),
+                Alert.created_at < datetime.combine(current + timedelta(days=1), datetime.min.time()),
+                Alert.asset_id.isnot(None)
+            ).distinct()
+        ]
+        db.query(AlertAssetSketch).filter(AlertAssetSketch.day == current).delete(synchronize_session=False)
+        merge_asset_sketches(db, {
+            (current, register): value for register, value in hyperloglog.sketch(asset_ids).items()
+        })
+        db.commit()
+        days += 1
+        current += timedelta(days=1)
+    logger.info(f"告警资产草图重建完成，共 {days} 天")
+    return days
+
+def estimate_affected_assets(db: Session, since: Optional[date] = None) -> int:
+    """
+    估计 since 之后有告警的资产数（合并每日草图，一次查询，扫描的行数最多为 天数 × 寄存器数）
+
+    Args:
+        db: 数据库会话
+        since: 开始日期（UTC，默认全部）
+
+    Returns:
+        int: 估计的资产数
+    """
+    query = db.query(AlertAssetSketch.register, func.max(AlertAssetSketch.value))
+    if since is not None:
+        query = query.filter(AlertAssetSketch.day >= since)
+    return hyperloglog.estimate(dict(query.group_by(AlertAssetSketch.register).all()))
@@ -0,0 +1,185 @@
+"""
+Event CRUD操作模块
+提供事件数据的批量写入和按时间范围查询操作
+
+events 在PostgreSQL上按 event_time 分区，这里的查询都带 event_time 范围，
+使规划器只扫描相关分区
+"""
+
+from typing import List, Dict, Any, Iterable, Optional
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import insert, desc
+from datetime import datetime, timedelta
+import csv
+import io
+import json
+import logging
+from app.core.compression import compress_json
+from app.models.postgres import Event
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 批量写入涉及的列（id由数据库生成）
+EVENT_INSERT_COLUMNS = (
+    "event_type",
+    "asset_id",
+    "source_ip",
+    "destination_ip",
+    "source_port",
+    "destination_port",
+    "protocol",
+    "description",
+    "event_time",
+    "created_at",
+    "raw_data",
+    "count",
+    "first_seen",
+    "last_seen",
+)
+
+# COPY 使用的NULL标记
+_COPY_NULL = "\\N"
+
+def prepare_event_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    将事件字典整理为完整的列集合
+
+    executemany要求每行的键一致，缺失列补None，created_at补当前时间，
+    未聚合的事件 count 为1，first_seen/last_seen 取 event_time
+
+    Args:
+        rows: 事件字典序列
+
+    Returns:
+        List[Dict[str, Any]]: 可直接写入的行
+    """
+    now = datetime.utcnow()
+    prepared = []
+    for row in rows:
+        item = {column: row.get(column) for column in EVENT_INSERT_COLUMNS}
+        if item["created_at"] is None:
+            item["created_at"] = now
+        if item["count"] is None:
+            item["count"] = 1
+        if item["first_seen"] is None:
+            item["first_seen"] = item["event_time"]
+        if item["last_seen"] is None:
+            item["last_seen"] = item["event_time"]
+        prepared.append(item)
+    return prepared
+
+def _copy_value(value: Any) -> Any:
+    """将单个值转换为COPY CSV格式"""
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bytes):
+        # bytea 的十六进制文本格式
+        return "\\x" + value.hex()
+    return value
+
+def _copy_events(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """使用PostgreSQL COPY写入事件"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        values = dict(row, raw_data=compress_json(row["raw_data"]))
+        writer.writerow([_copy_value(values[column]) for column in EVENT_INSERT_COLUMNS])
+    buffer.seek(0)
+
+    columns = ", ".join(EVENT_INSERT_COLUMNS)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY events ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def bulk_insert_events(db: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    批量写入事件（不提交事务）
+
+    PostgreSQL使用COPY，其它数据库使用executemany多行INSERT
+
+    Args:
+        db: 数据库会话
+        rows: 事件字典序列，键为events表列名
+
+    Returns:
+        int: 写入的行数
+    """
+    prepared = prepare_event_rows(rows)
+    if not prepared:
+        return 0
+
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_events(db, prepared)
+    else:
+        db.execute(insert(Event.__table__), prepared)
+
+    return len(prepared)
+
+def get_event_near(
+    db: Session,
+    event_id: int,
+    around: datetime,
+    window: timedelta = timedelta(days=1),
+    lookback: Optional[timedelta] = timedelta(days=30)
+) -> Optional[Event]:
+    """
+    按ID获取事件，只在 around 附近的时间范围内查找
+
+    事件表按 event_time 分区，仅按ID查询需要探测所有分区，因此查询始终带 event_time 范围：
+    告警通常在事件发生后不久产生，先在告警时间前后 window 内查找，找不到再向前扩大到 lookback
+    （延迟上报的事件），仍找不到返回 None
+
+    Args:
+        db: 数据库会话
+        event_id: 事件ID
+        around: 参考时间（通常为告警创建时间）
+        window: 查找窗口
+        lookback: 扩大查找时向前的范围，None 表示不扩大
+
+    Returns:
+        Optional[Event]: 事件对象
+    """
+    query = db.query(Event).options(undefer(Event.raw_data)).filter(
+        Event.id == event_id,
+        Event.event_time <= around + window
+    )
+    event = query.filter(Event.event_time >= around - window).first()
+    if event is None and lookback is not None and lookback > window:
+        event = query.filter(Event.event_time >= around - lookback).first()
+    return event
+
+def get_asset_events(
+    db: Session,
+    asset_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    limit: int = 20
+) -> List[Event]:
+    """
+    获取资产在时间范围内的事件（按时间倒序）
+
+    Args:
+        db: 数据库会话
+        asset_id: 资产ID
+        start_time: 开始时间（包含）
+        end_time: 结束时间（包含）
+        limit: 最大返回数量
+
+    Returns:
+        List[Event]: 事件列表
+    """
+    return db.query(Event).filter(
+        Event.asset_id == asset_id,
+        Event.event_time >= start_time,
+        Event.event_time <= end_time
+    ).order_by(desc(Event.event_time)).limit(limit).all()
@@ -0,0 +1,220 @@
+"""
+Event 分区维护模块
+PostgreSQL下 events 表按 event_time 做声明式范围分区（默认每天一个分区），
+本模块负责预建未来分区和按整分区删除/分离过期数据。
+SQLite或未分区的表退化为分块删除。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+import logging
+import re
+from app.core.config import settings
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+_EPOCH = date(1970, 1, 1)
+
+# 默认分区：接收不落在任何范围分区内的迟到/异常时间事件
+DEFAULT_PARTITION = "events_default"
+
+# 非分区表分块删除时每块的行数
+RETENTION_DELETE_CHUNK = 5000
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+def partition_bounds(day: date, interval_days: Optional[int] = None) -> Tuple[date, date]:
+    """
+    计算某天所在分区的范围 [start, end)
+
+    分区以1970-01-01为起点按 interval_days 对齐，保证多次计算结果一致
+    """
+    interval_days = interval_days or settings.EVENT_PARTITION_DAYS
+    offset = (day - _EPOCH).days // interval_days * interval_days
+    start = _EPOCH + timedelta(days=offset)
+    return start, start + timedelta(days=interval_days)
+
+def partition_name(start: date) -> str:
+    """分区表名称，如 events_p20240101"""
+    return f"events_p{start:%Y%m%d}"
+
+def is_events_partitioned(db: Session) -> bool:
+    """events 表是否为PostgreSQL分区表"""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    relkind = db.execute(text(
+        "SELECT c.relkind FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'events' AND n.nspname = current_schema()"
+    )).scalar()
+    return relkind == "p"
+
+def list_event_partitions(db: Session) -> List[Dict[str, Any]]:
+    """
+    列出 events 的范围分区（不含默认分区），按起始时间排序
+
+    Returns:
+        List[Dict[str, Any]]: name/start/end
+    """
+    rows = db.execute(text(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = 'events'"
+    )).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_PATTERN.search(bound or "")
+        if not match:
+            continue
+        partitions.append({
+            "name": name,
+            "start": datetime.fromisoformat(match.group(1)),
+            "end": datetime.fromisoformat(match.group(2)),
+        })
+    partitions.sort(key=lambda item: item["start"])
+    return partitions
+
+def create_event_partition(db: Session, start: date, end: date) -> str:
+    """
+    创建一个范围分区（不提交）
+
+    若默认分区中已有落在该范围内的数据，先将其移入新表再挂载，
+    否则直接 CREATE TABLE ... PARTITION OF 会失败
+    """
+    name = partition_name(start)
+    start_literal = f"{start:%Y-%m-%d} 00:00:00"
+    end_literal = f"{end:%Y-%m-%d} 00:00:00"
+    bound = f"FOR VALUES FROM ('{start_literal}') TO ('{end_literal}')"
+
+    has_default = db.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    stray = 0
+    if has_default:
+        stray = db.execute(text(
+            f"SELECT count(*) FROM {DEFAULT_PARTITION} "
+            "WHERE event_time >= :start AND event_time < :end"
+        ), {"start": start_literal, "end": end_literal}).scalar()
+
+    if not stray:
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF events {bound}"))
+        return name
+
+    logger.warning(f"默认分区中有 {stray} 行属于 {name}，迁移后挂载")
+    db.execute(text(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        "WHERE event_time >= :start AND event_time < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), {"start": start_literal, "end": end_literal})
+    db.execute(text(f"ALTER TABLE events ATTACH PARTITION {name} {bound}"))
+    return name
+
+def ensure_event_partitions(
+    db: Session,
+    days_ahead: Optional[int] = None,
+    from_day: Optional[date] = None
+) -> List[str]:
+    """
+    预建从 from_day（默认今天）到未来 days_ahead 天的分区并提交
+
+    Returns:
+        List[str]: 新建的分区名称（未分区时为空）
+    """
+    if not is_events_partitioned(db):
+        return []
+
+    days_ahead = settings.EVENT_PARTITION_PRECREATE_DAYS if days_ahead is None else days_ahead
+    from_day = from_day or datetime.utcnow().date()
+    existing = {item["name"] for item in list_event_partitions(db)}
+
+    created = []
+    start, end = partition_bounds(from_day)
+    last_day = from_day + timedelta(days=days_ahead)
+    try:
+        while start <= last_day:
+            if partition_name(start) not in existing:
+                created.append(create_event_partition(db, start, end))
+            start, end = end, end + timedelta(days=settings.EVENT_PARTITION_DAYS)
+        db.commit()
+    except Exception as e:
+        logger.error(f"创建事件分区失败: {e}")
+        db.rollback()
+        raise
+
+    if created:
+        logger.info(f"新建事件分区: {', '.join(created)}")
+    return created
+
+def apply_event_retention(
+    db: Session,
+    retention_days: Optional[int] = None,
+    mode: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    清理超过保留期的事件
+
+    分区表：结束时间早于截止时间的整个分区被 DROP（mode=drop）
+    或 DETACH（mode=detach，保留独立表供归档），默认分区中的过期行逐块删除；
+    未分区：按 event_time 分块删除。
+
+    Returns:
+        Dict[str, Any]: 截止时间、处理的分区和删除的行数
+    """
+    retention_days = settings.EVENT_RETENTION_DAYS if retention_days is None else retention_days
+    mode = mode or settings.EVENT_RETENTION_MODE
+    if mode not in ("drop", "detach"):
+        raise ValueError(f"不支持的保留策略: {mode}")
+
+    now = now or datetime.utcnow()
+    cutoff = datetime.combine(now.date() - timedelta(days=retention_days), datetime.min.time())
+    partitions: List[str] = []
+    deleted_rows = 0
+
+    try:
+        if is_events_partitioned(db):
+            for partition in list_event_partitions(db):
+                if partition["end"] > cutoff:
+                    continue
+                if mode == "detach":
+                    db.execute(text(f"ALTER TABLE events DETACH PARTITION {partition['name']}"))
+                else:
+                    db.execute(text(f"DROP TABLE {partition['name']}"))
+                partitions.append(partition["name"])
+            db.commit()
+            deleted_rows = _delete_in_chunks(db, DEFAULT_PARTITION, cutoff)
+        else:
+            deleted_rows = _delete_in_chunks(db, "events", cutoff)
+    except Exception as e:
+        logger.error(f"清理过期事件失败: {e}")
+        db.rollback()
+        raise
+
+    if partitions or deleted_rows:
+        action = "分离" if mode == "detach" else "删除"
+        logger.info(f"事件保留期清理: {action}分区 {len(partitions)} 个，删除 {deleted_rows} 行（截止 {cutoff}）")
+
+    return {
+        "cutoff": cutoff,
+        "mode": mode,
+        "partitions": partitions,
+        "deleted_rows": deleted_rows,
+    }
+
+def _delete_in_chunks(db: Session, table: str, cutoff: datetime) -> int:
+    """按 event_time 分块删除并逐块提交，避免长事务"""
+    deleted = 0
+    while True:
+        result = db.execute(text(
+            f"DELETE FROM {table} WHERE id IN ("
+            f"SELECT id FROM {table} WHERE event_time < :cutoff LIMIT :limit)"
+        ), {"cutoff": cutoff, "limit": RETENTION_DELETE_CHUNK})
+        db.commit()
+        deleted += result.rowcount or 0
+        if not result.rowcount or result.rowcount < RETENTION_DELETE_CHUNK:
+            return deleted
@@ -0,0 +1,102 @@
+"""
+Sync CRUD操作模块
+提供增量同步检查点的读写和同步延迟统计
+"""
+
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime
+import logging
+from app.models.postgres import Event, SyncCheckpoint
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 事件 → Manticore 同步任务的检查点名称
+EVENTS_MANTICORE_SYNC = "events_manticore"
+
+def get_checkpoint(db: Session, name: str) -> SyncCheckpoint:
+    """
+    获取同步检查点，不存在时创建
+
+    Args:
+        db: 数据库会话
+        name: 同步任务名称
+
+    Returns:
+        SyncCheckpoint: 检查点对象
+    """
+    checkpoint = db.get(SyncCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = SyncCheckpoint(name=name, last_id=0, synced_rows=0)
+        db.add(checkpoint)
+        db.commit()
+        db.refresh(checkpoint)
+    return checkpoint
+
+def advance_checkpoint(
+    db: Session,
+    name: str,
+    last_id: int,
+    last_event_time: Optional[datetime],
+    rows: int
+) -> bool:
+    """
+    推进检查点并提交
+
+    仅当新的高水位大于当前值时更新，避免并发或滞后的同步任务让检查点回退
+
+    Args:
+        db: 数据库会话
+        name: 同步任务名称
+        last_id: 本次已同步的最大事件ID
+        last_event_time: 对应事件时间
+        rows: 本次同步的行数
+
+    Returns:
+        bool: 是否更新了检查点
+    """
+    updated = db.query(SyncCheckpoint).filter(
+        SyncCheckpoint.name == name,
+        SyncCheckpoint.last_id < last_id
+    ).update({
+        SyncCheckpoint.last_id: last_id,
+        SyncCheckpoint.last_event_time: last_event_time,
+        SyncCheckpoint.synced_rows: SyncCheckpoint.synced_rows + rows,
+        SyncCheckpoint.updated_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
+def get_sync_lag(db: Session, name: str = EVENTS_MANTICORE_SYNC) -> Dict[str, Any]:
+    """
+    统计同步延迟
+
+    Args:
+        db: 数据库会话
+        name: 同步任务名称
+
+    Returns:
+        Dict[str, Any]: 检查点信息、待同步行数和延迟秒数
+    """
+    checkpoint = db.get(SyncCheckpoint, name)
+    last_id = checkpoint.last_id if checkpoint else 0
+
+    pending_rows = db.query(func.count(Event.id)).filter(Event.id > last_id).scalar() or 0
+
+    # 最早一条未同步事件的写入时间
+    oldest_pending = db.query(Event.created_at).filter(
+        Event.id > last_id
+    ).order_by(Event.id).limit(1).scalar()
+    lag_seconds = (datetime.utcnow() - oldest_pending).total_seconds() if oldest_pending else 0.0
+
+    return {
+        "name": name,
+        "last_id": last_id,
+        "last_event_time": checkpoint.last_event_time if checkpoint else None,
+        "synced_rows": checkpoint.synced_rows if checkpoint else 0,
+        "updated_at": checkpoint.updated_at if checkpoint else None,
+        "pending_rows": pending_rows,
+        "lag_seconds": max(lag_seconds, 0.0),
+    }
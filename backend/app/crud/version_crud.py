@@ -0,0 +1,52 @@
+"""
+Version CRUD操作模块
+配置版本号的读取和递增，用于多进程间的配置热加载
+"""
+
+from sqlalchemy.orm import Session
+from datetime import datetime
+import logging
+from app.models.postgres import ConfigVersion
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 告警规则集的版本号名称
+ALERT_RULES_VERSION = "alert_rules"
+
+def get_version(db: Session, name: str) -> int:
+    """
+    读取配置版本号，不存在时为0
+
+    Args:
+        db: 数据库会话
+        name: 配置名称
+
+    Returns:
+        int: 当前版本号
+    """
+    version = db.query(ConfigVersion.version).filter(ConfigVersion.name == name).scalar()
+    return version or 0
+
+def bump_version(db: Session, name: str) -> int:
+    """
+    递增配置版本号（不提交，与配置的修改在同一事务中提交）
+
+    UPDATE 持有行锁，并发的修改依次得到不同的版本号
+
+    Args:
+        db: 数据库会话
+        name: 配置名称
+
+    Returns:
+        int: 递增后的版本号
+    """
+    updated = db.query(ConfigVersion).filter(ConfigVersion.name == name).update({
+        ConfigVersion.version: ConfigVersion.version + 1,
+        ConfigVersion.updated_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    if not updated:
+        db.add(ConfigVersion(name=name, version=1, updated_at=datetime.utcnow()))
+        db.flush()
+        return 1
+    return get_version(db, name)
@@ -34,6 +34,10 @@ def create_initial_permissions(db: Session) -> dict:
         {"name": "alert:handle", "description": "处理告警"},
         {"name": "alert:create", "description": "创建告警规则"},
         {"name": "alert:delete", "description": "删除告警"},
+
+        # 事件采集权限
+        {"name": "event:create", "description": "写入事件"},
+        {"name": "event:read", "description": "查看事件"},
         
         # 威胁狩猎权限
         {"name": "hunting:read", "description": "查看狩猎任务"},
@@ -99,6 +103,7 @@ def create_initial_roles(db: Session, permissions: dict) -> dict:
             "permissions": [
                 "alert:read", "alert:handle",
                 "asset:read",
+                "event:read",
                 "hunting:read", "hunting:create", "hunting:execute",
                 "intelligence:read",
                 "investigation:read", "investigation:create", "investigation:update",
@@ -2,6 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.core.batch_writer import event_writer
+from app.core.event_aggregator import event_aggregator
+from app.api.v1.dashboard import big_screen_snapshot
+from app.core.stream import stream_hub
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -20,6 +24,21 @@ app.add_middleware(
 # 注册路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# 启动和关闭时管理后台写入器和快照刷新任务
+@app.on_event("startup")
+async def start_background_writers():
+    await event_writer.start()
+    await event_aggregator.start()
+    await big_screen_snapshot.start()
+
+@app.on_event("shutdown")
+async def stop_background_writers():
+    await stream_hub.stop()
+    await big_screen_snapshot.stop()
+    # 先输出聚合表中的剩余行，再停止写入器
+    await event_aggregator.stop()
+    await event_writer.stop()
+
 # 根路径
 @app.get("/")
 def read_root():
@@ -7,6 +7,7 @@ from .postgres import (
     Vulnerability,
     AssetVulnerability,
     Event,
+    SyncCheckpoint,
     Alert,
     AlertRule,
     IOC,
@@ -29,6 +30,7 @@ __all__ = [
     "Vulnerability",
     "AssetVulnerability",
     "Event",
+    "SyncCheckpoint",
     "Alert",
     "AlertRule",
     "IOC",
@@ -0,0 +1,93 @@
+"""
+Manticore 索引结构定义
+描述事件写入 sim_service_events / file_events / network_flows 三个索引时的
+文档格式，供日志清洗和同步任务共用（不依赖Manticore客户端）
+"""
+
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timezone
+
+# 索引名称
+SIM_SERVICE_INDEX = "sim_service_events"
+FILE_INDEX = "file_events"
+NETWORK_INDEX = "network_flows"
+
+EVENT_INDEXES = (SIM_SERVICE_INDEX, FILE_INDEX, NETWORK_INDEX)
+
+# 文档字段（顺序即 REPLACE 语句中的列顺序，id 单独处理）
+DOCUMENT_FIELDS = (
+    "event_type",
+    "asset_id",
+    "src_ip",
+    "dest_ip",
+    "src_port",
+    "dest_port",
+    "protocol",
+    "process_name",
+    "description",
+    "event_time",
+)
+
+# 三个索引结构相同，按事件类型分流
+INDEX_DDL = {
+    index: (
+        f"CREATE TABLE IF NOT EXISTS {index} ("
+        "event_type string, asset_id int, src_ip string, dest_ip string, "
+        "src_port int, dest_port int, protocol string, process_name string, "
+        "description text, event_time timestamp)"
+    )
+    for index in EVENT_INDEXES
+}
+
+# 写入网络流索引的事件类型
+NETWORK_EVENT_TYPES = frozenset({
+    "network_connection",
+    "port_scan",
+    "http_request",
+    "dns_query",
+})
+
+def index_for_event_type(event_type: Optional[str]) -> str:
+    """根据事件类型选择目标索引"""
+    if not event_type:
+        return SIM_SERVICE_INDEX
+    if event_type in NETWORK_EVENT_TYPES:
+        return NETWORK_INDEX
+    if event_type.startswith("file_"):
+        return FILE_INDEX
+    return SIM_SERVICE_INDEX
+
+def _unix_time(value: Any) -> int:
+    """将datetime转换为Unix时间戳（无时区视为UTC）"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value or 0)
+
+def event_to_document(row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    将事件行转换为Manticore文档
+
+    Args:
+        row: events表行（字典），有id时一并写入文档
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: (索引名, 文档)
+    """
+    raw = row.get("raw_data") or {}
+    document = {
+        "event_type": row.get("event_type") or "",
+        "asset_id": row.get("asset_id") or 0,
+        "src_ip": row.get("source_ip") or "",
+        "dest_ip": row.get("destination_ip") or "",
+        "src_port": row.get("source_port") or 0,
+        "dest_port": row.get("destination_port") or 0,
+        "protocol": row.get("protocol") or "",
+        "process_name": (raw.get("process_name") if isinstance(raw, dict) else None) or "",
+        "description": row.get("description") or "",
+        "event_time": _unix_time(row.get("event_time")),
+    }
+    if row.get("id") is not None:
+        document["id"] = row["id"]
+    return index_for_event_type(row.get("event_type")), document
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, ForeignKey, Numeric, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, JSON, ForeignKey, Numeric, Table, Index, DDL, event
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from app.core.db import Base
+from app.core.fulltext import POSTGRES_FTS_DDL, POSTGRES_FTS_DROP, SQLITE_FTS_DDL, SQLITE_FTS_DROP
+from app.models.types import CompressedJSON
 
 # 用户角色关联表
 user_roles = Table(
@@ -114,8 +116,15 @@ class AssetVulnerability(Base):
     vulnerability = relationship("Vulnerability", back_populates="asset_vulnerabilities")
 
 class Event(Base):
-    """事件表"""
+    """
+    事件表
+    PostgreSQL下由迁移 0001 改为按 event_time 范围分区的分区表，
+    主键为 (id, event_time)，查询应尽量带 event_time 条件以便分区裁剪
+    """
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_asset_time", "asset_id", "event_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     event_type = Column(String(50), nullable=False, index=True)
@@ -128,18 +137,32 @@ class Event(Base):
     description = Column(Text)
     event_time = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    raw_data = Column(JSON)  # 存储原始事件数据
+    # 原始事件数据：压缩存储，默认延迟加载，只在详情类查询中 undefer
+    raw_data = deferred(Column(CompressedJSON))
+    count = Column(Integer, nullable=False, default=1, server_default="1")  # 聚合的事件次数
+    first_seen = Column(DateTime)  # 聚合窗口内最早事件时间
+    last_seen = Column(DateTime)  # 聚合窗口内最晚事件时间
 
     # 关联关系
     asset = relationship("Asset", back_populates="events")
-    alerts = relationship("Alert", back_populates="event")
+    alerts = relationship("Alert", back_populates="event", primaryjoin="foreign(Alert.event_id) == Event.id")
+
+class SyncCheckpoint(Base):
+    """数据同步检查点表（记录增量同步的高水位）"""
+    __tablename__ = "sync_checkpoints"
+
+    name = Column(String(100), primary_key=True)  # 同步任务名称
+    last_id = Column(Integer, nullable=False, default=0)  # 已同步的最大事件ID
+    last_event_time = Column(DateTime)  # 已同步的最后一条事件时间
+    synced_rows = Column(Integer, nullable=False, default=0)  # 累计同步行数
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Alert(Base):
     """告警表"""
     __tablename__ = "alerts"
 
     id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(Integer, ForeignKey("events.id"))
+    event_id = Column(Integer, index=True)  # 分区表的唯一约束必须包含分区键，因此不建外键
     asset_id = Column(Integer, ForeignKey("assets.id"))
     alert_name = Column(String(100), nullable=False)
     severity = Column(String(20), nullable=False, index=True)  # low, medium, high, critical
@@ -149,13 +172,49 @@ class Alert(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     handled_by = Column(Integer, ForeignKey("users.id"))
     handle_notes = Column(Text)
-    handled_at = Column(DateTime)
+    handled_at = Column(DateTime, index=True)
+    # 告警聚合：同一规则、同一聚合键在抑制窗口内的重复命中合并到未处理完的告警
+    rule_id = Column(Integer, index=True)  # 产生告警的规则（手工创建的告警为空）
+    group_key = Column(String(40), index=True)  # 聚合键摘要（为空表示不聚合）
+    source_ip = Column(String(45))
+    occurrence_count = Column(Integer, nullable=False, default=1)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    # 全文检索文本（名称和描述按 app/core/fulltext.py 切分，写入告警时生成），列表查询不加载
+    search_text = deferred(Column(Text))
+    # 威胁类别（写入告警时按 app/core/threat_category.py 分类），威胁类型分布按该列汇总
+    threat_category = Column(String(30), index=True)
+
+    __table_args__ = (
+        # 告警列表按 (created_at, id) 倒序做游标分页
+        Index("ix_alerts_created_at_id", "created_at", "id"),
+    )
 
     # 关联关系
-    event = relationship("Event", back_populates="alerts")
+    event = relationship("Event", back_populates="alerts", primaryjoin="foreign(Alert.event_id) == Event.id")
     asset = relationship("Asset", back_populates="alerts")
     handler = relationship("User")
 
+# 全文索引（SQLite 的 FTS5 影子表和触发器、PostgreSQL 的 GIN 表达式索引）随告警表创建和删除
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Alert.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in SQLITE_FTS_DROP:
+    event.listen(Alert.__table__, "before_drop", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_FTS_DDL:
+    event.listen(Alert.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in POSTGRES_FTS_DROP:
+    event.listen(Alert.__table__, "before_drop", DDL(_statement).execute_if(dialect="postgresql"))
+
+class AlertOccurrence(Base):
+    """告警发生记录表（聚合告警下的每次命中，每条告警保留的条数有上限）"""
+    __tablename__ = "alert_occurrences"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alert_id = Column(Integer, ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False, index=True)
+    event_id = Column(Integer)
+    occurred_at = Column(DateTime, nullable=False)
+    description = Column(Text)
+
 class AlertRule(Base):
     """告警规则表"""
     __tablename__ = "alert_rules"
@@ -166,9 +225,44 @@ class AlertRule(Base):
     condition = Column(JSON, nullable=False)  # 存储告警触发条件
     severity = Column(String(20), nullable=False)
     enabled = Column(Boolean, default=True)
+    revision = Column(Integer, nullable=False, default=0)  # 最近一次修改时的规则集版本号
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class AlertCounter(Base):
+    """告警计数表（按 创建日期、状态、级别 汇总，告警写入和状态变更时在同一事务中增减，定期与告警表核对）"""
+    __tablename__ = "alert_counters"
+
+    day = Column(Date, primary_key=True)  # 告警创建日期（UTC）
+    status = Column(String(20), primary_key=True)
+    severity = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class AlertHourlyRollup(Base):
+    """告警小时汇总表（按 创建小时、级别、资产 汇总新建告警数，随告警写入增量更新，用于趋势图）"""
+    __tablename__ = "alert_hourly_rollups"
+
+    hour = Column(DateTime, primary_key=True)  # 告警创建时间截断到小时（UTC）
+    severity = Column(String(20), primary_key=True)
+    asset_id = Column(Integer, primary_key=True)  # 无关联资产的告警记为0
+    count = Column(Integer, nullable=False, default=0)
+
+class AlertAssetSketch(Base):
+    """告警资产草图表（每天一个 HyperLogLog 草图，每行一个寄存器，估计时间段内有告警的资产数，见 app/core/hyperloglog.py）"""
+    __tablename__ = "alert_asset_sketches"
+
+    day = Column(Date, primary_key=True)  # 告警创建日期（UTC）
+    register = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False)  # 寄存器值（只增不减）
+
+class ConfigVersion(Base):
+    """配置版本号表（配置修改时递增，各进程轮询版本号判断是否需要重新加载）"""
+    __tablename__ = "config_versions"
+
+    name = Column(String(100), primary_key=True)  # 配置名称
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class IOC(Base):
     """威胁情报指标表"""
     __tablename__ = "iocs"
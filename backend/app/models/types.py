@@ -0,0 +1,25 @@
+"""
+自定义列类型
+"""
+
+from typing import Any, Optional
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.core.compression import compress_json, decompress_json
+
+class CompressedJSON(TypeDecorator):
+    """
+    压缩存储的JSON列
+
+    写入时序列化并用 zlib + 预置字典压缩，读取时解压；
+    底层为二进制列（PostgreSQL bytea / SQLite BLOB）
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        return compress_json(value)
+
+    def process_result_value(self, value: Optional[bytes], dialect) -> Any:
+        return decompress_json(value)
@@ -1,6 +1,8 @@
 from typing import Any, Optional, List, Generic, TypeVar
 from pydantic import BaseModel
 from datetime import datetime
+import base64
+import json
 
 # 泛型类型变量
 DataType = TypeVar('DataType')
@@ -75,6 +77,64 @@ class PaginatedResponse(BaseModel, Generic[DataType]):
             has_prev=page > 1
         )
 
+class CursorPaginatedResponse(BaseModel, Generic[DataType]):
+    """
+    游标分页响应模式
+
+    按排序键做 keyset 分页，翻页代价与页深无关；下一页把 next_cursor 原样传回。
+    total 为精确总数（total_exact 为True），或只数到上限的下限值（显示为 "10,000+"）
+    """
+    items: List[DataType]
+    size: int
+    next_cursor: Optional[str] = None
+    has_next: bool
+    total: Optional[int] = None
+    total_exact: bool = False
+    total_display: Optional[str] = None
+
+    @classmethod
+    def create(
+        cls,
+        items: List[DataType],
+        size: int,
+        next_cursor: Optional[str],
+        total: Optional[int] = None,
+        total_exact: bool = False
+    ) -> "CursorPaginatedResponse[DataType]":
+        """创建游标分页响应"""
+        display = None
+        if total is not None:
+            display = f"{total:,}" if total_exact else f"{total:,}+"
+        return cls(
+            items=items,
+            size=size,
+            next_cursor=next_cursor,
+            has_next=next_cursor is not None,
+            total=total,
+            total_exact=total_exact,
+            total_display=display
+        )
+
+def encode_cursor(*values: Any) -> str:
+    """把排序键编码为不透明的游标字符串"""
+    text = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    解码游标，返回排序键列表（时间为ISO字符串）
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"无效的游标: {e}")
+    if not isinstance(values, list):
+        raise ValueError("无效的游标")
+    return values
+
 class FilterParams(BaseModel):
     """通用过滤参数模式"""
     search: Optional[str] = None
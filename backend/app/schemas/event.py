@@ -0,0 +1,63 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional, List
+
+class EventIngest(BaseModel):
+    """
+    事件批量写入的单行模式
+
+    字段名与events表一致，同时支持采集端常用的简写别名
+    （ts、type、src_ip、dst_ip、src_port、dst_port、proto、raw）
+    """
+    event_type: str = Field(..., max_length=50, alias="type")
+    event_time: datetime = Field(..., alias="ts")
+    asset_id: Optional[int] = None
+    source_ip: Optional[str] = Field(None, max_length=50, alias="src_ip")
+    destination_ip: Optional[str] = Field(None, max_length=50, alias="dst_ip")
+    source_port: Optional[int] = Field(None, ge=0, le=65535, alias="src_port")
+    destination_port: Optional[int] = Field(None, ge=0, le=65535, alias="dst_port")
+    protocol: Optional[str] = Field(None, max_length=20, alias="proto")
+    description: Optional[str] = None
+    raw_data: Optional[dict] = Field(None, alias="raw")
+
+    class Config:
+        populate_by_name = True  # 同时接受完整字段名和别名
+
+class EventBatchResult(BaseModel):
+    """单个写入批次的结果"""
+    batch: int
+    accepted: int
+    rejected: int
+
+class EventBatchError(BaseModel):
+    """被拒绝行的错误信息"""
+    line: int
+    error: str
+    end_line: Optional[int] = None  # 整个批次写入失败时为批次的最后一行（line 为第一行）
+
+class EventBatchResponse(BaseModel):
+    """事件批量写入响应"""
+    total_lines: int
+    accepted: int
+    rejected: int
+    batches: List[EventBatchResult]
+    errors: List[EventBatchError] = []
+
+class EventRecord(BaseModel):
+    """事件查询结果（热数据来自events表，冷数据来自归档段）"""
+    id: int
+    event_type: Optional[str] = None
+    event_time: datetime
+    created_at: Optional[datetime] = None
+    asset_id: Optional[int] = None
+    source_ip: Optional[str] = None
+    destination_ip: Optional[str] = None
+    source_port: Optional[int] = None
+    destination_port: Optional[int] = None
+    protocol: Optional[str] = None
+    description: Optional[str] = None
+    raw_data: Optional[dict] = None
+    count: Optional[int] = None  # 聚合的事件次数
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    storage: str  # hot, cold
@@ -0,0 +1,139 @@
+"""
+告警聚合
+同一规则、同一聚合键（默认资产 + 源IP）在抑制窗口内的重复命中不再插入新告警，
+而是累加到仍未处理完（unhandled/handling）的告警上：occurrence_count 加一、last_seen 后移，
+每次命中记录到 alert_occurrences（每条告警最多 ALERT_MAX_OCCURRENCES 条，之后只计数）
+
+一批告警行的处理:
+1. 批内先按聚合键合并，相邻命中的间隔超过窗口时拆成新的一组
+2. 一次查询取出各键最新的未处理完告警，第一组与其间隔在窗口内时合并到该告警
+3. 其余分组批量插入，再批量写入发生记录，并计入告警计数表
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import timedelta
+import logging
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.alert_counter_crud import count_new_alerts
+from app.models.postgres import Alert, AlertOccurrence
+from app.services.rule_engine import CompiledRule
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 可以继续聚合的告警状态
+OPEN_STATUSES = ("unhandled", "handling")
+
+class _Group:
+    """批内同一聚合键、间隔不超过窗口的一组命中"""
+
+    __slots__ = ("row", "window", "count", "last_seen", "occurrences")
+
+    def __init__(self, row: Dict[str, Any], window: timedelta):
+        self.row = row
+        self.window = window
+        self.count = 1
+        self.last_seen = row["last_seen"]
+        self.occurrences = [_occurrence(row)]
+
+    def absorb(self, row: Dict[str, Any]) -> bool:
+        """命中落在窗口内时并入本组"""
+        if row["last_seen"] - self.last_seen > self.window:
+            return False
+        self.count += 1
+        self.last_seen = max(self.last_seen, row["last_seen"])
+        self.occurrences.append(_occurrence(row))
+        return True
+
+def _occurrence(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"event_id": row["event_id"], "occurred_at": row["last_seen"], "description": row["description"]}
+
+def _window(rule: CompiledRule) -> timedelta:
+    window = rule.suppress.window if rule.suppress.window is not None else settings.ALERT_SUPPRESS_WINDOW
+    return timedelta(seconds=window)
+
+def write_alerts(
+    db: Session,
+    alerts: List[Tuple[CompiledRule, Dict[str, Any]]],
+    max_occurrences: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    写入一批规则告警，重复命中合并到已有告警（不提交，由调用方与检查点一起提交）
+
+    Args:
+        db: 数据库会话
+        alerts: (规则, alert_row 生成的告警行) 列表
+        max_occurrences: 每条告警最多记录的发生次数
+
+    Returns:
+        Dict[str, int]: 新建告警数、合并到已有告警的命中数
+    """
+    max_occurrences = settings.ALERT_MAX_OCCURRENCES if max_occurrences is None else max_occurrences
+    groups: List[_Group] = []
+    latest: Dict[str, _Group] = {}
+    first: Dict[str, _Group] = {}
+    for rule, row in alerts:
+        key = row.get("group_key")
+        group = latest.get(key) if key is not None else None
+        if group is not None and group.absorb(row):
+            continue
+        group = _Group(row, _window(rule) if key is not None else timedelta(0))
+        groups.append(group)
+        if key is not None:
+            latest[key] = group
+            first.setdefault(key, group)
+
+    # 各聚合键最新的未处理完告警
+    existing: Dict[str, Any] = {}
+    if first:
+        rows = db.execute(
+            select(Alert.id, Alert.group_key, Alert.last_seen, Alert.occurrence_count)
+            .where(Alert.group_key.in_(list(first)), Alert.status.in_(OPEN_STATUSES))
+            .order_by(Alert.id)
+        ).all()
+        for row in rows:
+            existing[row.group_key] = row
+
+    updates = []
+    occurrences: List[Dict[str, Any]] = []
+    merged = 0
+    new_groups = []
+    for group in groups:
+        key = group.row.get("group_key")
+        current = existing.get(key) if first.get(key) is group else None
+        if current is not None and current.last_seen is not None and group.row["first_seen"] - current.last_seen > group.window:
+            # 距离已有告警的最后一次命中超过窗口，开始新的告警
+            current = None
+        if current is not None:
+            updates.append({
+                "id": current.id,
+                "occurrence_count": current.occurrence_count + group.count,
+                "last_seen": max(current.last_seen, group.last_seen) if current.last_seen else group.last_seen,
+                "updated_at": group.row["updated_at"],
+            })
+            room = max(0, max_occurrences - current.occurrence_count)
+            occurrences.extend(dict(item, alert_id=current.id) for item in group.occurrences[:room])
+            merged += group.count
+        else:
+            group.row["occurrence_count"] = group.count
+            group.row["last_seen"] = group.last_seen
+            new_groups.append(group)
+
+    if updates:
+        db.execute(update(Alert), updates)
+    if new_groups:
+        ids = db.scalars(
+            insert(Alert).returning(Alert.id, sort_by_parameter_order=True),
+            [group.row for group in new_groups]
+        ).all()
+        for alert_id, group in zip(ids, new_groups):
+            occurrences.extend(dict(item, alert_id=alert_id) for item in group.occurrences[:max_occurrences])
+        count_new_alerts(db, [group.row for group in new_groups])
+    if occurrences:
+        db.execute(insert(AlertOccurrence), occurrences)
+
+    return {"created": len(new_groups), "merged": merged}
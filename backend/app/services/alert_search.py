@@ -0,0 +1,120 @@
+"""
+告警全文检索
+在 alerts.search_text 的全文索引上匹配（分词和索引见 app/core/fulltext.py），
+按相关度排序并生成高亮摘要；没有可检索字符的关键词（如纯标点）退回 LIKE 匹配
+"""
+
+from typing import List, Optional
+import html
+import re
+
+from sqlalchemy import Float, Integer, func, literal_column, or_, text
+from sqlalchemy.orm import Session
+
+from app.core.fulltext import POSTGRES_TSVECTOR, postgres_tsquery, query_terms, sqlite_match
+from app.models.postgres import Alert
+
+# 高亮摘要的长度（字符）
+SNIPPET_CHARS = 80
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+def _like(query: str):
+    return or_(Alert.alert_name.ilike(f"%{query}%"), Alert.description.ilike(f"%{query}%"))
+
+def search_condition(db: Session, query: str):
+    """
+    告警列表 search 参数的过滤条件
+
+    Args:
+        db: 数据库会话
+        query: 搜索关键词
+
+    Returns:
+        命中全文索引的过滤条件
+    """
+    terms = query_terms(query)
+    if not terms:
+        return _like(query)
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        return Alert.id.in_(
+            text("SELECT rowid FROM alerts_fts WHERE alerts_fts MATCH :fts_match")
+            .bindparams(fts_match=sqlite_match(terms))
+        )
+    if dialect == "postgresql":
+        return literal_column(POSTGRES_TSVECTOR).op("@@")(
+            func.to_tsquery(literal_column("'simple'::regconfig"), postgres_tsquery(terms))
+        )
+    return _like(query)
+
+def ranked_matches(db: Session, query: str):
+    """
+    按相关度打分的匹配子查询（列 id, score，score 越大越相关）
+
+    Args:
+        db: 数据库会话
+        query: 搜索关键词
+
+    Returns:
+        子查询；关键词没有可检索字符时为 None
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        # bm25 越小越相关
+        return (
+            text("SELECT rowid AS id, -bm25(alerts_fts) AS score FROM alerts_fts WHERE alerts_fts MATCH :fts_match")
+            .bindparams(fts_match=sqlite_match(terms))
+            .columns(id=Integer, score=Float)
+            .subquery("alert_matches")
+        )
+    if dialect == "postgresql":
+        return (
+            text(
+                f"SELECT id, ts_rank({POSTGRES_TSVECTOR}, q) AS score "
+                "FROM alerts, to_tsquery('simple'::regconfig, :fts_query) AS q "
+                f"WHERE {POSTGRES_TSVECTOR} @@ q"
+            )
+            .bindparams(fts_query=postgres_tsquery(terms))
+            .columns(id=Integer, score=Float)
+            .subquery("alert_matches")
+        )
+    return None
+
+def highlight(value: Optional[str], query: str, length: int = SNIPPET_CHARS) -> Optional[str]:
+    """
+    生成高亮摘要：截取第一个关键词附近的文本，关键词用 <mark> 标记（其余内容做HTML转义）
+
+    Args:
+        value: 原文
+        query: 搜索关键词
+        length: 摘要长度
+
+    Returns:
+        Optional[str]: 高亮摘要，原文中没有出现关键词时为 None
+    """
+    words = sorted(set(query.split()), key=len, reverse=True)
+    if not value or not words:
+        return None
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+
+    first = pattern.search(value)
+    if first is None:
+        return None
+    start = max(0, first.start() - length // 4)
+    end = min(len(value), start + length)
+    snippet = value[start:end]
+
+    parts: List[str] = ["…" if start > 0 else ""]
+    position = 0
+    for match in pattern.finditer(snippet):
+        parts.append(html.escape(snippet[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        position = match.end()
+    parts.append(html.escape(snippet[position:]))
+    parts.append("…" if end < len(value) else "")
+    return "".join(parts)
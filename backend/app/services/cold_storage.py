@@ -0,0 +1,653 @@
+"""
+事件冷存储
+将超过保留天数的事件从 events 表归档为列式压缩段文件，并支持冷热数据联合查询
+
+段文件格式（小端）:
+    [行组0各列数据块][行组1各列数据块]...[footer JSON(zlib)][footer长度 u64][MAGIC]
+
+- 行按 event_time 升序排列，每 COLD_ROW_GROUP_ROWS 行为一个行组，
+  footer 记录每个行组的时间范围和资产ID集合，扫描时按此跳过整个行组
+- event_type/protocol 为段级字典编码（uint32码值）
+- IPv4 存为整数，其他地址进入段级字典并以负数码值引用
+- 端口、资产ID为int32（-1表示空），时间为int64微秒
+- description/raw_data 按行组存为JSON数组
+- 读取时footer中不存在的列（旧版本段）返回None
+- 每个数据块单独zlib压缩，读取时通过mmap只解压命中的行组和列
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import column, desc, select, table, text, tuple_
+from sqlalchemy.orm import Session, undefer
+from array import array
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+
+from app.core.config import settings
+from app.crud.event_crud import get_event_near
+from app.crud.event_partition_crud import DEFAULT_PARTITION, is_events_partitioned, list_event_partitions
+from app.crud.sync_crud import advance_checkpoint, get_checkpoint
+from app.models.postgres import Event
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HSEG"
+SEGMENT_VERSION = 1
+_TRAILER = struct.Struct("<Q4s")
+
+# 冷归档任务的检查点名称（last_id 记录已提交的最大段序号）
+EVENTS_COLD_ARCHIVE = "events_cold_archive"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NULL = -1
+
+# 列名 → 编码方式
+COLUMN_ENCODINGS = {
+    "id": "int64",
+    "event_time": "time",
+    "created_at": "time",
+    "asset_id": "int32",
+    "event_type": "dict",
+    "protocol": "dict",
+    "source_ip": "ip",
+    "destination_ip": "ip",
+    "source_port": "int32",
+    "destination_port": "int32",
+    "description": "json",
+    "raw_data": "json",
+    "count": "int64",
+    "first_seen": "time",
+    "last_seen": "time",
+}
+
+_TYPECODES = {"int64": "q", "time": "q", "int32": "i", "dict": "I", "ip": "q"}
+
+_SEGMENT_NAME = re.compile(r"^events_(\d{8})_(\d{14})_(\d{14})\.seg$")
+_NAME_TIME_FORMAT = "%Y%m%d%H%M%S"
+
+def _to_micros(value: Optional[datetime]) -> int:
+    return _NULL if value is None else (value - _EPOCH) // _MICROSECOND
+
+def _from_micros(value: int) -> Optional[datetime]:
+    return None if value == _NULL else _EPOCH + timedelta(microseconds=value)
+
+def _pack(values: Sequence[int], typecode: str) -> bytes:
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+def _unpack(payload: bytes, typecode: str) -> array:
+    data = array(typecode)
+    data.frombytes(payload)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+class _Dictionary:
+    """写入时的字典编码表"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+def _encode_ip(value: Optional[str], overflow: _Dictionary) -> int:
+    if value is None:
+        return _NULL
+    try:
+        return int(ipaddress.IPv4Address(value))
+    except ValueError:
+        return -2 - overflow.code(value)
+
+def _decode_ip(value: int, overflow: List[str]) -> Optional[str]:
+    if value >= 0:
+        return str(ipaddress.IPv4Address(value))
+    if value == _NULL:
+        return None
+    return overflow[-2 - value]
+
+def write_segment(path: Path, rows: Sequence[Dict[str, Any]], row_group_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    将事件行写为段文件
+
+    先写临时文件并fsync，再原子重命名，读者不会看到写了一半的段
+
+    Args:
+        path: 目标文件路径
+        rows: 事件字典序列（键为 COLUMN_ENCODINGS 中的列）
+        row_group_rows: 每个行组的行数
+
+    Returns:
+        Dict[str, Any]: 段的footer信息
+    """
+    row_group_rows = row_group_rows or settings.COLD_ROW_GROUP_ROWS
+    rows = sorted(rows, key=_row_order)
+    dictionaries = {"event_type": _Dictionary(), "protocol": _Dictionary(), "ip": _Dictionary()}
+
+    groups = []
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as handle:
+        offset = 0
+        for start in range(0, len(rows), row_group_rows):
+            group_rows = rows[start:start + row_group_rows]
+            columns = {}
+            for name, encoding in COLUMN_ENCODINGS.items():
+                values = [row.get(name) for row in group_rows]
+                if encoding == "time":
+                    payload = _pack([_to_micros(v) for v in values], "q")
+                elif encoding in ("int64", "int32"):
+                    payload = _pack([_NULL if v is None else int(v) for v in values], _TYPECODES[encoding])
+                elif encoding == "dict":
+                    dictionary = dictionaries[name]
+                    payload = _pack([dictionary.code("" if v is None else v) for v in values], "I")
+                elif encoding == "ip":
+                    payload = _pack([_encode_ip(v, dictionaries["ip"]) for v in values], "q")
+                else:
+                    payload = json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")
+
+                block = zlib.compress(payload, settings.COLD_COMPRESSION_LEVEL)
+                handle.write(block)
+                columns[name] = [offset, len(block)]
+                offset += len(block)
+
+            asset_ids = sorted({row["asset_id"] for row in group_rows if row.get("asset_id") is not None})
+            group_ids = [row["id"] for row in group_rows]
+            groups.append({
+                "rows": len(group_rows),
+                "min_id": min(group_ids),
+                "max_id": max(group_ids),
+                "min_time": _to_micros(group_rows[0]["event_time"]),
+                "max_time": _to_micros(group_rows[-1]["event_time"]),
+                "asset_ids": asset_ids,
+                "columns": columns,
+            })
+
+        footer = {
+            "version": SEGMENT_VERSION,
+            "rows": len(rows),
+            "min_id": min((row["id"] for row in rows), default=0),
+            "max_id": max((row["id"] for row in rows), default=0),
+            "dictionaries": {name: dictionary.values for name, dictionary in dictionaries.items()},
+            "groups": groups,
+        }
+        footer_block = zlib.compress(json.dumps(footer).encode("utf-8"))
+        handle.write(footer_block)
+        handle.write(_TRAILER.pack(len(footer_block), MAGIC))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    os.replace(tmp_path, path)
+    return footer
+
+class SegmentReader:
+    """
+    段文件读取器
+    通过mmap访问文件，只解压与查询条件相交的行组中需要的列
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            footer_length, magic = _TRAILER.unpack(self._mmap[-_TRAILER.size:])
+            if magic != MAGIC:
+                raise ValueError(f"不是有效的事件段文件: {self.path}")
+            footer_end = len(self._mmap) - _TRAILER.size
+            self.footer = json.loads(zlib.decompress(self._mmap[footer_end - footer_length:footer_end]))
+        except Exception:
+            self.close()
+            raise
+        self._dictionaries = self.footer["dictionaries"]
+
+    @property
+    def rows(self) -> int:
+        return self.footer["rows"]
+
+    def close(self) -> None:
+        """释放mmap和文件句柄"""
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> "SegmentReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _column(self, group: Dict[str, Any], name: str) -> Sequence[Any]:
+        if name not in group["columns"]:
+            return [None] * group["rows"]
+        offset, length = group["columns"][name]
+        payload = zlib.decompress(self._mmap[offset:offset + length])
+        encoding = COLUMN_ENCODINGS[name]
+        if encoding == "json":
+            return json.loads(payload)
+        return _unpack(payload, _TYPECODES[encoding])
+
+    def _decode(self, name: str, value: Any) -> Any:
+        if value is None:
+            return None
+        encoding = COLUMN_ENCODINGS[name]
+        if encoding == "time":
+            return _from_micros(value)
+        if encoding in ("int64", "int32"):
+            return None if value == _NULL else value
+        if encoding == "dict":
+            return self._dictionaries[name][value] or None
+        if encoding == "ip":
+            return _decode_ip(value, self._dictionaries["ip"])
+        return value
+
+    def get(self, event_id: int) -> Optional[Dict[str, Any]]:
+        """按ID查找事件，只检查ID范围覆盖该ID的行组（早期段没有ID范围时读取每个行组的ID列）"""
+        if "min_id" in self.footer and not self.footer["min_id"] <= event_id <= self.footer["max_id"]:
+            return None
+        for group in self.footer["groups"]:
+            if "min_id" in group and not group["min_id"] <= event_id <= group["max_id"]:
+                continue
+            ids = self._column(group, "id")
+            for i, value in enumerate(ids):
+                if value == event_id:
+                    return {name: self._decode(name, self._column(group, name)[i]) for name in COLUMN_ENCODINGS}
+        return None
+
+    def scan(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        asset_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+        reverse: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        按时间范围（闭区间）和资产扫描事件
+
+        Args:
+            start_time: 开始时间
+            end_time: 结束时间
+            asset_id: 资产ID
+            columns: 需要返回的列，默认全部
+            reverse: 是否按时间倒序返回
+
+        Yields:
+            Dict[str, Any]: 事件字典
+        """
+        start = _to_micros(start_time) if start_time else None
+        end = _to_micros(end_time) if end_time else None
+        columns = list(columns or COLUMN_ENCODINGS)
+
+        groups = self.footer["groups"]
+        for group in (reversed(groups) if reverse else groups):
+            if start is not None and group["max_time"] < start:
+                continue
+            if end is not None and group["min_time"] > end:
+                continue
+            if asset_id is not None and asset_id not in group["asset_ids"]:
+                continue
+
+            # 先用时间和资产列计算命中的行，再解压其余列
+            times = self._column(group, "event_time")
+            assets = self._column(group, "asset_id") if asset_id is not None else None
+            matched = [
+                i for i in range(group["rows"])
+                if (start is None or times[i] >= start)
+                and (end is None or times[i] <= end)
+                and (assets is None or assets[i] == asset_id)
+            ]
+            if not matched:
+                continue
+
+            decoded = {}
+            for name in columns:
+                if name == "event_time":
+                    decoded[name] = times
+                elif name == "asset_id" and assets is not None:
+                    decoded[name] = assets
+                else:
+                    decoded[name] = self._column(group, name)
+            for i in (reversed(matched) if reverse else matched):
+                yield {name: self._decode(name, decoded[name][i]) for name in columns}
+
+class ColdEventStore:
+    """
+    冷存储目录
+    段文件名包含序号和时间范围: events_<序号>_<最早时间>_<最晚时间>.seg，
+    按时间查询时不打开范围不相交的文件
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.COLD_STORAGE_DIR)
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """按序号排列的段文件列表"""
+        if not self.directory.exists():
+            return []
+        segments = []
+        for path in self.directory.iterdir():
+            match = _SEGMENT_NAME.match(path.name)
+            if match:
+                segments.append({
+                    "sequence": int(match.group(1)),
+                    "min_time": datetime.strptime(match.group(2), _NAME_TIME_FORMAT),
+                    # 文件名只精确到秒，上界取下一秒
+                    "max_time": datetime.strptime(match.group(3), _NAME_TIME_FORMAT) + timedelta(seconds=1),
+                    "path": path,
+                    "size": path.stat().st_size,
+                })
+        segments.sort(key=lambda item: item["sequence"])
+        return segments
+
+    def write(self, sequence: int, rows: Sequence[Dict[str, Any]]) -> Path:
+        """写入一个段文件"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        min_time = min(row["event_time"] for row in rows)
+        max_time = max(row["event_time"] for row in rows)
+        path = self.directory / (
+            f"events_{sequence:08d}_{min_time:{_NAME_TIME_FORMAT}}_{max_time:{_NAME_TIME_FORMAT}}.seg"
+        )
+        write_segment(path, rows)
+        return path
+
+    def remove_after(self, sequence: int) -> List[Path]:
+        """删除序号大于 sequence 的段（归档中途失败留下的未提交段）"""
+        removed = []
+        for segment in self.segments():
+            if segment["sequence"] > sequence:
+                segment["path"].unlink()
+                removed.append(segment["path"])
+        for tmp in self.directory.glob("*.tmp") if self.directory.exists() else []:
+            tmp.unlink()
+        return removed
+
+    def get(self, event_id: int) -> Optional[Dict[str, Any]]:
+        """按ID查找归档事件（从最新的段开始）"""
+        for segment in reversed(self.segments()):
+            with SegmentReader(segment["path"]) as reader:
+                row = reader.get(event_id)
+            if row is not None:
+                return row
+        return None
+
+    def remove_before(self, cutoff: datetime) -> List[Path]:
+        """删除最晚事件早于 cutoff 的段（冷数据保留期）"""
+        removed = []
+        for segment in self.segments():
+            if segment["max_time"] <= cutoff:
+                segment["path"].unlink()
+                removed.append(segment["path"])
+        return removed
+
+    def scan(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        asset_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        reverse: bool = True,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        扫描时间范围内的冷数据（默认按时间倒序）
+
+        Args:
+            start_time: 开始时间（包含）
+            end_time: 结束时间（包含）
+            asset_id: 资产ID
+            limit: 最大返回数量
+            reverse: 是否按时间倒序
+            columns: 需要返回的列，默认全部
+
+        Returns:
+            List[Dict[str, Any]]: 事件字典列表
+        """
+        candidates = [
+            segment for segment in self.segments()
+            if segment["max_time"] >= start_time and segment["min_time"] <= end_time
+        ]
+        candidates.sort(key=lambda item: item["max_time" if reverse else "min_time"], reverse=reverse)
+
+        results: List[Dict[str, Any]] = []
+        for segment in candidates:
+            if limit and len(results) >= limit:
+                # 已收集足够行时，剩余段若不可能包含更靠前的事件则停止
+                results.sort(key=_row_order, reverse=reverse)
+                del results[limit:]
+                boundary = results[-1]["event_time"]
+                if reverse and segment["max_time"] < boundary:
+                    break
+                if not reverse and segment["min_time"] > boundary:
+                    break
+            with SegmentReader(segment["path"]) as reader:
+                rows = reader.scan(start_time, end_time, asset_id, columns=columns, reverse=reverse)
+                # 段内行已按时间有序，每段最多只需解码前 limit 行
+                results.extend(islice(rows, limit) if limit else rows)
+
+        results.sort(key=_row_order, reverse=reverse)
+        return results[:limit] if limit else results
+
+def _row_order(row: Dict[str, Any]):
+    return row["event_time"], row["id"]
+
+def _event_source(name: str):
+    """与 events 列类型相同的表（events 本身或其分区），用于直接读取某个分区"""
+    return table(name, *(column(field, Event.__table__.c[field].type) for field in COLUMN_ENCODINGS))
+
+def _aged_chunks(db: Session, source, cutoff: datetime, segment_rows: int) -> Iterator[List[Dict[str, Any]]]:
+    """按 (event_time, id) 顺序分段读取 source 中早于 cutoff 的事件（键集分页）"""
+    after = None
+    while True:
+        query = select(*source.c).where(source.c.event_time < cutoff)
+        if after is not None:
+            query = query.where(tuple_(source.c.event_time, source.c.id) > after)
+        rows = [
+            dict(row._mapping)
+            for row in db.execute(query.order_by(source.c.event_time, source.c.id).limit(segment_rows))
+        ]
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1]["event_time"], rows[-1]["id"])
+
+def archive_aged_events(
+    db: Session,
+    store: Optional[ColdEventStore] = None,
+    older_than_days: Optional[int] = None,
+    segment_rows: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    将超过 older_than_days 天的事件归档到冷存储并从 events 表移除
+
+    - 分区表：结束时间不晚于截止时间的整个分区写成段文件后 DETACH 并 DROP，不逐行删除；
+      默认分区中的过期行（迟到/异常时间的少量事件）按段写入后按ID删除
+    - 未分区（SQLite等）：按段写入后按ID删除
+
+    每个分区（或每个逐行删除的段）的段文件先写入，再在同一事务中移除事件并推进检查点（段序号），
+    失败后重跑会先清理序号大于检查点的未提交段
+
+    Args:
+        db: 数据库会话
+        store: 冷存储目录
+        older_than_days: 归档阈值天数
+        segment_rows: 每个段的最大行数
+        now: 当前时间
+
+    Returns:
+        Dict[str, Any]: 归档的段数、行数、移除的分区和截止时间
+    """
+    store = store or ColdEventStore()
+    older_than_days = settings.COLD_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    segment_rows = segment_rows or settings.COLD_SEGMENT_ROWS
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+
+    checkpoint = get_checkpoint(db, EVENTS_COLD_ARCHIVE)
+    sequence = checkpoint.last_id
+    orphans = store.remove_after(sequence)
+    if orphans:
+        logger.warning(f"清理未提交的冷存储段: {[path.name for path in orphans]}")
+
+    segments = 0
+    archived = 0
+    partitions: List[str] = []
+    partitioned = is_events_partitioned(db)
+
+    if partitioned:
+        for partition in list_event_partitions(db):
+            if partition["end"] > cutoff:
+                break
+            name = partition["name"]
+            written: List[Path] = []
+            rows_count = 0
+            last_time = None
+            try:
+                # 阻止迟到事件在读取后写入该分区（随分区一起被删除）
+                db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+                for rows in _aged_chunks(db, _event_source(name), partition["end"], segment_rows):
+                    written.append(store.write(sequence + len(written) + 1, rows))
+                    rows_count += len(rows)
+                    last_time = rows[-1]["event_time"]
+                db.execute(text(f"ALTER TABLE events DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+                if written:
+                    advance_checkpoint(db, EVENTS_COLD_ARCHIVE, sequence + len(written), last_time, rows_count)
+                else:
+                    db.commit()
+            except Exception:
+                db.rollback()
+                for path in written:
+                    path.unlink(missing_ok=True)
+                raise
+
+            sequence += len(written)
+            segments += len(written)
+            archived += rows_count
+            partitions.append(name)
+            logger.info(f"归档事件分区 {name}: {rows_count} 行，{len(written)} 个段")
+
+    # 默认分区或未分区表中的过期行
+    source = _event_source(DEFAULT_PARTITION if partitioned else Event.__tablename__)
+    for rows in _aged_chunks(db, source, cutoff, segment_rows):
+        sequence += 1
+        path = store.write(sequence, rows)
+        try:
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), 1000):
+                db.execute(source.delete().where(
+                    source.c.id.in_(ids[start:start + 1000]),
+                    source.c.event_time < cutoff
+                ))
+            advance_checkpoint(db, EVENTS_COLD_ARCHIVE, sequence, rows[-1]["event_time"], len(rows))
+        except Exception:
+            db.rollback()
+            path.unlink(missing_ok=True)
+            raise
+
+        segments += 1
+        archived += len(rows)
+        logger.info(f"归档事件段 {path.name}: {len(rows)} 行，{path.stat().st_size} 字节")
+
+    return {"cutoff": cutoff, "segments": segments, "archived_rows": archived, "partitions": partitions}
+
+# 列表查询返回的列（raw_data 只在详情中解码）
+LIST_COLUMNS = tuple(name for name in COLUMN_ENCODINGS if name != "raw_data")
+
+def search_events(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    asset_id: Optional[int] = None,
+    limit: int = 100,
+    include_cold: bool = True,
+    store: Optional[ColdEventStore] = None
+) -> List[Dict[str, Any]]:
+    """
+    冷热联合查询：events 表和冷存储段按时间倒序合并
+
+    归档过程中同一事件可能短暂同时存在于两处，按ID去重（以热数据为准）。
+    不读取 raw_data：热数据不查询该列，冷数据不解压该列
+
+    Args:
+        db: 数据库会话
+        start_time: 开始时间（包含）
+        end_time: 结束时间（包含）
+        asset_id: 资产ID
+        limit: 最大返回数量
+        include_cold: 是否查询冷存储
+        store: 冷存储目录
+
+    Returns:
+        List[Dict[str, Any]]: 带 storage 标记（hot/cold）的事件字典列表
+    """
+    query = db.query(*(getattr(Event, name) for name in LIST_COLUMNS)).filter(
+        Event.event_time >= start_time,
+        Event.event_time <= end_time
+    )
+    if asset_id is not None:
+        query = query.filter(Event.asset_id == asset_id)
+    hot = [
+        dict(row._asdict(), storage="hot")
+        for row in query.order_by(desc(Event.event_time), desc(Event.id)).limit(limit)
+    ]
+
+    cold = []
+    if include_cold:
+        hot_ids = {row["id"] for row in hot}
+        cold = [
+            dict(row, storage="cold")
+            for row in (store or ColdEventStore()).scan(
+                start_time, end_time, asset_id, limit=limit, columns=LIST_COLUMNS
+            )
+            if row["id"] not in hot_ids
+        ]
+
+    merged = sorted(hot + cold, key=_row_order, reverse=True)
+    return merged[:limit]
+
+def get_event_detail(
+    db: Session,
+    event_id: int,
+    event_time: Optional[datetime] = None,
+    store: Optional[ColdEventStore] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    获取单个事件的完整数据（含解码后的 raw_data），先查热数据再查冷存储
+
+    Args:
+        db: 数据库会话
+        event_id: 事件ID
+        event_time: 事件时间提示，用于分区裁剪
+        store: 冷存储目录
+
+    Returns:
+        Optional[Dict[str, Any]]: 带 storage 标记的事件字典
+    """
+    if event_time is not None:
+        event = get_event_near(db, event_id, event_time, window=timedelta(minutes=1), lookback=None)
+    else:
+        event = db.query(Event).options(undefer(Event.raw_data)).filter(Event.id == event_id).first()
+    if event is not None:
+        return dict({name: getattr(event, name) for name in COLUMN_ENCODINGS}, storage="hot")
+
+    row = (store or ColdEventStore()).get(event_id)
+    return dict(row, storage="cold") if row is not None else None
@@ -1,116 +1,539 @@
 """
 Log 服务模块
-提供Log相关的业务逻辑处理
+提供蜜罐日志的清洗（标准化）与入库处理
+
+流程：采集 → 清洗 → 存储
+- 每种日志来源用一份字段映射描述（时间格式、IP字段、端口、协议/事件类型枚举等）
+- 映射在加载时预编译为提取函数，逐条处理时不再解析映射
+- 按批处理，输出可直接写入的 events 行和 Manticore 文档，无效记录被丢弃并计数
 """
 
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from sqlalchemy.orm import Session
-from datetime import datetime
-from app.core.logger import get_logger
+from datetime import datetime, timezone
+from functools import lru_cache
+import ipaddress
+import json
+import logging
+
+from app.crud.event_crud import bulk_insert_events
+from app.models.manticore_schema import event_to_document
+from app.models.postgres import Event
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class NormalizationError(ValueError):
+    """记录无法标准化（缺少必需字段或字段无效）"""
+
+# 协议标准化表：名称统一小写，IP协议号转名称
+PROTOCOL_ALIASES = {
+    "1": "icmp",
+    "6": "tcp",
+    "17": "udp",
+    "icmp": "icmp",
+    "tcp": "tcp",
+    "udp": "udp",
+    "ssh": "ssh",
+    "telnet": "telnet",
+    "http": "http",
+    "https": "https",
+    "ftp": "ftp",
+    "smb": "smb",
+    "rdp": "rdp",
+    "mysql": "mysql",
+    "mssql": "mssql",
+    "sip": "sip",
+}
+
+# 各日志来源的字段映射
+# 目标字段取值可以是：
+# - 字符串：源字段路径（支持 a.b 形式的嵌套路径）
+# - dict：{"field": 源字段, "type": 类型, ...}，type 取 time/ip/port/enum/protocol/process/string
+SOURCE_MAPPINGS: Dict[str, Dict[str, Any]] = {
+    # 字段名与events表一致的通用格式
+    "generic": {
+        "event_type": {"field": "event_type", "type": "string", "required": True},
+        "event_time": {"field": "event_time", "type": "time", "formats": ["iso", "epoch"], "required": True},
+        "asset_id": {"field": "asset_id", "type": "int"},
+        "source_ip": {"field": "source_ip", "type": "ip"},
+        "destination_ip": {"field": "destination_ip", "type": "ip"},
+        "source_port": {"field": "source_port", "type": "port"},
+        "destination_port": {"field": "destination_port", "type": "port"},
+        "protocol": {"field": "protocol", "type": "protocol"},
+        "description": "description",
+        "process_name": {"field": "process_name", "type": "process"},
+    },
+    # Cowrie SSH/Telnet 蜜罐
+    "cowrie": {
+        "event_type": {
+            "field": "eventid",
+            "type": "enum",
+            "required": True,
+            "map": {
+                "cowrie.session.connect": "network_connection",
+                "cowrie.login.failed": "authentication_failure",
+                "cowrie.login.success": "authentication_success",
+                "cowrie.command.input": "process_creation",
+                "cowrie.command.failed": "process_creation",
+                "cowrie.session.file_download": "file_download",
+                "cowrie.session.file_upload": "file_creation",
+                "cowrie.direct-tcpip.request": "network_connection",
+            },
+            "default": "honeypot_interaction",
+        },
+        "event_time": {"field": "timestamp", "type": "time", "formats": ["iso"], "required": True},
+        "source_ip": {"field": "src_ip", "type": "ip"},
+        "source_port": {"field": "src_port", "type": "port"},
+        "destination_ip": {"field": "dst_ip", "type": "ip"},
+        "destination_port": {"field": "dst_port", "type": "port"},
+        "protocol": {"field": "protocol", "type": "protocol", "default": "ssh"},
+        "description": "message",
+        "process_name": {"field": "input", "type": "process"},
+    },
+    # Dionaea 多协议蜜罐
+    "dionaea": {
+        "event_type": {
+            "field": "connection.type",
+            "type": "enum",
+            "required": True,
+            "map": {"accept": "network_connection", "connect": "network_connection", "listen": "network_connection"},
+            "default": "network_connection",
+        },
+        "event_time": {"field": "timestamp", "type": "time", "formats": ["iso", "%Y-%m-%dT%H:%M:%S.%f"], "required": True},
+        "source_ip": {"field": "src_ip", "type": "ip"},
+        "source_port": {"field": "src_port", "type": "port"},
+        "destination_ip": {"field": "dst_ip", "type": "ip"},
+        "destination_port": {"field": "dst_port", "type": "port"},
+        "protocol": {"field": "connection.protocol", "type": "protocol"},
+    },
+    # OpenCanary
+    "opencanary": {
+        "event_type": {
+            "field": "logtype",
+            "type": "enum",
+            "required": True,
+            "map": {
+                "2000": "authentication_failure",
+                "3000": "http_request",
+                "3001": "authentication_failure",
+                "4000": "network_connection",
+                "4002": "authentication_failure",
+                "5001": "port_scan",
+                "6001": "authentication_failure",
+                "8001": "authentication_failure",
+            },
+            "default": "honeypot_interaction",
+        },
+        "event_time": {"field": "local_time", "type": "time", "formats": ["%Y-%m-%d %H:%M:%S.%f", "iso"], "required": True},
+        "source_ip": {"field": "src_host", "type": "ip"},
+        "source_port": {"field": "src_port", "type": "port"},
+        "destination_ip": {"field": "dst_host", "type": "ip"},
+        "destination_port": {"field": "dst_port", "type": "port"},
+    },
+    # 纯文本syslog（由采集器解析后的记录，source_ip 为发送端地址）
+    "syslog": {
+        "event_type": {"field": "app_name", "type": "enum", "required": True, "map": {}, "default": "syslog_message"},
+        "event_time": {"field": "timestamp", "type": "time", "formats": ["iso"], "required": True},
+        "source_ip": {"field": "peer_ip", "type": "ip"},
+        "description": "message",
+        "process_name": {"field": "app_name", "type": "process"},
+    },
+    # Sysmon（经采集端转为JSON）
+    "sysmon": {
+        "event_type": {
+            "field": "EventID",
+            "type": "enum",
+            "required": True,
+            "map": {
+                "1": "process_creation",
+                "3": "network_connection",
+                "11": "file_creation",
+                "12": "registry_modification",
+                "13": "registry_modification",
+                "22": "dns_query",
+            },
+        },
+        "event_time": {"field": "UtcTime", "type": "time", "formats": ["%Y-%m-%d %H:%M:%S.%f", "iso"], "required": True},
+        "source_ip": {"field": "SourceIp", "type": "ip"},
+        "source_port": {"field": "SourcePort", "type": "port"},
+        "destination_ip": {"field": "DestinationIp", "type": "ip"},
+        "destination_port": {"field": "DestinationPort", "type": "port"},
+        "protocol": {"field": "Protocol", "type": "protocol"},
+        "description": "CommandLine",
+        "process_name": {"field": "Image", "type": "process"},
+    },
+}
+
+# ---------------------------------------------------------------------------
+# 字段转换函数
+# ---------------------------------------------------------------------------
+
+def _to_naive_utc(value: datetime) -> datetime:
+    """带时区的时间转换为无时区UTC时间（数据库列均为UTC）"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _parse_iso(value: Any) -> datetime:
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return _to_naive_utc(datetime.fromisoformat(value))
+
+def _parse_epoch(value: Any) -> datetime:
+    seconds = float(value)
+    if seconds > 1e11:  # 毫秒时间戳
+        seconds /= 1000.0
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+# 可由 datetime.fromisoformat 解析的strptime格式（fromisoformat比strptime快一个数量级）
+_ISO_COMPATIBLE_FORMATS = frozenset({
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+})
+
+def _make_time_parser(formats: List[str]) -> Callable[[Any], datetime]:
+    """将时间格式列表编译为解析函数，依次尝试各格式"""
+    parsers = []
+    for fmt in formats:
+        if fmt == "iso" or fmt in _ISO_COMPATIBLE_FORMATS:
+            if _parse_iso not in parsers:
+                parsers.append(_parse_iso)
+            if fmt == "iso":
+                continue
+        if fmt == "epoch":
+            parsers.append(_parse_epoch)
+        else:
+            parsers.append(lambda value, fmt=fmt: _to_naive_utc(datetime.strptime(value, fmt)))
+
+    def parse(value: Any) -> datetime:
+        if isinstance(value, datetime):
+            return _to_naive_utc(value)
+        if isinstance(value, (int, float)):
+            return _parse_epoch(value)
+        for parser in parsers:
+            try:
+                return parser(value)
+            except (ValueError, TypeError, AttributeError, OverflowError):
+                continue
+        raise NormalizationError(f"无法解析时间: {value!r}")
+
+    return parse
+
+@lru_cache(maxsize=65536)
+def normalize_ip(value: str) -> Optional[str]:
+    """标准化IP地址，无效时返回None（蜜罐流量中IP重复度高，结果做缓存）"""
+    try:
+        address = ipaddress.ip_address(value.strip())
+    except (ValueError, AttributeError):
+        return None
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return str(address)
+
+def _to_ip(value: Any) -> Optional[str]:
+    return normalize_ip(value) if isinstance(value, str) else None
+
+def _to_port(value: Any) -> Optional[int]:
+    try:
+        port = int(value)
+    except (TypeError, ValueError):
+        return None
+    return port if 0 <= port <= 65535 else None
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_protocol(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    key = str(value).strip().lower()
+    return PROTOCOL_ALIASES.get(key, key[:20] or None)
+
+# 可执行文件扩展名，用于截断含空格的Windows路径
+_EXECUTABLE_EXTENSIONS = (".exe", ".dll", ".ps1", ".bat", ".cmd", ".vbs", ".js", ".com", ".scr")
+
+@lru_cache(maxsize=16384)
+def normalize_process_name(value: str) -> Optional[str]:
+    """从进程路径或命令行中提取小写的可执行文件名"""
+    value = value.strip()
+    if value.startswith('"'):
+        executable = value[1:].split('"', 1)[0]
+    elif len(value) > 2 and value[1] == ":" and value[2] in "\\/":
+        # Windows绝对路径可能含空格，截断到扩展名
+        executable = value
+        lowered = value.lower()
+        for ext in _EXECUTABLE_EXTENSIONS:
+            pos = lowered.find(ext + " ")
+            if pos > 0:
+                executable = value[:pos + len(ext)]
+                break
+    else:
+        executable = value.split(None, 1)[0] if value else ""
+    name = executable.replace("\\", "/").rsplit("/", 1)[-1].lower()
+    return name or None
 
-logger = get_logger(__name__)
+def _to_process(value: Any) -> Optional[str]:
+    return normalize_process_name(value) if isinstance(value, str) else None
+
+def _to_string(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "ip": _to_ip,
+    "port": _to_port,
+    "int": _to_int,
+    "protocol": _to_protocol,
+    "process": _to_process,
+    "string": _to_string,
+}
+
+# ---------------------------------------------------------------------------
+# 映射编译
+# ---------------------------------------------------------------------------
+
+def _compile_getter(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """将字段路径编译为取值函数"""
+    if "." not in path:
+        return lambda record: record.get(path)
+
+    parts = tuple(path.split("."))
+
+    def get_nested(record: Dict[str, Any]) -> Any:
+        value = record
+        for part in parts:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    return get_nested
+
+def _compile_field(target: str, spec: Union[str, Dict[str, Any]]) -> Callable[[Dict[str, Any]], Any]:
+    """将单个目标字段的映射编译为提取函数"""
+    if isinstance(spec, str):
+        spec = {"field": spec, "type": "string"}
+
+    getter = _compile_getter(spec["field"])
+    field_type = spec.get("type", "string")
+    default = spec.get("default")
+    required = spec.get("required", False)
+
+    if field_type == "time":
+        convert = _make_time_parser(spec.get("formats", ["iso"]))
+    elif field_type == "enum":
+        mapping = {str(key): value for key, value in spec["map"].items()}
+
+        def convert(value: Any) -> Any:
+            return mapping.get(str(value), default)
+    else:
+        convert = _CONVERTERS[field_type]
+
+    def extract(record: Dict[str, Any]) -> Any:
+        value = getter(record)
+        if value is not None and value != "":
+            value = convert(value)
+        else:
+            value = None
+        if value is None:
+            value = default
+            if value is None and required:
+                raise NormalizationError(f"缺少必需字段: {target}")
+        return value
+
+    return extract
+
+# events表的列（process_name 仅存于 raw_data 和 Manticore 文档）
+_EVENT_FIELDS = (
+    "event_type",
+    "event_time",
+    "asset_id",
+    "source_ip",
+    "destination_ip",
+    "source_port",
+    "destination_port",
+    "protocol",
+    "description",
+)
+
+# 有长度限制的 events 列（与 EventIngest 的 max_length 一致），超长的记录拒绝，避免整批写入失败
+_COLUMN_LIMITS = {
+    name: Event.__table__.c[name].type.length
+    for name in _EVENT_FIELDS
+    if getattr(Event.__table__.c[name].type, "length", None)
+}
+
+def compile_source(mapping: Dict[str, Any]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    将一份来源映射编译为记录标准化函数
+
+    Args:
+        mapping: 目标字段 → 源字段映射
+
+    Returns:
+        Callable: 输入原始记录字典，输出events行字典，无效时抛出NormalizationError
+    """
+    extractors = tuple(
+        (target, _compile_field(target, mapping[target]))
+        for target in _EVENT_FIELDS if target in mapping
+    )
+    missing = tuple(target for target in _EVENT_FIELDS if target not in mapping)
+    process_extractor = _compile_field("process_name", mapping["process_name"]) if "process_name" in mapping else None
+    limits = tuple((target, _COLUMN_LIMITS[target]) for target, _ in extractors if target in _COLUMN_LIMITS)
+
+    def normalize(record: Dict[str, Any]) -> Dict[str, Any]:
+        row = {target: extract(record) for target, extract in extractors}
+        for target, limit in limits:
+            value = row[target]
+            if isinstance(value, str) and len(value) > limit:
+                raise NormalizationError(f"字段 {target} 超过 {limit} 个字符")
+        for target in missing:
+            row[target] = None
+        if process_extractor is not None:
+            process_name = process_extractor(record)
+            if process_name:
+                # 不修改调用方的记录（采集器、写入接口的批次可能被复用）
+                record = {**record, "process_name": process_name}
+        row["raw_data"] = record
+        return row
+
+    return normalize
+
+class NormalizedBatch:
+    """一批日志的清洗结果"""
+
+    __slots__ = ("events", "rejected", "errors")
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.rejected = 0
+        self.errors: List[str] = []
+
+    @property
+    def documents(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """对应的Manticore文档（事件有id时带上id）"""
+        return [event_to_document(event) for event in self.events]
+
+class LogNormalizer:
+    """
+    日志标准化器
+
+    初始化时预编译所有来源映射，normalize_batch 按批处理原始行
+    """
+
+    # 每批最多保留的错误信息条数
+    MAX_ERRORS = 20
+
+    def __init__(self, mappings: Optional[Dict[str, Dict[str, Any]]] = None, default_asset_id: Optional[int] = None):
+        self.default_asset_id = default_asset_id
+        self._compiled: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        for source, mapping in (mappings or SOURCE_MAPPINGS).items():
+            self.register_source(source, mapping)
+
+    @property
+    def sources(self) -> List[str]:
+        """已注册的日志来源"""
+        return list(self._compiled)
+
+    def register_source(self, source: str, mapping: Dict[str, Any]) -> None:
+        """注册（或替换）一个日志来源的字段映射"""
+        self._compiled[source] = compile_source(mapping)
+
+    def normalize_batch(
+        self,
+        source: str,
+        records: Iterable[Union[str, bytes, Dict[str, Any]]],
+        asset_id: Optional[int] = None
+    ) -> NormalizedBatch:
+        """
+        标准化一批原始日志
+
+        Args:
+            source: 日志来源名称
+            records: JSON行（str/bytes）或已解析的字典
+            asset_id: 事件所属资产ID，记录中未提供时使用
+
+        Returns:
+            NormalizedBatch: 有效事件行与拒绝计数
+        """
+        normalize = self._compiled.get(source)
+        if normalize is None:
+            raise ValueError(f"未知的日志来源: {source}")
+
+        asset_id = asset_id if asset_id is not None else self.default_asset_id
+        batch = NormalizedBatch()
+        events = batch.events
+        loads = json.loads
+
+        for record in records:
+            try:
+                if not isinstance(record, dict):
+                    record = loads(record)
+                    if not isinstance(record, dict):
+                        raise NormalizationError("记录不是JSON对象")
+                row = normalize(record)
+            except (ValueError, TypeError) as e:
+                batch.rejected += 1
+                if len(batch.errors) < self.MAX_ERRORS:
+                    batch.errors.append(str(e))
+                continue
+            if row["asset_id"] is None:
+                row["asset_id"] = asset_id
+            events.append(row)
+
+        return batch
+
+# 默认标准化器（加载时编译全部内置来源）
+log_normalizer = LogNormalizer()
 
 class LogService:
     """
     Log服务类
     """
-    
-    def __init__(self, db: Session):
+
+    def __init__(self, db: Session, normalizer: Optional[LogNormalizer] = None):
         self.db = db
-    
-    async def get_list(self, skip: int = 0, limit: int = 100, **filters) -> List[Dict[str, Any]]:
-        """
-        获取Log列表
-        """
-        try:
-            # 模拟数据，实际应从数据库查询
-            items = []
-            for i in range(min(limit, 10)):
-                items.append({
-                    'id': skip + i + 1,
-                    'name': f'Log {skip + i + 1}',
-                    'status': 'active',
-                    'created_at': datetime.utcnow().isoformat(),
-                    'updated_at': datetime.utcnow().isoformat()
-                })
-            
-            logger.info(f"获取Log列表成功，返回 {len(items)} 条记录")
-            return items
-        except Exception as e:
-            logger.error(f"获取Log列表失败: {e}")
-            return []
-    
-    async def get_by_id(self, item_id: int) -> Optional[Dict[str, Any]]:
+        self.normalizer = normalizer or log_normalizer
+
+    def normalize(
+        self,
+        source: str,
+        records: Iterable[Union[str, bytes, Dict[str, Any]]],
+        asset_id: Optional[int] = None
+    ) -> NormalizedBatch:
         """
-        根据ID获取Log
+        清洗一批原始日志（不写库）
         """
-        try:
-            # 模拟数据，实际应从数据库查询
-            item = {
-                'id': item_id,
-                'name': f'Log {item_id}',
-                'status': 'active',
-                'description': f'这是Log {item_id}的描述',
-                'created_at': datetime.utcnow().isoformat(),
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"获取Log详情成功: {item_id}")
-            return item
-        except Exception as e:
-            logger.error(f"获取Log详情失败: {e}")
-            return None
-    
-    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.normalizer.normalize_batch(source, records, asset_id=asset_id)
+
+    def ingest(
+        self,
+        source: str,
+        records: Iterable[Union[str, bytes, Dict[str, Any]]],
+        asset_id: Optional[int] = None
+    ) -> NormalizedBatch:
         """
-        创建Log
+        清洗一批原始日志并写入events表
         """
+        batch = self.normalize(source, records, asset_id=asset_id)
         try:
-            # 模拟创建，实际应保存到数据库
-            new_item = {
-                'id': 999,  # 实际应为数据库生成的ID
-                **data,
-                'created_at': datetime.utcnow().isoformat(),
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"创建Log成功: {new_item['id']}")
-            return new_item
+            bulk_insert_events(self.db, batch.events)
+            self.db.commit()
+            logger.info(f"写入 {source} 日志 {len(batch.events)} 条，丢弃 {batch.rejected} 条")
+            return batch
         except Exception as e:
-            logger.error(f"创建Log失败: {e}")
+            logger.error(f"写入 {source} 日志失败: {e}")
+            self.db.rollback()
             raise
-    
-    async def update(self, item_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """
-        更新Log
-        """
-        try:
-            # 模拟更新，实际应更新数据库
-            updated_item = {
-                'id': item_id,
-                **data,
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"更新Log成功: {item_id}")
-            return updated_item
-        except Exception as e:
-            logger.error(f"更新Log失败: {e}")
-            return None
-    
-    async def delete(self, item_id: int) -> bool:
-        """
-        删除Log
-        """
-        try:
-            # 模拟删除，实际应从数据库删除
-            logger.info(f"删除Log成功: {item_id}")
-            return True
-        except Exception as e:
-            logger.error(f"删除Log失败: {e}")
-            return False
 
 # 创建服务实例的工厂函数
 def get_log_service(db: Session) -> LogService:
     """获取Log服务实例"""
-    return LogService(db)
\ No newline at end of file
+    return LogService(db)
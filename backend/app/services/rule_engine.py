@@ -0,0 +1,846 @@
+"""
+告警规则引擎
+把 AlertRule.condition 的条件树编译为Python函数，按 event_type 建索引，
+每条事件只与适用的规则比较
+
+条件格式（JSON）:
+    叶子: {"field": "destination_port", "op": "in", "value": [22, 23]}
+          op 省略时为 eq；字段为事件列名，或 raw_data.<路径> 访问原始数据
+    组合: {"all": [条件...]}  {"any": [条件...]}  {"not": 条件}
+
+    支持的 op: eq ne in not_in gt gte lt lte contains not_contains
+              startswith endswith regex cidr exists
+    字符串类 op 可加 "ignore_case": true
+
+    阈值（窗口聚合）规则在顶层加 threshold，条件命中的事件按分组计数，
+    窗口内超过 count 次时产生告警（见 rule_window 模块）:
+        {"all": [...], "threshold": {"count": 10, "window": "5m", "group_by": ["src_ip"]}}
+
+    序列（关联）规则：同一分组内各步骤依次发生且总时长不超过 within 时产生告警，
+    group_by 默认为 asset_id:
+        {"sequence": {"steps": [条件A, 条件B, ...], "within": "10m", "group_by": ["asset_id"]}}
+
+    告警默认按 (规则, asset_id, source_ip) 聚合，抑制窗口内的重复命中累加到未处理完的告警上
+    （见 alert_grouping 模块），可在顶层加 suppress 调整，"suppress": false 时每次命中都产生新告警:
+        {"all": [...], "suppress": {"window": "1h", "group_by": ["src_ip"]}}
+
+编译方式:
+- 顶层（或顶层 all 中）对 event_type 的 eq/in 条件决定规则进入哪些索引桶，
+  没有该条件的规则进入通配桶，对所有事件生效
+- 同一索引桶内的全部规则生成一个函数：用到的字段在函数开头各取一次，
+  每条规则编译为一个 if 表达式，常量（集合、正则、网段）作为函数的全局变量，
+  避免逐节点调用闭包的开销
+"""
+
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import ipaddress
+import json
+import logging
+import re
+import threading
+
+from app.core.fulltext import index_text
+from app.core.threat_category import classify_threat
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 事件列及其类型（用于在编译期转换常量类型）
+EVENT_FIELDS: Dict[str, type] = {
+    "id": int,
+    "event_type": str,
+    "asset_id": int,
+    "source_ip": str,
+    "destination_ip": str,
+    "source_port": int,
+    "destination_port": int,
+    "protocol": str,
+    "description": str,
+    "event_time": datetime,
+    "created_at": datetime,
+    "count": int,
+    "first_seen": datetime,
+    "last_seen": datetime,
+}
+
+RAW_DATA_PREFIX = "raw_data."
+
+_COMPARE_OPS = {"eq": "==", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_STRING_OPS = ("contains", "not_contains", "startswith", "endswith", "regex")
+_ALL_OPS = frozenset(_COMPARE_OPS) | frozenset(_STRING_OPS) | {"in", "not_in", "cidr", "exists"}
+
+class RuleCompileError(ValueError):
+    """规则条件无法编译"""
+
+# 窗口长度的单位
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# group_by 可使用的简写
+GROUP_BY_ALIASES = {
+    "src_ip": "source_ip",
+    "dst_ip": "destination_ip",
+    "src_port": "source_port",
+    "dst_port": "destination_port",
+    "username": "raw_data.username",
+}
+
+# 阈值规则的最长窗口
+MAX_WINDOW_SECONDS = 7 * 86400
+
+# IPv6 地址的整数键偏移，使IPv4与IPv6的地址区间不重叠
+_IPV6_OFFSET = 1 << 128
+
+@lru_cache(maxsize=65536)
+def _ip_key(value: Any) -> Optional[int]:
+    """IP地址转换为整数键，无效地址返回None（网段匹配只需比较整数区间）"""
+    if value is None:
+        return None
+    try:
+        address = ipaddress.ip_address(str(value))
+    except ValueError:
+        return None
+    return int(address) + (_IPV6_OFFSET if address.version == 6 else 0)
+
+def _network_range(network: Any) -> Tuple[int, int]:
+    offset = _IPV6_OFFSET if network.version == 6 else 0
+    return int(network.network_address) + offset, int(network.broadcast_address) + offset
+
+def _raw_path(event: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    """按路径读取 raw_data 中的值，中途缺失返回None"""
+    value = event.get("raw_data")
+    for key in path:
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+    return value
+
+def _coerce(field: str, value: Any) -> Any:
+    """把常量转换为字段的类型（"22" → 22 等），无法转换时报错"""
+    field_type = EVENT_FIELDS.get(field)
+    if field_type is None or value is None or isinstance(value, field_type):
+        return value
+    try:
+        if field_type is datetime:
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+        if field_type is int and isinstance(value, bool):
+            raise ValueError(value)
+        return field_type(value)
+    except (TypeError, ValueError):
+        raise RuleCompileError(f"字段 {field} 的值类型错误: {value!r}")
+
+class _CodeBuilder:
+    """为一组规则生成一个匹配函数的源码"""
+
+    def __init__(self):
+        self.namespace: Dict[str, Any] = {"_ip_key": _ip_key, "_raw_path": _raw_path}
+        self.fields: Dict[str, str] = {}
+        self.string_fields: Dict[Tuple[str, bool], str] = {}
+        self.ip_fields: Dict[str, str] = {}
+        self.prologue: List[str] = []
+        self._constants: Dict[Any, str] = {}
+
+    def constant(self, value: Any) -> str:
+        """登记常量，返回其变量名（可哈希的相同常量复用）"""
+        try:
+            key = (type(value), value)
+            hash(key)
+        except TypeError:
+            key = None
+        if key is not None and key in self._constants:
+            return self._constants[key]
+        name = f"_c{len(self.namespace)}"
+        self.namespace[name] = value
+        if key is not None:
+            self._constants[key] = name
+        return name
+
+    def field(self, field: str) -> str:
+        """字段值的局部变量名，首次使用时在函数开头取值"""
+        name = self.fields.get(field)
+        if name is None:
+            name = f"v{len(self.fields)}"
+            self.fields[field] = name
+            if field.startswith(RAW_DATA_PREFIX):
+                path = self.constant(tuple(field[len(RAW_DATA_PREFIX):].split(".")))
+                self.prologue.append(f"{name} = _raw_path(e, {path})")
+            else:
+                self.prologue.append(f"{name} = e.get({field!r})")
+        return name
+
+    def string_field(self, field: str, ignore_case: bool) -> str:
+        """字段的字符串形式（None保持None），ignore_case 时为小写"""
+        key = (field, ignore_case)
+        name = self.string_fields.get(key)
+        if name is None:
+            value = self.field(field)
+            name = f"s{len(self.string_fields)}"
+            self.string_fields[key] = name
+            text = f"({value} if {value}.__class__ is str else str({value}))"
+            if ignore_case:
+                text = f"{text}.lower()"
+            self.prologue.append(f"{name} = None if {value} is None else {text}")
+        return name
+
+    def ip_field(self, field: str) -> str:
+        """字段IP地址的整数键（无效地址为None）"""
+        name = self.ip_fields.get(field)
+        if name is None:
+            value = self.field(field)
+            name = f"i{len(self.ip_fields)}"
+            self.ip_fields[field] = name
+            self.prologue.append(f"{name} = _ip_key({value})")
+        return name
+
+    def expression(self, node: Any) -> str:
+        """把条件树编译为表达式源码"""
+        if not isinstance(node, dict):
+            raise RuleCompileError(f"条件节点必须是对象: {node!r}")
+
+        if "all" in node or "any" in node:
+            key = "all" if "all" in node else "any"
+            children = node[key]
+            if not isinstance(children, list) or not children:
+                raise RuleCompileError(f"{key} 需要非空的条件列表")
+            joiner = " and " if key == "all" else " or "
+            # 廉价的条件放在前面，短路求值时尽早排除
+            ordered = sorted(children, key=_cost)
+            return "(" + joiner.join(self.expression(child) for child in ordered) + ")"
+        if "not" in node:
+            return f"(not {self.expression(node['not'])})"
+        if "field" in node:
+            return self._leaf(node)
+        raise RuleCompileError(f"无法识别的条件节点: {node!r}")
+
+    def _leaf(self, node: Dict[str, Any]) -> str:
+        field = node["field"]
+        op = node.get("op", "eq")
+        value = node.get("value")
+        if not isinstance(field, str) or not (field in EVENT_FIELDS or field.startswith(RAW_DATA_PREFIX)):
+            raise RuleCompileError(f"未知的字段: {field!r}")
+        if op not in _ALL_OPS:
+            raise RuleCompileError(f"未知的操作符: {op!r}")
+
+        if op == "exists":
+            return f"({self.field(field)} is {'not ' if value is None or value else ''}None)"
+
+        if op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise RuleCompileError(f"{op} 需要列表值")
+            try:
+                members = frozenset(_coerce(field, item) for item in value)
+            except TypeError:
+                raise RuleCompileError(f"{op} 的值必须是标量列表")
+            return f"({self.field(field)} {'not in' if op == 'not_in' else 'in'} {self.constant(members)})"
+
+        if op in _COMPARE_OPS:
+            if isinstance(value, (list, dict)):
+                raise RuleCompileError(f"{op} 需要标量值")
+            name = self.field(field)
+            constant = self.constant(_coerce(field, value))
+            if op in ("eq", "ne"):
+                return f"({name} {_COMPARE_OPS[op]} {constant})"
+            if value is None:
+                raise RuleCompileError(f"{op} 的值不能为空")
+            return f"({name} is not None and {name} {_COMPARE_OPS[op]} {constant})"
+
+        if op == "cidr":
+            items = value if isinstance(value, list) else [value]
+            try:
+                networks = tuple(ipaddress.ip_network(str(item), strict=False) for item in items)
+            except ValueError as e:
+                raise RuleCompileError(f"无效的网段: {e}")
+            name = self.ip_field(field)
+            ranges = " or ".join(
+                f"{self.constant(low)} <= {name} <= {self.constant(high)}"
+                for low, high in (_network_range(network) for network in networks)
+            )
+            return f"({name} is not None and ({ranges}))"
+
+        # 字符串类操作
+        if not isinstance(value, str):
+            raise RuleCompileError(f"{op} 需要字符串值")
+        ignore_case = bool(node.get("ignore_case"))
+        name = self.string_field(field, ignore_case)
+        if op == "regex":
+            try:
+                pattern = re.compile(value, re.IGNORECASE if ignore_case else 0)
+            except re.error as e:
+                raise RuleCompileError(f"无效的正则表达式: {e}")
+            return f"({name} is not None and {self.constant(pattern)}.search({name}) is not None)"
+
+        constant = self.constant(value.lower() if ignore_case else value)
+        if op == "contains":
+            return f"({name} is not None and {constant} in {name})"
+        if op == "not_contains":
+            return f"({name} is None or {constant} not in {name})"
+        return f"({name} is not None and {name}.{op}({constant}))"
+
+def _cost(node: Any) -> int:
+    """条件节点的相对求值代价，用于调整短路求值顺序（不影响结果）"""
+    if not isinstance(node, dict):
+        return 0
+    if "all" in node or "any" in node:
+        children = node.get("all", node.get("any"))
+        return sum(_cost(child) for child in children) if isinstance(children, list) else 0
+    if "not" in node:
+        return _cost(node["not"])
+    op = node.get("op", "eq")
+    if op == "regex":
+        return 8
+    if op in _STRING_OPS or op == "cidr":
+        return 3
+    if op in ("eq", "ne", "in", "not_in", "exists"):
+        return 1
+    return 2
+
+def _parse_duration(value: Any) -> int:
+    """窗口长度: 秒数，或 30s / 5m / 1h / 1d 形式的字符串"""
+    if isinstance(value, str) and value[-1:] in _DURATION_UNITS and value[:-1].isdigit():
+        seconds = int(value[:-1]) * _DURATION_UNITS[value[-1]]
+    elif isinstance(value, int) and not isinstance(value, bool):
+        seconds = value
+    else:
+        raise RuleCompileError(f"无效的窗口长度: {value!r}")
+    if not 0 < seconds <= MAX_WINDOW_SECONDS:
+        raise RuleCompileError(f"窗口长度必须在 1 秒到 {MAX_WINDOW_SECONDS // 86400} 天之间")
+    return seconds
+
+class _Grouping:
+    """按 group_by 字段对事件分组（阈值和序列规则共用）"""
+
+    __slots__ = ("group_by", "_getters")
+
+    def __init__(self, group_by: Any, name: str):
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        if not isinstance(group_by, list):
+            raise RuleCompileError(f"{name} 必须是字段列表")
+        self.group_by: Tuple[str, ...] = ()
+        getters = []
+        for item in group_by:
+            field = GROUP_BY_ALIASES.get(item, item) if isinstance(item, str) else item
+            if isinstance(field, str) and field.startswith(RAW_DATA_PREFIX):
+                path = tuple(field[len(RAW_DATA_PREFIX):].split("."))
+                getters.append(lambda event, path=path: _raw_path(event, path))
+            elif EVENT_FIELDS.get(field) in (str, int):
+                getters.append(lambda event, field=field: event.get(field))
+            else:
+                raise RuleCompileError(f"不能按字段分组: {item!r}")
+            self.group_by += (field,)
+        self._getters = tuple(getters)
+
+    def key(self, event: Dict[str, Any]) -> Tuple[Any, ...]:
+        """事件所属的分组键（非标量值转为字符串，保证可哈希且能写入快照）"""
+        values = []
+        for getter in self._getters:
+            value = getter(event)
+            if value is not None and not isinstance(value, (str, int, float)):
+                value = str(value)
+            values.append(value)
+        return tuple(values)
+
+class ThresholdSpec(_Grouping):
+    """阈值规则的窗口定义：group_by 分组内 window 秒内命中超过 count 次时告警"""
+
+    __slots__ = ("count", "window")
+
+    def __init__(self, spec: Any):
+        if not isinstance(spec, dict):
+            raise RuleCompileError("threshold 必须是JSON对象")
+        count = spec.get("count")
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise RuleCompileError("threshold.count 必须是正整数")
+        super().__init__(spec.get("group_by", []), "threshold.group_by")
+        self.count = count
+        self.window = _parse_duration(spec.get("window"))
+
+    def describe(self) -> List[Any]:
+        return [self.count, self.window, self.group_by]
+
+class SuppressSpec(_Grouping):
+    """
+    告警聚合（抑制）定义：同一规则、同一 group_by 分组在 window 秒内的重复命中
+    合并到仍未处理完的告警上，window 为None时使用 ALERT_SUPPRESS_WINDOW
+    """
+
+    __slots__ = ("window",)
+
+    # 默认按资产和源IP聚合
+    DEFAULT_GROUP_BY = ["asset_id", "source_ip"]
+
+    def __init__(self, spec: Any):
+        if spec is True or spec is None:
+            spec = {}
+        if not isinstance(spec, dict):
+            raise RuleCompileError("suppress 必须是JSON对象或布尔值")
+        super().__init__(spec.get("group_by", self.DEFAULT_GROUP_BY), "suppress.group_by")
+        self.window = _parse_duration(spec["window"]) if spec.get("window") is not None else None
+
+# 序列规则的最多步骤数（每个分组的部分匹配状态不超过 步骤数-1 个）
+MAX_SEQUENCE_STEPS = 8
+
+class SequenceSpec(_Grouping):
+    """
+    序列规则的定义：同一分组（默认同一资产）内 steps 依次发生，
+    从第一步到最后一步不超过 within 秒时告警
+    """
+
+    __slots__ = ("steps", "within", "predicates")
+
+    def __init__(self, spec: Any):
+        if not isinstance(spec, dict):
+            raise RuleCompileError("sequence 必须是JSON对象")
+        steps = spec.get("steps")
+        if not isinstance(steps, list) or not 2 <= len(steps) <= MAX_SEQUENCE_STEPS:
+            raise RuleCompileError(f"sequence.steps 需要 2~{MAX_SEQUENCE_STEPS} 个条件")
+        super().__init__(spec.get("group_by", ["asset_id"]), "sequence.group_by")
+        self.steps = steps
+        self.within = _parse_duration(spec.get("within"))
+        self.predicates = tuple(_compile_predicate(step) for step in steps)
+
+    def matched_steps(self, event: Dict[str, Any]) -> List[int]:
+        """事件满足的步骤序号"""
+        return [index for index, predicate in enumerate(self.predicates) if predicate(event)]
+
+    def describe(self) -> List[Any]:
+        return [self.steps, self.within, self.group_by]
+
+def _index_values(node: Any) -> Optional[FrozenSet[str]]:
+    """event_type 的 eq/in 叶子条件对应的取值集合，其他节点返回None"""
+    if not isinstance(node, dict) or node.get("field") != "event_type":
+        return None
+    op = node.get("op", "eq")
+    if op == "eq" and isinstance(node.get("value"), str):
+        return frozenset([node["value"]])
+    if op == "in" and isinstance(node.get("value"), list):
+        return frozenset(str(item) for item in node["value"])
+    return None
+
+def _conjuncts(condition: Dict[str, Any]) -> List[Any]:
+    """顶层的合取条件列表"""
+    children = condition.get("all", [condition])
+    return children if isinstance(children, list) else [condition]
+
+def _index_event_types(condition: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+    """提取决定索引桶的 event_type 集合，None表示通配"""
+    if isinstance(condition.get("any"), list) and condition["any"]:
+        # 顶层 any 的每个分支都限定了事件类型时取并集（如序列规则的各步骤）
+        branches = [
+            _index_event_types(child) if isinstance(child, dict) else None
+            for child in condition["any"]
+        ]
+        if all(branch is not None for branch in branches):
+            return frozenset().union(*branches)
+        return None
+    event_types: Optional[FrozenSet[str]] = None
+    for node in _conjuncts(condition):
+        values = _index_values(node)
+        if values is not None:
+            # 多个条件同时约束 event_type 时取交集
+            event_types = values if event_types is None else event_types & values
+    return event_types
+
+def _build_matcher(
+    rules: Sequence["CompiledRule"],
+    indexed: bool = False
+) -> Callable[[Dict[str, Any]], List["CompiledRule"]]:
+    """
+    为一组规则生成匹配函数，返回命中的规则列表
+
+    indexed 为True时函数只用于已按 event_type 分桶的事件，
+    规则中决定分桶的 event_type 条件必然成立，不再生成
+    """
+    builder = _CodeBuilder()
+    checks = []
+    for rule in rules:
+        if indexed and rule.event_types is not None:
+            remaining = [node for node in _conjuncts(rule.condition) if _index_values(node) is None]
+            expression = builder.expression({"all": remaining}) if remaining else "True"
+        else:
+            expression = builder.expression(rule.condition)
+        checks.append(f"    if {expression}:\n        append({builder.constant(rule)})")
+
+    return _define(builder, ["    hits = []", "    append = hits.append"], checks + ["    return hits"])
+
+def _define(builder: _CodeBuilder, head: List[str], body: List[str]) -> Callable:
+    """生成函数: 开头语句 + 字段取值 + 函数体"""
+    # 常量以默认参数传入，函数内按局部变量访问
+    constants = [name for name in builder.namespace if name.startswith("_c")]
+    signature = ", ".join(["e"] + [f"{name}={name}" for name in constants])
+    source = "\n".join(
+        [f"def _match({signature}):"] + head + [f"    {line}" for line in builder.prologue] + body
+    )
+    exec(compile(source, "<alert-rules>", "exec"), builder.namespace)
+    return builder.namespace["_match"]
+
+def _compile_predicate(condition: Any) -> Callable[[Dict[str, Any]], bool]:
+    """把单个条件树编译为谓词函数"""
+    builder = _CodeBuilder()
+    expression = builder.expression(condition)
+    return _define(builder, [], [f"    return bool({expression})"])
+
+class CompiledRule:
+    """编译后的告警规则"""
+
+    __slots__ = (
+        "id", "name", "severity", "description", "revision", "condition", "threshold", "sequence", "suppress",
+        "signature", "event_types", "predicate", "uses_raw_data",
+    )
+
+    def __init__(
+        self,
+        rule_id: int,
+        name: str,
+        severity: str,
+        condition: Dict[str, Any],
+        description: Optional[str] = None,
+        revision: int = 0
+    ):
+        self.id = rule_id
+        self.name = name
+        self.severity = severity
+        self.description = description
+        self.revision = revision
+        # suppress 决定告警如何聚合，不参与匹配；为 false 时每次命中都产生新告警
+        suppress = condition.get("suppress", True)
+        self.suppress = SuppressSpec(suppress) if suppress is not False else None
+        condition = {key: value for key, value in condition.items() if key != "suppress"}
+        # threshold 不参与逐条匹配，单独解析
+        self.threshold = ThresholdSpec(condition["threshold"]) if "threshold" in condition else None
+        if self.threshold is not None:
+            condition = {key: value for key, value in condition.items() if key != "threshold"}
+        # 序列规则: 满足任一步骤的事件进入状态机
+        self.sequence = SequenceSpec(condition["sequence"]) if "sequence" in condition else None
+        if self.sequence is not None:
+            if len(condition) > 1 or self.threshold is not None:
+                raise RuleCompileError("sequence 不能与其他条件或 threshold 同时使用")
+            condition = {"any": self.sequence.steps}
+        self.condition = condition
+        # 条件的摘要，规则修改后窗口状态随之失效
+        spec = self.threshold or self.sequence
+        self.signature = hashlib.sha1(
+            json.dumps([condition, spec and spec.describe()], sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        self.event_types = _index_event_types(condition)
+        self.uses_raw_data = RAW_DATA_PREFIX in repr(condition) or any(
+            field.startswith(RAW_DATA_PREFIX)
+            for grouping in (spec, self.suppress) if grouping is not None
+            for field in grouping.group_by
+        )
+        # 单条规则的谓词，用于校验和匹配函数出错时的逐条回退
+        matcher = _build_matcher([self])
+        self.predicate: Callable[[Dict[str, Any]], bool] = lambda event: bool(matcher(event))
+
+    @property
+    def stateful(self) -> bool:
+        """是否为需要跨事件状态的规则（阈值或序列）"""
+        return self.threshold is not None or self.sequence is not None
+
+    @property
+    def horizon(self) -> int:
+        """有状态规则需要回看的时间跨度（秒），无状态规则为0"""
+        if self.threshold is not None:
+            return self.threshold.window
+        return self.sequence.within if self.sequence is not None else 0
+
+    def group_key(self, event: Dict[str, Any]) -> Optional[str]:
+        """告警聚合键的摘要，不聚合的规则返回None"""
+        if self.suppress is None:
+            return None
+        key = json.dumps([self.id, self.suppress.key(event)], default=str)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def __repr__(self) -> str:
+        return f"<CompiledRule {self.id} {self.name!r}>"
+
+def compile_rule(rule: Any) -> CompiledRule:
+    """
+    编译一条 AlertRule（或具有相同属性的对象）
+
+    Raises:
+        RuleCompileError: 条件格式错误
+    """
+    if not isinstance(rule.condition, dict):
+        raise RuleCompileError("条件必须是JSON对象")
+    return CompiledRule(
+        rule.id, rule.name, rule.severity, rule.condition, rule.description, getattr(rule, "revision", 0) or 0
+    )
+
+# 桶内至少有这么多规则在同一字段上有等值条件时才做二级分派
+DISPATCH_MIN_RULES = 8
+
+def _dispatch_values(rule: "CompiledRule", field: str) -> Optional[FrozenSet[Any]]:
+    """规则顶层对 field 的 eq/in 条件允许的取值，没有该条件时返回None"""
+    allowed: Optional[FrozenSet[Any]] = None
+    for node in _conjuncts(rule.condition):
+        if not isinstance(node, dict) or node.get("field") != field:
+            continue
+        op = node.get("op", "eq")
+        value = node.get("value")
+        if op == "eq" and not isinstance(value, (list, dict)):
+            values = frozenset([_coerce(field, value)])
+        elif op == "in" and isinstance(value, list):
+            values = frozenset(_coerce(field, item) for item in value)
+        else:
+            continue
+        allowed = values if allowed is None else allowed & values
+    return allowed
+
+class _Bucket:
+    """
+    一个事件类型桶
+
+    桶内规则较多时，选出顶层等值条件覆盖规则最多的字段（如目的端口）做二级分派：
+    每个取值编译一个只含 可能命中该取值的规则 + 不限制该字段的规则 的匹配函数
+    """
+
+    __slots__ = ("rules", "field", "_by_value", "_default")
+
+    def __init__(self, rules: List["CompiledRule"], indexed: bool):
+        self.rules = rules
+        self.field: Optional[str] = None
+        self._by_value: Dict[Any, Tuple[Callable, List[CompiledRule]]] = {}
+
+        counts: Dict[str, int] = {}
+        for rule in rules:
+            for node in _conjuncts(rule.condition):
+                field = node.get("field") if isinstance(node, dict) else None
+                if field in EVENT_FIELDS and field != "event_type" and node.get("op", "eq") in ("eq", "in"):
+                    counts[field] = counts.get(field, 0) + 1
+        best = max(counts, key=counts.get, default=None)
+
+        if best is not None and counts[best] >= DISPATCH_MIN_RULES:
+            self.field = best
+            allowed = {id(rule): _dispatch_values(rule, best) for rule in rules}
+            values = set().union(*(values for values in allowed.values() if values))
+            for value in values:
+                subset = [rule for rule in rules if allowed[id(rule)] is None or value in allowed[id(rule)]]
+                self._by_value[value] = (_build_matcher(subset, indexed), subset)
+            rest = [rule for rule in rules if allowed[id(rule)] is None]
+        else:
+            rest = rules
+        self._default = (_build_matcher(rest, indexed), rest)
+
+    def entry(self, event: Dict[str, Any]) -> Tuple[Callable, List["CompiledRule"]]:
+        """事件适用的 (匹配函数, 规则列表)"""
+        if self.field is None:
+            return self._default
+        return self._by_value.get(event.get(self.field), self._default)
+
+class RuleSet:
+    """
+    按 event_type 索引的规则集
+
+    match 对一条事件只执行一个匹配函数：先按事件类型选桶（通配规则编入每个桶），
+    桶内再按二级分派字段的取值选函数
+
+    规则集创建后不再修改；重新加载时传入 previous，规则列表未变的桶直接复用，
+    只为受影响的事件类型重新生成匹配函数
+    """
+
+    def __init__(self, rules: Iterable[CompiledRule], previous: Optional["RuleSet"] = None):
+        self.rules: List[CompiledRule] = list(rules)
+        self.uses_raw_data = any(rule.uses_raw_data for rule in self.rules)
+
+        buckets: Dict[str, List[CompiledRule]] = {}
+        wildcard: List[CompiledRule] = []
+        for rule in self.rules:
+            if rule.event_types is None:
+                wildcard.append(rule)
+            else:
+                for event_type in rule.event_types:
+                    buckets.setdefault(event_type, []).append(rule)
+
+        old_buckets = previous._buckets if previous is not None else {}
+        old_wildcard = previous._wildcard if previous is not None else None
+        self.reused_buckets = 0
+        self._buckets: Dict[str, _Bucket] = {
+            event_type: self._bucket(bucket + wildcard, True, old_buckets.get(event_type))
+            for event_type, bucket in buckets.items()
+        }
+        self._wildcard = self._bucket(wildcard, False, old_wildcard) if wildcard else None
+        self.wildcard_rules = len(wildcard)
+
+    def _bucket(self, rules: List[CompiledRule], indexed: bool, old: Optional[_Bucket]) -> _Bucket:
+        """规则列表（同一批编译对象、同样顺序）未变时复用旧桶"""
+        if old is not None and len(old.rules) == len(rules) and all(a is b for a, b in zip(old.rules, rules)):
+            self.reused_buckets += 1
+            return old
+        return _Bucket(rules, indexed)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, event: Dict[str, Any]) -> List[CompiledRule]:
+        """返回事件命中的规则"""
+        bucket = self._buckets.get(event.get("event_type")) or self._wildcard
+        if bucket is None:
+            return []
+        matcher, rules = bucket.entry(event)
+        try:
+            return matcher(event)
+        except Exception:
+            return self._match_each(event, rules)
+
+    def _match_each(self, event: Dict[str, Any], rules: List[CompiledRule]) -> List[CompiledRule]:
+        """组合函数出错时逐条匹配，跳过出错的规则"""
+        hits = []
+        for rule in rules:
+            try:
+                if rule.predicate(event):
+                    hits.append(rule)
+            except Exception as e:
+                logger.warning(f"告警规则 {rule.id} 匹配事件 {event.get('id')} 出错: {e}")
+        return hits
+
+    def match_batch(self, events: Iterable[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], CompiledRule]]:
+        """返回一批事件的 (事件, 规则) 命中列表"""
+        matches = []
+        for event in events:
+            for rule in self.match(event):
+                matches.append((event, rule))
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        """规则集概况"""
+        return {
+            "rules": len(self.rules),
+            "indexed_event_types": len(self._buckets),
+            "wildcard_rules": self.wildcard_rules,
+            "threshold_rules": sum(1 for rule in self.rules if rule.threshold is not None),
+            "sequence_rules": sum(1 for rule in self.rules if rule.sequence is not None),
+            "uses_raw_data": self.uses_raw_data,
+        }
+
+def build_rule_set(rules: Iterable[Any]) -> Tuple[RuleSet, Dict[int, str]]:
+    """
+    编译规则，跳过无法编译的规则
+
+    Returns:
+        Tuple[RuleSet, Dict[int, str]]: (规则集, 规则ID → 编译错误)
+    """
+    compiled = []
+    errors: Dict[int, str] = {}
+    for rule in rules:
+        try:
+            compiled.append(compile_rule(rule))
+        except RuleCompileError as e:
+            errors[rule.id] = str(e)
+            logger.warning(f"告警规则 {rule.id} ({rule.name}) 编译失败，已跳过: {e}")
+    return RuleSet(compiled), errors
+
+class RuleRegistry:
+    """
+    进程内的编译规则集，按规则集版本号热加载
+
+    refresh 先读取版本号（一次主键查询），未变化时直接返回；变化时只读取规则ID和修订号，
+    仅重新编译修订号变化的规则，未变的规则复用编译结果，新规则集构建完成后整体替换 rule_set 引用，
+    正在使用旧规则集的匹配不受影响
+    """
+
+    def __init__(self):
+        self.version = -1
+        self.rule_set = RuleSet([])
+        self.errors: Dict[int, str] = {}
+        self.reloads = 0
+        self._compiled: Dict[int, CompiledRule] = {}
+        self._failed: Dict[int, int] = {}  # 编译失败的规则ID → 修订号
+        self._lock = threading.Lock()
+
+    def refresh(self, db) -> bool:
+        """
+        版本号变化时增量重新加载
+
+        Returns:
+            bool: 是否替换了规则集
+        """
+        from app.crud.version_crud import ALERT_RULES_VERSION, get_version
+        from app.models.postgres import AlertRule
+
+        with self._lock:
+            version = get_version(db, ALERT_RULES_VERSION)
+            if version == self.version:
+                return False
+
+            revisions = dict(
+                db.query(AlertRule.id, AlertRule.revision)
+                .filter(AlertRule.enabled.is_(True))
+                .order_by(AlertRule.id)
+                .all()
+            )
+            changed = [
+                rule_id for rule_id, revision in revisions.items()
+                if (rule_id in self._compiled and self._compiled[rule_id].revision != revision)
+                or (rule_id in self._failed and self._failed[rule_id] != revision)
+                or (rule_id not in self._compiled and rule_id not in self._failed)
+            ]
+            compiled = {rule_id: rule for rule_id, rule in self._compiled.items() if rule_id in revisions}
+            failed = {rule_id: revision for rule_id, revision in self._failed.items() if rule_id in revisions}
+            errors = {rule_id: error for rule_id, error in self.errors.items() if rule_id in failed}
+            if changed:
+                for rule in db.query(AlertRule).filter(AlertRule.id.in_(changed)).all():
+                    compiled.pop(rule.id, None)
+                    failed.pop(rule.id, None)
+                    errors.pop(rule.id, None)
+                    try:
+                        compiled[rule.id] = compile_rule(rule)
+                    except RuleCompileError as e:
+                        failed[rule.id] = rule.revision
+                        errors[rule.id] = str(e)
+                        logger.warning(f"告警规则 {rule.id} ({rule.name}) 编译失败，已跳过: {e}")
+
+            rule_set = RuleSet([compiled[rule_id] for rule_id in sorted(compiled)], previous=self.rule_set)
+            # 引用赋值是原子的，读取方拿到的总是完整的新规则集或旧规则集
+            self._compiled, self._failed, self.errors = compiled, failed, errors
+            self.rule_set = rule_set
+            self.version = version
+            self.reloads += 1
+            logger.info(
+                f"告警规则集已更新到版本 {version}: 规则 {len(rule_set)} 条，重新编译 {len(changed)} 条，"
+                f"复用索引桶 {rule_set.reused_buckets} 个，编译失败 {len(errors)} 条"
+            )
+            return True
+
+def alert_row(
+    event: Dict[str, Any],
+    rule: CompiledRule,
+    now: Optional[datetime] = None,
+    summary: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    由命中的事件和规则生成告警行，summary 省略时按事件的源和目标生成
+
+    first_seen/last_seen 取事件时间，用于判断重复命中是否落在抑制窗口内
+    """
+    now = now or datetime.utcnow()
+    seen = event.get("event_time") or now
+    if summary is None:
+        target = event.get("destination_ip") or ""
+        if event.get("destination_port") is not None:
+            target = f"{target}:{event['destination_port']}"
+        summary = f"{event.get('event_type')} {event.get('source_ip') or '-'} -> {target or '-'}"
+    description = f"{rule.description}（{summary}）" if rule.description else f"规则命中: {summary}"
+    return {
+        "event_id": event.get("id"),
+        "asset_id": event.get("asset_id"),
+        "alert_name": rule.name,
+        "severity": rule.severity,
+        "status": "unhandled",
+        "description": description,
+        "created_at": now,
+        "updated_at": now,
+        "rule_id": rule.id,
+        "group_key": rule.group_key(event),
+        "source_ip": event.get("source_ip"),
+        "occurrence_count": 1,
+        "first_seen": seen,
+        "last_seen": seen,
+        "search_text": index_text(rule.name, description),
+        "threat_category": classify_threat(rule.name, event.get("event_type"), description),
+    }
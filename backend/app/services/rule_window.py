@@ -0,0 +1,379 @@
+"""
+有状态规则（阈值、序列）的跨事件状态
+
+阈值规则按 group_by 分组，每个分组一个分桶计数环：窗口切成 RULE_WINDOW_SLOTS 个桶，
+按事件时间落桶，窗口前移时清空过期的桶，内存与窗口内事件数无关
+
+序列规则每个分组一个部分匹配状态机：stages[i] 为已完成前 i+1 步、等待下一步的部分匹配，
+同一阶段只保留起点最晚的一个（起点更早的部分匹配能完成的序列，起点更晚的也能完成），
+因此每个分组最多 步骤数-1 个部分匹配；超过 within 的部分匹配被剪除
+
+- 窗口时钟取事件时间（event_time），回放和延迟到达的事件按发生时间计数；
+  比分组当前窗口更早的事件直接忽略
+- 事件的 count（写入时聚合的重复次数）计入窗口
+- 分组超过 count 次时产生一条告警并清零该分组，再超过一次才再次告警
+- 每条规则的分组数有上限，超出时淘汰最久未更新的分组；窗口已整体过期的分组定期清理
+- 状态定期写入快照文件（先写临时文件再替换），记录对应的检查点事件ID，
+  重启后加载快照并重放快照之后已提交的事件，窗口不丢失
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from collections import OrderedDict
+from datetime import datetime
+import json
+import logging
+import os
+
+from app.core.config import settings
+from app.services.rule_engine import CompiledRule
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 快照格式版本
+SNAPSHOT_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+
+class WindowCounter:
+    """一个分组的分桶计数环，head 为最新桶的绝对序号"""
+
+    __slots__ = ("head", "total", "slots")
+
+    def __init__(self, size: int, head: int = 0, slots: Optional[List[int]] = None):
+        self.head = head
+        self.slots = slots if slots is not None else [0] * size
+        self.total = sum(self.slots)
+
+    def add(self, slot: int, weight: int) -> int:
+        """计入一个桶，返回窗口内合计；早于窗口的事件不计入"""
+        size = len(self.slots)
+        if slot > self.head:
+            # 窗口前移，清空移出窗口的桶
+            for index in range(self.head + 1, min(slot, self.head + size) + 1):
+                self.total -= self.slots[index % size]
+                self.slots[index % size] = 0
+            self.head = slot
+        elif slot <= self.head - size:
+            return self.total
+        self.slots[slot % size] += weight
+        self.total += weight
+        return self.total
+
+    def reset(self) -> None:
+        """清零（告警后重新计数）"""
+        self.slots = [0] * len(self.slots)
+        self.total = 0
+
+class RuleWindow:
+    """一条阈值规则的全部分组"""
+
+    def __init__(self, rule: CompiledRule, slots: int, max_keys: int):
+        self.rule = rule
+        self.size = max(1, min(slots, rule.threshold.window))
+        self.width = rule.threshold.window / self.size
+        self.max_keys = max_keys
+        self.keys: "OrderedDict[Tuple[Any, ...], WindowCounter]" = OrderedDict()
+        self.latest = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def slot(self, event: Dict[str, Any]) -> Optional[int]:
+        """事件时间所在的桶序号，没有时间的事件返回None"""
+        when = event.get("event_time") or event.get("created_at")
+        if not isinstance(when, datetime):
+            return None
+        if when.tzinfo is not None:
+            when = when.replace(tzinfo=None) - when.utcoffset()
+        return int((when - _EPOCH).total_seconds() // self.width)
+
+    def observe(self, event: Dict[str, Any]) -> Optional[int]:
+        """计入一条命中的事件，超过阈值时返回窗口内合计并清零该分组"""
+        slot = self.slot(event)
+        if slot is None:
+            return None
+        key = self.rule.threshold.key(event)
+        counter = self.keys.get(key)
+        if counter is None:
+            counter = self.keys[key] = WindowCounter(self.size, slot)
+            if len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.keys.move_to_end(key)
+        if slot > self.latest:
+            self.latest = slot
+
+        total = counter.add(slot, event.get("count") or 1)
+        if total > self.rule.threshold.count:
+            counter.reset()
+            return total
+        return None
+
+    def expire(self) -> int:
+        """清理窗口已整体过期的分组（从最久未更新的一端开始）"""
+        removed = 0
+        while self.keys:
+            key, counter = next(iter(self.keys.items()))
+            if counter.head > self.latest - self.size:
+                break
+            del self.keys[key]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "signature": self.rule.signature,
+            "latest": self.latest,
+            "keys": [[list(key), counter.head, counter.slots] for key, counter in self.keys.items()],
+        }
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        self.latest = data.get("latest", 0)
+        for key, head, slots in data.get("keys", []):
+            if len(slots) == self.size:
+                self.keys[tuple(key)] = WindowCounter(self.size, head, slots)
+
+class RuleSequence:
+    """
+    一条序列规则的全部分组
+
+    部分匹配为 (起点时间, 最近一步时间, 各步事件ID)，时间为 epoch 秒
+    """
+
+    def __init__(self, rule: CompiledRule, max_keys: int):
+        self.rule = rule
+        self.max_keys = max_keys
+        self.keys: "OrderedDict[Tuple[Any, ...], List[Optional[Tuple[float, float, Tuple[Any, ...]]]]]" = OrderedDict()
+        self.latest = 0.0
+        self.evicted = 0
+        self.expired = 0
+        self.pruned = 0
+        self.completed = 0
+
+    @property
+    def partial_matches(self) -> int:
+        return sum(1 for stages in self.keys.values() for partial in stages if partial is not None)
+
+    def observe(self, event: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        """推进事件所在分组的状态机，序列完成时返回各步的事件ID并清空该分组"""
+        sequence = self.rule.sequence
+        matched = sequence.matched_steps(event)
+        when = event.get("event_time") or event.get("created_at")
+        if not matched or not isinstance(when, datetime):
+            return None
+        if when.tzinfo is not None:
+            when = when.replace(tzinfo=None) - when.utcoffset()
+        now = (when - _EPOCH).total_seconds()
+        if now > self.latest:
+            self.latest = now
+
+        key = sequence.key(event)
+        stages = self.keys.get(key)
+        if stages is None:
+            if 0 not in matched:
+                return None
+            stages = self.keys[key] = [None] * (len(sequence.steps) - 1)
+            if len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.keys.move_to_end(key)
+
+        event_id = event.get("id")
+        last_step = len(sequence.steps) - 1
+        # 从后往前推进，同一事件不会连续推进多步
+        for stage in range(len(stages) - 1, -1, -1):
+            partial = stages[stage]
+            if partial is None:
+                continue
+            start, last, ids = partial
+            if now - start > sequence.within:
+                stages[stage] = None
+                self.pruned += 1
+                continue
+            if stage + 1 not in matched or now < last:
+                continue
+            stages[stage] = None
+            if stage + 1 == last_step:
+                del self.keys[key]
+                self.completed += 1
+                return ids + (event_id,)
+            current = stages[stage + 1]
+            if current is None or current[0] <= start:
+                stages[stage + 1] = (start, now, ids + (event_id,))
+
+        if 0 in matched:
+            current = stages[0]
+            if current is None or current[0] <= now:
+                stages[0] = (now, now, (event_id,))
+        return None
+
+    def expire(self) -> int:
+        """清理部分匹配全部超时的分组（从最久未更新的一端开始）"""
+        removed = 0
+        horizon = self.latest - self.rule.sequence.within
+        while self.keys:
+            key, stages = next(iter(self.keys.items()))
+            if any(partial is not None and partial[0] >= horizon for partial in stages):
+                break
+            del self.keys[key]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "signature": self.rule.signature,
+            "latest": self.latest,
+            "keys": [[list(key), stages] for key, stages in self.keys.items()],
+        }
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        self.latest = data.get("latest", 0.0)
+        size = len(self.rule.sequence.steps) - 1
+        for key, stages in data.get("keys", []):
+            if len(stages) == size:
+                self.keys[tuple(key)] = [
+                    None if partial is None else (partial[0], partial[1], tuple(partial[2]))
+                    for partial in stages
+                ]
+
+class WindowStore:
+    """
+    规则集全部有状态规则的状态（阈值规则为 RuleWindow，序列规则为 RuleSequence）
+
+    规则重新加载后调用 sync：新增规则建立空状态，删除或条件已修改的规则丢弃状态
+    """
+
+    def __init__(self, slots: Optional[int] = None, max_keys: Optional[int] = None):
+        self.slots = slots or settings.RULE_WINDOW_SLOTS
+        self.max_keys = max_keys or settings.RULE_WINDOW_MAX_KEYS
+        self.windows: Dict[int, Union[RuleWindow, RuleSequence]] = {}
+        # 状态对应的检查点事件ID
+        self.last_id = 0
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+    def sync(self, rules: Iterable[CompiledRule]) -> None:
+        """按当前规则集增删窗口"""
+        windows = {}
+        for rule in rules:
+            if not rule.stateful:
+                continue
+            window = self.windows.get(rule.id)
+            if window is None or window.rule.signature != rule.signature:
+                window = self._create(rule)
+                data = self._pending.pop(rule.id, None)
+                if data is not None and data.get("signature") == rule.signature:
+                    window.restore(data)
+            else:
+                window.rule = rule
+            windows[rule.id] = window
+        self.windows = windows
+
+    def clear(self) -> None:
+        """丢弃全部窗口状态"""
+        self.windows = {}
+        self._pending = {}
+
+    def _create(self, rule: CompiledRule) -> Union[RuleWindow, RuleSequence]:
+        if rule.sequence is not None:
+            return RuleSequence(rule, self.max_keys)
+        return RuleWindow(rule, self.slots, self.max_keys)
+
+    def observe(self, rule: CompiledRule, event: Dict[str, Any]) -> Any:
+        """
+        计入命中有状态规则的事件
+
+        Returns:
+            阈值规则达到阈值时返回窗口内合计，序列规则完成时返回各步事件ID，否则为None
+        """
+        window = self.windows.get(rule.id)
+        if window is None:
+            window = self.windows[rule.id] = self._create(rule)
+        return window.observe(event)
+
+    def expire(self) -> int:
+        """清理全部规则的过期分组"""
+        return sum(window.expire() for window in self.windows.values())
+
+    def save_rules(self, rule_ids: Iterable[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """
+        复制指定规则当前的状态（处理一块事件前调用，写入失败时用 restore_rules 撤销）
+
+        Returns:
+            Dict[int, Optional[Dict[str, Any]]]: 规则ID → 状态（尚无状态的规则为None）
+        """
+        saved = {}
+        for rule_id in rule_ids:
+            window = self.windows.get(rule_id)
+            saved[rule_id] = None if window is None else {
+                **window.dump(), "evicted": window.evicted, "expired": window.expired
+            }
+        return saved
+
+    def restore_rules(self, saved: Dict[int, Optional[Dict[str, Any]]]) -> None:
+        """恢复 save_rules 保存的状态，撤销之后计入的事件"""
+        for rule_id, data in saved.items():
+            window = self.windows.pop(rule_id, None)
+            if data is None or window is None:
+                continue
+            restored = self._create(window.rule)
+            restored.restore(data)
+            restored.evicted = data["evicted"]
+            restored.expired = data["expired"]
+            self.windows[rule_id] = restored
+
+    def stats(self) -> Dict[str, Any]:
+        """状态概况（分组数、部分匹配数用于评估内存占用）"""
+        sequences = [window for window in self.windows.values() if isinstance(window, RuleSequence)]
+        return {
+            "rules": len(self.windows),
+            "keys": sum(len(window.keys) for window in self.windows.values()),
+            "evicted": sum(window.evicted for window in self.windows.values()),
+            "expired": sum(window.expired for window in self.windows.values()),
+            "partial_matches": sum(window.partial_matches for window in sequences),
+            "pruned_partial_matches": sum(window.pruned for window in sequences),
+            "completed_sequences": sum(window.completed for window in sequences),
+            "last_id": self.last_id,
+        }
+
+    def save(self, path: str) -> None:
+        """写入快照（原子替换）"""
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "last_id": self.last_id,
+            "saved_at": datetime.utcnow().isoformat(),
+            "rules": {str(rule_id): window.dump() for rule_id, window in self.windows.items()},
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, slots: Optional[int] = None, max_keys: Optional[int] = None) -> "WindowStore":
+        """
+        读取快照，文件不存在或损坏时返回空状态
+
+        快照中的窗口在 sync 时按规则ID和条件摘要认领
+        """
+        store = cls(slots, max_keys)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return store
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取阈值窗口快照失败，从空状态开始: {e}")
+            return store
+        if data.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"阈值窗口快照版本不匹配，已忽略: {data.get('version')}")
+            return store
+        store.last_id = data.get("last_id", 0)
+        store._pending = {int(rule_id): window for rule_id, window in data.get("rules", {}).items()}
+        return store
@@ -0,0 +1,333 @@
+"""
+规则引擎工作进程
+按事件ID增量读取新写入的事件，用编译后的规则集匹配，命中的告警按块批量写入
+
+- 与Manticore同步相同，以事件ID为高水位，检查点保存在 sync_checkpoints 表
+- 每块的告警写入和检查点推进在同一事务中提交，崩溃重启后不会漏报或重复告警；
+  有状态规则在提交前计入该块事件，写入失败时恢复块前的状态，重读该块时不会重复计数
+- 重复命中按聚合键合并到未处理完的告警上（见 alert_grouping）
+- 所有写入路径（同步写入、缓冲写入器、syslog采集器）的事件都经过规则匹配
+- 阈值和序列规则的状态定期写入快照，重启时加载并重放快照之后已提交的事件（见 rule_window），
+  状态规模（分组数、部分匹配数）写入指标文件，由系统接口展示
+
+运行方式: python -m app.services.rule_worker
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+import signal
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.crud.sync_crud import advance_checkpoint, get_checkpoint
+from app.models.postgres import Event
+from app.services.alert_grouping import write_alerts
+from app.services.rule_engine import CompiledRule, RuleRegistry, RuleSet, alert_row
+from app.services.rule_window import WindowStore
+from app.services.syslog_collector import write_stats_file
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 规则引擎的检查点名称
+EVENTS_RULE_ENGINE = "events_rule_engine"
+
+# 匹配时读取的事件列（raw_data 只在有规则用到时读取）
+_MATCH_COLUMNS = (
+    Event.id,
+    Event.event_type,
+    Event.asset_id,
+    Event.source_ip,
+    Event.destination_ip,
+    Event.source_port,
+    Event.destination_port,
+    Event.protocol,
+    Event.description,
+    Event.event_time,
+    Event.created_at,
+    Event.count,
+    Event.first_seen,
+    Event.last_seen,
+)
+
+def _initial_checkpoint(db: Session) -> int:
+    """
+    首次运行时的起点
+
+    RULE_ENGINE_START_AT 为 latest 时从当前最大事件ID开始，不为历史事件补发告警
+    """
+    checkpoint = get_checkpoint(db, EVENTS_RULE_ENGINE)
+    if checkpoint.last_id == 0 and checkpoint.synced_rows == 0 and settings.RULE_ENGINE_START_AT == "latest":
+        max_id = db.query(func.max(Event.id)).scalar() or 0
+        if max_id:
+            advance_checkpoint(db, EVENTS_RULE_ENGINE, max_id, None, 0)
+            logger.info(f"规则引擎首次运行，从事件ID {max_id} 之后开始匹配")
+        return max_id
+    return checkpoint.last_id
+
+def _threshold_summary(event: Dict[str, Any], rule: CompiledRule, total: int) -> str:
+    threshold = rule.threshold
+    group = ", ".join(f"{field}={value}" for field, value in zip(threshold.group_by, threshold.key(event)))
+    return f"{group or '全部事件'} 在 {threshold.window} 秒内 {total} 次，超过阈值 {threshold.count}"
+
+def _sequence_summary(event: Dict[str, Any], rule: CompiledRule, event_ids: Tuple[Any, ...]) -> str:
+    sequence = rule.sequence
+    group = ", ".join(f"{field}={value}" for field, value in zip(sequence.group_by, sequence.key(event)))
+    steps = " → ".join(f"#{event_id}" for event_id in event_ids)
+    return f"{group or '全部事件'} 在 {sequence.within} 秒内依次发生 {len(event_ids)} 步: 事件 {steps}"
+
+def _alert_rows(
+    matches: List[Tuple[Dict[str, Any], CompiledRule]],
+    windows: WindowStore,
+    now: datetime
+) -> List[Tuple[CompiledRule, Dict[str, Any]]]:
+    """命中结果转换为 (规则, 告警行)，有状态规则先推进状态，达到阈值或序列完成时才告警"""
+    rows = []
+    for event, rule in matches:
+        if not rule.stateful:
+            rows.append((rule, alert_row(event, rule, now)))
+            continue
+        result = windows.observe(rule, event)
+        if result is None:
+            continue
+        if rule.threshold is not None:
+            rows.append((rule, alert_row(event, rule, now, _threshold_summary(event, rule, result))))
+        else:
+            rows.append((rule, alert_row(event, rule, now, _sequence_summary(event, rule, result))))
+    return rows
+
+def evaluate_new_events(
+    db: Session,
+    rule_set: RuleSet,
+    chunk_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+    settle_seconds: Optional[int] = None,
+    windows: Optional[WindowStore] = None
+) -> Dict[str, Any]:
+    """
+    匹配检查点之后的新事件并写入告警
+
+    Args:
+        db: 数据库会话
+        rule_set: 编译后的规则集
+        chunk_size: 每块读取的事件数
+        max_rows: 本次最多处理的事件数（None为不限制）
+        settle_seconds: 只处理写入时间早于该秒数的事件，避免越过尚未提交的较小ID
+        windows: 阈值规则的窗口状态（None时使用仅本次有效的临时状态）
+
+    Returns:
+        Dict[str, Any]: 处理的事件数、新建的告警数、合并到已有告警的命中数、高水位和耗时
+    """
+    chunk_size = chunk_size or settings.RULE_ENGINE_CHUNK_SIZE
+    settle_seconds = settings.RULE_ENGINE_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+    columns = _MATCH_COLUMNS + ((Event.raw_data,) if rule_set.uses_raw_data else ())
+    windows = windows if windows is not None else WindowStore()
+    windows.sync(rule_set.rules)
+
+    started = time.perf_counter()
+    last_id = _initial_checkpoint(db)
+    processed = 0
+    alerts = 0
+    merged = 0
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+
+    while max_rows is None or processed < max_rows:
+        limit = chunk_size if max_rows is None else min(chunk_size, max_rows - processed)
+        rows = db.execute(
+            select(*columns).where(Event.id > last_id).order_by(Event.id).limit(limit)
+        ).all()
+
+        events: List[Dict[str, Any]] = []
+        for row in rows:
+            if row.created_at is not None and row.created_at > cutoff:
+                break
+            events.append(row._asdict())
+        if not events:
+            break
+
+        now = datetime.utcnow()
+        matches = rule_set.match_batch(events)
+        saved = windows.save_rules({rule.id for _, rule in matches if rule.stateful})
+        tail = events[-1]
+        try:
+            alert_rows = _alert_rows(matches, windows, now)
+            written = write_alerts(db, alert_rows) if alert_rows else {"created": 0, "merged": 0}
+            # advance_checkpoint 提交事务，告警与检查点一起生效
+            advance_checkpoint(db, EVENTS_RULE_ENGINE, tail["id"], tail["event_time"], len(events))
+        except Exception:
+            db.rollback()
+            windows.restore_rules(saved)
+            raise
+
+        last_id = windows.last_id = tail["id"]
+        processed += len(events)
+        alerts += written["created"]
+        merged += written["merged"]
+        if len(events) < len(rows) or len(rows) < limit:
+            break
+
+    windows.expire()
+    duration = time.perf_counter() - started
+    if processed:
+        logger.info(f"规则引擎处理事件 {processed} 条，产生告警 {alerts} 条，合并重复命中 {merged} 次，高水位 {last_id}，耗时 {duration:.2f}s")
+    return {
+        "processed": processed,
+        "alerts": alerts,
+        "merged": merged,
+        "last_id": last_id,
+        "duration": duration,
+    }
+
+def replay_windows(
+    db: Session,
+    rule_set: RuleSet,
+    windows: WindowStore,
+    chunk_size: Optional[int] = None
+) -> int:
+    """
+    把快照之后、检查点之前已提交的事件重新计入有状态规则（不产生告警）
+
+    没有快照时从空状态开始；只重放仍在最长窗口内的事件
+
+    Returns:
+        int: 重放的事件数
+    """
+    chunk_size = chunk_size or settings.RULE_ENGINE_CHUNK_SIZE
+    checkpoint = get_checkpoint(db, EVENTS_RULE_ENGINE).last_id
+    windows.sync(rule_set.rules)
+    if windows.last_id > checkpoint:
+        logger.warning(f"阈值窗口快照（事件ID {windows.last_id}）比检查点 {checkpoint} 新，已丢弃")
+        windows.clear()
+    if not windows.windows or windows.last_id == 0:
+        windows.last_id = checkpoint
+        return 0
+
+    longest = max(window.rule.horizon for window in windows.windows.values())
+    since = datetime.utcnow() - timedelta(seconds=longest)
+    columns = _MATCH_COLUMNS + ((Event.raw_data,) if rule_set.uses_raw_data else ())
+    replayed = 0
+    while windows.last_id < checkpoint:
+        rows = db.execute(
+            select(*columns)
+            .where(Event.id > windows.last_id, Event.id <= checkpoint, Event.event_time >= since)
+            .order_by(Event.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        events = [row._asdict() for row in rows]
+        for event, rule in rule_set.match_batch(events):
+            if rule.stateful:
+                windows.observe(rule, event)
+        windows.last_id = events[-1]["id"]
+        replayed += len(events)
+    windows.last_id = checkpoint
+    if replayed:
+        logger.info(f"阈值窗口已重放快照之后的事件 {replayed} 条")
+    return replayed
+
+class RuleWorker:
+    """
+    规则引擎常驻循环
+
+    没有新事件时按 poll_interval 休眠；后台线程按 reload_interval 轮询规则集版本号，
+    有变化时增量编译并整体替换规则集，匹配循环不暂停，下一块事件起使用新规则集。
+    有状态规则的状态按 RULE_WINDOW_SNAPSHOT_INTERVAL 写入快照，退出时再写一次
+    """
+
+    def __init__(self, poll_interval: Optional[float] = None, reload_interval: Optional[float] = None):
+        self.poll_interval = settings.RULE_ENGINE_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.reload_interval = settings.RULE_ENGINE_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self.registry = RuleRegistry()
+        self._stop = threading.Event()
+        self._reloader: Optional[threading.Thread] = None
+        self.snapshot_file = settings.RULE_WINDOW_SNAPSHOT_FILE
+        self.windows = WindowStore.load(self.snapshot_file)
+        self._restored = False
+        self._saved_at = time.monotonic()
+
+    @property
+    def rule_set(self) -> RuleSet:
+        return self.registry.rule_set
+
+    def stop(self) -> None:
+        """请求停止（当前块处理完后退出）"""
+        self._stop.set()
+
+    def reload(self) -> bool:
+        """检查规则集版本号，有变化时增量重新加载"""
+        db = SessionLocal()
+        try:
+            return self.registry.refresh(db)
+        finally:
+            db.close()
+
+    def _reload_loop(self) -> None:
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"重新加载告警规则失败: {e}")
+
+    def save_windows(self) -> None:
+        """写入有状态规则的快照和状态指标"""
+        try:
+            self.windows.save(self.snapshot_file)
+            write_stats_file(settings.RULE_ENGINE_STATS_FILE, self.windows.stats())
+        except OSError as e:
+            logger.error(f"写入规则状态快照失败: {e}")
+        self._saved_at = time.monotonic()
+
+    def run_once(self) -> Dict[str, Any]:
+        """执行一轮匹配"""
+        db = SessionLocal()
+        try:
+            if not self._restored:
+                self.registry.refresh(db)
+                replay_windows(db, self.rule_set, self.windows)
+                self._restored = True
+            # 本轮使用同一个规则集，后台线程的替换从下一轮生效
+            result = evaluate_new_events(db, self.rule_set, windows=self.windows)
+        finally:
+            db.close()
+        if self.windows.windows and time.monotonic() - self._saved_at >= settings.RULE_WINDOW_SNAPSHOT_INTERVAL:
+            self.save_windows()
+        return result
+
+    def run(self) -> None:
+        """循环运行直到 stop"""
+        logger.info("规则引擎已启动")
+        self._reloader = threading.Thread(target=self._reload_loop, name="rule-reloader", daemon=True)
+        self._reloader.start()
+        while not self._stop.is_set():
+            try:
+                result = self.run_once()
+            except Exception as e:
+                logger.error(f"规则引擎处理失败: {e}")
+                result = {"processed": 0}
+            if not result["processed"]:
+                self._stop.wait(self.poll_interval)
+        self._reloader.join()
+        if self._restored and self.windows.windows:
+            self.save_windows()
+        logger.info("规则引擎已停止")
+
+def main():
+    """命令行入口"""
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    worker = RuleWorker()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    worker.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""
+syslog 采集器
+基于asyncio监听UDP/TCP端口接收蜜罐日志，解析后交给日志清洗器和事件批量写入器
+
+数据流:
+    UDP/TCP接收 → 有界接收队列 → 解析+清洗（线程池） → 聚合阶段/批量写入器
+
+- 接收回调只做入队，不做解析，避免慢处理阻塞收包
+- 接收队列超过水位线后按 1/N 采样入队（保留的事件 count 乘以 N，统计总量近似不变），
+  队列满时丢弃；所有丢弃和采样都按原因计数
+- 下游写入器队列满时处理协程等待，背压传导到接收队列
+- 可单独运行（python -m app.services.syslog_collector），也可由gunicorn主进程拉起
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import Counter, defaultdict
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+
+from app.core.config import settings
+from app.services.log_service import LogNormalizer, log_normalizer
+from app.services.syslog_parser import SyslogParseError, parse_message
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 过载策略
+OVERLOAD_POLICIES = ("drop", "sample")
+
+# 停止信号
+_STOP = object()
+
+def load_asset_map() -> Dict[str, int]:
+    """加载 资产IP → 资产ID 映射，用于按发送端地址归属事件"""
+    from app.core.db import SessionLocal
+    from app.models.postgres import Asset
+
+    db = SessionLocal()
+    try:
+        return {ip: asset_id for asset_id, ip in db.query(Asset.id, Asset.ip_address).all()}
+    finally:
+        db.close()
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    """UDP接收协议，每个数据报是一条消息"""
+
+    def __init__(self, collector: "SyslogCollector"):
+        self.collector = collector
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.collector.offer(data, addr[0], "udp")
+
+    def error_received(self, exc: Exception) -> None:
+        logger.warning(f"UDP接收错误: {exc}")
+
+class SyslogCollector:
+    """
+    syslog/JSON 日志采集器
+
+    sink 需提供 async enqueue(row)，通常是 event_writer 或 event_aggregator，
+    其启动和停止由调用方负责（需在采集器停止之后停止）
+    """
+
+    def __init__(
+        self,
+        sink: Any,
+        normalizer: Optional[LogNormalizer] = None,
+        host: str = "0.0.0.0",
+        udp_port: Optional[int] = 5514,
+        tcp_port: Optional[int] = 5514,
+        queue_size: int = 50000,
+        batch_size: int = 1000,
+        max_latency: float = 0.5,
+        overload_policy: str = "sample",
+        sample_watermark: float = 0.8,
+        sample_rate: int = 10,
+        max_message_bytes: int = 64 * 1024,
+        asset_loader: Optional[Callable[[], Dict[str, int]]] = None
+    ):
+        if overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"未知的过载策略: {overload_policy}")
+        self.sink = sink
+        self.normalizer = normalizer or log_normalizer
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.overload_policy = overload_policy
+        self.sample_threshold = int(queue_size * sample_watermark)
+        self.sample_rate = max(sample_rate, 1)
+        self.max_message_bytes = max_message_bytes
+        self.asset_loader = asset_loader
+        self.asset_map: Dict[str, int] = {}
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._udp_transport: Optional[asyncio.DatagramTransport] = None
+        self._tcp_server: Optional[asyncio.AbstractServer] = None
+        self._sample_seq = 0
+
+        # 运行指标
+        self.received: Counter = Counter()
+        self.dropped: Counter = Counter()
+        self.sampled_out = 0
+        self.parse_errors = 0
+        self.rejected = 0
+        self.forwarded = 0
+        self.tcp_connections = 0
+        self.started_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        """处理协程是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        """接收队列中的消息数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """启动处理协程和监听端口"""
+        if self.running:
+            return
+        if self.asset_loader is not None:
+            await self.refresh_assets()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="syslog-collector")
+        loop = asyncio.get_running_loop()
+
+        if self.udp_port is not None:
+            self._udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UdpProtocol(self), local_addr=(self.host, self.udp_port)
+            )
+            logger.info(f"syslog采集器监听 UDP {self.host}:{self.udp_port}")
+        if self.tcp_port is not None:
+            self._tcp_server = await asyncio.start_server(
+                self._handle_tcp, self.host, self.tcp_port, limit=self.max_message_bytes
+            )
+            logger.info(f"syslog采集器监听 TCP {self.host}:{self.tcp_port}")
+        self.started_at = datetime.utcnow()
+
+    async def stop(self, timeout: Optional[float] = 30.0) -> None:
+        """停止接收，把接收队列中的消息处理完后退出"""
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+            self._udp_transport = None
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+            self._tcp_server = None
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"syslog采集器停止超时，剩余 {self.queue_depth} 条消息未处理")
+            self._task.cancel()
+        self._task = None
+        logger.info("syslog采集器已停止")
+
+    async def refresh_assets(self) -> None:
+        """重新加载资产IP映射"""
+        try:
+            self.asset_map = await asyncio.to_thread(self.asset_loader)
+        except Exception as e:
+            logger.warning(f"加载资产IP映射失败: {e}")
+
+    def offer(self, data: bytes, peer_ip: Optional[str], transport: str) -> bool:
+        """
+        接收一条消息并按过载策略入队
+
+        Returns:
+            bool: 是否入队
+        """
+        self.received[transport] += 1
+        if self._queue is None:
+            self.dropped["not_running"] += 1
+            return False
+        if len(data) > self.max_message_bytes:
+            self.dropped["oversize"] += 1
+            return False
+
+        weight = 1
+        if self.overload_policy == "sample" and self._queue.qsize() >= self.sample_threshold:
+            self._sample_seq += 1
+            if self._sample_seq % self.sample_rate:
+                self.sampled_out += 1
+                return False
+            weight = self.sample_rate
+
+        try:
+            self._queue.put_nowait((data, peer_ip, weight))
+        except asyncio.QueueFull:
+            self.dropped["queue_full"] += 1
+            return False
+        return True
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        TCP连接处理，支持RFC6587的两种分帧
+
+        - 以数字开头: 计数分帧 "长度 消息"
+        - 其他: 换行分帧
+        """
+        peer = writer.get_extra_info("peername")
+        peer_ip = peer[0] if peer else None
+        self.tcp_connections += 1
+        try:
+            while True:
+                head = await reader.read(1)
+                if not head:
+                    break
+                if head.isdigit():
+                    length_text = head + (await reader.readuntil(b" "))[:-1]
+                    if not length_text.isdigit():
+                        self.dropped["bad_frame"] += 1
+                        break
+                    length = int(length_text)
+                    if length > self.max_message_bytes:
+                        self.dropped["oversize"] += 1
+                        break
+                    self.offer(await reader.readexactly(length), peer_ip, "tcp")
+                elif head in b"\r\n":
+                    continue
+                else:
+                    self.offer(head + await reader.readuntil(b"\n"), peer_ip, "tcp")
+        except asyncio.IncompleteReadError as e:
+            # 连接关闭前最后一行没有换行符
+            if e.partial and not e.partial[:1].isdigit():
+                self.offer(e.partial, peer_ip, "tcp")
+        except asyncio.LimitOverrunError:
+            self.dropped["oversize"] += 1
+        except (ConnectionError, ValueError) as e:
+            logger.debug(f"TCP连接 {peer_ip} 异常关闭: {e}")
+        finally:
+            self.tcp_connections -= 1
+            writer.close()
+
+    def process(self, items: List[Tuple[bytes, Optional[str], int]]) -> List[Dict[str, Any]]:
+        """
+        解析并清洗一批消息（在线程池中执行）
+
+        按 (来源, 资产, 采样权重) 分组后调用清洗器，采样保留的事件 count 乘以权重
+        """
+        groups: Dict[Tuple[str, Optional[int], int], List[Dict[str, Any]]] = defaultdict(list)
+        for data, peer_ip, weight in items:
+            try:
+                source, record = parse_message(data, peer_ip)
+            except SyslogParseError:
+                self.parse_errors += 1
+                continue
+            groups[(source, self.asset_map.get(peer_ip), weight)].append(record)
+
+        rows: List[Dict[str, Any]] = []
+        for (source, asset_id, weight), records in groups.items():
+            batch = self.normalizer.normalize_batch(source, records, asset_id=asset_id)
+            self.rejected += batch.rejected
+            if weight > 1:
+                for row in batch.events:
+                    row["count"] = (row.get("count") or 1) * weight
+            rows.extend(batch.events)
+        return rows
+
+    async def _run(self) -> None:
+        """处理循环：攒批、解析清洗、交给下游"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    item = await self._get_with_timeout(remaining)
+                    if item is None:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._forward(batch)
+
+        # 停止时处理剩余消息
+        batch = [item for item in self._drain() if item is not _STOP]
+        for start in range(0, len(batch), self.batch_size):
+            await self._forward(batch[start:start + self.batch_size])
+
+    async def _get_with_timeout(self, timeout: float) -> Any:
+        """带超时的出队，超时返回None（与 BatchWriter 相同，避免超时与出队同时发生时丢消息）"""
+        getter = asyncio.ensure_future(self._queue.get())
+        done, _ = await asyncio.wait({getter}, timeout=timeout)
+        if not done:
+            getter.cancel()
+            try:
+                return await getter
+            except asyncio.CancelledError:
+                return None
+        return getter.result()
+
+    def _drain(self) -> List[Any]:
+        items = []
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _forward(self, batch: List[Tuple[bytes, Optional[str], int]]) -> None:
+        try:
+            rows = await asyncio.to_thread(self.process, batch)
+        except Exception as e:
+            logger.error(f"处理 {len(batch)} 条syslog消息失败，丢弃: {e}")
+            self.dropped["process_error"] += len(batch)
+            return
+        for row in rows:
+            await self.sink.enqueue(row)
+        self.forwarded += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取运行指标"""
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.queue_size,
+            "overload_policy": self.overload_policy,
+            "received": dict(self.received),
+            "received_total": sum(self.received.values()),
+            "dropped": dict(self.dropped),
+            "dropped_total": sum(self.dropped.values()),
+            "sampled_out": self.sampled_out,
+            "parse_errors": self.parse_errors,
+            "rejected": self.rejected,
+            "forwarded": self.forwarded,
+            "tcp_connections": self.tcp_connections,
+            "assets": len(self.asset_map),
+            "started_at": self.started_at,
+        }
+
+def write_stats_file(path: str, stats: Dict[str, Any]) -> None:
+    """原子写入采集器指标文件，供API进程读取"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(stats, updated_at=datetime.utcnow()), f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+def read_stats_file(path: str) -> Optional[Dict[str, Any]]:
+    """读取采集器指标文件，不存在时返回None"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+async def _report(collector: SyslogCollector, writer: Any, interval: float) -> None:
+    """定期输出指标文件、刷新资产映射，丢弃数增加时记录警告"""
+    last_lost = 0
+    last_refresh = asyncio.get_running_loop().time()
+    while True:
+        await asyncio.sleep(interval)
+        stats = collector.stats()
+        stats["writer"] = writer.stats()
+        try:
+            await asyncio.to_thread(write_stats_file, settings.COLLECTOR_STATS_FILE, stats)
+        except OSError as e:
+            logger.warning(f"写入采集器指标文件失败: {e}")
+
+        lost = stats["dropped_total"] + stats["sampled_out"]
+        if lost > last_lost:
+            logger.warning(
+                f"syslog采集器过载: 新增丢弃 {lost - last_lost} 条"
+                f"（丢弃 {stats['dropped']}，采样跳过 {stats['sampled_out']}）"
+            )
+            last_lost = lost
+
+        now = asyncio.get_running_loop().time()
+        if collector.asset_loader is not None and now - last_refresh >= settings.COLLECTOR_ASSET_REFRESH:
+            await collector.refresh_assets()
+            last_refresh = now
+
+async def run_collector(
+    host: Optional[str] = None,
+    udp_port: Optional[int] = None,
+    tcp_port: Optional[int] = None
+) -> None:
+    """
+    独立运行采集器，收到SIGINT/SIGTERM后按顺序停止
+
+    参数为None时使用配置，端口为0表示不监听该协议
+    """
+    from app.core.batch_writer import event_writer
+    from app.core.event_aggregator import event_aggregator
+
+    aggregate = settings.EVENT_AGGREGATION_ENABLED
+    collector = SyslogCollector(
+        sink=event_aggregator if aggregate else event_writer,
+        host=host or settings.COLLECTOR_HOST,
+        udp_port=(settings.COLLECTOR_UDP_PORT if udp_port is None else udp_port) or None,
+        tcp_port=(settings.COLLECTOR_TCP_PORT if tcp_port is None else tcp_port) or None,
+        queue_size=settings.COLLECTOR_QUEUE_SIZE,
+        batch_size=settings.COLLECTOR_BATCH_SIZE,
+        max_latency=settings.COLLECTOR_MAX_LATENCY,
+        overload_policy=settings.COLLECTOR_OVERLOAD_POLICY,
+        sample_watermark=settings.COLLECTOR_SAMPLE_WATERMARK,
+        sample_rate=settings.COLLECTOR_SAMPLE_RATE,
+        max_message_bytes=settings.COLLECTOR_MAX_MESSAGE_BYTES,
+        asset_loader=load_asset_map,
+    )
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await event_writer.start()
+    if aggregate:
+        await event_aggregator.start()
+    await collector.start()
+    reporter = asyncio.create_task(_report(collector, event_writer, settings.COLLECTOR_STATS_INTERVAL))
+
+    await stop_event.wait()
+    logger.info("syslog采集器收到停止信号")
+    reporter.cancel()
+    await collector.stop()
+    if aggregate:
+        await event_aggregator.stop()
+    await event_writer.stop()
+    write_stats_file(settings.COLLECTOR_STATS_FILE, dict(collector.stats(), writer=event_writer.stats()))
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="H-System syslog采集器")
+    parser.add_argument("--host", help="监听地址")
+    parser.add_argument("--udp-port", type=int, help="UDP端口（0表示不监听）")
+    parser.add_argument("--tcp-port", type=int, help="TCP端口（0表示不监听）")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(run_collector(host=args.host, udp_port=args.udp_port, tcp_port=args.tcp_port))
+
+if __name__ == "__main__":
+    main()
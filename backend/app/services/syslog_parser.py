@@ -0,0 +1,231 @@
+"""
+syslog 消息解析
+把采集器收到的一条消息解析为 (来源, 记录)，交给日志清洗器按来源映射处理
+
+支持的格式:
+- RFC5424: <PRI>1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID [SD] MSG
+- RFC3164: <PRI>Mmm dd hh:mm:ss HOSTNAME TAG[PID]: MSG
+- JSON行: 蜜罐直接输出的JSON日志（无syslog头）
+
+syslog消息体本身是JSON时（rsyslog转发的Cowrie日志等）按JSON记录处理，
+否则作为 "syslog" 来源的纯文本记录
+"""
+
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timezone
+import json
+import re
+
+# syslog facility/severity 名称
+FACILITIES = (
+    "kern", "user", "mail", "daemon", "auth", "syslog", "lpr", "news",
+    "uucp", "cron", "authpriv", "ftp", "ntp", "security", "console", "clock",
+    "local0", "local1", "local2", "local3", "local4", "local5", "local6", "local7",
+)
+SEVERITIES = ("emerg", "alert", "crit", "err", "warning", "notice", "info", "debug")
+
+# 程序名 → 日志来源（与 SOURCE_MAPPINGS 的键对应）
+APP_SOURCES = {
+    "cowrie": "cowrie",
+    "dionaea": "dionaea",
+    "opencanary": "opencanary",
+    "opencanaryd": "opencanary",
+    "sysmon": "sysmon",
+}
+
+_PRI = re.compile(rb"^<(\d{1,3})>")
+_RFC3164_HEADER = re.compile(
+    r"^(?P<month>[A-Z][a-z]{2}) {1,2}(?P<day>\d{1,2}) (?P<time>\d{2}:\d{2}:\d{2}) "
+    r"(?:(?P<host>\S+) )?(?P<tag>[^\s:\[]+)(?:\[(?P<pid>[^\]]*)\])?: ?(?P<msg>.*)$",
+    re.S
+)
+_MONTHS = {name: index for index, name in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1
+)}
+_SD_PARAM = re.compile(r'([^\s=\]"]+)="((?:[^"\\\]]|\\.)*)"')
+_SD_UNESCAPE = re.compile(r'\\(["\\\]])')
+
+class SyslogParseError(ValueError):
+    """消息无法解析"""
+
+def _nil(value: str) -> Optional[str]:
+    return None if value == "-" else value
+
+def _parse_structured_data(text: str) -> Tuple[Dict[str, Dict[str, str]], str]:
+    """解析RFC5424结构化数据，返回 (数据, 剩余的MSG)"""
+    if text.startswith("-"):
+        return {}, text[2:] if text.startswith("- ") else text[1:]
+
+    elements: Dict[str, Dict[str, str]] = {}
+    position = 0
+    while position < len(text) and text[position] == "[":
+        # 找到不在引号内的 ]
+        end = position + 1
+        in_quotes = False
+        while end < len(text):
+            char = text[end]
+            if char == "\\":
+                end += 2
+                continue
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == "]" and not in_quotes:
+                break
+            end += 1
+        if end >= len(text):
+            raise SyslogParseError("结构化数据未闭合")
+
+        body = text[position + 1:end]
+        sd_id, _, params = body.partition(" ")
+        elements[sd_id] = {
+            name: _SD_UNESCAPE.sub(r"\1", value) for name, value in _SD_PARAM.findall(params)
+        }
+        position = end + 1
+
+    if not elements:
+        raise SyslogParseError("结构化数据格式错误")
+    return elements, text[position + 1:] if text[position:position + 1] == " " else text[position:]
+
+def parse_rfc5424(pri: int, text: str) -> Dict[str, Any]:
+    """解析PRI之后的RFC5424消息"""
+    parts = text.split(" ", 6)
+    if len(parts) < 7 or parts[0] != "1":
+        raise SyslogParseError("RFC5424 头部字段不足")
+    _, timestamp, hostname, app_name, procid, msgid, rest = parts
+    structured_data, message = _parse_structured_data(rest)
+    if message.startswith("\ufeff"):
+        message = message[1:]
+
+    return {
+        "facility": FACILITIES[pri >> 3] if (pri >> 3) < len(FACILITIES) else str(pri >> 3),
+        "severity": SEVERITIES[pri & 7],
+        "timestamp": _nil(timestamp),
+        "hostname": _nil(hostname),
+        "app_name": _nil(app_name),
+        "procid": _nil(procid),
+        "msgid": _nil(msgid),
+        "structured_data": structured_data,
+        "message": message,
+    }
+
+def parse_rfc3164(pri: int, text: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    解析PRI之后的RFC3164消息
+
+    时间戳没有年份和时区，按UTC处理；月份比当前月份晚（跨年）时取上一年
+    """
+    match = _RFC3164_HEADER.match(text)
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    record: Dict[str, Any] = {
+        "facility": FACILITIES[pri >> 3] if (pri >> 3) < len(FACILITIES) else str(pri >> 3),
+        "severity": SEVERITIES[pri & 7],
+        "timestamp": None,
+        "hostname": None,
+        "app_name": None,
+        "procid": None,
+        "message": text,
+    }
+    if not match:
+        # 不规范的BSD消息，整体作为消息体
+        record["timestamp"] = now.isoformat()
+        return record
+
+    month = _MONTHS.get(match.group("month"))
+    if month is None:
+        raise SyslogParseError(f"无效的月份: {match.group('month')}")
+    year = now.year - 1 if month > now.month + 1 else now.year
+    hour, minute, second = (int(part) for part in match.group("time").split(":"))
+    try:
+        timestamp = datetime(year, month, int(match.group("day")), hour, minute, second)
+    except ValueError as e:
+        raise SyslogParseError(f"无效的时间: {e}")
+
+    record.update(
+        timestamp=timestamp.isoformat(),
+        hostname=match.group("host"),
+        app_name=match.group("tag"),
+        procid=match.group("pid"),
+        message=match.group("msg"),
+    )
+    return record
+
+def detect_source(record: Dict[str, Any], app_name: Optional[str] = None) -> str:
+    """
+    根据程序名或JSON记录的特征字段判断日志来源
+
+    无法识别的JSON记录按通用格式处理
+    """
+    if app_name:
+        source = APP_SOURCES.get(app_name.lower())
+        if source:
+            return source
+    eventid = record.get("eventid")
+    if isinstance(eventid, str) and eventid.startswith("cowrie."):
+        return "cowrie"
+    if "logtype" in record:
+        return "opencanary"
+    if "EventID" in record and "UtcTime" in record:
+        return "sysmon"
+    if isinstance(record.get("connection"), dict):
+        return "dionaea"
+    return "generic"
+
+def _json_object(text: str) -> Optional[Dict[str, Any]]:
+    text = text.strip()
+    if not text.startswith("{"):
+        return None
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+def parse_message(
+    data: bytes,
+    peer_ip: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    解析一条采集到的消息
+
+    Args:
+        data: 原始消息字节（不含分帧的换行或长度前缀）
+        peer_ip: 发送端地址，纯文本syslog记录的 source_ip
+        now: 当前时间（RFC3164补年份和无头消息使用）
+
+    Returns:
+        Tuple[str, Dict]: (日志来源, 交给清洗器的记录)
+
+    Raises:
+        SyslogParseError: 消息为空或格式错误
+    """
+    data = data.strip(b"\r\n\x00 ")
+    if not data:
+        raise SyslogParseError("空消息")
+
+    match = _PRI.match(data)
+    if match is None:
+        text = data.decode("utf-8", errors="replace")
+        record = _json_object(text)
+        if record is not None:
+            return detect_source(record), record
+        # 无PRI头的纯文本，按RFC3164宽松处理
+        header = parse_rfc3164(13, text, now)
+    else:
+        pri = int(match.group(1))
+        if pri > 191:
+            raise SyslogParseError(f"无效的PRI: {pri}")
+        text = data[match.end():].decode("utf-8", errors="replace")
+        if text.startswith("1 "):
+            header = parse_rfc5424(pri, text)
+        else:
+            header = parse_rfc3164(pri, text, now)
+
+    record = _json_object(header["message"])
+    if record is not None:
+        return detect_source(record, header.get("app_name")), record
+
+    header["peer_ip"] = peer_ip
+    if not header.get("timestamp"):
+        header["timestamp"] = (now or datetime.now(timezone.utc).replace(tzinfo=None)).isoformat()
+    return "syslog", header
@@ -0,0 +1,62 @@
+"""
+告警威胁类别回填
+为写入分类之前的已有告警补写 alerts.threat_category（分类规则见 app/core/threat_category.py），
+由 manage_db.py backfill-threat-categories 或 Celery 任务执行
+"""
+
+from typing import Dict, List
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.core.threat_category import classify_threat
+from app.models.postgres import Alert, Event
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+def backfill_threat_categories(db: Session, batch_size: int = 1000, reclassify: bool = False) -> int:
+    """
+    按ID分批为已有告警写入威胁类别，每批单独提交
+
+    Args:
+        db: 数据库会话
+        batch_size: 每批告警数
+        reclassify: 是否重新分类已有类别的告警（调整分类规则后使用）
+
+    Returns:
+        int: 更新的告警数
+    """
+    last_id = 0
+    updated = 0
+    while True:
+        query = db.query(Alert.id, Alert.alert_name, Alert.description, Alert.event_id, Alert.threat_category).filter(
+            Alert.id > last_id
+        )
+        if not reclassify:
+            query = query.filter(Alert.threat_category.is_(None))
+        rows = query.order_by(Alert.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        event_ids = {row.event_id for row in rows if row.event_id is not None}
+        event_types = dict(
+            db.query(Event.id, Event.event_type).filter(Event.id.in_(event_ids)).all()
+        ) if event_ids else {}
+
+        # 同一类别的告警一条 UPDATE
+        by_category: Dict[str, List[int]] = {}
+        for row in rows:
+            category = classify_threat(row.alert_name, event_types.get(row.event_id), row.description)
+            if category != row.threat_category:
+                by_category.setdefault(category, []).append(row.id)
+        for category, ids in by_category.items():
+            db.query(Alert).filter(Alert.id.in_(ids)).update(
+                {Alert.threat_category: category}, synchronize_session=False
+            )
+        db.commit()
+
+        updated += sum(len(ids) for ids in by_category.values())
+        last_id = rows[-1].id
+    logger.info(f"告警威胁类别回填完成，共更新 {updated} 条告警")
+    return updated
@@ -0,0 +1,23 @@
+"""
+告警计数表核对任务
+定期按告警表重新汇总，修正并发修改等原因造成的计数偏离
+"""
+
+from typing import Dict
+import logging
+
+from app.core.db import SessionLocal
+from app.crud.alert_counter_crud import reconcile_counters
+from app.tasks.celery_app import celery_app
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="app.tasks.alert_counters.reconcile_alert_counters_task", ignore_result=True)
+def reconcile_alert_counters_task() -> Dict[str, int]:
+    """核对告警计数表"""
+    db = SessionLocal()
+    try:
+        return reconcile_counters(db)
+    finally:
+        db.close()
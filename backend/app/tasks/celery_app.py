@@ -1,2 +1,60 @@
-// celery_app.py
-// 文件内容将在此处添加
+"""
+Celery 应用
+后台周期任务（事件同步等）的调度入口
+
+启动方式:
+    celery -A app.tasks.celery_app worker -l info
+    celery -A app.tasks.celery_app beat -l info
+"""
+
+from celery import Celery
+from app.core.config import settings
+
+celery_app = Celery(
+    "hsystem",
+    broker=settings.REDIS_URL,
+    backend=settings.REDIS_URL,
+    include=[
+        "app.tasks.log_sync",
+        "app.tasks.partition_maintenance",
+        "app.tasks.event_archive",
+        "app.tasks.alert_counters",
+        "app.tasks.threat_category",
+    ]
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    timezone="UTC",
+    enable_utc=True,
+    task_ignore_result=True,
+    worker_prefetch_multiplier=1,
+)
+
+# 周期任务
+celery_app.conf.beat_schedule = {
+    "sync-events-to-manticore": {
+        "task": "app.tasks.log_sync.sync_events_task",
+        "schedule": settings.MANTICORE_SYNC_INTERVAL,
+        "options": {"expires": settings.MANTICORE_SYNC_INTERVAL},
+    },
+    "ensure-event-partitions": {
+        "task": "app.tasks.partition_maintenance.ensure_partitions_task",
+        "schedule": 3600,
+    },
+    "apply-event-retention": {
+        "task": "app.tasks.partition_maintenance.event_retention_task",
+        "schedule": 6 * 3600,
+    },
+    "archive-aged-events": {
+        "task": "app.tasks.event_archive.archive_events_task",
+        "schedule": 3600,
+    },
+    "reconcile-alert-counters": {
+        "task": "app.tasks.alert_counters.reconcile_alert_counters_task",
+        "schedule": settings.ALERT_COUNTER_RECONCILE_INTERVAL,
+        "options": {"expires": settings.ALERT_COUNTER_RECONCILE_INTERVAL},
+    },
+}
@@ -0,0 +1,36 @@
+"""
+事件冷归档任务
+定期把超过 COLD_ARCHIVE_AFTER_DAYS 天的事件转存为列式段文件，
+并删除超过 EVENT_RETENTION_DAYS 的段
+"""
+
+from typing import Any, Dict
+from datetime import datetime, timedelta
+import logging
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.services.cold_storage import ColdEventStore, archive_aged_events
+from app.tasks.celery_app import celery_app
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="app.tasks.event_archive.archive_events_task", ignore_result=True)
+def archive_events_task() -> Dict[str, Any]:
+    """归档过期事件"""
+    store = ColdEventStore()
+    db = SessionLocal()
+    try:
+        result = archive_aged_events(db, store)
+        result["cutoff"] = result["cutoff"].isoformat()
+        expired = store.remove_before(datetime.utcnow() - timedelta(days=settings.EVENT_RETENTION_DAYS))
+        result["expired_segments"] = [path.name for path in expired]
+        return result
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # 单次运行
+    logging.basicConfig(level=logging.INFO)
+    print(archive_events_task())
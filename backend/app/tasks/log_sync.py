@@ -1,2 +1,242 @@
-// log_sync.py
-// 文件内容将在此处添加
+"""
+事件同步任务
+将 events 表中的新增事件增量同步到 Manticore 的
+sim_service_events / file_events / network_flows 索引
+
+- 以事件ID为高水位，检查点保存在 sync_checkpoints 表
+- 使用服务端游标按块读取新事件，每块用 REPLACE 批量写入后再推进检查点
+- REPLACE 按文档ID幂等，崩溃后从检查点重跑只会重复写入最后一块未确认的数据
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import logging
+import time
+
+import pymysql
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.crud.sync_crud import EVENTS_MANTICORE_SYNC, advance_checkpoint, get_checkpoint
+from app.models.manticore_schema import DOCUMENT_FIELDS, INDEX_DDL, event_to_document
+from app.models.postgres import Event
+from app.tasks.celery_app import celery_app
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 同步时读取的事件列
+_SYNC_COLUMNS = (
+    Event.id,
+    Event.event_type,
+    Event.asset_id,
+    Event.source_ip,
+    Event.destination_ip,
+    Event.source_port,
+    Event.destination_port,
+    Event.protocol,
+    Event.description,
+    Event.event_time,
+    Event.created_at,
+    Event.raw_data,
+)
+
+class ManticoreBulkWriter:
+    """
+    Manticore 批量写入器
+    通过 MySQL 协议（默认9306端口）执行多行 REPLACE
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None
+    ):
+        self.host = host or settings.MANTICORE_HOST
+        self.port = port or settings.MANTICORE_PORT
+        self.user = user if user is not None else settings.MANTICORE_USER
+        self.password = password if password is not None else settings.MANTICORE_PASSWORD
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = pymysql.connect(
+                host=self.host,
+                port=self.port,
+                user=self.user or None,
+                password=self.password or "",
+                charset="utf8mb4",
+                autocommit=True
+            )
+        return self._connection
+
+    def ensure_indexes(self) -> None:
+        """创建不存在的事件索引"""
+        with self._connect().cursor() as cursor:
+            for ddl in INDEX_DDL.values():
+                cursor.execute(ddl)
+
+    def replace(self, index: str, documents: Sequence[Dict[str, Any]]) -> int:
+        """
+        批量写入（覆盖）文档
+
+        Args:
+            index: 索引名称
+            documents: 带id的文档列表
+
+        Returns:
+            int: 写入的文档数
+        """
+        if not documents:
+            return 0
+        columns = ("id",) + DOCUMENT_FIELDS
+        placeholders = ", ".join(["%s"] * len(columns))
+        sql = f"REPLACE INTO {index} ({', '.join(columns)}) VALUES ({placeholders})"
+        values = [tuple(document[column] for column in columns) for document in documents]
+        try:
+            with self._connect().cursor() as cursor:
+                # pymysql 会把 REPLACE ... VALUES 的 executemany 合并为多行语句
+                cursor.executemany(sql, values)
+        except pymysql.MySQLError:
+            self.close()
+            raise
+        return len(values)
+
+    def close(self) -> None:
+        """关闭连接"""
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+def _push_chunk(writer: ManticoreBulkWriter, rows: List[Any]) -> None:
+    """将一块事件按目标索引分组后写入"""
+    by_index: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        index, document = event_to_document(row._asdict())
+        by_index.setdefault(index, []).append(document)
+    for index, documents in by_index.items():
+        writer.replace(index, documents)
+
+def sync_events_to_manticore(
+    writer: Optional[ManticoreBulkWriter] = None,
+    chunk_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+    settle_seconds: Optional[int] = None,
+    read_db: Optional[Session] = None,
+    state_db: Optional[Session] = None
+) -> Dict[str, Any]:
+    """
+    执行一次增量同步
+
+    读取与检查点更新使用不同会话：服务端游标在读会话上保持打开，
+    检查点在写会话上逐块提交。
+
+    Args:
+        writer: Manticore写入器，默认按配置连接
+        chunk_size: 每块行数
+        max_rows: 本次最多同步的行数（None为不限制）
+        settle_seconds: 只同步写入时间早于该秒数的事件，
+            遇到更新的事件即停止，避免越过尚未提交的较小ID
+        read_db: 读取事件的会话
+        state_db: 读写检查点的会话
+
+    Returns:
+        Dict[str, Any]: 本次同步的行数、块数、高水位和耗时
+    """
+    chunk_size = chunk_size or settings.MANTICORE_SYNC_CHUNK_SIZE
+    settle_seconds = settings.MANTICORE_SYNC_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+    own_writer = writer is None
+    own_read_db = read_db is None
+    own_state_db = state_db is None
+    writer = writer or ManticoreBulkWriter()
+    read_db = read_db or SessionLocal()
+    state_db = state_db or SessionLocal()
+
+    started = time.perf_counter()
+    synced = 0
+    chunks = 0
+    try:
+        checkpoint = get_checkpoint(state_db, EVENTS_MANTICORE_SYNC)
+        last_id = checkpoint.last_id
+        cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds)
+
+        statement = select(*_SYNC_COLUMNS).where(Event.id > last_id).order_by(Event.id)
+        if max_rows:
+            statement = statement.limit(max_rows)
+        result = read_db.execute(
+            statement,
+            execution_options={"stream_results": True, "yield_per": chunk_size}
+        )
+
+        reached_unsettled = False
+        for rows in result.partitions(chunk_size):
+            settled = []
+            for row in rows:
+                if row.created_at is not None and row.created_at > cutoff:
+                    reached_unsettled = True
+                    break
+                settled.append(row)
+
+            if settled:
+                _push_chunk(writer, settled)
+                tail = settled[-1]
+                advance_checkpoint(state_db, EVENTS_MANTICORE_SYNC, tail.id, tail.event_time, len(settled))
+                last_id = tail.id
+                synced += len(settled)
+                chunks += 1
+
+            if reached_unsettled:
+                break
+
+        result.close()
+        duration = time.perf_counter() - started
+        if synced:
+            logger.info(f"同步事件到Manticore: {synced} 行，{chunks} 块，高水位 {last_id}，耗时 {duration:.2f}s")
+
+        return {
+            "synced": synced,
+            "chunks": chunks,
+            "last_id": last_id,
+            "duration": duration,
+        }
+
+    except Exception as e:
+        logger.error(f"同步事件到Manticore失败（已同步 {synced} 行）: {e}")
+        raise
+    finally:
+        if own_writer:
+            writer.close()
+        if own_read_db:
+            read_db.close()
+        if own_state_db:
+            state_db.close()
+
+# 本进程是否已确认索引存在（每个工作进程第一次同步前创建一次）
+_indexes_ensured = False
+
+@celery_app.task(name="app.tasks.log_sync.sync_events_task", ignore_result=True)
+def sync_events_task() -> Dict[str, Any]:
+    """周期同步任务"""
+    global _indexes_ensured
+    writer = ManticoreBulkWriter()
+    try:
+        if not _indexes_ensured:
+            writer.ensure_indexes()
+            _indexes_ensured = True
+        return sync_events_to_manticore(writer=writer)
+    finally:
+        writer.close()
+
+if __name__ == "__main__":
+    # 单次运行（可用于cron或手动补同步）
+    logging.basicConfig(level=logging.INFO)
+    bulk_writer = ManticoreBulkWriter()
+    bulk_writer.ensure_indexes()
+    print(sync_events_to_manticore(writer=bulk_writer))
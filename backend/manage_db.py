@@ -128,6 +128,74 @@ def reset_database():
         logger.error(f"初始化数据失败: {e}")
         return False
 
+def ensure_partitions(days_ahead: int = None):
+    """预建事件分区（仅PostgreSQL分区表）"""
+    from app.core.db import SessionLocal
+    from app.crud.event_partition_crud import ensure_event_partitions
+
+    db = SessionLocal()
+    try:
+        created = ensure_event_partitions(db, days_ahead=days_ahead)
+        logger.info(f"新建分区 {len(created)} 个")
+        return True
+    except Exception as e:
+        logger.error(f"预建事件分区失败: {e}")
+        return False
+    finally:
+        db.close()
+
+def apply_retention(retention_days: int = None, mode: str = None):
+    """按保留期清理过期事件"""
+    from app.core.db import SessionLocal
+    from app.crud.event_partition_crud import apply_event_retention
+
+    db = SessionLocal()
+    try:
+        result = apply_event_retention(db, retention_days=retention_days, mode=mode)
+        logger.info(f"清理完成: 分区 {result['partitions']}，删除 {result['deleted_rows']} 行")
+        return True
+    except Exception as e:
+        logger.error(f"清理过期事件失败: {e}")
+        return False
+    finally:
+        db.close()
+
+def backfill_rollups(days: int = None):
+    """按告警表回填（重建）告警小时汇总和每日资产草图"""
+    from datetime import datetime, timedelta
+    from app.core.db import SessionLocal
+    from app.crud.alert_counter_crud import rebuild_asset_sketches, rebuild_hourly_rollup
+
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow() - timedelta(days=days) if days else None
+        end = datetime.utcnow() + timedelta(hours=1) if days else None
+        total = rebuild_hourly_rollup(db, start=start, end=end)
+        sketch_days = rebuild_asset_sketches(db, start=start.date() if start else None, end=end.date() if end else None)
+        logger.info(f"回填完成: {total} 条告警，{sketch_days} 天资产草图")
+        return True
+    except Exception as e:
+        logger.error(f"回填告警汇总失败: {e}")
+        return False
+    finally:
+        db.close()
+
+def backfill_threat_categories(reclassify: bool = False):
+    """为已有告警回填威胁类别"""
+    from app.core.db import SessionLocal
+    from app.services.threat_backfill import backfill_threat_categories as backfill
+
+    db = SessionLocal()
+    try:
+        total = backfill(db, reclassify=reclassify)
+        logger.info(f"回填完成: {total} 条告警")
+        return True
+    except Exception as e:
+        logger.error(f"回填告警威胁类别失败: {e}")
+        return False
+    finally:
+        db.close()
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="数据库管理工具")
@@ -166,6 +234,23 @@ def main():
     # 初始化数据
     subparsers.add_parser("init-data", help="初始化基础数据")
     
+    # 预建事件分区
+    partitions_parser = subparsers.add_parser("ensure-partitions", help="预建事件分区")
+    partitions_parser.add_argument("--days-ahead", type=int, default=None, help="预建未来天数")
+
+    # 事件保留期清理
+    retention_parser = subparsers.add_parser("retention", help="清理过期事件")
+    retention_parser.add_argument("--days", type=int, default=None, help="保留天数")
+    retention_parser.add_argument("--mode", choices=["drop", "detach"], default=None, help="过期分区处理方式")
+
+    # 回填告警小时汇总
+    rollup_parser = subparsers.add_parser("backfill-rollups", help="回填告警小时汇总和资产草图")
+    rollup_parser.add_argument("--days", type=int, default=None, help="只重建最近天数（默认全部告警）")
+
+    # 回填告警威胁类别
+    threat_parser = subparsers.add_parser("backfill-threat-categories", help="回填告警威胁类别")
+    threat_parser.add_argument("--all", action="store_true", help="重新分类全部告警（默认只处理没有类别的告警）")
+
     args = parser.parse_args()
     
     if not args.command:
@@ -192,6 +277,14 @@ def main():
         success = drop_tables()
     elif args.command == "reset":
         success = reset_database()
+    elif args.command == "ensure-partitions":
+        success = ensure_partitions(args.days_ahead)
+    elif args.command == "retention":
+        success = apply_retention(args.days, args.mode)
+    elif args.command == "backfill-rollups":
+        success = backfill_rollups(args.days)
+    elif args.command == "backfill-threat-categories":
+        success = backfill_threat_categories(args.all)
     elif args.command == "init-data":
         try:
             init_db()
@@ -0,0 +1,159 @@
+"""partition events by event_time
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-05-01 00:00:00
+
+将 events 改为按 event_time 的声明式范围分区表（仅PostgreSQL）：
+- 主键改为 (id, event_time)，分区表的唯一约束必须包含分区键
+- alerts.event_id 外键随之删除（分区表上无法对 id 单列建唯一约束）
+- 按现有数据范围和预建天数创建分区，另建 events_default 接收越界数据
+- 之后的分区由 app.tasks.partition_maintenance 定期预建
+
+其他数据库上该迁移不做任何操作。
+这是第一个迁移，assets 表可能尚不存在（空库），此时 asset_id 不建外键。
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.crud.event_partition_crud import DEFAULT_PARTITION, partition_bounds, partition_name
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+_EVENT_COLUMNS = (
+    "id, event_type, asset_id, source_ip, destination_ip, source_port, destination_port, "
+    "protocol, description, event_time, created_at, raw_data"
+)
+
+_INDEXES = (
+    "CREATE INDEX ix_events_id ON events (id)",
+    "CREATE INDEX ix_events_event_type ON events (event_type)",
+    "CREATE INDEX ix_events_event_time ON events (event_time)",
+    "CREATE INDEX ix_events_asset_time ON events (asset_id, event_time)",
+)
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+def _table_exists(name: str) -> bool:
+    return op.get_bind().execute(sa.text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+def _asset_reference() -> str:
+    """assets 表存在时 asset_id 的外键约束"""
+    return " REFERENCES assets (id)" if _table_exists("assets") else ""
+
+def upgrade() -> None:
+    if not _is_postgres():
+        return
+
+    bind = op.get_bind()
+    has_events = _table_exists("events")
+    if has_events:
+        relkind = bind.execute(sa.text(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass('events')"
+        )).scalar()
+        if relkind == "p":
+            return
+
+        op.execute("ALTER TABLE alerts DROP CONSTRAINT IF EXISTS alerts_event_id_fkey")
+        op.execute("ALTER TABLE events RENAME TO events_unpartitioned")
+        op.execute("ALTER TABLE events_unpartitioned RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey")
+        op.execute("ALTER SEQUENCE IF EXISTS events_id_seq OWNED BY NONE")
+        for index in ("ix_events_id", "ix_events_event_type", "ix_events_event_time", "ix_events_asset_time"):
+            op.execute(f"DROP INDEX IF EXISTS {index}")
+    else:
+        op.execute("CREATE SEQUENCE IF NOT EXISTS events_id_seq")
+
+    op.execute(f"""
+        CREATE TABLE events (
+            id INTEGER NOT NULL DEFAULT nextval('events_id_seq'),
+            event_type VARCHAR(50) NOT NULL,
+            asset_id INTEGER{_asset_reference()},
+            source_ip VARCHAR(50),
+            destination_ip VARCHAR(50),
+            source_port INTEGER,
+            destination_port INTEGER,
+            protocol VARCHAR(20),
+            description TEXT,
+            event_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            raw_data JSON,
+            PRIMARY KEY (id, event_time)
+        ) PARTITION BY RANGE (event_time)
+    """)
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF events DEFAULT")
+
+    # 覆盖已有数据和未来预建天数的分区
+    today = datetime.utcnow().date()
+    first_day = today
+    if has_events:
+        oldest = bind.execute(sa.text("SELECT min(event_time) FROM events_unpartitioned")).scalar()
+        if oldest is not None:
+            first_day = min(oldest.date(), today)
+    last_day = today + timedelta(days=settings.EVENT_PARTITION_PRECREATE_DAYS)
+
+    start, end = partition_bounds(first_day)
+    while start <= last_day:
+        op.execute(
+            f"CREATE TABLE {partition_name(start)} PARTITION OF events "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d} 00:00:00') TO ('{end:%Y-%m-%d} 00:00:00')"
+        )
+        start, end = end, end + timedelta(days=settings.EVENT_PARTITION_DAYS)
+
+    if has_events:
+        op.execute(
+            f"INSERT INTO events ({_EVENT_COLUMNS}) "
+            f"SELECT {_EVENT_COLUMNS} FROM events_unpartitioned"
+        )
+        op.execute("DROP TABLE events_unpartitioned")
+
+    # 在父表上建索引会自动传播到所有分区（包括之后新建的分区）
+    for statement in _INDEXES:
+        op.execute(statement)
+    if _table_exists("alerts"):
+        op.execute("CREATE INDEX IF NOT EXISTS ix_alerts_event_id ON alerts (event_id)")
+    op.execute("SELECT setval('events_id_seq', GREATEST((SELECT max(id) FROM events), 1))")
+
+def downgrade() -> None:
+    if not _is_postgres():
+        return
+
+    op.execute("ALTER TABLE events RENAME TO events_partitioned")
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY NONE")
+    for index in ("ix_events_id", "ix_events_event_type", "ix_events_event_time", "ix_events_asset_time"):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute(f"""
+        CREATE TABLE events (
+            id INTEGER NOT NULL DEFAULT nextval('events_id_seq') PRIMARY KEY,
+            event_type VARCHAR(50) NOT NULL,
+            asset_id INTEGER{_asset_reference()},
+            source_ip VARCHAR(50),
+            destination_ip VARCHAR(50),
+            source_port INTEGER,
+            destination_port INTEGER,
+            protocol VARCHAR(20),
+            description TEXT,
+            event_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            raw_data JSON
+        )
+    """)
+    op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+    op.execute(f"INSERT INTO events ({_EVENT_COLUMNS}) SELECT {_EVENT_COLUMNS} FROM events_partitioned")
+    op.execute("DROP TABLE events_partitioned")
+
+    for statement in _INDEXES:
+        op.execute(statement)
+    if _table_exists("alerts"):
+        # 迁移期间可能写入了引用已过期事件的告警，先清空失效引用再恢复外键
+        op.execute("UPDATE alerts SET event_id = NULL WHERE event_id IS NOT NULL AND event_id NOT IN (SELECT id FROM events)")
+        op.execute("ALTER TABLE alerts ADD CONSTRAINT alerts_event_id_fkey FOREIGN KEY (event_id) REFERENCES events (id)")
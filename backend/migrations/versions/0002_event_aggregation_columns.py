@@ -0,0 +1,31 @@
+"""add event aggregation columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-05-08 00:00:00
+
+events 增加聚合写入使用的 count/first_seen/last_seen 列，
+已有行视为单次事件（count=1，first_seen=last_seen=event_time）
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('count', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('events', sa.Column('first_seen', sa.DateTime(), nullable=True))
+    op.add_column('events', sa.Column('last_seen', sa.DateTime(), nullable=True))
+    op.execute("UPDATE events SET first_seen = event_time, last_seen = event_time WHERE first_seen IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('events', 'last_seen')
+    op.drop_column('events', 'first_seen')
+    op.drop_column('events', 'count')
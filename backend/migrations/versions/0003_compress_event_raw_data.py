@@ -0,0 +1,77 @@
+"""compress events.raw_data
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-05-15 00:00:00
+
+events.raw_data 由 JSON 改为压缩二进制（zlib + 预置字典，见 app/core/compression.py）。
+PostgreSQL 上先把列转换为 bytea（内容为原JSON文本，可直接被解码），再分批重新压缩；
+SQLite 的列类型无需变更，旧的JSON文本同样可以被解码，新写入的数据为压缩格式。
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+from app.core.compression import compress_json, decompress_json
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE events ALTER COLUMN raw_data TYPE bytea USING convert_to(raw_data::text, 'UTF8')")
+
+    # 按ID分批重新压缩（未压缩的JSON文本以 '{' 或 '[' 开头）
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, event_time, raw_data FROM events "
+            "WHERE id > :last_id AND raw_data IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": _BATCH_SIZE}).all()
+        if not rows:
+            break
+        updates = [
+            {"id": row.id, "event_time": row.event_time, "raw_data": compress_json(decompress_json(row.raw_data))}
+            for row in rows
+            if bytes(row.raw_data[:1]) in (b"{", b"[")
+        ]
+        if updates:
+            bind.execute(sa.text(
+                "UPDATE events SET raw_data = :raw_data WHERE id = :id AND event_time = :event_time"
+            ), updates)
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.add_column('events', sa.Column('raw_data_json', sa.JSON(), nullable=True))
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, event_time, raw_data FROM events "
+            "WHERE id > :last_id AND raw_data IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": _BATCH_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(sa.text(
+            "UPDATE events SET raw_data_json = CAST(:raw_data AS json) WHERE id = :id AND event_time = :event_time"
+        ), [
+            {"id": row.id, "event_time": row.event_time, "raw_data": json.dumps(decompress_json(row.raw_data))}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+    op.drop_column('events', 'raw_data')
+    op.alter_column('events', 'raw_data_json', new_column_name='raw_data')
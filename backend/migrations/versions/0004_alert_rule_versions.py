@@ -0,0 +1,35 @@
+"""add alert rule revisions and config versions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-05-29 00:00:00
+
+新增 config_versions 表（配置版本号，规则修改时递增，规则引擎轮询后增量重新编译），
+alert_rules 增加 revision 列记录每条规则最近一次修改时的版本号。
+预置 alert_rules 版本行，规则修改时总是走 UPDATE（持有行锁），并发修改不会同时插入同一主键
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    config_versions = op.create_table(
+        'config_versions',
+        sa.Column('name', sa.String(length=100), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.bulk_insert(config_versions, [{'name': 'alert_rules', 'version': 0}])
+    op.add_column('alert_rules', sa.Column('revision', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('alert_rules', 'revision')
+    op.drop_table('config_versions')
@@ -0,0 +1,52 @@
+"""add alert grouping columns and alert occurrences
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-06-05 00:00:00
+
+alerts 增加聚合使用的 rule_id/group_key/source_ip/occurrence_count/first_seen/last_seen 列，
+新增 alert_occurrences 表记录聚合告警下的每次命中；
+已有告警视为单次发生（occurrence_count=1，first_seen=last_seen=created_at）
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('alerts', sa.Column('rule_id', sa.Integer(), nullable=True))
+    op.add_column('alerts', sa.Column('group_key', sa.String(length=40), nullable=True))
+    op.add_column('alerts', sa.Column('source_ip', sa.String(length=45), nullable=True))
+    op.add_column('alerts', sa.Column('occurrence_count', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('alerts', sa.Column('first_seen', sa.DateTime(), nullable=True))
+    op.add_column('alerts', sa.Column('last_seen', sa.DateTime(), nullable=True))
+    op.execute("UPDATE alerts SET first_seen = created_at, last_seen = created_at WHERE first_seen IS NULL")
+    op.create_index('ix_alerts_rule_id', 'alerts', ['rule_id'])
+    op.create_index('ix_alerts_group_key', 'alerts', ['group_key'])
+
+    op.create_table(
+        'alert_occurrences',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('alert_id', sa.Integer(), sa.ForeignKey('alerts.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=True),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_alert_occurrences_id', 'alert_occurrences', ['id'])
+    op.create_index('ix_alert_occurrences_alert_id', 'alert_occurrences', ['alert_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alert_occurrences_alert_id', table_name='alert_occurrences')
+    op.drop_index('ix_alert_occurrences_id', table_name='alert_occurrences')
+    op.drop_table('alert_occurrences')
+    op.drop_index('ix_alerts_group_key', table_name='alerts')
+    op.drop_index('ix_alerts_rule_id', table_name='alerts')
+    for column in ('last_seen', 'first_seen', 'occurrence_count', 'source_ip', 'group_key', 'rule_id'):
+        op.drop_column('alerts', column)
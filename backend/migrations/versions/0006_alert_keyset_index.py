@@ -0,0 +1,24 @@
+"""add alerts (created_at, id) index for keyset pagination
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-06-12 00:00:00
+
+告警列表按 (created_at, id) 倒序做游标分页，复合索引使任意页深都只需一次索引范围扫描
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_alerts_created_at_id', 'alerts', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alerts_created_at_id', table_name='alerts')
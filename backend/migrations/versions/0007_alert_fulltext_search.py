@@ -0,0 +1,66 @@
+"""add alert full-text search
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-06-18 00:00:00
+
+alerts 增加 search_text 列（名称和描述切分后的索引文本，中文按二元组切分，见 app/core/fulltext.py），
+已有告警分批回填；PostgreSQL 建立 to_tsvector 上的 GIN 表达式索引，
+SQLite 建立 FTS5 外部内容表 alerts_fts 和同步触发器，并从回填后的数据重建索引
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.fulltext import (
+    POSTGRES_FTS_DDL,
+    POSTGRES_FTS_DROP,
+    SQLITE_FTS_DDL,
+    SQLITE_FTS_DROP,
+    index_text,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.add_column('alerts', sa.Column('search_text', sa.Text(), nullable=True))
+
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, alert_name, description FROM alerts WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": _BATCH_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(sa.text("UPDATE alerts SET search_text = :search_text WHERE id = :id"), [
+            {"id": row.id, "search_text": index_text(row.alert_name, row.description)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+    if bind.dialect.name == "postgresql":
+        for statement in POSTGRES_FTS_DDL:
+            op.execute(statement)
+    elif bind.dialect.name == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO alerts_fts(alerts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for statement in POSTGRES_FTS_DROP:
+            op.execute(statement)
+    elif bind.dialect.name == "sqlite":
+        for statement in SQLITE_FTS_DROP:
+            op.execute(statement)
+    op.drop_column('alerts', 'search_text')
@@ -0,0 +1,38 @@
+"""add alert counters table
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-06-24 00:00:00
+
+新增 alert_counters 表，按 (创建日期, 状态, 级别) 汇总告警数，统计接口只读这张表；
+由已有告警一次性汇总填充，之后随告警写入在同一事务中增减，并由定期任务核对
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'alert_counters',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('status', sa.String(length=20), primary_key=True),
+        sa.Column('severity', sa.String(length=20), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO alert_counters (day, status, severity, count) "
+        "SELECT date(created_at), coalesce(status, 'unhandled'), severity, count(*) FROM alerts "
+        "WHERE created_at IS NOT NULL "
+        "GROUP BY date(created_at), coalesce(status, 'unhandled'), severity"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('alert_counters')
@@ -0,0 +1,32 @@
+"""add alert hourly rollup table
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-07-01 00:00:00
+
+新增 alert_hourly_rollups 表，按 (创建小时, 级别, 资产) 汇总新建告警数，告警趋势接口只读这张表；
+随告警写入增量更新，已有告警用 python manage_db.py backfill-rollups 分段回填
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'alert_hourly_rollups',
+        sa.Column('hour', sa.DateTime(), primary_key=True),
+        sa.Column('severity', sa.String(length=20), primary_key=True),
+        sa.Column('asset_id', sa.Integer(), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('alert_hourly_rollups')
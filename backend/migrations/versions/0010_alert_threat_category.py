@@ -0,0 +1,28 @@
+"""add alert threat category
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2024-07-08 00:00:00
+
+alerts 增加 threat_category 列（写入告警时按 app/core/threat_category.py 分类）及其索引，
+威胁类型分布按该列汇总；已有告警用 python manage_db.py backfill-threat-categories 分批回填
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('alerts', sa.Column('threat_category', sa.String(length=30), nullable=True))
+    op.create_index('ix_alerts_threat_category', 'alerts', ['threat_category'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alerts_threat_category', table_name='alerts')
+    op.drop_column('alerts', 'threat_category')
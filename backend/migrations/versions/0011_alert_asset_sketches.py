@@ -0,0 +1,34 @@
+"""add alert asset sketches
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2024-07-15 00:00:00
+
+新增 alert_asset_sketches 表（每天一个 HyperLogLog 草图，每行一个寄存器），
+安全态势指标合并草图估计有告警的资产数；alerts.handled_at 增加索引，用于统计今日处理的告警。
+随告警写入增量更新，已有告警用 python manage_db.py backfill-rollups 回填
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'alert_asset_sketches',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('register', sa.Integer(), primary_key=True),
+        sa.Column('value', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_alerts_handled_at', 'alerts', ['handled_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alerts_handled_at', table_name='alerts')
+    op.drop_table('alert_asset_sketches')
@@ -0,0 +1,35 @@
+"""add sync checkpoints table
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2024-07-22 00:00:00
+
+新增 sync_checkpoints 表（增量同步的高水位：Manticore 同步、规则引擎、冷存储归档），
+此前只由 create_all 创建；已由 create_all 建表的数据库跳过
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('sync_checkpoints'):
+        return
+    op.create_table(
+        'sync_checkpoints',
+        sa.Column('name', sa.String(length=100), primary_key=True),
+        sa.Column('last_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_event_time', sa.DateTime(), nullable=True),
+        sa.Column('synced_rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_checkpoints')
@@ -3,23 +3,82 @@ conftest 模块测试
 """
 
 import pytest
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.main import app
+from app.core.db import Base, get_db
+from app.core.dependencies import get_current_active_user, get_current_active_user_cached
+from app import models  # noqa: F401  注册所有模型
 
 client = TestClient(app)
 
+@pytest.fixture
+def db_engine():
+    """内存SQLite引擎，每个测试独立建表"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db_session(db_engine):
+    """绑定到内存引擎的数据库会话"""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+def make_user(*permissions: str) -> SimpleNamespace:
+    """构造拥有指定权限的测试用户"""
+    role = SimpleNamespace(
+        name="测试角色",
+        permissions=[SimpleNamespace(name=name) for name in permissions]
+    )
+    return SimpleNamespace(id=1, username="tester", is_active=True, roles=[role])
+
+@pytest.fixture
+def api_client(db_engine):
+    """
+    使用内存数据库的测试客户端
+
+    通过 client.user 设置当前用户（默认无任何权限）
+    """
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    state = SimpleNamespace(user=make_user())
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_active_user] = lambda: state.user
+    app.dependency_overrides[get_current_active_user_cached] = lambda: state.user
+    test_client = TestClient(app)
+    test_client.state = state
+    yield test_client
+    app.dependency_overrides.clear()
+
 class TestConftest:
     """
     conftest 测试类
     """
-    
+
     def test_conftest_example(self):
         """
         示例测试方法
         """
         # 测试实现将在此处添加
         assert True
-    
+
     @pytest.mark.asyncio
     async def test_conftest_async_example(self):
         """
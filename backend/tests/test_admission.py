@@ -0,0 +1,99 @@
+"""
+admission 模块测试
+"""
+
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.core.admission import AdmissionController, TokenBucket, ingest_admission
+from tests.conftest import make_user
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _writer(depth=0):
+    return SimpleNamespace(
+        queue_depth=depth, total_flush_duration=0.0, flushed_rows=0, batch_size=500, max_latency=1.0
+    )
+
+class TestAdmission:
+    """
+    admission 测试类
+    """
+
+    def test_token_bucket_overdraft(self):
+        """透支后需要等待令牌恢复"""
+        bucket = TokenBucket(rate=100, burst=200, now=0)
+        bucket.consume(500, now=0)
+
+        assert bucket.retry_after(now=0) == pytest.approx(3.01)
+        assert bucket.retry_after(now=3.5) == 0
+        assert bucket.refill(now=100) == 200
+
+    def test_source_rate_limit(self):
+        """来源透支时拒绝该来源，其他来源不受影响"""
+        clock = _Clock()
+        controller = AdmissionController(_writer(), source_rate=10, source_burst=10, clock=clock)
+
+        controller.admit("a@1")
+        controller.charge("a@1", 50)
+        controller.release()
+
+        with pytest.raises(HTTPException) as exc:
+            controller.admit("a@1")
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "5"
+        controller.admit("b@1")
+        controller.release()
+
+        clock.now = 5
+        controller.admit("a@1")
+        assert controller.rejected == {"rate_limit": 1}
+
+    def test_queue_depth_and_concurrency(self):
+        """队列过深或写入并发已满时拒绝"""
+        writer = _writer(depth=100)
+        controller = AdmissionController(writer, max_queue_depth=100, max_concurrency=1)
+
+        with pytest.raises(HTTPException) as exc:
+            controller.admit("a")
+        assert exc.value.headers["Retry-After"] == "1"
+
+        writer.queue_depth = 0
+        controller.admit("a")
+        with pytest.raises(HTTPException):
+            controller.admit("b")
+        controller.release()
+
+        stats = controller.stats()
+        assert stats["rejected"] == {"queue_depth": 1, "concurrency": 1}
+        assert stats["in_flight"] == 0
+
+    def test_batch_endpoint_returns_429(self, api_client, monkeypatch):
+        """写入接口在来源超限时返回429和Retry-After，读取接口不受影响"""
+        monkeypatch.setattr(ingest_admission, "_buckets", type(ingest_admission._buckets)())
+        monkeypatch.setattr(ingest_admission, "source_burst", 2)
+        monkeypatch.setattr(ingest_admission, "source_rate", 0.5)
+        api_client.state.user = make_user("event:create", "alert:read")
+        body = "\n".join('{"type": "port_scan", "ts": "2024-01-01T00:00:00"}' for _ in range(5))
+
+        assert api_client.post("/api/v1/events:batch", content=body).status_code == 200
+        response = api_client.post("/api/v1/events:batch", content=body)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert api_client.get("/api/v1/alerts").status_code == 200
+        assert ingest_admission.in_flight == 0
+
+    def test_admission_endpoint(self, api_client):
+        """管理员可查看准入控制状态"""
+        assert api_client.get("/api/v1/system/ingest/admission").status_code == 403
+
+        api_client.state.user.roles[0].name = "admin"
+        response = api_client.get("/api/v1/system/ingest/admission")
+        assert response.status_code == 200
+        assert "rejected" in response.json()
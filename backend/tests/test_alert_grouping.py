@@ -0,0 +1,92 @@
+"""
+alert_grouping 模块测试
+"""
+
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from app.models.postgres import Alert, AlertOccurrence, Asset
+from app.services.alert_grouping import write_alerts
+from app.services.rule_engine import alert_row, compile_rule
+from tests.conftest import make_user
+
+SSH_FAILURE = {"field": "event_type", "value": "authentication_failure"}
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+def _rule(condition=SSH_FAILURE, rule_id=1):
+    return compile_rule(SimpleNamespace(
+        id=rule_id, name="SSH暴力破解", severity="high", condition=condition, description=None
+    ))
+
+def _hits(rule, *specs):
+    """specs: (事件ID, 秒偏移, 源IP)"""
+    return [
+        (rule, alert_row({"id": event_id, "event_type": "authentication_failure", "asset_id": 1,
+                          "source_ip": source_ip, "event_time": T0 + timedelta(seconds=seconds)}, rule, T0))
+        for event_id, seconds, source_ip in specs
+    ]
+
+class TestAlertGrouping:
+    """
+    alert_grouping 测试类
+    """
+
+    def test_repeats_collapse_into_open_alert(self, db_session):
+        """窗口内的重复命中累加到同一告警，跨批次同样合并"""
+        rule = _rule()
+        result = write_alerts(db_session, _hits(rule, (1, 0, "45.1.2.3"), (2, 10, "45.1.2.3"), (3, 20, "8.8.8.8")))
+        db_session.commit()
+        assert result == {"created": 2, "merged": 0}
+
+        result = write_alerts(db_session, _hits(rule, (4, 60, "45.1.2.3"), (5, 70, "45.1.2.3")))
+        db_session.commit()
+        assert result == {"created": 0, "merged": 2}
+
+        alert = db_session.query(Alert).filter(Alert.source_ip == "45.1.2.3").one()
+        assert alert.occurrence_count == 4
+        assert alert.first_seen == T0
+        assert alert.last_seen == T0 + timedelta(seconds=70)
+        assert db_session.query(AlertOccurrence).filter(AlertOccurrence.alert_id == alert.id).count() == 4
+
+    def test_window_and_status_end_grouping(self, db_session):
+        """超过抑制窗口或告警已处理时产生新告警"""
+        rule = _rule({**SSH_FAILURE, "suppress": {"window": "1m", "group_by": ["src_ip"]}})
+        write_alerts(db_session, _hits(rule, (1, 0, "45.1.2.3"), (2, 30, "45.1.2.3"), (3, 200, "45.1.2.3")))
+        db_session.commit()
+        assert [a.occurrence_count for a in db_session.query(Alert).order_by(Alert.id)] == [2, 1]
+
+        db_session.query(Alert).update({Alert.status: "resolved"})
+        write_alerts(db_session, _hits(rule, (4, 210, "45.1.2.3")))
+        db_session.commit()
+        assert db_session.query(Alert).count() == 3
+
+    def test_suppress_disabled_and_occurrence_cap(self, db_session):
+        """关闭聚合时每次命中都是新告警；发生明细按上限截断但次数照常累加"""
+        rule = _rule({**SSH_FAILURE, "suppress": False})
+        assert write_alerts(db_session, _hits(rule, (1, 0, "1.1.1.1"), (2, 1, "1.1.1.1")))["created"] == 2
+
+        grouped = _rule(rule_id=2)
+        write_alerts(db_session, _hits(grouped, *[(i, i, "2.2.2.2") for i in range(10, 15)]), max_occurrences=3)
+        db_session.commit()
+        alert = db_session.query(Alert).filter(Alert.rule_id == 2).one()
+        assert alert.occurrence_count == 5
+        assert db_session.query(AlertOccurrence).filter(AlertOccurrence.alert_id == alert.id).count() == 3
+
+    def test_occurrences_endpoint(self, api_client, db_session):
+        """分页列出聚合告警下的发生记录"""
+        db_session.add(Asset(id=1, name="蜜罐-1", asset_type="honeypot", ip_address="10.0.0.1"))
+        db_session.commit()
+        write_alerts(db_session, _hits(_rule(), *[(i, i, "45.1.2.3") for i in range(1, 4)]))
+        db_session.commit()
+        api_client.state.user = make_user("alert:read")
+        alert_id = db_session.query(Alert.id).scalar()
+
+        response = api_client.get(f"/api/v1/alerts/{alert_id}/occurrences", params={"size": 2})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["total"] == 3
+        assert [item["event_id"] for item in body["items"]] == [3, 2]
+
+        listed = api_client.get("/api/v1/alerts").json()["items"]
+        assert listed[0]["occurrence_count"] == 3
+        assert api_client.get("/api/v1/alerts/999/occurrences").status_code == 404
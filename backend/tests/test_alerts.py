@@ -2,9 +2,14 @@
 alerts 模块测试
 """
 
+from datetime import datetime, timedelta
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core.fulltext import index_text
+from app.crud.alert_counter_crud import count_by_status_severity, reconcile_counters
+from app.models.postgres import Alert, Asset, Event
+from tests.conftest import make_user
 
 client = TestClient(app)
 
@@ -27,3 +32,170 @@ class TestAlerts:
         """
         # 异步测试实现将在此处添加
         assert True
+
+    def test_bulk_status_by_ids(self, api_client, db_session):
+        """按ID批量更新状态，不存在的ID计入失败"""
+        db_session.add_all([Alert(alert_name=f"a{i}", severity="high", status="unhandled") for i in range(3)])
+        db_session.commit()
+        api_client.state.user = make_user("alert:handle")
+
+        response = api_client.post("/api/v1/alerts/bulk-status", json={
+            "ids": [1, 2, 2, 99], "status": "resolved", "handle_notes": "误报"
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["success_count"], body["failed_count"], body["total_count"]) == (2, 1, 3)
+        assert body["failed_items"] == [99]
+
+        db_session.expire_all()
+        resolved = db_session.query(Alert).filter(Alert.status == "resolved").all()
+        assert [alert.id for alert in resolved] == [1, 2]
+        assert all(alert.handled_by == api_client.state.user.id and alert.handled_at for alert in resolved)
+        assert resolved[0].handle_notes == "误报"
+
+    def test_bulk_status_by_filter(self, api_client, db_session):
+        """按过滤条件批量更新，参数错误时返回400"""
+        db_session.add_all([
+            Alert(alert_name="ssh", severity=severity, status="unhandled")
+            for severity in ("high", "high", "low")
+        ])
+        db_session.commit()
+        api_client.state.user = make_user("alert:handle")
+
+        response = api_client.post("/api/v1/alerts/bulk-status", json={
+            "filter": {"severity": "high", "status": "unhandled"}, "status": "handling"
+        })
+        assert response.json()["success_count"] == 2
+        assert db_session.query(Alert).filter(Alert.status == "handling").count() == 2
+
+        for body in (
+            {"filter": {}, "status": "resolved"},
+            {"ids": [1], "filter": {"severity": "low"}, "status": "resolved"},
+            {"ids": [1], "status": "done"},
+        ):
+            assert api_client.post("/api/v1/alerts/bulk-status", json=body).status_code == 400
+
+    def test_cursor_pagination(self, api_client, db_session, monkeypatch):
+        """游标分页按 (created_at, id) 倒序遍历全部告警，总数有上限"""
+        monkeypatch.setattr("app.core.config.settings.ALERT_LIST_TOTAL_CAP", 4)
+        t0 = datetime(2024, 1, 1)
+        # 两条告警的创建时间相同，由ID区分先后
+        db_session.add_all([
+            Alert(alert_name=f"a{i}", severity="high", status="unhandled", created_at=t0 + timedelta(minutes=i // 2))
+            for i in range(5)
+        ])
+        db_session.commit()
+        api_client.state.user = make_user("alert:read")
+
+        seen, cursor = [], None
+        while True:
+            params = {"size": 2, **({"cursor": cursor} if cursor else {})}
+            body = api_client.get("/api/v1/alerts/cursor", params=params).json()
+            seen += [item["id"] for item in body["items"]]
+            cursor = body["next_cursor"]
+            if not body["has_next"]:
+                break
+        assert seen == [5, 4, 3, 2, 1]
+        assert (body["total"], body["total_exact"], body["total_display"]) == (4, False, "4+")
+
+        body = api_client.get("/api/v1/alerts/cursor", params={"exact_total": True, "start_time": "2023-01-01T00:00:00"}).json()
+        assert (body["total"], body["total_exact"]) == (5, True)
+        assert api_client.get("/api/v1/alerts/cursor", params={"cursor": "bad"}).status_code == 400
+
+    def test_fulltext_search(self, api_client, db_session):
+        """全文检索：中文按二元组短语匹配、按相关度排序并高亮；索引随告警的修改和删除同步"""
+        def alert(name, description):
+            return Alert(alert_name=name, severity="high", status="unhandled", description=description,
+                         search_text=index_text(name, description))
+
+        db_session.add_all([
+            alert("SSH暴力破解", "来自 45.1.2.3 的 SSH 暴力破解，尝试用户 root"),
+            alert("Web扫描", "目录扫描 <script> 探测"),
+            alert("暴力破解检测", "RDP 登录失败次数过多"),
+            alert("力破测试", "与暴力无关"),
+        ])
+        db_session.commit()
+        api_client.state.user = make_user("alert:read")
+
+        body = api_client.get("/api/v1/alerts/search", params={"q": "暴力破解"}).json()
+        assert body["total"] == 2
+        assert [item["id"] for item in body["items"]] == [1, 3]
+        assert body["items"][0]["highlight"] == "来自 45.1.2.3 的 SSH <mark>暴力破解</mark>，尝试用户 root"
+        assert body["items"][0]["score"] > body["items"][1]["score"]
+
+        # 多个关键词同时命中，英文大小写不敏感并按前缀匹配
+        items = api_client.get("/api/v1/alerts/search", params={"q": "ssh 45.1.2"}).json()["items"]
+        assert [item["id"] for item in items] == [1]
+        items = api_client.get("/api/v1/alerts/search", params={"q": "scr"}).json()["items"]
+        assert items[0]["highlight"] == "目录扫描 &lt;<mark>scr</mark>ipt&gt; 探测"
+
+        # 告警列表的 search 参数使用同一索引
+        listed = api_client.get("/api/v1/alerts/cursor", params={"search": "暴力"}).json()["items"]
+        assert sorted(item["id"] for item in listed) == [1, 3, 4]
+
+        row = db_session.get(Alert, 3)
+        row.search_text = index_text("RDP登录失败", row.description)
+        db_session.delete(db_session.get(Alert, 1))
+        db_session.commit()
+        assert api_client.get("/api/v1/alerts/search", params={"q": "暴力破解"}).json()["total"] == 0
+        assert api_client.get("/api/v1/alerts/search", params={"q": "%%"}).status_code == 400
+
+    def test_statistics_from_counters(self, api_client, db_session):
+        """统计读告警计数表：创建、状态变更时同步增减，核对任务修正偏离"""
+        api_client.state.user = make_user("alert:read", "alert:create", "alert:handle")
+        db_session.add(Asset(id=1, name="蜜罐-1", asset_type="honeypot", ip_address="10.0.0.1"))
+        db_session.commit()
+        for severity in ("critical", "high", "high"):
+            response = api_client.post("/api/v1/alerts", json={"alert_name": "x", "severity": severity, "asset_id": 1})
+            assert response.status_code == 200
+
+        api_client.put("/api/v1/alerts/1/status", json={"status": "resolved"})
+        api_client.post("/api/v1/alerts/bulk-status", json={"filter": {"severity": "high"}, "status": "handling"})
+        body = api_client.get("/api/v1/alerts/statistics").json()
+        assert (body["total"], body["unhandled"], body["handling"], body["resolved"]) == (3, 0, 2, 1)
+        assert (body["critical"], body["high"], body["today_new"], body["this_week_new"]) == (1, 2, 3, 3)
+
+        body = api_client.get("/api/v1/alerts/cursor", params={"exact_total": True, "status": "handling"}).json()
+        assert (body["total"], body["total_exact"]) == (2, True)
+
+        # 绕过计数入口的写入造成偏离，由核对修正
+        db_session.add(Alert(alert_name="y", severity="low", status="unhandled", created_at=datetime(2024, 1, 1)))
+        db_session.query(Alert).filter(Alert.id == 1).delete()
+        db_session.commit()
+        assert reconcile_counters(db_session) == {"keys": 2, "corrected": 2}
+        assert count_by_status_severity(db_session) == {("handling", "high"): 2, ("unhandled", "low"): 1}
+        assert reconcile_counters(db_session)["corrected"] == 0
+
+    def test_alert_without_asset(self, api_client, db_session):
+        """没有资产的规则告警在列表、详情和大屏最近告警中都能查到，详情不关联无资产的事件"""
+        api_client.state.user = make_user("alert:read")
+        db_session.add(Event(event_type="port_scan", event_time=datetime.utcnow()))
+        db_session.add(Alert(alert_name="规则告警", severity="critical", status="unhandled", rule_id=1))
+        db_session.commit()
+
+        body = api_client.get("/api/v1/alerts/").json()
+        assert body["total"] == 1
+        assert body["items"][0]["asset_name"] is None
+
+        response = api_client.get("/api/v1/alerts/1")
+        assert response.status_code == 200
+        assert response.json()["related_events"] == []
+
+        recent = api_client.get("/api/v1/dashboard/recent-alerts").json()
+        assert [(alert["id"], alert["asset_name"]) for alert in recent] == [(1, None)]
+
+    def test_threat_category_from_event_type(self, api_client, db_session):
+        """创建告警时按关联事件的类型分类，详情与列表返回相同的威胁类别"""
+        api_client.state.user = make_user("alert:read", "alert:create")
+        db_session.add(Asset(id=1, name="蜜罐-1", asset_type="honeypot", ip_address="10.0.0.1"))
+        db_session.add(Event(id=7, event_type="authentication_failure", asset_id=1, event_time=datetime.utcnow()))
+        db_session.commit()
+
+        response = api_client.post("/api/v1/alerts", json={
+            "alert_name": "蜜罐告警", "severity": "high", "asset_id": 1, "event_id": 7
+        })
+        assert response.status_code == 200
+
+        listed = api_client.get("/api/v1/alerts/").json()["items"][0]
+        detail = api_client.get("/api/v1/alerts/1").json()
+        assert listed["threat_category"] == detail["threat_category"] == "brute_force"
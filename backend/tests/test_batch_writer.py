@@ -0,0 +1,82 @@
+"""
+batch_writer 模块测试
+"""
+
+import asyncio
+import pytest
+from app.core.batch_writer import BatchWriter
+
+class TestBatchWriter:
+    """
+    batch_writer 测试类
+    """
+
+    @pytest.mark.asyncio
+    async def test_flush_by_batch_size(self):
+        """攒满批大小立即刷新"""
+        batches = []
+        writer = BatchWriter("test", batches.append, batch_size=3, max_latency=10)
+        await writer.start()
+        for i in range(6):
+            await writer.enqueue({"n": i})
+        for _ in range(50):
+            if writer.flushed_rows == 6:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+
+        assert [len(batch) for batch in batches] == [3, 3]
+        assert writer.stats()["flush_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_flush_by_latency(self):
+        """未攒满时在最大延迟后刷新"""
+        batches = []
+        writer = BatchWriter("test", batches.append, batch_size=100, max_latency=0.05)
+        await writer.start()
+        await writer.enqueue({"n": 1})
+        await asyncio.sleep(0.2)
+
+        assert batches == [[{"n": 1}]]
+        assert writer.queue_depth == 0
+        await writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_drains_queue(self):
+        """停止时写完剩余数据"""
+        batches = []
+        writer = BatchWriter("test", batches.append, batch_size=2, max_latency=10)
+        await writer.start()
+        for i in range(5):
+            writer.enqueue_nowait({"n": i})
+        await writer.stop()
+
+        assert sum(len(batch) for batch in batches) == 5
+        assert not writer.running
+
+    @pytest.mark.asyncio
+    async def test_enqueue_nowait_when_full(self):
+        """队列满时拒绝并计数"""
+        writer = BatchWriter("test", lambda rows: None, batch_size=10, max_latency=10, max_queue=1)
+        assert not writer.enqueue_nowait({"n": 0})
+
+        await writer.start()
+        accepted = [writer.enqueue_nowait({"n": i}) for i in range(3)]
+        await writer.stop()
+
+        assert accepted.count(False) >= 1
+        assert writer.stats()["rejected"] == 1 + accepted.count(False)
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_counted(self):
+        """写入失败重试后计入失败行数"""
+        def fail(rows):
+            raise RuntimeError("db down")
+
+        writer = BatchWriter("test", fail, batch_size=1, max_latency=10)
+        await writer.start()
+        await writer.enqueue({"n": 1})
+        await writer.stop()
+
+        assert writer.failed_rows == 1
+        assert writer.flushed_rows == 0
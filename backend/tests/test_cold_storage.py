@@ -0,0 +1,149 @@
+"""
+cold_storage 模块测试
+"""
+
+from datetime import datetime, timedelta
+from app.crud.event_crud import bulk_insert_events
+from app.models.postgres import Event
+from app.services.cold_storage import (
+    ColdEventStore,
+    SegmentReader,
+    archive_aged_events,
+    search_events,
+    write_segment,
+)
+from tests.conftest import make_user
+
+BASE_TIME = datetime(2024, 1, 1)
+
+def _rows(count, start_id=1):
+    return [
+        {
+            "id": start_id + i,
+            "event_type": "port_scan" if i % 2 else "ssh_login",
+            "event_time": BASE_TIME + timedelta(minutes=i),
+            "created_at": BASE_TIME + timedelta(minutes=i, seconds=1),
+            "asset_id": 1 + i % 3,
+            "source_ip": "10.0.0.%d" % (i % 250) if i % 5 else "2001:db8::1",
+            "destination_ip": None,
+            "source_port": 40000 + i,
+            "destination_port": 22,
+            "protocol": "TCP" if i % 4 else None,
+            "description": f"事件 {i}",
+            "raw_data": {"seq": i},
+            "count": 1 + i % 7,
+            "first_seen": BASE_TIME + timedelta(minutes=i),
+            "last_seen": BASE_TIME + timedelta(minutes=i, seconds=30),
+        }
+        for i in range(count)
+    ]
+
+class TestColdStorage:
+    """
+    cold_storage 测试类
+    """
+
+    def test_segment_round_trip(self, tmp_path):
+        """编码后读回的行与原始数据一致"""
+        rows = _rows(50)
+        footer = write_segment(tmp_path / "seg.seg", rows, row_group_rows=16)
+
+        assert footer["rows"] == 50
+        assert len(footer["groups"]) == 4
+        assert footer["dictionaries"]["event_type"] == ["ssh_login", "port_scan"]
+        with SegmentReader(tmp_path / "seg.seg") as reader:
+            assert list(reader.scan()) == rows
+
+    def test_scan_filters_time_and_asset(self, tmp_path):
+        """按时间范围和资产过滤，并可倒序返回"""
+        write_segment(tmp_path / "seg.seg", _rows(100), row_group_rows=10)
+
+        with SegmentReader(tmp_path / "seg.seg") as reader:
+            rows = list(reader.scan(
+                BASE_TIME + timedelta(minutes=20),
+                BASE_TIME + timedelta(minutes=39),
+                asset_id=2,
+                columns=["id", "asset_id"],
+                reverse=True
+            ))
+
+        assert [row["id"] for row in rows] == [38, 35, 32, 29, 26, 23]
+        assert all(set(row) == {"id", "asset_id"} for row in rows)
+
+    def test_get_without_id_ranges(self, tmp_path):
+        """早期段的页脚没有ID范围时，按ID查找读取行组的ID列"""
+        write_segment(tmp_path / "seg.seg", _rows(50), row_group_rows=16)
+
+        with SegmentReader(tmp_path / "seg.seg") as reader:
+            for target in [reader.footer, *reader.footer["groups"]]:
+                del target["min_id"], target["max_id"]
+            assert reader.get(40)["description"] == "事件 39"
+            assert reader.get(99) is None
+
+    def test_store_scan_stops_at_limit(self, tmp_path, monkeypatch):
+        """带 limit 的查询每个段只解码前 limit 行"""
+        store = ColdEventStore(str(tmp_path))
+        store.write(1, _rows(100))
+        store.write(2, _rows(100, start_id=101))
+        decoded = []
+        original = SegmentReader.scan
+
+        def counting_scan(self, *args, **kwargs):
+            for row in original(self, *args, **kwargs):
+                decoded.append(row["id"])
+                yield row
+
+        monkeypatch.setattr(SegmentReader, "scan", counting_scan)
+        rows = store.scan(BASE_TIME, BASE_TIME + timedelta(days=1), limit=3, reverse=True)
+
+        assert [row["id"] for row in rows] == [200, 100, 199]
+        assert len(decoded) == 6
+
+    def test_archive_and_search(self, db_session, tmp_path):
+        """归档过期事件后，冷热联合查询仍能查到"""
+        store = ColdEventStore(str(tmp_path))
+        now = datetime(2024, 1, 20)
+        bulk_insert_events(db_session, [
+            {"event_type": "port_scan", "asset_id": 1, "event_time": datetime(2024, 1, day)}
+            for day in (1, 2, 3, 18, 19)
+        ])
+        db_session.commit()
+
+        result = archive_aged_events(db_session, store, older_than_days=7, segment_rows=2, now=now)
+
+        assert result["segments"] == 2
+        assert result["archived_rows"] == 3
+        assert db_session.query(Event).count() == 2
+        assert [segment["sequence"] for segment in store.segments()] == [1, 2]
+
+        events = search_events(db_session, datetime(2024, 1, 1), now, asset_id=1, store=store)
+        assert [event["event_time"].day for event in events] == [19, 18, 3, 2, 1]
+        assert [event["storage"] for event in events] == ["hot", "hot", "cold", "cold", "cold"]
+
+        limited = search_events(db_session, datetime(2024, 1, 1), now, limit=3, store=store)
+        assert [event["event_time"].day for event in limited] == [19, 18, 3]
+
+    def test_archive_removes_uncommitted_segments(self, db_session, tmp_path):
+        """检查点之后的残留段在下次归档时被清理"""
+        store = ColdEventStore(str(tmp_path))
+        store.write(5, _rows(3))
+
+        result = archive_aged_events(db_session, store, now=datetime(2024, 2, 1))
+
+        assert result["segments"] == 0
+        assert store.segments() == []
+
+    def test_query_endpoint(self, api_client, db_session, monkeypatch, tmp_path):
+        """查询接口返回冷热数据"""
+        monkeypatch.setattr("app.core.config.settings.COLD_STORAGE_DIR", str(tmp_path))
+        ColdEventStore(str(tmp_path)).write(1, _rows(3, start_id=100))
+        bulk_insert_events(db_session, [{"event_type": "ssh_login", "event_time": BASE_TIME + timedelta(hours=1)}])
+        db_session.commit()
+
+        params = {"start_time": "2024-01-01T00:00:00", "end_time": "2024-01-02T00:00:00"}
+        assert api_client.get("/api/v1/events", params=params).status_code == 403
+
+        api_client.state.user = make_user("event:read")
+        response = api_client.get("/api/v1/events", params=params)
+        assert response.status_code == 200
+        assert [event["storage"] for event in response.json()] == ["hot", "cold", "cold", "cold"]
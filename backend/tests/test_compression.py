@@ -0,0 +1,78 @@
+"""
+compression 模块测试
+"""
+
+from datetime import datetime
+from sqlalchemy import inspect, text
+from app.core.compression import compress_json, decompress_json
+from app.crud.event_crud import bulk_insert_events
+from app.models.postgres import Event
+from tests.conftest import make_user
+
+COWRIE_RECORD = {
+    "eventid": "cowrie.login.failed",
+    "timestamp": "2024-05-01T10:00:00.000000Z",
+    "src_ip": "45.1.2.3",
+    "src_port": 50122,
+    "dst_ip": "10.0.0.5",
+    "dst_port": 22,
+    "username": "root",
+    "password": "123456",
+    "message": "login attempt [root/123456] failed",
+    "sensor": "hp-ssh-01",
+}
+
+class TestCompression:
+    """
+    compression 测试类
+    """
+
+    def test_round_trip_with_zdict(self):
+        """使用预置字典压缩后可还原，且明显小于原文"""
+        payload = compress_json(COWRIE_RECORD)
+
+        assert payload[:2] == b"\xf1\x01"
+        assert len(payload) < len(str(COWRIE_RECORD)) / 2
+        assert decompress_json(payload) == COWRIE_RECORD
+        assert decompress_json(compress_json(COWRIE_RECORD, zdict_version=0)) == COWRIE_RECORD
+
+    def test_legacy_and_short_values(self):
+        """未压缩的旧JSON文本可直接解码，短文本不压缩"""
+        assert decompress_json(b'{"a": 1}') == {"a": 1}
+        assert decompress_json('{"a": 1}') == {"a": 1}
+        assert compress_json([1]) == b"[1]"
+        assert compress_json(None) is None
+        assert decompress_json(None) is None
+
+    def test_event_raw_data_deferred(self, db_session):
+        """raw_data 压缩存储且默认不随事件加载"""
+        bulk_insert_events(db_session, [
+            {"event_type": "authentication_failure", "event_time": datetime(2024, 5, 1), "raw_data": COWRIE_RECORD}
+        ])
+        db_session.commit()
+
+        stored = db_session.execute(text("SELECT raw_data FROM events")).scalar()
+        assert stored[:1] == b"\xf1"
+
+        event = db_session.query(Event).first()
+        assert "raw_data" in inspect(event).unloaded
+        assert event.raw_data == COWRIE_RECORD
+
+    def test_event_detail_endpoint(self, api_client, db_session):
+        """事件详情接口返回解码后的 raw_data，列表接口不返回"""
+        bulk_insert_events(db_session, [
+            {"event_type": "authentication_failure", "event_time": datetime(2024, 5, 1), "raw_data": COWRIE_RECORD}
+        ])
+        db_session.commit()
+        api_client.state.user = make_user("event:read")
+
+        response = api_client.get("/api/v1/events/1", params={"event_time": "2024-05-01T00:00:00"})
+        assert response.status_code == 200
+        assert response.json()["raw_data"] == COWRIE_RECORD
+
+        listing = api_client.get("/api/v1/events", params={
+            "start_time": "2024-05-01T00:00:00", "end_time": "2024-05-02T00:00:00", "include_cold": False
+        })
+        assert listing.json()[0]["raw_data"] is None
+
+        assert api_client.get("/api/v1/events/999").status_code == 404
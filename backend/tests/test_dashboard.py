@@ -0,0 +1,161 @@
+"""
+dashboard 模块测试
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import sessionmaker
+from app.api.v1.dashboard import big_screen_snapshot
+from app.core.config import settings
+from app.core import hyperloglog
+from app.core.threat_category import classify_threat
+from app.crud.alert_counter_crud import count_new_alerts, rebuild_asset_sketches, rebuild_hourly_rollup
+from app.models.postgres import Alert, AlertAssetSketch, AlertHourlyRollup, Event, HuntingTask
+from app.services.threat_backfill import backfill_threat_categories
+
+class TestDashboard:
+    """
+    dashboard 测试类
+    """
+
+    def test_alert_trend_from_rollup(self, api_client, db_session):
+        """告警趋势读小时汇总表：写入时增量更新，回填结果与增量一致"""
+        now = datetime.utcnow()
+        alerts = [
+            Alert(alert_name="a", severity="critical", status="unhandled", asset_id=1, created_at=now),
+            Alert(alert_name="b", severity="high", status="unhandled", asset_id=2, created_at=now),
+            Alert(alert_name="c", severity="low", status="resolved", created_at=now - timedelta(days=2)),
+            Alert(alert_name="d", severity="high", status="unhandled", asset_id=1, created_at=now - timedelta(days=200)),
+        ]
+        db_session.add_all(alerts)
+        db_session.flush()
+        count_new_alerts(db_session, alerts)
+        db_session.commit()
+        incremental = sorted((r.hour, r.severity, r.asset_id, r.count) for r in db_session.query(AlertHourlyRollup))
+
+        body = api_client.get("/api/v1/dashboard/alert-trend", params={"days": 3}).json()
+        assert body["dates"][-1] == now.strftime("%m/%d")
+        assert (body["counts"], body["critical_counts"], body["high_counts"], body["low_counts"]) == (
+            [1, 0, 2], [0, 0, 1], [0, 0, 1], [1, 0, 0]
+        )
+
+        body = api_client.get("/api/v1/dashboard/alert-trend", params={"days": 365, "asset_id": 1}).json()
+        assert len(body["dates"]) == 365
+        assert sum(body["counts"]) == 2
+
+        db_session.query(AlertHourlyRollup).delete()
+        db_session.commit()
+        assert rebuild_hourly_rollup(db_session, chunk=timedelta(days=30)) == 4
+        assert sorted((r.hour, r.severity, r.asset_id, r.count) for r in db_session.query(AlertHourlyRollup)) == incremental
+
+    def test_big_screen_snapshot_etag(self, api_client, db_session, db_engine, tmp_path, monkeypatch):
+        """大屏数据来自快照：数据未变化时 If-None-Match 得到 304，新告警写入并刷新后 ETag 变化"""
+        monkeypatch.setattr(settings, "BIG_SCREEN_SNAPSHOT_FILE", str(tmp_path / "big_screen.json"))
+        monkeypatch.setattr(big_screen_snapshot, "session_factory", sessionmaker(bind=db_engine))
+
+        # 快照不存在时同步计算一次
+        response = api_client.get("/api/v1/dashboard/big-screen")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert response.json()["metrics"]["today_alerts"] == 0
+        refreshes = big_screen_snapshot.refreshes
+
+        response = api_client.get("/api/v1/dashboard/big-screen", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        # 数据未变化时重新计算得到相同的 ETag
+        assert big_screen_snapshot.refresh().etag == etag
+        assert big_screen_snapshot.refreshes == refreshes + 1
+
+        alert = Alert(alert_name="a", severity="critical", status="unhandled", created_at=datetime.utcnow())
+        db_session.add(alert)
+        db_session.flush()
+        count_new_alerts(db_session, [alert])
+        db_session.commit()
+        # 刷新前仍返回旧快照
+        assert api_client.get("/api/v1/dashboard/big-screen", headers={"If-None-Match": etag}).status_code == 304
+
+        big_screen_snapshot.refresh()
+        response = api_client.get("/api/v1/dashboard/big-screen", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["metrics"]["today_alerts"] == 1
+
+    def test_threat_distribution(self, api_client, db_session):
+        """威胁类型分布按写入时分类的 threat_category 汇总，已有告警可回填"""
+        assert classify_threat("爆破成功后下载执行") == "malware"
+        assert classify_threat("可疑登录", "authentication_failure") == "brute_force"
+        assert classify_threat("自定义告警", description="检测到 PowerShell 编码命令") == "script"
+        assert classify_threat("端口扫描", "port_scan") == "other"
+
+        event = Event(event_type="scheduled_task_creation", event_time=datetime.utcnow())
+        db_session.add(event)
+        db_session.flush()
+        db_session.add_all([
+            Alert(alert_name="横向移动", severity="high", threat_category="lateral_movement"),
+            Alert(alert_name="暴力破解", severity="high"),
+            Alert(alert_name="规则命中", severity="medium", event_id=event.id),
+            Alert(alert_name="端口扫描", severity="low"),
+        ])
+        db_session.commit()
+
+        body = api_client.get("/api/v1/dashboard/threat-distribution").json()
+        assert body["types"] == ["恶意软件", "可疑脚本", "横向移动", "持久化", "数据渗出", "暴力破解"]
+        assert body["counts"] == [0, 0, 1, 0, 0, 0]
+
+        assert backfill_threat_categories(db_session, batch_size=2) == 3
+        assert backfill_threat_categories(db_session) == 0
+        body = api_client.get("/api/v1/dashboard/threat-distribution").json()
+        assert body["types"][-1] == "其他"
+        assert body["counts"] == [0, 0, 1, 1, 0, 1, 1]
+
+    def test_security_metrics(self, api_client, db_session, db_engine):
+        """安全态势指标：计数一条语句汇总，受影响资产由每日草图合并估计"""
+        now = datetime.utcnow()
+        alerts = [
+            Alert(alert_name="a", severity="high", status="unhandled", asset_id=1, created_at=now),
+            Alert(alert_name="b", severity="high", status="unhandled", asset_id=2, created_at=now),
+            Alert(alert_name="c", severity="low", status="resolved", asset_id=1, created_at=now - timedelta(days=3),
+                  handled_at=now),
+            Alert(alert_name="d", severity="low", status="unhandled", asset_id=3, created_at=now - timedelta(days=40)),
+            Alert(alert_name="e", severity="low", status="unhandled", created_at=now),
+        ]
+        db_session.add_all(alerts)
+        db_session.add_all([HuntingTask(name=f"t{i}", query_string="*", status=status)
+                            for i, status in enumerate(["pending", "running", "completed", "failed"])])
+        db_session.flush()
+        count_new_alerts(db_session, alerts)
+        db_session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa_event.listen(db_engine, "before_cursor_execute", record)
+        body = api_client.get("/api/v1/dashboard/metrics").json()
+        sa_event.remove(db_engine, "before_cursor_execute", record)
+        assert body == {
+            "today_alerts": 3, "unhandled_alerts": 4, "affected_assets": 3,
+            "active_hunting_tasks": 2, "handled_events": 1
+        }
+        # 计数指标一条语句，受影响资产一条语句
+        assert len([sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]) == 2
+        assert api_client.get("/api/v1/dashboard/metrics", params={"days": 7}).json()["affected_assets"] == 2
+
+        # 重建结果与增量维护一致
+        incremental = sorted((r.day, r.register, r.value) for r in db_session.query(AlertAssetSketch))
+        db_session.query(AlertAssetSketch).delete()
+        db_session.commit()
+        assert rebuild_asset_sketches(db_session) == 41
+        assert sorted((r.day, r.register, r.value) for r in db_session.query(AlertAssetSketch)) == incremental
+
+    def test_hyperloglog_merge(self):
+        """草图按寄存器取最大值合并，大基数的估计误差在标准误差的数倍以内"""
+        first = hyperloglog.sketch(range(0, 30000))
+        second = hyperloglog.sketch(range(20000, 50000))
+        merged = {register: max(first.get(register, 0), second.get(register, 0)) for register in first.keys() | second.keys()}
+        assert merged == hyperloglog.sketch(range(50000))
+        assert abs(hyperloglog.estimate(merged) - 50000) < 50000 * 0.1
+        assert hyperloglog.estimate(hyperloglog.sketch(range(100))) in range(97, 104)
+        assert hyperloglog.estimate({}) == 0
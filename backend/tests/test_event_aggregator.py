@@ -0,0 +1,95 @@
+"""
+event_aggregator 模块测试
+"""
+
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from app.core.batch_writer import BatchWriter
+from app.core.event_aggregator import AggregatingWriter, EventAggregator, aggregate_rows
+from app.models.postgres import Event
+from tests.conftest import make_user
+
+BASE_TIME = datetime(2024, 1, 1)
+
+def _probe(seconds, source_ip="1.2.3.4", port=22):
+    return {
+        "event_type": "port_scan",
+        "source_ip": source_ip,
+        "destination_port": port,
+        "asset_id": 1,
+        "event_time": BASE_TIME + timedelta(seconds=seconds),
+    }
+
+class TestEventAggregator:
+    """
+    event_aggregator 测试类
+    """
+
+    def test_fold_within_window(self):
+        """窗口内相同键合并，窗口外开启新行"""
+        rows = aggregate_rows(
+            [_probe(0), _probe(5), _probe(3), _probe(1, port=23), _probe(70)],
+            window_seconds=60
+        )
+
+        by_port = sorted(rows, key=lambda row: (row["destination_port"], row["event_time"]))
+        assert [(row["destination_port"], row["count"]) for row in by_port] == [(22, 3), (22, 1), (23, 1)]
+        assert by_port[0]["first_seen"] == BASE_TIME
+        assert by_port[0]["last_seen"] == BASE_TIME + timedelta(seconds=5)
+        assert sum(row["count"] for row in rows) == 5
+
+    def test_lru_eviction_keeps_counts(self):
+        """超过键上限时淘汰最久未命中的键，计数不丢失"""
+        aggregator = EventAggregator(window_seconds=60, max_keys=2)
+        emitted = []
+        for seconds, ip in [(0, "a"), (1, "b"), (2, "a"), (3, "c"), (4, "a")]:
+            emitted += aggregator.add(_probe(seconds, source_ip=ip), now=0)
+
+        assert [(row["source_ip"], row["count"]) for row in emitted] == [("b", 1)]
+        assert aggregator.evicted == 1
+        drained = {row["source_ip"]: row["count"] for row in aggregator.drain()}
+        assert drained == {"a": 3, "c": 1}
+
+    def test_expire_by_wall_clock(self):
+        """开启超过窗口时长的键被输出"""
+        aggregator = EventAggregator(window_seconds=10, max_keys=10)
+        aggregator.add(_probe(0), now=100)
+        aggregator.add(_probe(1, port=80), now=105)
+
+        assert [row["destination_port"] for row in aggregator.expire(now=111)] == [22]
+        assert len(aggregator) == 1
+
+    @pytest.mark.asyncio
+    async def test_aggregating_writer_flushes_on_stop(self):
+        """常驻聚合阶段停止时把剩余行交给下游写入器"""
+        batches = []
+        writer = BatchWriter("test", batches.append, batch_size=10, max_latency=10)
+        stage = AggregatingWriter(writer, EventAggregator(window_seconds=60, max_keys=100))
+        await writer.start()
+        await stage.start()
+        for i in range(20):
+            await stage.enqueue(_probe(i))
+        await stage.stop()
+        await writer.stop()
+
+        rows = [row for batch in batches for row in batch]
+        assert len(rows) == 1
+        assert rows[0]["count"] == 20
+
+    def test_batch_endpoint_aggregates(self, api_client, db_session):
+        """批量写入接口按批次聚合重复事件"""
+        api_client.state.user = make_user("event:create")
+        body = "\n".join(
+            '{"type": "port_scan", "ts": "2024-01-01T00:00:%02d", "src_ip": "1.2.3.4", "dst_port": 22}' % i
+            for i in range(10)
+        )
+
+        response = api_client.post("/api/v1/events:batch?aggregate=true", content=body)
+
+        assert response.status_code == 200
+        assert response.json()["accepted"] == 10
+        events = db_session.query(Event).all()
+        assert len(events) == 1
+        assert events[0].count == 10
+        assert events[0].last_seen == datetime(2024, 1, 1, 0, 0, 9)
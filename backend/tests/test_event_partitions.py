@@ -0,0 +1,70 @@
+"""
+event_partition 模块测试
+"""
+
+import pytest
+from datetime import date, datetime
+from app.crud.event_crud import bulk_insert_events, get_asset_events, get_event_near
+from app.crud.event_partition_crud import (
+    apply_event_retention,
+    ensure_event_partitions,
+    partition_bounds,
+    partition_name,
+)
+from app.models.postgres import Asset, Event
+
+class TestEventPartitions:
+    """
+    event_partition 测试类
+    """
+
+    def test_partition_bounds(self):
+        """分区范围按天数对齐且首尾相接"""
+        assert partition_bounds(date(2024, 3, 5), 1) == (date(2024, 3, 5), date(2024, 3, 6))
+        start, end = partition_bounds(date(2024, 3, 5), 7)
+        assert start <= date(2024, 3, 5) < end
+        assert (end - start).days == 7
+        assert partition_bounds(end, 7)[0] == end
+        assert partition_name(date(2024, 3, 5)) == "events_p20240305"
+
+    def test_ensure_partitions_noop_without_postgres(self, db_session):
+        """非分区表不创建分区"""
+        assert ensure_event_partitions(db_session) == []
+
+    def test_retention_deletes_old_rows(self, db_session, monkeypatch):
+        """未分区时按 event_time 分块删除过期事件"""
+        monkeypatch.setattr("app.crud.event_partition_crud.RETENTION_DELETE_CHUNK", 2)
+        bulk_insert_events(db_session, [
+            {"event_type": "port_scan", "event_time": datetime(2024, 1, day)} for day in range(1, 11)
+        ])
+        db_session.commit()
+
+        result = apply_event_retention(db_session, retention_days=3, now=datetime(2024, 1, 9, 12))
+
+        assert result["cutoff"] == datetime(2024, 1, 6)
+        assert result["deleted_rows"] == 5
+        remaining = [e.event_time.day for e in db_session.query(Event).order_by(Event.event_time)]
+        assert remaining == [6, 7, 8, 9, 10]
+
+    def test_retention_rejects_unknown_mode(self, db_session):
+        """不支持的保留策略报错"""
+        with pytest.raises(ValueError):
+            apply_event_retention(db_session, mode="truncate")
+
+    def test_time_bounded_lookups(self, db_session):
+        """按时间窗口查找事件，窗口外只向前扩大到有限范围"""
+        db_session.add(Asset(id=1, name="web-01", asset_type="server", ip_address="10.0.0.1"))
+        bulk_insert_events(db_session, [
+            {"event_type": "ssh_login", "asset_id": 1, "event_time": datetime(2024, 1, 1, 10)},
+            {"event_type": "port_scan", "asset_id": 1, "event_time": datetime(2024, 1, 1, 11)},
+            {"event_type": "port_scan", "asset_id": 1, "event_time": datetime(2024, 1, 5)},
+        ])
+        db_session.commit()
+
+        assert get_event_near(db_session, 1, datetime(2024, 1, 1, 12)).event_type == "ssh_login"
+        assert get_event_near(db_session, 3, datetime(2024, 1, 12)).id == 3
+        assert get_event_near(db_session, 3, datetime(2024, 1, 1)) is None
+        assert get_event_near(db_session, 3, datetime(2024, 3, 1)) is None
+
+        events = get_asset_events(db_session, 1, datetime(2024, 1, 1), datetime(2024, 1, 2))
+        assert [e.id for e in events] == [2, 1]
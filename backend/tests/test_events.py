@@ -0,0 +1,99 @@
+"""
+events 模块测试
+"""
+
+import json
+from datetime import datetime
+from app.core.config import settings
+from app.crud.event_crud import bulk_insert_events
+from app.models.postgres import Event
+from tests.conftest import make_user
+
+def _ndjson(records) -> bytes:
+    return "\n".join(
+        record if isinstance(record, str) else json.dumps(record) for record in records
+    ).encode()
+
+class TestEvents:
+    """
+    events 测试类
+    """
+
+    def test_bulk_insert_events(self, db_session):
+        """批量写入补齐缺失列"""
+        count = bulk_insert_events(db_session, [
+            {"event_type": "ssh_login", "event_time": datetime(2024, 1, 1), "source_ip": "1.2.3.4"},
+            {"event_type": "port_scan", "event_time": datetime(2024, 1, 2), "destination_port": 22},
+        ])
+        db_session.commit()
+
+        assert count == 2
+        events = db_session.query(Event).order_by(Event.id).all()
+        assert [e.event_type for e in events] == ["ssh_login", "port_scan"]
+        assert events[0].created_at is not None
+        assert events[1].destination_port == 22
+
+    def test_batch_endpoint_counts(self, api_client, db_session, monkeypatch):
+        """按批次统计接收和拒绝的行"""
+        monkeypatch.setattr(settings, "EVENT_INGEST_BATCH_SIZE", 2)
+        api_client.state.user = make_user("event:create")
+        body = _ndjson([
+            {"type": "ssh_login", "ts": "2024-01-01T00:00:00", "src_ip": "1.2.3.4", "dst_port": 22},
+            "not json",
+            "",
+            {"event_type": "port_scan", "event_time": "2024-01-01T00:00:01"},
+            {"type": "port_scan"},
+            {"type": "http_request", "ts": "2024-01-01T00:00:02", "dst_port": 70000},
+        ])
+
+        response = api_client.post("/api/v1/events:batch", content=body)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_lines"] == 5
+        assert data["accepted"] == 2
+        assert data["rejected"] == 3
+        assert [b["accepted"] + b["rejected"] for b in data["batches"]] == [2, 2, 1]
+        assert [e["line"] for e in data["errors"]] == [2, 4, 5]
+        assert db_session.query(Event).count() == 2
+
+    def test_batch_endpoint_reports_failed_batch_lines(self, api_client, monkeypatch):
+        """写入数据库失败的批次报告其第一行和最后一行"""
+        from app.api.v1 import events as events_api
+
+        monkeypatch.setattr(settings, "EVENT_INGEST_BATCH_SIZE", 2)
+        api_client.state.user = make_user("event:create")
+        calls = []
+
+        def failing_write(db, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError("db down")
+            return len(rows)
+
+        monkeypatch.setattr(events_api, "_write_batch", failing_write)
+        body = _ndjson([{"type": "x", "ts": "2024-01-01T00:00:00"}] * 5)
+
+        data = api_client.post("/api/v1/events:batch", content=body).json()
+
+        assert data["accepted"] == 3
+        assert [(e["line"], e["end_line"]) for e in data["errors"]] == [(3, 4)]
+
+    def test_batch_endpoint_rejects_oversized_line(self, api_client, monkeypatch):
+        """超长行被拒绝且不影响后续行"""
+        monkeypatch.setattr(settings, "EVENT_INGEST_MAX_LINE_BYTES", 64)
+        api_client.state.user = make_user("event:create")
+        body = _ndjson([
+            {"type": "x", "ts": "2024-01-01T00:00:00", "description": "a" * 200},
+            {"type": "y", "ts": "2024-01-01T00:00:00"},
+        ])
+
+        data = api_client.post("/api/v1/events:batch", content=body).json()
+
+        assert data["accepted"] == 1
+        assert data["rejected"] == 1
+
+    def test_batch_endpoint_requires_permission(self, api_client):
+        """缺少event:create权限时拒绝"""
+        response = api_client.post("/api/v1/events:batch", content=b"")
+        assert response.status_code == 403
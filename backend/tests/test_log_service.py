@@ -0,0 +1,101 @@
+"""
+log_service 模块测试
+"""
+
+import json
+from datetime import datetime
+from app.models.manticore_schema import NETWORK_INDEX, SIM_SERVICE_INDEX
+from app.models.postgres import Event
+from app.services.log_service import LogNormalizer, LogService, normalize_process_name
+
+def _line(**fields) -> str:
+    return json.dumps(fields)
+
+class TestLogService:
+    """
+    log_service 测试类
+    """
+
+    def test_cowrie_normalization(self):
+        """字段映射、时区转换和枚举映射"""
+        batch = LogNormalizer().normalize_batch("cowrie", [
+            _line(eventid="cowrie.login.failed", timestamp="2024-05-01T08:00:00.5+08:00",
+                  src_ip="::ffff:45.1.2.3", src_port="51000", dst_ip="10.0.0.5", dst_port=22),
+        ], asset_id=7)
+
+        assert batch.rejected == 0
+        event = batch.events[0]
+        assert event["event_type"] == "authentication_failure"
+        assert event["event_time"] == datetime(2024, 5, 1, 0, 0, 0, 500000)
+        assert event["source_ip"] == "45.1.2.3"
+        assert event["source_port"] == 51000
+        assert event["protocol"] == "ssh"
+        assert event["asset_id"] == 7
+
+    def test_invalid_records_are_dropped(self):
+        """无效记录丢弃，可选字段无效时置空"""
+        batch = LogNormalizer().normalize_batch("generic", [
+            "not json",
+            "[1, 2]",
+            _line(event_type="port_scan"),
+            _line(event_type="port_scan", event_time="yesterday"),
+            _line(event_type="port_scan", event_time=1714521600, source_ip="999.1.1.1", destination_port=70000),
+        ])
+
+        assert batch.rejected == 4
+        assert len(batch.errors) == 4
+        event = batch.events[0]
+        assert event["event_time"] == datetime(2024, 5, 1)
+        assert event["source_ip"] is None
+        assert event["destination_port"] is None
+
+    def test_overlong_fields_are_rejected(self):
+        """超过列长度的字段整条拒绝，不影响同批其他记录写入"""
+        batch = LogNormalizer().normalize_batch("generic", [
+            _line(event_type="x" * 300, event_time=1714521600),
+            _line(event_type="port_scan", event_time=1714521600),
+        ])
+
+        assert batch.rejected == 1
+        assert "event_type" in batch.errors[0]
+        assert [event["event_type"] for event in batch.events] == ["port_scan"]
+
+    def test_sysmon_process_and_documents(self):
+        """进程名标准化并生成Manticore文档"""
+        records = [
+            {"EventID": 1, "UtcTime": "2024-05-01 10:00:00.123",
+             "Image": "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\PowerShell.exe"},
+            {"EventID": 3, "UtcTime": "2024-05-01 10:00:01.000",
+             "DestinationIp": "203.0.113.9", "DestinationPort": "443", "Protocol": "6"},
+        ]
+        batch = LogNormalizer().normalize_batch("sysmon", records)
+        assert "process_name" not in records[0]
+
+        assert [e["event_type"] for e in batch.events] == ["process_creation", "network_connection"]
+        assert batch.events[0]["raw_data"]["process_name"] == "powershell.exe"
+        assert batch.events[1]["protocol"] == "tcp"
+
+        (index1, doc1), (index2, doc2) = batch.documents
+        assert index1 == SIM_SERVICE_INDEX and doc1["process_name"] == "powershell.exe"
+        assert index2 == NETWORK_INDEX and doc2["dest_port"] == 443
+        assert "id" not in doc1
+
+    def test_process_name_extraction(self):
+        """从路径和命令行提取可执行文件名"""
+        assert normalize_process_name("C:\\Program Files\\Foo Bar\\App.exe -x") == "app.exe"
+        assert normalize_process_name('"C:\\Program Files\\x.exe" arg') == "x.exe"
+        assert normalize_process_name("wget http://198.51.100.7/x.sh") == "wget"
+        assert normalize_process_name("/usr/bin/python3") == "python3"
+
+    def test_ingest_writes_events(self, db_session):
+        """清洗后写入events表"""
+        service = LogService(db_session)
+        batch = service.ingest("opencanary", [
+            _line(logtype=4002, local_time="2024-05-01 10:00:00.000000", src_host="198.51.100.1", dst_port=22),
+            _line(logtype=4002),
+        ], asset_id=1)
+
+        assert batch.rejected == 1
+        stored = db_session.query(Event).one()
+        assert stored.event_type == "authentication_failure"
+        assert stored.raw_data["src_host"] == "198.51.100.1"
@@ -0,0 +1,98 @@
+"""
+log_sync 模块测试
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from app.crud.event_crud import bulk_insert_events
+from app.crud.sync_crud import get_sync_lag
+from app.models.manticore_schema import NETWORK_INDEX, SIM_SERVICE_INDEX
+from app.tasks.log_sync import sync_events_to_manticore
+
+class FakeWriter:
+    """记录REPLACE调用的假写入器，可在指定次数后失败"""
+
+    def __init__(self, fail_after=None):
+        self.calls = []
+        self.fail_after = fail_after
+
+    def replace(self, index, documents):
+        if self.fail_after is not None and len(self.calls) >= self.fail_after:
+            raise RuntimeError("manticore down")
+        self.calls.append((index, [doc["id"] for doc in documents]))
+        return len(documents)
+
+    def synced_ids(self):
+        return sorted(i for _, ids in self.calls for i in ids)
+
+@pytest.fixture
+def sessions(db_engine):
+    factory = sessionmaker(bind=db_engine)
+    read_db, state_db = factory(), factory()
+    yield read_db, state_db
+    read_db.close()
+    state_db.close()
+
+def _insert_events(db, count, event_type="port_scan", created_at=None):
+    created_at = created_at or datetime.utcnow() - timedelta(minutes=1)
+    bulk_insert_events(db, [
+        {"event_type": event_type, "event_time": datetime(2024, 1, 1, 0, 0, i % 60), "created_at": created_at}
+        for i in range(count)
+    ])
+    db.commit()
+
+class TestLogSync:
+    """
+    log_sync 测试类
+    """
+
+    def test_incremental_sync(self, sessions):
+        """按块同步并推进检查点，再次运行只同步新增事件"""
+        read_db, state_db = sessions
+        _insert_events(state_db, 5, "port_scan")
+        _insert_events(state_db, 2, "authentication_failure")
+
+        writer = FakeWriter()
+        result = sync_events_to_manticore(writer=writer, chunk_size=3, read_db=read_db, state_db=state_db)
+
+        assert result["synced"] == 7
+        assert result["chunks"] == 3
+        assert writer.synced_ids() == list(range(1, 8))
+        assert {index for index, _ in writer.calls} == {NETWORK_INDEX, SIM_SERVICE_INDEX}
+
+        _insert_events(state_db, 2)
+        writer = FakeWriter()
+        result = sync_events_to_manticore(writer=writer, chunk_size=3, read_db=read_db, state_db=state_db)
+        assert writer.synced_ids() == [8, 9]
+        assert get_sync_lag(state_db)["pending_rows"] == 0
+
+    def test_resume_after_failure(self, sessions):
+        """写入失败后从最后确认的块继续"""
+        read_db, state_db = sessions
+        _insert_events(state_db, 6)
+
+        with pytest.raises(RuntimeError):
+            sync_events_to_manticore(writer=FakeWriter(fail_after=1), chunk_size=2, read_db=read_db, state_db=state_db)
+        lag = get_sync_lag(state_db)
+        assert lag["last_id"] == 2
+        assert lag["pending_rows"] == 4
+        assert lag["lag_seconds"] > 0
+
+        read_db.rollback()
+        writer = FakeWriter()
+        sync_events_to_manticore(writer=writer, chunk_size=2, read_db=read_db, state_db=state_db)
+        assert writer.synced_ids() == [3, 4, 5, 6]
+
+    def test_stops_at_unsettled_rows(self, sessions):
+        """遇到刚写入的事件时停止，不越过它推进检查点"""
+        read_db, state_db = sessions
+        _insert_events(state_db, 2)
+        _insert_events(state_db, 1, created_at=datetime.utcnow())
+        _insert_events(state_db, 1)
+
+        writer = FakeWriter()
+        result = sync_events_to_manticore(writer=writer, settle_seconds=30, read_db=read_db, state_db=state_db)
+
+        assert writer.synced_ids() == [1, 2]
+        assert result["last_id"] == 2
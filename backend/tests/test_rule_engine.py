@@ -0,0 +1,154 @@
+"""
+rule_engine 模块测试
+"""
+
+from types import SimpleNamespace
+from datetime import datetime
+import pytest
+from app.crud.event_crud import bulk_insert_events
+from app.models.postgres import Alert, AlertRule
+from app.services.rule_engine import RuleCompileError, RuleRegistry, RuleSet, build_rule_set, compile_rule
+from app.services.rule_worker import evaluate_new_events
+from tests.conftest import make_user
+
+def _rule(rule_id, condition, name=None, severity="high"):
+    return SimpleNamespace(id=rule_id, name=name or f"rule-{rule_id}", severity=severity, condition=condition, description=None)
+
+SSH_BRUTE = {"all": [
+    {"field": "event_type", "value": "authentication_failure"},
+    {"field": "destination_port", "op": "in", "value": ["22", 2222]},
+]}
+
+def _event(**fields):
+    event = {"id": 1, "event_type": "authentication_failure", "source_ip": "45.1.2.3", "destination_port": 22}
+    event.update(fields)
+    return event
+
+class TestRuleEngine:
+    """
+    rule_engine 测试类
+    """
+
+    def test_operators(self):
+        """各类操作符按预期匹配"""
+        cases = [
+            ({"field": "source_ip", "op": "cidr", "value": "45.1.0.0/16"}, True),
+            ({"field": "source_ip", "op": "cidr", "value": ["10.0.0.0/8", "::1/128"]}, False),
+            ({"field": "description", "op": "contains", "value": "WGET", "ignore_case": True}, True),
+            ({"field": "description", "op": "regex", "value": r"https?://\d+"}, True),
+            ({"field": "destination_port", "op": "gte", "value": 1024}, False),
+            ({"field": "destination_port", "op": "startswith", "value": "2"}, True),
+            ({"field": "protocol", "op": "exists"}, False),
+            ({"field": "raw_data.session.user", "value": "root"}, True),
+            ({"not": {"field": "count", "op": "gt", "value": 1}}, True),
+            ({"any": [{"field": "asset_id", "value": 3}, {"field": "source_port", "op": "lt", "value": 10}]}, False),
+        ]
+        event = _event(description="wget http://1.2.3.4/x", raw_data={"session": {"user": "root"}}, count=1)
+        for condition, expected in cases:
+            assert compile_rule(_rule(1, condition)).predicate(event) is expected, condition
+
+    def test_index_by_event_type(self):
+        """规则按事件类型索引，通配规则对所有类型生效"""
+        rule_set = RuleSet([
+            compile_rule(_rule(1, SSH_BRUTE)),
+            compile_rule(_rule(2, {"field": "event_type", "op": "in", "value": ["port_scan", "network_connection"]})),
+            compile_rule(_rule(3, {"field": "source_ip", "op": "cidr", "value": "45.0.0.0/8"})),
+        ])
+
+        assert rule_set.stats()["indexed_event_types"] == 3
+        assert [rule.id for rule in rule_set.match(_event())] == [1, 3]
+        assert [rule.id for rule in rule_set.match(_event(event_type="port_scan"))] == [2, 3]
+        assert [rule.id for rule in rule_set.match(_event(event_type="dns_query", source_ip="8.8.8.8"))] == []
+
+    def test_compile_errors(self):
+        """格式错误的规则被拒绝，build_rule_set 跳过并记录"""
+        for condition in (
+            {"field": "no_such_column", "value": 1},
+            {"field": "destination_port", "op": "like", "value": 1},
+            {"field": "destination_port", "value": "ssh"},
+            {"all": []},
+            {"field": "source_ip", "op": "cidr", "value": "bad"},
+        ):
+            with pytest.raises(RuleCompileError):
+                compile_rule(_rule(1, condition))
+
+        rule_set, errors = build_rule_set([_rule(1, SSH_BRUTE), _rule(2, {"field": "x"})])
+        assert len(rule_set) == 1
+        assert list(errors) == [2]
+
+    def test_evaluate_new_events(self, db_session, monkeypatch):
+        """增量匹配新事件，告警与检查点一起提交"""
+        monkeypatch.setattr("app.core.config.settings.RULE_ENGINE_START_AT", "earliest")
+        rule_set, _ = build_rule_set([_rule(7, SSH_BRUTE, name="SSH暴力破解")])
+        bulk_insert_events(db_session, [
+            {"event_type": "authentication_failure", "destination_port": port, "asset_id": 1,
+             "source_ip": f"45.1.2.{port % 250}", "event_time": datetime(2024, 1, 1)}
+            for port in (22, 80, 2222)
+        ])
+        db_session.commit()
+
+        result = evaluate_new_events(db_session, rule_set, chunk_size=2, settle_seconds=0)
+
+        assert result["processed"] == 3
+        assert result["alerts"] == 2
+        alerts = db_session.query(Alert).order_by(Alert.event_id).all()
+        assert [alert.event_id for alert in alerts] == [1, 3]
+        assert alerts[0].alert_name == "SSH暴力破解"
+        assert alerts[0].status == "unhandled"
+        assert evaluate_new_events(db_session, rule_set, settle_seconds=0)["processed"] == 0
+
+    def test_first_run_starts_at_latest(self, db_session):
+        """默认首次运行不为历史事件补发告警"""
+        rule_set, _ = build_rule_set([_rule(1, SSH_BRUTE)])
+        bulk_insert_events(db_session, [
+            {"event_type": "authentication_failure", "destination_port": 22, "event_time": datetime(2024, 1, 1)}
+        ])
+        db_session.commit()
+
+        assert evaluate_new_events(db_session, rule_set, settle_seconds=0)["processed"] == 0
+        assert db_session.query(Alert).count() == 0
+
+    def test_rule_api_validates_condition(self, api_client, db_session):
+        """创建规则时校验条件"""
+        api_client.state.user = make_user("alert:create")
+        body = {"name": "bad", "condition": {"field": "nope"}, "severity": "high"}
+
+        response = api_client.post("/api/v1/alerts/rules", json=body)
+        assert response.status_code == 400
+        assert "规则条件无效" in response.json()["detail"]
+
+        body.update(name="ssh", condition=SSH_BRUTE)
+        assert api_client.post("/api/v1/alerts/rules", json=body).status_code == 200
+        assert db_session.query(AlertRule).count() == 1
+
+    def test_registry_hot_reload(self, api_client, db_session):
+        """规则修改递增版本号，注册表只重新编译变化的规则并复用未受影响的索引桶"""
+        api_client.state.user = make_user("alert:create")
+        port_scan = {"field": "event_type", "value": "port_scan"}
+        for name, condition in (("ssh", SSH_BRUTE), ("scan", port_scan)):
+            body = {"name": name, "condition": condition, "severity": "high"}
+            assert api_client.post("/api/v1/alerts/rules", json=body).status_code == 200
+
+        registry = RuleRegistry()
+        assert registry.refresh(db_session) is True
+        assert registry.version == 2
+        assert registry.refresh(db_session) is False
+        old_set = registry.rule_set
+        scan_rule = old_set.rules[1]
+
+        ssh_id = old_set.rules[0].id
+        update = {"condition": {"all": SSH_BRUTE["all"] + [{"field": "source_ip", "op": "cidr", "value": "45.0.0.0/8"}]}}
+        assert api_client.put(f"/api/v1/alerts/rules/{ssh_id}", json=update).status_code == 200
+        db_session.expire_all()
+
+        assert registry.refresh(db_session) is True
+        assert registry.rule_set is not old_set
+        assert registry.rule_set.rules[1] is scan_rule
+        assert registry.rule_set.reused_buckets == 1
+        assert [rule.id for rule in registry.rule_set.match(_event(source_ip="8.8.8.8"))] == []
+        assert [rule.id for rule in old_set.match(_event(source_ip="8.8.8.8"))] == [ssh_id]
+
+        assert api_client.put(f"/api/v1/alerts/rules/{ssh_id}", json={"enabled": False}).status_code == 200
+        db_session.expire_all()
+        registry.refresh(db_session)
+        assert [rule.id for rule in registry.rule_set.rules] == [scan_rule.id]
@@ -0,0 +1,227 @@
+"""
+rule_window 模块测试
+"""
+
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import pytest
+from app.crud.event_crud import bulk_insert_events
+from app.crud.sync_crud import get_checkpoint
+from app.models.postgres import Alert
+from app.services.rule_engine import RuleCompileError, build_rule_set, compile_rule
+from app.services.rule_window import WindowStore
+from app.services.rule_worker import EVENTS_RULE_ENGINE, evaluate_new_events, replay_windows
+
+BRUTE_FORCE = {
+    "field": "event_type",
+    "value": "authentication_failure",
+    "threshold": {"count": 3, "window": "1m", "group_by": ["src_ip", "username"]},
+}
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+def _rule(rule_id=1, condition=BRUTE_FORCE):
+    return SimpleNamespace(id=rule_id, name=f"rule-{rule_id}", severity="high", condition=condition, description=None)
+
+def _event(seconds, source_ip="45.1.2.3", user="root", count=1):
+    return {
+        "event_type": "authentication_failure", "source_ip": source_ip, "count": count,
+        "event_time": T0 + timedelta(seconds=seconds), "raw_data": {"username": user},
+    }
+
+class TestRuleWindow:
+    """
+    rule_window 测试类
+    """
+
+    def test_threshold_per_group(self):
+        """每个分组窗口内超过阈值时触发一次，之后重新计数；过期事件移出窗口"""
+        rule = compile_rule(_rule())
+        store = WindowStore(slots=12)
+
+        assert [store.observe(rule, _event(s)) for s in (0, 10, 20)] == [None, None, None]
+        assert store.observe(rule, _event(25, user="admin")) is None
+        assert store.observe(rule, _event(30)) == 4
+        assert store.observe(rule, _event(31)) is None
+
+        # 60秒后前面的事件已移出窗口，聚合的 count 按次数计入
+        assert store.observe(rule, _event(200)) is None
+        assert store.observe(rule, _event(205, count=5)) == 6
+
+    def test_bounded_keys_and_expiry(self):
+        """分组数超过上限时淘汰最久未更新的分组，窗口过期的分组被清理"""
+        rule = compile_rule(_rule())
+        store = WindowStore(slots=6, max_keys=2)
+        for index in range(3):
+            store.observe(rule, _event(index, source_ip=f"10.0.0.{index}"))
+
+        window = store.windows[1]
+        assert [key[0] for key in window.keys] == ["10.0.0.1", "10.0.0.2"]
+        assert window.evicted == 1
+
+        store.observe(rule, _event(300, source_ip="10.0.0.9"))
+        assert store.expire() == 1
+        assert [key[0] for key in window.keys] == ["10.0.0.9"]
+        assert store.stats()["evicted"] == 2
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        """快照恢复窗口，条件修改过的规则丢弃旧窗口"""
+        rule = compile_rule(_rule())
+        store = WindowStore(slots=12)
+        for s in (0, 1, 2):
+            store.observe(rule, _event(s))
+        store.last_id = 42
+        path = str(tmp_path / "windows.json")
+        store.save(path)
+
+        restored = WindowStore.load(path, slots=12)
+        restored.sync([rule])
+        assert restored.last_id == 42
+        assert restored.observe(rule, _event(3)) == 4
+
+        changed = dict(BRUTE_FORCE, threshold=dict(BRUTE_FORCE["threshold"], count=5))
+        restored = WindowStore.load(path, slots=12)
+        restored.sync([compile_rule(_rule(condition=changed))])
+        assert restored.stats()["keys"] == 0
+
+    def test_invalid_threshold(self):
+        """阈值定义错误时编译失败"""
+        for threshold in (
+            {"count": 0, "window": "5m"},
+            {"count": 3, "window": "5x"},
+            {"count": 3, "window": 60, "group_by": ["event_time"]},
+            {"count": 3, "window": "30d"},
+        ):
+            with pytest.raises(RuleCompileError):
+                compile_rule(_rule(condition={"field": "event_type", "value": "x", "threshold": threshold}))
+
+    def test_worker_restart_keeps_windows(self, db_session, monkeypatch, tmp_path):
+        """快照之后已提交的事件在重启时重放，窗口不丢失"""
+        monkeypatch.setattr("app.core.config.settings.RULE_ENGINE_START_AT", "earliest")
+        rule_set, _ = build_rule_set([_rule(condition={**BRUTE_FORCE, "threshold": {"count": 3, "window": "1h"}})])
+        now = datetime.utcnow()
+
+        def insert(count):
+            bulk_insert_events(db_session, [
+                {"event_type": "authentication_failure", "source_ip": "45.1.2.3", "event_time": now}
+                for _ in range(count)
+            ])
+            db_session.commit()
+
+        path = str(tmp_path / "windows.json")
+        windows = WindowStore()
+        insert(2)
+        evaluate_new_events(db_session, rule_set, settle_seconds=0, windows=windows)
+        windows.save(path)
+        insert(1)
+        evaluate_new_events(db_session, rule_set, settle_seconds=0, windows=windows)
+
+        # 模拟重启：从快照（事件ID 2）恢复并重放第3条事件
+        windows = WindowStore.load(path)
+        assert replay_windows(db_session, rule_set, windows) == 1
+        assert windows.last_id == get_checkpoint(db_session, EVENTS_RULE_ENGINE).last_id
+        assert db_session.query(Alert).count() == 0
+
+        insert(1)
+        result = evaluate_new_events(db_session, rule_set, settle_seconds=0, windows=windows)
+        assert result["alerts"] == 1
+        assert "4 次" in db_session.query(Alert).one().description
+
+    def test_failed_write_restores_windows(self, db_session, monkeypatch):
+        """告警写入失败时恢复块前的窗口状态，重新处理该块不会重复计数"""
+        monkeypatch.setattr("app.core.config.settings.RULE_ENGINE_START_AT", "earliest")
+        rule_set, _ = build_rule_set([_rule(condition={**BRUTE_FORCE, "threshold": {"count": 3, "window": "1h"}})])
+        bulk_insert_events(db_session, [
+            {"event_type": "authentication_failure", "source_ip": "45.1.2.3", "event_time": datetime.utcnow()}
+            for _ in range(4)
+        ])
+        db_session.commit()
+
+        def fail(db, rows):
+            raise RuntimeError("写入失败")
+
+        windows = WindowStore()
+        monkeypatch.setattr("app.services.rule_worker.write_alerts", fail)
+        with pytest.raises(RuntimeError):
+            evaluate_new_events(db_session, rule_set, settle_seconds=0, windows=windows)
+        assert windows.stats()["keys"] == 0
+
+        monkeypatch.undo()
+        monkeypatch.setattr("app.core.config.settings.RULE_ENGINE_START_AT", "earliest")
+        bulk_insert_events(db_session, [
+            {"event_type": "authentication_failure", "source_ip": "45.1.2.3", "event_time": datetime.utcnow()}
+        ])
+        db_session.commit()
+        result = evaluate_new_events(db_session, rule_set, settle_seconds=0, windows=windows)
+        assert result["alerts"] == 1
+        assert "4 次" in db_session.query(Alert).one().description
+
+PROCESS_THEN_C2 = {"sequence": {
+    "steps": [
+        {"all": [{"field": "event_type", "value": "process_creation"},
+                 {"field": "raw_data.input", "op": "contains", "value": "/tmp/"}]},
+        {"field": "event_type", "value": "network_connection"},
+    ],
+    "within": "10m",
+}}
+
+def _step(event_id, seconds, event_type, asset_id=1, command="ls"):
+    return {"id": event_id, "event_type": event_type, "asset_id": asset_id,
+            "event_time": T0 + timedelta(seconds=seconds), "raw_data": {"input": command}}
+
+class TestSequenceRule:
+    """
+    序列规则测试类
+    """
+
+    def test_sequence_per_asset(self):
+        """同一资产上依次发生且在时限内时完成序列"""
+        rule = compile_rule(_rule(condition=PROCESS_THEN_C2))
+        store = WindowStore()
+
+        assert rule.event_types == frozenset(["process_creation", "network_connection"])
+        assert store.observe(rule, _step(1, 0, "network_connection")) is None
+        assert store.observe(rule, _step(2, 10, "process_creation", command="/tmp/x")) is None
+        assert store.observe(rule, _step(3, 20, "network_connection", asset_id=2)) is None
+        assert store.stats()["partial_matches"] == 1
+        assert store.observe(rule, _step(4, 30, "network_connection")) == (2, 4)
+        assert store.stats()["partial_matches"] == 0
+        assert store.stats()["completed_sequences"] == 1
+
+    def test_stale_partial_matches_pruned(self):
+        """超过时限的部分匹配被剪除，同一阶段只保留起点最晚的部分匹配"""
+        rule = compile_rule(_rule(condition=PROCESS_THEN_C2))
+        store = WindowStore()
+        for event_id in (1, 2, 3):
+            store.observe(rule, _step(event_id, event_id, "process_creation", command="/tmp/x"))
+        assert store.stats()["partial_matches"] == 1
+
+        assert store.observe(rule, _step(4, 1000, "network_connection")) is None
+        assert store.stats()["pruned_partial_matches"] == 1
+        store.observe(rule, _step(5, 2000, "process_creation", asset_id=9, command="/tmp/y"))
+        assert store.expire() == 1
+
+    def test_sequence_alert(self, db_session, monkeypatch):
+        """规则工作进程为完成的序列产生一条告警"""
+        monkeypatch.setattr("app.core.config.settings.RULE_ENGINE_START_AT", "earliest")
+        rule_set, _ = build_rule_set([_rule(condition=PROCESS_THEN_C2)])
+        now = datetime.utcnow()
+        bulk_insert_events(db_session, [
+            {"event_type": "process_creation", "asset_id": 1, "event_time": now, "raw_data": {"input": "/tmp/a"}},
+            {"event_type": "network_connection", "asset_id": 1, "event_time": now + timedelta(seconds=5)},
+        ])
+        db_session.commit()
+
+        result = evaluate_new_events(db_session, rule_set, settle_seconds=0)
+        assert result["alerts"] == 1
+        assert "#1 → #2" in db_session.query(Alert).one().description
+
+    def test_invalid_sequence(self):
+        """序列定义错误时编译失败"""
+        for condition in (
+            {"sequence": {"steps": [{"field": "event_type", "value": "a"}], "within": "1m"}},
+            {"sequence": {"steps": [{"field": "x"}, {"field": "event_type", "value": "b"}], "within": "1m"}},
+            {"sequence": {"steps": [{"field": "event_type", "value": "a"}] * 2}, "field": "asset_id", "value": 1},
+        ):
+            with pytest.raises(RuleCompileError):
+                compile_rule(_rule(condition=condition))
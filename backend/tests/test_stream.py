@@ -0,0 +1,131 @@
+"""
+stream 模块测试
+"""
+
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+from starlette.websockets import WebSocketDisconnect
+import pytest
+from app.api.v1 import stream as stream_api
+from app.core.config import settings
+from app.core.stream import StreamHub, StreamSubscriber, stream_hub
+from app.crud.alert_counter_crud import count_new_alerts
+from app.models.postgres import Alert, Asset
+from tests.conftest import make_user
+
+def _add_alert(db_session, severity):
+    alert = Alert(alert_name=f"{severity} 告警", severity=severity, status="unhandled", created_at=datetime.utcnow())
+    db_session.add(alert)
+    db_session.flush()
+    count_new_alerts(db_session, [alert])
+    db_session.commit()
+    return alert
+
+class TestStream:
+    """
+    stream 测试类
+    """
+
+    def test_poll_deltas(self, db_engine, db_session):
+        """检查只产生增量：首次只建立基线，之后推送新的高危告警、变化的计数和资产状态"""
+        asset = Asset(name="web-01", asset_type="server", ip_address="10.0.0.1", status="normal")
+        db_session.add(asset)
+        _add_alert(db_session, "critical")
+        hub = StreamHub()
+        hub.session_factory = sessionmaker(bind=db_engine)
+
+        first = hub.poll()
+        assert [key for key, _ in first] == ["counters"]
+        assert first[0][1]["data"]["today_alerts"] == 1
+        assert hub.poll() == []
+
+        alert = _add_alert(db_session, "high")
+        _add_alert(db_session, "low")
+        asset.status = "danger"
+        db_session.commit()
+        messages = dict(hub.poll())
+        assert set(messages) == {f"alert:{alert.id}", "counters", f"asset:{asset.id}"}
+        assert messages["counters"]["data"] == {
+            "today_alerts": 3, "unhandled_alerts": 3, "by_status": {"unhandled": 3},
+            "by_severity": {"critical": 1, "high": 1, "low": 1}
+        }
+        assert messages[f"asset:{asset.id}"]["data"]["previous"] == "normal"
+
+    def test_poll_late_committed_alert(self, db_engine, db_session):
+        """较小ID的告警晚于较大ID提交时仍会推送，已推送的告警不重复推送"""
+        hub = StreamHub()
+        hub.session_factory = sessionmaker(bind=db_engine)
+        hub.poll()
+
+        db_session.add(Alert(id=10, alert_name="后分配先提交", severity="critical", status="unhandled",
+                             created_at=datetime.utcnow()))
+        db_session.commit()
+        assert [key for key, _ in hub.poll() if key.startswith("alert:")] == ["alert:10"]
+
+        db_session.add(Alert(id=5, alert_name="先分配后提交", severity="high", status="unhandled",
+                             created_at=datetime.utcnow()))
+        db_session.commit()
+        assert [key for key, _ in hub.poll() if key.startswith("alert:")] == ["alert:5"]
+        assert hub._last_alert_id == 0
+
+    def test_subscriber_coalesce_and_overflow(self):
+        """同一键的未发送更新合并为一条；缓冲满时清空并要求重新拉取"""
+        subscriber = StreamSubscriber(max_pending=3)
+        subscriber.push("counters", {"type": "counters", "data": {"today_alerts": 1, "unhandled_alerts": 1}})
+        subscriber.push("asset:1", {"type": "asset_status", "data": {"id": 1, "status": "warning", "previous": "normal"}})
+        subscriber.push("counters", {"type": "counters", "data": {"today_alerts": 2}})
+        subscriber.push("asset:1", {"type": "asset_status", "data": {"id": 1, "status": "danger", "previous": "warning"}})
+        assert list(subscriber._pending.values()) == [
+            {"type": "counters", "data": {"today_alerts": 2, "unhandled_alerts": 1}},
+            {"type": "asset_status", "data": {"id": 1, "status": "danger", "previous": "normal"}},
+        ]
+
+        for alert_id in range(3):
+            subscriber.push(f"alert:{alert_id}", {"type": "alert", "data": {"id": alert_id}})
+        assert list(subscriber._pending.values()) == [{"type": "resync"}, {"type": "alert", "data": {"id": 2}}]
+        assert subscriber.dropped == 3
+
+    def test_websocket_push(self, api_client, db_engine, db_session, monkeypatch):
+        """WebSocket 连接先收到完整计数，之后收到新告警和计数变化"""
+        monkeypatch.setattr(stream_api, "_authorize", lambda token: make_user("alert:read"))
+        monkeypatch.setattr(stream_hub, "session_factory", sessionmaker(bind=db_engine))
+        monkeypatch.setattr(settings, "STREAM_POLL_INTERVAL", 0.05)
+
+        with api_client.websocket_connect("/api/v1/stream?token=t") as websocket:
+            baseline = websocket.receive_json()
+            assert baseline == {"type": "counters", "data": {
+                "today_alerts": 0, "unhandled_alerts": 0, "by_status": {}, "by_severity": {}
+            }}
+
+            alert = _add_alert(db_session, "critical")
+            received = {}
+            while set(received) != {"alert", "counters"}:
+                message = websocket.receive_json()
+                received[message["type"]] = message["data"]
+            assert received["alert"]["id"] == alert.id
+            assert received["counters"] == {
+                "today_alerts": 1, "unhandled_alerts": 1, "by_status": {"unhandled": 1}, "by_severity": {"critical": 1}
+            }
+
+    def test_websocket_closed_after_revocation(self, api_client, db_engine, monkeypatch):
+        """连接期间用户失去权限时，重新校验失败并以 1008 关闭连接"""
+        calls = []
+
+        def authorize(token):
+            calls.append(token)
+            if len(calls) > 1:
+                raise HTTPException(status_code=403, detail="权限不足，需要权限: alert:read")
+            return make_user("alert:read")
+
+        monkeypatch.setattr(stream_api, "_authorize", authorize)
+        monkeypatch.setattr(stream_hub, "session_factory", sessionmaker(bind=db_engine))
+        monkeypatch.setattr(settings, "STREAM_HEARTBEAT_INTERVAL", 0.05)
+        monkeypatch.setattr(settings, "USER_CACHE_TTL", 0)
+
+        with api_client.websocket_connect("/api/v1/stream?token=t") as websocket:
+            with pytest.raises(WebSocketDisconnect) as closed:
+                while True:
+                    websocket.receive_json()
+        assert closed.value.code == 1008
+        assert len(calls) == 2
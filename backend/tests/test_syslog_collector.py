@@ -0,0 +1,138 @@
+"""
+syslog_collector 模块测试
+"""
+
+import asyncio
+import pytest
+from datetime import datetime
+from app.core.batch_writer import BatchWriter
+from app.services.syslog_collector import SyslogCollector, write_stats_file
+from app.services.syslog_parser import SyslogParseError, parse_message
+from tests.conftest import make_user
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+COWRIE_JSON = (
+    '{"eventid": "cowrie.login.failed", "timestamp": "2024-05-01T10:00:00.000000Z", '
+    '"src_ip": "45.1.2.3", "src_port": 50122, "dst_port": 22, "username": "root"}'
+)
+
+def _collector(sink, **kwargs):
+    options = dict(udp_port=None, tcp_port=None, queue_size=10, batch_size=100, max_latency=0.01)
+    options.update(kwargs)
+    return SyslogCollector(sink, **options)
+
+class TestSyslogParser:
+    """
+    syslog_parser 测试类
+    """
+
+    def test_rfc5424_with_structured_data(self):
+        """解析RFC5424头部和结构化数据"""
+        source, record = parse_message(
+            b'<34>1 2024-05-01T10:00:00Z hp-01 sshd 123 ID47 '
+            b'[exampleSDID@32473 iut="3" eventSource="App\\"lication"] Failed password for root',
+            peer_ip="10.0.0.5"
+        )
+
+        assert source == "syslog"
+        assert record["facility"] == "auth"
+        assert record["severity"] == "crit"
+        assert record["app_name"] == "sshd"
+        assert record["structured_data"] == {"exampleSDID@32473": {"iut": "3", "eventSource": 'App"lication'}}
+        assert record["message"] == "Failed password for root"
+        assert record["peer_ip"] == "10.0.0.5"
+
+    def test_rfc3164_year_inference(self):
+        """RFC3164时间补全年份，跨年时取上一年"""
+        _, record = parse_message(b"<13>Dec 31 23:59:59 hp-01 su[42]: session opened", now=NOW)
+        assert record["timestamp"] == "2023-12-31T23:59:59"
+        assert record["app_name"] == "su"
+        assert record["procid"] == "42"
+        assert record["message"] == "session opened"
+
+    def test_json_payloads(self):
+        """JSON行和syslog包装的JSON按特征识别来源"""
+        assert parse_message(COWRIE_JSON.encode())[0] == "cowrie"
+        source, record = parse_message(b"<14>May  1 10:00:00 hp-01 opencanaryd: " + b'{"logtype": 5001}', now=NOW)
+        assert source == "opencanary"
+        assert record == {"logtype": 5001}
+
+    def test_invalid_messages(self):
+        """空消息和无效PRI抛出解析错误"""
+        with pytest.raises(SyslogParseError):
+            parse_message(b"\r\n")
+        with pytest.raises(SyslogParseError):
+            parse_message(b"<999>1 - - - - - -")
+
+class TestSyslogCollector:
+    """
+    syslog_collector 测试类
+    """
+
+    def test_overload_drop_counts(self):
+        """队列满时丢弃并计数"""
+        async def scenario():
+            collector = _collector(None, overload_policy="drop", queue_size=3)
+            collector._queue = asyncio.Queue(maxsize=3)
+            results = [collector.offer(b"x", None, "udp") for _ in range(5)]
+            return collector, results
+
+        collector, results = asyncio.run(scenario())
+        assert results == [True, True, True, False, False]
+        assert collector.dropped["queue_full"] == 2
+        assert collector.received["udp"] == 5
+
+    def test_overload_sampling_weights(self):
+        """超过水位线后按1/N采样，保留的事件计数乘以N"""
+        async def scenario():
+            collector = _collector(None, queue_size=100, sample_watermark=0.0, sample_rate=4)
+            collector._queue = asyncio.Queue(maxsize=100)
+            for _ in range(8):
+                collector.offer(COWRIE_JSON.encode(), None, "udp")
+            return collector, [collector._queue.get_nowait() for _ in range(collector._queue.qsize())]
+
+        collector, items = asyncio.run(scenario())
+        assert collector.sampled_out == 6
+        assert [weight for _, _, weight in items] == [4, 4]
+        rows = collector.process(items)
+        assert [row["count"] for row in rows] == [4, 4]
+
+    @pytest.mark.asyncio
+    async def test_tcp_end_to_end(self):
+        """TCP换行和计数分帧的消息经清洗后写入下游"""
+        batches = []
+        writer = BatchWriter("test", batches.append, batch_size=100, max_latency=0.01)
+        collector = _collector(writer, host="127.0.0.1", tcp_port=0, asset_loader=lambda: {"127.0.0.1": 7})
+        await writer.start()
+        await collector.start()
+        port = collector._tcp_server.sockets[0].getsockname()[1]
+
+        reader, conn = await asyncio.open_connection("127.0.0.1", port)
+        framed = b"<13>May  1 10:00:00 hp-01 sshd[1]: Accepted password"
+        conn.write(COWRIE_JSON.encode() + b"\n" + str(len(framed)).encode() + b" " + framed + b"garbage\n")
+        await conn.drain()
+        conn.close()
+        await asyncio.sleep(0.1)
+        await collector.stop()
+        await writer.stop()
+
+        rows = [row for batch in batches for row in batch]
+        assert sorted(row["event_type"] for row in rows) == ["authentication_failure", "syslog_message", "syslog_message"]
+        assert all(row["asset_id"] == 7 for row in rows)
+        assert collector.stats()["received_total"] == 3
+        assert collector.forwarded == 3
+
+    def test_collector_stats_endpoint(self, api_client, monkeypatch, tmp_path):
+        """管理接口读取采集器指标文件"""
+        path = str(tmp_path / "stats.json")
+        monkeypatch.setattr("app.core.config.settings.COLLECTOR_STATS_FILE", path)
+        api_client.state.user = make_user()
+        api_client.state.user.roles[0].name = "admin"
+
+        assert api_client.get("/api/v1/system/ingest/collector").status_code == 404
+
+        write_stats_file(path, _collector(None).stats())
+        response = api_client.get("/api/v1/system/ingest/collector")
+        assert response.status_code == 200
+        assert response.json()["dropped_total"] == 0
@@ -44,11 +44,42 @@ raw_env = [
     "ENVIRONMENT=production"
 ]
 
+# 后台进程: 由主进程拉起的独立子进程（不占用worker）
+#   HSYSTEM_EMBEDDED_COLLECTOR=1    syslog采集器
+#   HSYSTEM_EMBEDDED_RULE_WORKER=1  告警规则引擎
+embedded_services = [
+    module for flag, module in (
+        ("HSYSTEM_EMBEDDED_COLLECTOR", "app.services.syslog_collector"),
+        ("HSYSTEM_EMBEDDED_RULE_WORKER", "app.services.rule_worker"),
+    )
+    if os.environ.get(flag, "0") == "1"
+]
+_service_processes = []
+
 # 钩子函数 - 用于监控和优化
 def when_ready(server):
     """服务器启动完成时的回调"""
     server.log.info("H-System EDR Backend Server is ready")
 
+    import subprocess
+    import sys
+
+    for module in embedded_services:
+        process = subprocess.Popen([sys.executable, "-m", module])
+        _service_processes.append(process)
+        server.log.info("%s started (pid: %s)", module, process.pid)
+
+def on_exit(server):
+    """主进程退出时停止后台进程（收到SIGTERM后会处理完已接收的数据）"""
+    for process in _service_processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in _service_processes:
+        try:
+            process.wait(timeout=30)
+        except Exception:
+            process.kill()
+
 def worker_int(worker):
     """Worker进程中断时的回调"""
     worker.log.info("Worker received INT or QUIT signal")